@@ -1,7 +1,7 @@
 from fastapi import APIRouter
 from app.api.v1 import (
     courses, assignments, flashcards, chat, study_sessions, settings, canvas,
-    auth, quizzes, saved_decks, profile, dashboard, modules
+    auth, quizzes, saved_decks, profile, dashboard, modules, jobs
 )
 
 api_router = APIRouter()
@@ -33,3 +33,6 @@ api_router.include_router(study_sessions.router, prefix="/study-sessions", tags=
 # AI Chat
 api_router.include_router(chat.router, prefix="/chat", tags=["chat"])
 
+# Background Jobs
+api_router.include_router(jobs.router, prefix="/jobs", tags=["jobs"])
+
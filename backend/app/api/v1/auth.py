@@ -1,5 +1,8 @@
+import asyncio
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
@@ -7,17 +10,13 @@ from passlib.context import CryptContext
 from typing import Optional
 from pydantic import BaseModel, Field
 
-from app.db.database import get_db
+from app.db.database import get_async_db, get_db
 from app.models.user import User
-from app.models.course import Course
 from app.models.module import Module
-from app.models.assignment import Assignment
 from app.schemas.auth import UserSignup, UserLogin, UserResponse, Token, TokenData, LoginResponse
 from app.core.config import settings
 from app.core.encryption import encrypt_data, decrypt_data
-from app.services.canvas_scraper import CanvasScraper
-from datetime import datetime as dt
-from dateutil import parser as date_parser
+from app.services import canvas_import, canvas_refresh, job_queue
 
 router = APIRouter()
 
@@ -48,31 +47,48 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def _token_data(token: str) -> TokenData:
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         email: str = payload.get("sub")
         if email is None:
-            raise credentials_exception
-        token_data = TokenData(email=email)
+            raise _credentials_exception()
+        return TokenData(email=email)
     except JWTError:
-        raise credentials_exception
-    
+        raise _credentials_exception()
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+    """The authenticated user on the request's Session (for routes using get_db; runs in the threadpool)"""
+    token_data = _token_data(token)
     user = db.query(User).filter(User.email == token_data.email).first()
     if user is None:
-        raise credentials_exception
+        raise _credentials_exception()
+    return user
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
+    """The authenticated user on the request's AsyncSession (for routes using get_async_db)"""
+    token_data = _token_data(token)
+    user = await db.scalar(select(User).where(User.email == token_data.email))
+    if user is None:
+        raise _credentials_exception()
     return user
 
 @router.post("/signup", response_model=Token, status_code=status.HTTP_201_CREATED)
-async def signup(user_data: UserSignup, db: Session = Depends(get_db)):
-    """Register a new user and optionally import their Canvas courses"""
+async def signup(user_data: UserSignup, db: AsyncSession = Depends(get_async_db)):
+    """
+    Register a new user and optionally import their Canvas courses
+    
+    The import runs as a background job; poll GET /jobs/{import_job_id}.
+    """
     # Check if user already exists
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
+    existing_user = await db.scalar(select(User.id).where(User.email == user_data.email))
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -84,8 +100,8 @@ async def signup(user_data: UserSignup, db: Session = Depends(get_db)):
     if user_data.canvas_session_cookie:
         encrypted_session = encrypt_data(user_data.canvas_session_cookie)
     
-    # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    # Create new user (bcrypt is deliberately slow, so it runs off the event loop)
+    hashed_password = await asyncio.to_thread(get_password_hash, user_data.password)
     new_user = User(
         first_name=user_data.first_name,
         last_name=user_data.last_name,
@@ -97,88 +113,16 @@ async def signup(user_data: UserSignup, db: Session = Depends(get_db)):
     )
     
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     
-    # Auto-import Canvas courses if session cookie was provided
+    # Import Canvas courses in the background if a session cookie was provided
+    import_job_id = None
     if user_data.canvas_session_cookie and user_data.canvas_instance_url:
-        try:
-            scraper = CanvasScraper(
-                base_url=user_data.canvas_instance_url,
-                session_cookie=user_data.canvas_session_cookie
-            )
-            
-            courses_data = scraper.scrape_all_active_courses()
-            colors = ["#3B82F6", "#10B981", "#F59E0B", "#EF4444", "#8B5CF6", "#EC4899", 
-                      "#06B6D4", "#F97316", "#84CC16", "#A855F7"]
-            
-            # Import courses for this user
-            for idx, course_data in enumerate(courses_data):
-                canvas_id = course_data['id']
-                name = course_data['name']
-                code = name.split('.')[0] if '.' in name else name.split()[0]
-                
-                course = Course(
-                    canvas_id=canvas_id,
-                    user_id=new_user.id,
-                    code=code,
-                    name=name,
-                    instructor="TBD",
-                    term="Current Semester",
-                    progress=0.0,
-                    color=colors[idx % len(colors)],
-                    is_active=1
-                )
-                
-                db.add(course)
-                db.flush()
-                
-                # Import modules
-                for pos, module_data in enumerate(course_data.get('modules', [])):
-                    module = Module(
-                        course_id=course.id,
-                        name=module_data.get('name', 'Unnamed Module'),
-                        position=pos,
-                        items=module_data.get('items', [])
-                    )
-                    db.add(module)
-                
-                # Import assignments
-                assignments_data = scraper.get_course_assignments(canvas_id)
-                for assign_data in assignments_data:
-                    try:
-                        # Parse due date
-                        due_date_str = assign_data.get('due_date', '')
-                        due_date = dt.utcnow()  # Default to now
-                        
-                        if due_date_str:
-                            try:
-                                # Try to parse the date string
-                                due_date = date_parser.parse(due_date_str)
-                            except:
-                                pass
-                        
-                        assignment = Assignment(
-                            user_id=new_user.id,
-                            course_id=course.id,
-                            title=assign_data.get('name', 'Unnamed Assignment'),
-                            course=code,
-                            due_date=due_date,
-                            type="Assignment",
-                            priority="medium",
-                            status="pending",
-                            submitted=False
-                        )
-                        db.add(assignment)
-                    except Exception as e:
-                        print(f"Failed to import assignment: {e}")
-                        continue
-            
-            db.commit()
-            
-        except Exception as e:
-            # Don't fail signup if Canvas import fails
-            print(f"Canvas import failed during signup: {e}")
+        job = await db.run_sync(
+            job_queue.enqueue, "import_courses", canvas_import.import_payload(new_user.id), user_id=new_user.id
+        )
+        import_job_id = job.id
+        await db.run_sync(canvas_refresh.session_updated, new_user.id)
     
     # Create access token
     access_token = create_access_token(data={"sub": new_user.email})
@@ -186,112 +130,27 @@ async def signup(user_data: UserSignup, db: Session = Depends(get_db)):
     return {
         "access_token": access_token,
         "token_type": "bearer",
-        "user": UserResponse.from_orm(new_user)
+        "user": UserResponse.from_orm(new_user),
+        "import_job_id": import_job_id
     }
 
 @router.post("/login", response_model=LoginResponse)
-async def login(user_data: UserLogin, db: Session = Depends(get_db)):
-    """Login user, validate Canvas session, and sync assignments"""
-    user = db.query(User).filter(User.email == user_data.email).first()
+async def login(user_data: UserLogin, db: AsyncSession = Depends(get_async_db)):
+    """Login user; no Canvas requests are made (see canvas_refresh)"""
+    user = await db.scalar(select(User).where(User.email == user_data.email))
     
-    if not user or not verify_password(user_data.password, user.password_hash):
+    if not user or not await asyncio.to_thread(verify_password, user_data.password, user.password_hash):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Check Canvas session validity and sync assignments
-    canvas_session_valid = False
-    has_canvas_session = False
-    
-    if user.canvas_session_cookie:
-        has_canvas_session = True
-        try:
-            session_cookie = decrypt_data(user.canvas_session_cookie)
-            canvas_url = user.canvas_instance_url or "https://usflearn.instructure.com"
-            
-            if session_cookie:
-                # Use CanvasScraper to properly validate session
-                scraper = CanvasScraper(
-                    base_url=canvas_url,
-                    session_cookie=session_cookie
-                )
-                
-                # Try to get courses - this is a better validation than just checking homepage
-                try:
-                    courses = scraper.get_all_courses()
-                    canvas_session_valid = len(courses) > 0
-                    print(f"Canvas session validation: {canvas_session_valid} (found {len(courses)} courses)")
-                except Exception as validation_error:
-                    print(f"Canvas session validation failed: {validation_error}")
-                    canvas_session_valid = False
-                
-                # If session is valid, sync assignments in background
-                if canvas_session_valid:
-                    try:
-                        # Get all user's courses
-                        user_courses = db.query(Course).filter(Course.user_id == user.id).all()
-                        
-                        for course in user_courses:
-                            if not course.canvas_id:
-                                continue
-                                
-                            # Fetch assignments from Canvas (scraper already created above)
-                            assignments_data = scraper.get_course_assignments(course.canvas_id)
-                            
-                            for assign_data in assignments_data:
-                                try:
-                                    # Parse due date
-                                    due_date_str = assign_data.get('due_date', '')
-                                    due_date = dt.utcnow()
-                                    
-                                    if due_date_str:
-                                        try:
-                                            due_date = date_parser.parse(due_date_str)
-                                        except:
-                                            pass
-                                    
-                                    title = assign_data.get('name', 'Unnamed Assignment')
-                                    
-                                    # Check if assignment already exists
-                                    existing_assignment = db.query(Assignment).filter(
-                                        Assignment.user_id == user.id,
-                                        Assignment.course_id == course.id,
-                                        Assignment.title == title
-                                    ).first()
-                                    
-                                    if existing_assignment:
-                                        # Update due date if changed
-                                        if existing_assignment.due_date != due_date:
-                                            existing_assignment.due_date = due_date
-                                    else:
-                                        # Create new assignment
-                                        assignment = Assignment(
-                                            user_id=user.id,
-                                            course_id=course.id,
-                                            title=title,
-                                            course=course.code,
-                                            due_date=due_date,
-                                            type="Assignment",
-                                            priority="medium",
-                                            status="pending",
-                                            submitted=False
-                                        )
-                                        db.add(assignment)
-                                except Exception as e:
-                                    print(f"Failed to sync assignment: {e}")
-                                    continue
-                        
-                        db.commit()
-                    except Exception as e:
-                        print(f"Assignment sync failed during login: {e}")
-                        db.rollback()
-                        
-        except Exception as e:
-            # Don't block login if Canvas check fails
-            print(f"Canvas session check failed: {e}")
-            canvas_session_valid = False
+    # Canvas data is refreshed in the background (canvas_refresh); login only
+    # reports whether the stored session is still usable and queues a refresh
+    # if the user's data is stale
+    has_canvas_session = bool(user.canvas_session_cookie)
+    canvas_session_valid = await db.run_sync(canvas_refresh.record_login, user)
     
     # Create access token
     access_token = create_access_token(data={"sub": user.email})
@@ -305,18 +164,18 @@ async def login(user_data: UserLogin, db: Session = Depends(get_db)):
     )
 
 @router.post("/logout")
-async def logout(current_user: User = Depends(get_current_user)):
+async def logout(current_user: User = Depends(get_current_user_async)):
     """Logout user (client should remove token)"""
     return {"message": "Successfully logged out"}
 
 @router.get("/me", response_model=UserResponse)
-async def get_current_user_info(current_user: User = Depends(get_current_user)):
+async def get_current_user_info(current_user: User = Depends(get_current_user_async)):
     """Get current user information"""
     return UserResponse.from_orm(current_user)
 
 
 @router.post("/validate-canvas-session")
-async def validate_user_canvas_session(current_user: User = Depends(get_current_user)):
+async def validate_user_canvas_session(current_user: User = Depends(get_current_user_async)):
     """
     Validate the current user's Canvas session cookie
     
@@ -355,7 +214,7 @@ async def validate_user_canvas_session(current_user: User = Depends(get_current_
             session_cookie=session_cookie
         )
         
-        courses = scraper.get_all_courses()
+        courses = await asyncio.to_thread(scraper.get_all_courses)
         
         if courses:
             return {
@@ -382,20 +241,20 @@ class UpdateCanvasSessionRequest(BaseModel):
     canvas_instance_url: Optional[str] = "https://usflearn.instructure.com"
 
 
-@router.post("/update-canvas-session")
+@router.post("/update-canvas-session", status_code=status.HTTP_202_ACCEPTED)
 async def update_canvas_session(
     request: UpdateCanvasSessionRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Update the user's Canvas session cookie
     
-    This is used when the session expires and needs to be refreshed
+    This is used when the session expires and needs to be refreshed.
+    The new cookie is validated inline; re-syncing courses runs as a
+    background job (poll GET /jobs/{job_id}).
     """
     from app.services.canvas_scraper import CanvasScraper
-    from app.models.course import Course
-    from app.models.module import Module
     
     # First validate the new session cookie
     try:
@@ -406,7 +265,7 @@ async def update_canvas_session(
         
         # Validate by fetching courses
         try:
-            courses = scraper.get_all_courses()
+            courses = await asyncio.to_thread(scraper.get_all_courses)
             
             if not courses:
                 raise HTTPException(
@@ -452,142 +311,19 @@ async def update_canvas_session(
     current_user.canvas_session_cookie = encrypted_session
     current_user.canvas_instance_url = request.canvas_instance_url
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
     
-    # Optionally re-sync courses
-    try:
-        courses_data = scraper.scrape_all_active_courses()
-        colors = ["#3B82F6", "#10B981", "#F59E0B", "#EF4444", "#8B5CF6", "#EC4899", 
-                  "#06B6D4", "#F97316", "#84CC16", "#A855F7"]
-        
-        courses_synced = 0
-        modules_synced = 0
-        
-        # Import/update courses
-        for idx, course_data in enumerate(courses_data):
-            canvas_id = course_data['id']
-            name = course_data['name']
-            code = name.split('.')[0] if '.' in name else name.split()[0]
-            
-            # Check if course already exists by canvas_id
-            existing_course = db.query(Course).filter(
-                Course.canvas_id == canvas_id,
-                Course.user_id == current_user.id
-            ).first()
-            
-            if existing_course:
-                course = existing_course
-                # Update course info if needed
-                if existing_course.name != name:
-                    existing_course.name = name
-                if existing_course.code != code:
-                    existing_course.code = code
-            else:
-                # Check if course exists by name/code but without canvas_id
-                existing_by_name = db.query(Course).filter(
-                    Course.user_id == current_user.id,
-                    Course.name == name
-                ).first()
-                
-                if existing_by_name and not existing_by_name.canvas_id:
-                    # Update existing course with canvas_id
-                    existing_by_name.canvas_id = canvas_id
-                    existing_by_name.code = code
-                    course = existing_by_name
-                    courses_synced += 1
-                else:
-                    # Create new course
-                    course = Course(
-                        canvas_id=canvas_id,
-                        user_id=current_user.id,
-                        code=code,
-                        name=name,
-                        instructor="TBD",
-                        term="Current Semester",
-                        progress=0.0,
-                        color=colors[idx % len(colors)],
-                        is_active=1
-                    )
-                    db.add(course)
-                    db.flush()
-                    courses_synced += 1
-            
-            # Import modules
-            for pos, module_data in enumerate(course_data.get('modules', [])):
-                module_name = module_data.get('name', 'Unnamed Module')
-                
-                # Check if module already exists
-                existing_module = db.query(Module).filter(
-                    Module.course_id == course.id,
-                    Module.name == module_name
-                ).first()
-                
-                if not existing_module:
-                    module = Module(
-                        course_id=course.id,
-                        name=module_name,
-                        position=pos,
-                        items=module_data.get('items', [])
-                    )
-                    db.add(module)
-                    modules_synced += 1
-            
-            # Import assignments for this course
-            canvas_id = course_data['id']
-            assignments_data = scraper.get_course_assignments(canvas_id)
-            for assign_data in assignments_data:
-                try:
-                    # Parse due date
-                    due_date_str = assign_data.get('due_date', '')
-                    due_date = dt.utcnow()
-                    
-                    if due_date_str:
-                        try:
-                            due_date = date_parser.parse(due_date_str)
-                        except:
-                            pass
-                    
-                    # Check if assignment already exists
-                    existing_assignment = db.query(Assignment).filter(
-                        Assignment.user_id == current_user.id,
-                        Assignment.course_id == course.id,
-                        Assignment.title == assign_data.get('name', 'Unnamed Assignment')
-                    ).first()
-                    
-                    if not existing_assignment:
-                        assignment = Assignment(
-                            user_id=current_user.id,
-                            course_id=course.id,
-                            title=assign_data.get('name', 'Unnamed Assignment'),
-                            course=code,
-                            due_date=due_date,
-                            type="Assignment",
-                            priority="medium",
-                            status="pending",
-                            submitted=False
-                        )
-                        db.add(assignment)
-                except Exception as e:
-                    print(f"Failed to import assignment: {e}")
-                    continue
-        
-        db.commit()
-        
-        return {
-            "success": True,
-            "message": "Canvas session updated successfully",
-            "courses_synced": courses_synced,
-            "modules_synced": modules_synced
-        }
-        
-    except Exception as e:
-        # Session was updated, but sync failed
-        return {
-            "success": True,
-            "message": f"Canvas session updated, but sync failed: {str(e)}",
-            "courses_synced": 0,
-            "modules_synced": 0
-        }
+    # Re-sync courses in the background
+    job = await db.run_sync(
+        job_queue.enqueue, "import_courses", canvas_import.import_payload(current_user.id), user_id=current_user.id
+    )
+    await db.run_sync(canvas_refresh.session_updated, current_user.id)
+    
+    return {
+        "success": True,
+        "message": "Canvas session updated successfully; course sync queued",
+        "job_id": job.id,
+        "job_status": job.status
+    }
 
 
@@ -2,19 +2,21 @@
 Canvas Integration API Endpoints
 Handles authentication and data syncing with Canvas LMS
 """
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, status
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, Field
 from app.db.database import get_db
 from app.services.canvas_client import CanvasClient, CanvasAuthError
 from app.services.canvas_sync import CanvasSyncService
 from app.services.canvas_scraper import CanvasScraper
+from app.services import canvas_import, course_files_index, job_queue
+from app.schemas.job import JobResponse
 from app.models.user import User
 from app.models.course import Course
 from app.models.module import Module
 from app.api.v1.auth import get_current_user
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 router = APIRouter()
 
@@ -35,11 +37,27 @@ class CanvasAuthResponse(BaseModel):
     message: str
 
 
+class CourseSyncTiming(BaseModel):
+    """Time spent syncing one course"""
+    course_id: int
+    code: str
+    full: bool
+    fetch_ms: float  # Canvas requests (runs concurrently with other courses)
+    write_ms: float  # Database write and commit
+    rows_touched: int
+    error: Optional[str] = None
+
 class SyncResponse(BaseModel):
     """Response model for data sync"""
     success: bool
     courses_synced: int
     assignments_synced: int
+    modules_synced: int = 0
+    files_synced: int = 0
+    rows_touched: int = 0  # Rows written
+    rows_skipped: int = 0  # Rows left alone because Canvas reported no change
+    not_modified: int = 0  # Course resources skipped by conditional requests
+    course_timings: list[CourseSyncTiming] = []
     last_sync: str
     errors: list[str] = []
 
@@ -125,6 +143,7 @@ async def authenticate_canvas(
 @router.post("/sync", response_model=SyncResponse)
 async def sync_canvas_data(
     user_id: int,
+    full: bool = False,
     db: Session = Depends(get_db)
 ):
     """
@@ -133,8 +152,11 @@ async def sync_canvas_data(
     Fetches:
     - Courses
     - Assignments
-    - Modules (future)
-    - Files (future)
+    - Modules
+    - Files
+    
+    Incremental unless full=true: only what changed since the last sync is
+    downloaded and written (see CanvasSyncService).
     """
     try:
         # Get user
@@ -156,7 +178,7 @@ async def sync_canvas_data(
         
         # Perform sync
         try:
-            results = await sync_service.sync_all()
+            results = await sync_service.sync_all(full=full)
         finally:
             await canvas.close()
         
@@ -168,6 +190,12 @@ async def sync_canvas_data(
             success=True,
             courses_synced=results.get('courses', 0),
             assignments_synced=results.get('assignments', 0),
+            modules_synced=results.get('modules', 0),
+            files_synced=results.get('files', 0),
+            rows_touched=results.get('rows_touched', 0),
+            rows_skipped=results.get('rows_skipped', 0),
+            not_modified=results.get('not_modified', 0),
+            course_timings=results.get('course_timings', []),
             last_sync=user.last_sync.isoformat(),
             errors=results.get('errors', [])
         )
@@ -223,10 +251,10 @@ async def sync_courses_only(user_id: int, db: Session = Depends(get_db)):
 @router.post("/sync/assignments/{user_id}/{course_id}")
 async def sync_assignments_only(
     user_id: int,
-    course_id: str,
+    course_id: int,
     db: Session = Depends(get_db)
 ):
-    """Sync assignments for a specific course"""
+    """Sync assignments for one of the user's courses (local course id)"""
     try:
         user = db.query(User).filter(User.id == user_id).first()
         if not user:
@@ -252,117 +280,38 @@ class CanvasScraperRequest(BaseModel):
     user_id: int = Field(..., description="User ID to associate courses with")
 
 
-class CanvasScraperResponse(BaseModel):
-    """Response model for Canvas scraping"""
-    success: bool
-    courses_imported: int
-    modules_imported: int
-    message: str
-
-
-@router.post("/scrape-courses", response_model=CanvasScraperResponse)
+@router.post("/scrape-courses", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
 def scrape_canvas_courses(
     request: CanvasScraperRequest,
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
 ):
     """
     Scrape courses from Canvas using session cookie
     
-    This endpoint:
+    Queues a background job that:
     1. Scrapes all active courses from Canvas
     2. Imports them into the database
     3. Imports all modules for each course
+    4. Queues chunk indexing and flashcard/quiz pre-generation
+    
+    Returns 202 with the job; poll GET /jobs/{id}. On success the job result
+    has courses_imported, modules_imported and message.
     
     Use this when users create an account with their Canvas session cookie
     """
-    try:
-        # Verify user exists
-        user = db.query(User).filter(User.id == request.user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail="User not found")
-        
-        # Create scraper
-        scraper = CanvasScraper(
-            base_url=request.canvas_url,
-            session_cookie=request.session_cookie
-        )
-        
-        # Scrape all active courses
-        courses_data = scraper.scrape_all_active_courses()
-        
-        # Import colors for courses
-        colors = ["#3B82F6", "#10B981", "#F59E0B", "#EF4444", "#8B5CF6", "#EC4899", 
-                  "#06B6D4", "#F97316", "#84CC16", "#A855F7"]
-        
-        courses_imported = 0
-        modules_imported = 0
-        
-        # Import each course
-        for idx, course_data in enumerate(courses_data):
-            canvas_id = course_data['id']
-            name = course_data['name']
-            
-            # Check if course already exists
-            existing = db.query(Course).filter(Course.canvas_id == canvas_id).first()
-            
-            if existing:
-                course = existing
-            else:
-                # Extract course code from name
-                code = name.split('.')[0] if '.' in name else name.split()[0]
-                
-                # Create new course
-                course = Course(
-                    canvas_id=canvas_id,
-                    user_id=request.user_id,
-                    code=code,
-                    name=name,
-                    instructor="TBD",
-                    term="Current Semester",
-                    progress=0.0,
-                    color=colors[idx % len(colors)],
-                    is_active=1
-                )
-                
-                db.add(course)
-                db.flush()
-                courses_imported += 1
-            
-            # Import modules
-            for pos, module_data in enumerate(course_data.get('modules', [])):
-                module_name = module_data.get('name', 'Unnamed Module')
-                
-                # Check if module already exists
-                existing_module = db.query(Module).filter(
-                    Module.course_id == course.id,
-                    Module.name == module_name
-                ).first()
-                
-                if not existing_module:
-                    module = Module(
-                        course_id=course.id,
-                        name=module_name,
-                        position=pos,
-                        items=module_data.get('items', [])
-                    )
-                    db.add(module)
-                    modules_imported += 1
-        
-        db.commit()
-        
-        return CanvasScraperResponse(
-            success=True,
-            courses_imported=courses_imported,
-            modules_imported=modules_imported,
-            message=f"Successfully imported {courses_imported} courses and {modules_imported} modules"
-        )
-        
-    except Exception as e:
-        db.rollback()
-        raise HTTPException(
-            status_code=500,
-            detail=f"Scraping failed: {str(e)}"
-        )
+    # Verify user exists
+    user = db.query(User).filter(User.id == request.user_id).first()
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    
+    return job_queue.enqueue(
+        db,
+        "scrape_courses",
+        canvas_import.import_payload(user.id, request.canvas_url, request.session_cookie),
+        user_id=user.id,
+        idempotency_key=idempotency_key
+    )
 
 
 class CanvasSessionValidateRequest(BaseModel):
@@ -419,6 +368,7 @@ class CourseFilesRequest(BaseModel):
     course_id: str = Field(..., description="Canvas course ID")
     canvas_url: str = Field(..., description="Canvas instance URL")
     session_cookie: str = Field(..., description="Canvas session cookie")
+    refresh: bool = Field(False, description="Re-list the Files tab even if the cached listing is fresh")
 
 
 class CourseFile(BaseModel):
@@ -441,13 +391,15 @@ class CourseFilesResponse(BaseModel):
 @router.post("/files", response_model=CourseFilesResponse)
 def get_course_files(
     request: CourseFilesRequest,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
 ):
     """
     Get all files from the Files tab of a Canvas course
     
     This endpoint scans the Canvas Files tab and returns all available files
-    that can be used for flashcards, quizzes, and AI tutor.
+    that can be used for flashcards, quizzes, and AI tutor. Listings for
+    imported courses are served from the files index.
     """
     try:
         # Use provided session cookie or fall back to user's stored cookie
@@ -465,15 +417,23 @@ def get_course_files(
                 detail="Canvas session cookie is required. Please provide a Canvas session cookie to access course files."
             )
         
-        # Create scraper
-        scraper = CanvasScraper(
-            base_url=canvas_url,
-            session_cookie=session_cookie
-        )
+        course = db.query(Course).filter(
+            Course.canvas_id == request.course_id,
+            Course.user_id == current_user.id
+        ).first()
         
         # Get files from the course
         try:
-            files_data = scraper.get_course_files(request.course_id)
+            if course:
+                files_data = course_files_index.get_course_files(
+                    db, course, canvas_url, session_cookie, force_refresh=request.refresh
+                )
+            else:
+                scraper = CanvasScraper(
+                    base_url=canvas_url,
+                    session_cookie=session_cookie
+                )
+                files_data = scraper.get_course_files(request.course_id)
         except Exception as e:
             print(f"Error in get_course_files: {e}")
             raise HTTPException(
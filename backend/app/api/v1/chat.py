@@ -1,24 +1,30 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy import delete, false, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Optional
-from app.db.database import get_db
+from typing import List, Optional, Tuple
+from app.db.database import get_async_db
 from app.models.chat_message import ChatMessage as ChatMessageModel
 from app.models.user import User
 from app.models.module import Module
 from app.schemas.chat import ChatMessage, ChatRequest, ChatResponse
 from app.core.config import settings
-from app.core.encryption import decrypt_data
+from app.core import metrics
 from app.services.flashcard_generator import (
-    extract_text_from_url, 
     generate_chat_response_with_groq,
+    stream_chat_response_with_groq,
     generate_active_recall_question_with_groq,
-    grade_active_recall_answer_with_groq
+    grade_active_recall_answer_with_groq,
+    stream_grade_active_recall_answer_with_groq,
+    parse_grade_response
 )
-from app.services.canvas_scraper import CanvasScraper
-from app.models.course import Course
-from app.api.v1.auth import get_current_user
+from app.services import chunk_index
+from app.services.ingestion import ContentIngestionService
+from app.api.v1.auth import get_current_user_async
+import json
 import random
+import time
 
 router = APIRouter()
 
@@ -66,20 +72,37 @@ COURSE_CONTENT = {
     }
 }
 
-@router.post("/", response_model=ChatResponse)
-async def chat(
-    request: ChatRequest, 
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """
-    AI Tutor chat endpoint - responds to student questions using RAG with selected course materials.
-    
-    This endpoint:
-    1. Extracts text from selected PDF/document files
-    2. Uses extracted text as context for AI (RAG - Retrieval Augmented Generation)
-    3. Generates contextual responses using Groq API
-    """
+# Server-Sent Events: disable proxy buffering so tokens are flushed as they arrive
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",
+}
+
+NOT_ENOUGH_CONTEXT_MESSAGE = (
+    "I couldn't extract enough context from the selected files. "
+    "This might be because the files are in an unsupported format or I don't have access to them. "
+    "Please try selecting different files or check that the files contain text content."
+)
+
+GENERATION_FAILED_MESSAGE = (
+    "I encountered an error generating a response. "
+    "This might be due to API limits. Please try again in a moment."
+)
+
+
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event"""
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+
+async def _chat_context(
+    request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession,
+    current_user: User
+) -> Tuple[str, str, List[str]]:
+    """Resolve the module and RAG context for a chat message: (module name, context, references)"""
     print(f"\n=== AI Tutor Chat Request ===")
     print(f"Module ID: {request.module_id}")
     print(f"User Message: {request.message}")
@@ -88,7 +111,7 @@ async def chat(
     # Get module for context (optional)
     module = None
     if request.module_id:
-        module = db.query(Module).filter(Module.id == request.module_id).first()
+        module = await db.get(Module, request.module_id)
         if not module:
             raise HTTPException(status_code=404, detail="Module not found")
     
@@ -101,101 +124,75 @@ async def chat(
             detail="Canvas session cookie not available. Please provide a Canvas session cookie to use the AI tutor."
         )
     
-    # Decrypt session cookie
-    session_cookie = decrypt_data(current_user.canvas_session_cookie)
-    
-    # If include_files_tab is True, fetch files from Canvas Files tab
-    files_tab_urls = []
-    if request.include_files_tab:
-        try:
-            # Get course ID from module or from first file URL (if we can extract it)
-            course = None
-            if module:
-                course = db.query(Course).filter(Course.id == module.course_id).first()
-            elif request.file_urls and len(request.file_urls) > 0:
-                # Try to extract course ID from file URL
-                import re
-                for file_url in request.file_urls:
-                    match = re.search(r'/courses/(\d+)/files/', file_url)
-                    if match:
-                        canvas_course_id = match.group(1)
-                        # Find course by canvas_id
-                        course = db.query(Course).filter(
-                            Course.canvas_id == canvas_course_id,
-                            Course.user_id == current_user.id
-                        ).first()
-                        if course:
-                            break
-            
-            if course and course.canvas_id:
-                print(f"Scanning Files tab for course {course.canvas_id}...")
-                scraper = CanvasScraper(
-                    base_url=current_user.canvas_instance_url or settings.CANVAS_INSTANCE_URL,
-                    session_cookie=session_cookie
+    ingestion = ContentIngestionService(db, current_user)
+    course = await ingestion.resolve_course(module, request.file_urls)
+    
+    # Search the course's chunk index first; download files only if it isn't built yet
+    with metrics.timer("chat.context"):
+        content = None
+        if course:
+            content = await ingestion.search_index(
+                course,
+                request.message,
+                settings.CHAT_CONTEXT_TOKENS,
+                module=module,
+                file_urls=request.file_urls,
+                include_files_tab=request.include_files_tab
+            )
+        
+        if content is None:
+            # Extract text from selected files (RAG context)
+            content = await ingestion.ingest(
+                module=module,
+                file_urls=request.file_urls,
+                include_files_tab=request.include_files_tab,
+                max_files=5  # Limit to 5 files per message
+            )
+            if course:
+                background_tasks.add_task(
+                    chunk_index.index_course, course.id, ingestion.canvas_url, ingestion.session_cookie
                 )
-                files_tab_files = scraper.get_course_files(course.canvas_id)
-                files_tab_urls = [f.get('url', '') for f in files_tab_files if f.get('url')]
-                print(f"Found {len(files_tab_urls)} files from Files tab")
-        except Exception as e:
-            print(f"Warning: Failed to scan Files tab: {e}")
-    
-    # Combine user-selected files with files tab files if requested
-    all_file_urls = list(request.file_urls) if request.file_urls else []
-    if files_tab_urls:
-        all_file_urls.extend(files_tab_urls)
-        # Remove duplicates
-        all_file_urls = list(dict.fromkeys(all_file_urls))
     
-    # Extract text from selected files (RAG context)
-    context_text = ""
-    references = []
+    # Only the passages relevant to the question go into the prompt
+    context_text = content.select_context(request.message, settings.CHAT_CONTEXT_TOKENS)
+    return module_name, context_text, content.references
+
+
+@router.post("/", response_model=ChatResponse)
+async def chat(
+    request: ChatRequest, 
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    AI Tutor chat endpoint - responds to student questions using RAG with selected course materials.
     
-    if all_file_urls and len(all_file_urls) > 0:
-        print(f"\nExtracting text from {len(all_file_urls)} files for RAG context...")
-        
-        for file_url in all_file_urls[:5]:  # Limit to 5 files to avoid token limits
-            try:
-                print(f"  Processing: {file_url[:80]}...")
-                text = extract_text_from_url(
-                    file_url,
-                    session_cookie,
-                    current_user.canvas_instance_url or settings.CANVAS_INSTANCE_URL
-                )
-                
-                if text and len(text) > 50:
-                    context_text += text + "\n\n"
-                    # Extract filename from URL for reference
-                    filename = file_url.split('/')[-1].split('?')[0]
-                    references.append(filename)
-                    print(f"    ✓ Extracted {len(text)} characters")
-            except Exception as e:
-                print(f"    ✗ Failed to extract text: {e}")
-                continue
+    This endpoint:
+    1. Searches the course's chunk index (or extracts text from the selected files
+       if they are not indexed yet, and schedules indexing)
+    2. Uses the most relevant passages as context for AI (RAG - Retrieval Augmented Generation)
+    3. Generates contextual responses using Groq API
+    """
+    module_name, context_text, references = await _chat_context(request, background_tasks, db, current_user)
     
     # Generate AI response using RAG
     if not context_text or len(context_text) < 100:
-        response_text = (
-            "I couldn't extract enough context from the selected files. "
-            "This might be because the files are in an unsupported format or I don't have access to them. "
-            "Please try selecting different files or check that the files contain text content."
-        )
+        response_text = NOT_ENOUGH_CONTEXT_MESSAGE
         references = []
     else:
         print(f"\nGenerating AI response with {len(context_text)} characters of context...")
         
         try:
-            response_text = generate_chat_response_with_groq(
+            response_text = await generate_chat_response_with_groq(
                 question=request.message,
-                context=context_text[:15000],  # Limit context to avoid token limits
+                context=context_text,
                 module_name=module_name
             )
             print("✓ AI response generated successfully")
         except Exception as e:
             print(f"✗ AI generation failed: {e}")
-            response_text = (
-                "I encountered an error generating a response. "
-                "This might be due to API limits. Please try again in a moment."
-            )
+            response_text = GENERATION_FAILED_MESSAGE
             references = []
     
     return ChatResponse(
@@ -204,22 +201,85 @@ async def chat(
         references=references if references else ["Course materials"]
     )
 
+
+@router.post("/stream")
+async def chat_stream(
+    request: ChatRequest,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    Streaming AI Tutor chat endpoint (Server-Sent Events).
+    
+    Same context as POST /chat/, but the answer is relayed as Groq generates it:
+    - event "references": {"references": [...]} once, before any text
+    - unnamed events: {"token": "..."} for each piece of the answer
+    - event "error": {"detail": "..."} if generation fails
+    - event "done": {} when the answer is complete
+    """
+    started = time.perf_counter()
+    module_name, context_text, references = await _chat_context(request, background_tasks, db, current_user)
+    
+    async def events():
+        if not context_text or len(context_text) < 100:
+            yield _sse({"references": ["Course materials"]}, "references")
+            yield _sse({"token": NOT_ENOUGH_CONTEXT_MESSAGE})
+            yield _sse({}, "done")
+            return
+        
+        print(f"\nStreaming AI response with {len(context_text)} characters of context...")
+        yield _sse({"references": references or ["Course materials"]}, "references")
+        
+        first_token = True
+        try:
+            async for token in stream_chat_response_with_groq(
+                question=request.message,
+                context=context_text,
+                module_name=module_name
+            ):
+                if first_token:
+                    metrics.record("chat.stream.first_token", time.perf_counter() - started)
+                    first_token = False
+                yield _sse({"token": token})
+        except Exception as e:
+            print(f"✗ AI generation failed: {e}")
+            yield _sse({"detail": GENERATION_FAILED_MESSAGE}, "error")
+            return
+        
+        print("✓ AI response streamed successfully")
+        yield _sse({}, "done")
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+def _course_history_filter(course_id: str):
+    """
+    Messages for a course id taken from the path (a string, as the routes always accepted)
+
+    asyncpg won't compare a string with the integer column, so numeric ids
+    are converted; anything else matches no messages, as before.
+    """
+    if course_id.isdigit():
+        return ChatMessageModel.course_id == int(course_id)
+    return false()
+
 @router.get("/history/{course_id}", response_model=list[ChatMessage])
-async def get_chat_history(course_id: str, limit: int = 50, db: Session = Depends(get_db)):
+async def get_chat_history(course_id: str, limit: int = 50, db: AsyncSession = Depends(get_async_db)):
     """Get chat history for a specific course"""
-    messages = db.query(ChatMessageModel).filter(
-        ChatMessageModel.course_id == course_id
-    ).order_by(ChatMessageModel.created_at.desc()).limit(limit).all()
+    messages = (await db.scalars(
+        select(ChatMessageModel)
+        .where(_course_history_filter(course_id))
+        .order_by(ChatMessageModel.created_at.desc())
+        .limit(limit)
+    )).all()
     
     return reversed(messages)
 
 @router.delete("/history/{course_id}", status_code=204)
-async def clear_chat_history(course_id: str, db: Session = Depends(get_db)):
+async def clear_chat_history(course_id: str, db: AsyncSession = Depends(get_async_db)):
     """Clear chat history for a specific course"""
-    db.query(ChatMessageModel).filter(
-        ChatMessageModel.course_id == course_id
-    ).delete()
-    db.commit()
+    await db.execute(delete(ChatMessageModel).where(_course_history_filter(course_id)))
+    await db.commit()
     return None
 
 
@@ -258,8 +318,8 @@ class ActiveRecallGradeResponse(BaseModel):
 @router.post("/active-recall/question", response_model=ActiveRecallQuestionResponse)
 async def generate_question(
     request: ActiveRecallQuestionRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
 ):
     """Generate an active recall question from selected course materials"""
     print(f"\n=== Active Recall Question Generation ===")
@@ -269,7 +329,7 @@ async def generate_question(
     # Get module (optional)
     module = None
     if request.module_id:
-        module = db.query(Module).filter(Module.id == request.module_id).first()
+        module = await db.get(Module, request.module_id)
         if not module:
             raise HTTPException(status_code=404, detail="Module not found")
     
@@ -279,67 +339,15 @@ async def generate_question(
     if not current_user.canvas_session_cookie:
         raise HTTPException(status_code=400, detail="No Canvas session cookie available")
     
-    session_cookie = decrypt_data(current_user.canvas_session_cookie)
-    
-    # If include_files_tab is True, fetch files from Canvas Files tab
-    files_tab_urls = []
-    if request.include_files_tab:
-        try:
-            # Get course ID from module or from first file URL (if we can extract it)
-            course = None
-            if module:
-                course = db.query(Course).filter(Course.id == module.course_id).first()
-            elif request.file_urls and len(request.file_urls) > 0:
-                # Try to extract course ID from file URL
-                import re
-                for file_url in request.file_urls:
-                    match = re.search(r'/courses/(\d+)/files/', file_url)
-                    if match:
-                        canvas_course_id = match.group(1)
-                        # Find course by canvas_id
-                        course = db.query(Course).filter(
-                            Course.canvas_id == canvas_course_id,
-                            Course.user_id == current_user.id
-                        ).first()
-                        if course:
-                            break
-            
-            if course and course.canvas_id:
-                scraper = CanvasScraper(
-                    base_url=current_user.canvas_instance_url or settings.CANVAS_INSTANCE_URL,
-                    session_cookie=session_cookie
-                )
-                files_tab_files = scraper.get_course_files(course.canvas_id)
-                files_tab_urls = [f.get('url', '') for f in files_tab_files if f.get('url')]
-        except Exception as e:
-            print(f"Warning: Failed to scan Files tab: {e}")
-    
-    # Combine user-selected files with files tab files if requested
-    all_file_urls = list(request.file_urls) if request.file_urls else []
-    if files_tab_urls:
-        all_file_urls.extend(files_tab_urls)
-        all_file_urls = list(dict.fromkeys(all_file_urls))
-    
     # Extract text from selected files
-    context_text = ""
-    
-    if all_file_urls and len(all_file_urls) > 0:
-        print(f"Extracting text from {len(all_file_urls)} files...")
-        
-        for file_url in all_file_urls[:3]:  # Limit to 3 files
-            try:
-                text = extract_text_from_url(
-                    file_url,
-                    session_cookie,
-                    current_user.canvas_instance_url or settings.CANVAS_INSTANCE_URL
-                )
-                
-                if text and len(text) > 50:
-                    context_text += text + "\n\n"
-                    print(f"  ✓ Extracted {len(text)} characters")
-            except Exception as e:
-                print(f"  ✗ Failed to extract: {e}")
-                continue
+    ingestion = ContentIngestionService(db, current_user)
+    content = await ingestion.ingest(
+        module=module,
+        file_urls=request.file_urls,
+        include_files_tab=request.include_files_tab,
+        max_files=3
+    )
+    context_text = content.select_context(module_name, settings.ACTIVE_RECALL_CONTEXT_TOKENS)
     
     if not context_text or len(context_text) < 100:
         raise HTTPException(
@@ -351,8 +359,8 @@ async def generate_question(
     print(f"Generating question from {len(context_text)} characters...")
     
     try:
-        question = generate_active_recall_question_with_groq(
-            context=context_text[:10000],  # Limit context
+        question = await generate_active_recall_question_with_groq(
+            context=context_text,
             module_name=module_name
         )
         print(f"✓ Question generated: {question[:80]}...")
@@ -364,13 +372,8 @@ async def generate_question(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-@router.post("/active-recall/grade", response_model=ActiveRecallGradeResponse)
-async def grade_answer(
-    request: ActiveRecallGradeRequest,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
-):
-    """Grade a user's active recall answer"""
+async def _grading_context(request: ActiveRecallGradeRequest, db: AsyncSession, current_user: User) -> str:
+    """Course material context for grading an active recall answer"""
     print(f"\n=== Active Recall Grading ===")
     print(f"Question: {request.question[:80]}...")
     print(f"Answer length: {len(request.user_answer)} characters")
@@ -379,7 +382,7 @@ async def grade_answer(
     # Get module (optional)
     module = None
     if request.module_id:
-        module = db.query(Module).filter(Module.id == request.module_id).first()
+        module = await db.get(Module, request.module_id)
         if not module:
             raise HTTPException(status_code=404, detail="Module not found")
     
@@ -387,77 +390,45 @@ async def grade_answer(
     if not current_user.canvas_session_cookie:
         raise HTTPException(status_code=400, detail="No Canvas session cookie available")
     
-    session_cookie = decrypt_data(current_user.canvas_session_cookie)
-    
-    # If include_files_tab is True, fetch files from Canvas Files tab
-    files_tab_urls = []
-    if request.include_files_tab:
-        try:
-            # Get course ID from module or from first file URL (if we can extract it)
-            course = None
-            if module:
-                course = db.query(Course).filter(Course.id == module.course_id).first()
-            elif request.file_urls and len(request.file_urls) > 0:
-                # Try to extract course ID from file URL
-                import re
-                for file_url in request.file_urls:
-                    match = re.search(r'/courses/(\d+)/files/', file_url)
-                    if match:
-                        canvas_course_id = match.group(1)
-                        # Find course by canvas_id
-                        course = db.query(Course).filter(
-                            Course.canvas_id == canvas_course_id,
-                            Course.user_id == current_user.id
-                        ).first()
-                        if course:
-                            break
-            
-            if course and course.canvas_id:
-                scraper = CanvasScraper(
-                    base_url=current_user.canvas_instance_url or settings.CANVAS_INSTANCE_URL,
-                    session_cookie=session_cookie
-                )
-                files_tab_files = scraper.get_course_files(course.canvas_id)
-                files_tab_urls = [f.get('url', '') for f in files_tab_files if f.get('url')]
-        except Exception as e:
-            print(f"Warning: Failed to scan Files tab: {e}")
-    
-    # Combine user-selected files with files tab files if requested
-    all_file_urls = list(request.file_urls) if request.file_urls else []
-    if files_tab_urls:
-        all_file_urls.extend(files_tab_urls)
-        all_file_urls = list(dict.fromkeys(all_file_urls))
-    
     # Extract text from selected files (same as question generation)
-    context_text = ""
-    
-    if all_file_urls and len(all_file_urls) > 0:
-        for file_url in all_file_urls[:3]:
-            try:
-                text = extract_text_from_url(
-                    file_url,
-                    session_cookie,
-                    current_user.canvas_instance_url or settings.CANVAS_INSTANCE_URL
-                )
-                if text and len(text) > 50:
-                    context_text += text + "\n\n"
-            except:
-                continue
+    ingestion = ContentIngestionService(db, current_user)
+    content = await ingestion.ingest(
+        module=module,
+        file_urls=request.file_urls,
+        include_files_tab=request.include_files_tab,
+        max_files=3
+    )
+    # Rank passages against both the question and the student's answer
+    context_text = content.select_context(
+        f"{request.question}\n{request.user_answer}",
+        settings.ACTIVE_RECALL_CONTEXT_TOKENS
+    )
     
     if not context_text or len(context_text) < 100:
         raise HTTPException(
             status_code=400,
             detail="Could not extract enough content from files to grade answer"
         )
+    return context_text
+
+
+@router.post("/active-recall/grade", response_model=ActiveRecallGradeResponse)
+async def grade_answer(
+    request: ActiveRecallGradeRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """Grade a user's active recall answer"""
+    context_text = await _grading_context(request, db, current_user)
     
     # Grade the answer
     print(f"Grading with {len(context_text)} characters of context...")
     
     try:
-        result = grade_active_recall_answer_with_groq(
+        result = await grade_active_recall_answer_with_groq(
             question=request.question,
             user_answer=request.user_answer,
-            context=context_text[:10000],
+            context=context_text,
             difficulty=request.difficulty
         )
         print(f"✓ Grading complete: {result['score']}/100")
@@ -469,6 +440,46 @@ async def grade_answer(
         raise HTTPException(status_code=500, detail=str(e))
 
 
-
-
-
+@router.post("/active-recall/grade/stream")
+async def grade_answer_stream(
+    request: ActiveRecallGradeRequest,
+    db: AsyncSession = Depends(get_async_db),
+    current_user: User = Depends(get_current_user_async)
+):
+    """
+    Streaming variant of active recall grading (Server-Sent Events).
+    
+    - unnamed events: {"token": "..."} as the grading text is generated
+    - event "result": the parsed grade (same fields as POST /active-recall/grade)
+    - event "error": {"detail": "..."} if grading fails
+    - event "done": {} at the end of the stream
+    """
+    started = time.perf_counter()
+    context_text = await _grading_context(request, db, current_user)
+    print(f"Streaming grade with {len(context_text)} characters of context...")
+    
+    async def events():
+        parts = []
+        try:
+            async for token in stream_grade_active_recall_answer_with_groq(
+                question=request.question,
+                user_answer=request.user_answer,
+                context=context_text,
+                difficulty=request.difficulty
+            ):
+                if not parts:
+                    metrics.record("grade.stream.first_token", time.perf_counter() - started)
+                parts.append(token)
+                yield _sse({"token": token})
+            
+            result = ActiveRecallGradeResponse(**parse_grade_response("".join(parts)))
+        except Exception as e:
+            print(f"✗ Grading failed: {e}")
+            yield _sse({"detail": str(e)}, "error")
+            return
+        
+        print(f"✓ Grading complete: {result.score}/100")
+        yield _sse(result.model_dump(), "result")
+        yield _sse({}, "done")
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
@@ -1,21 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
 from sqlalchemy.orm import Session
 from datetime import datetime
 from pydantic import BaseModel, Field
 from typing import List, Optional
-from app.db.database import get_db
+from app.db.database import SessionLocal, get_db, use_writer
 from app.models.flashcard import Flashcard as FlashcardModel, FlashcardSet as FlashcardSetModel
 from app.models.module import Module
 from app.models.user import User
-from app.models.course import Course
 from app.schemas.flashcard import (
     Flashcard, FlashcardCreate, FlashcardUpdate, FlashcardReview,
     FlashcardSet, FlashcardSetCreate
 )
+from app.schemas.job import JobResponse
 from app.api.v1.auth import get_current_user
-from app.core.encryption import decrypt_data
-from app.services.flashcard_generator import generate_flashcards_with_groq, extract_text_from_url
-from app.services.canvas_scraper import CanvasScraper
+from app.services.flashcard_generator import generate_flashcards_with_groq, FLASHCARD_PROMPT_VERSION, MODEL
+from app.services import generation_cache, job_queue, pregeneration
+from app.services.ingestion import ContentIngestionService
+from app.core.config import settings
 
 router = APIRouter()
 
@@ -26,6 +27,7 @@ class GenerateFlashcardsRequest(BaseModel):
     num_cards: int = Field(15, ge=10, le=30, description="Number of flashcards to generate")
     file_urls: List[str] = Field(default=[], description="Optional: Specific file URLs to process")
     include_files_tab: bool = Field(default=False, description="If True, scan and include files from Canvas Files tab")
+    refresh: bool = Field(default=False, description="If True, generate a new set instead of reusing a cached one")
 
 
 class GenerateFlashcardsResponse(BaseModel):
@@ -95,6 +97,7 @@ def create_flashcard(flashcard: FlashcardCreate, db: Session = Depends(get_db)):
 @router.put("/{flashcard_id}", response_model=Flashcard)
 def update_flashcard(flashcard_id: str, flashcard: FlashcardUpdate, db: Session = Depends(get_db)):
     """Update an existing flashcard"""
+    use_writer(db)
     db_flashcard = db.query(FlashcardModel).filter(FlashcardModel.id == flashcard_id).first()
     if not db_flashcard:
         raise HTTPException(status_code=404, detail="Flashcard not found")
@@ -110,6 +113,7 @@ def update_flashcard(flashcard_id: str, flashcard: FlashcardUpdate, db: Session
 @router.post("/review", response_model=Flashcard)
 def review_flashcard(review: FlashcardReview, db: Session = Depends(get_db)):
     """Record a flashcard review"""
+    use_writer(db)  # times_reviewed is incremented from the row read here
     db_flashcard = db.query(FlashcardModel).filter(FlashcardModel.id == review.flashcard_id).first()
     if not db_flashcard:
         raise HTTPException(status_code=404, detail="Flashcard not found")
@@ -137,11 +141,12 @@ def delete_flashcard(flashcard_id: str, db: Session = Depends(get_db)):
     return None
 
 
-@router.post("/generate", response_model=GenerateFlashcardsResponse)
+@router.post("/generate", response_model=JobResponse, status_code=202)
 async def generate_flashcards_from_module(
     request: GenerateFlashcardsRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
 ):
     """
     Generate flashcards from a module using pre-generated flashcards or AI
@@ -149,8 +154,12 @@ async def generate_flashcards_from_module(
     This endpoint:
     1. Fetches the module
     2. Checks if we have pre-generated flashcards for this module
-    3. If yes, returns them (filtered by count)
-    4. If no, generates new ones using AI
+    3. If yes, returns them (a random sample of the requested count) as an
+       already-succeeded job
+    4. If no, queues a generation job and returns 202; poll GET /jobs/{id}
+       until its result holds the flashcards
+    
+    Retries carrying the same Idempotency-Key header get the original job.
     """
     # Get the module (may be None if using files only)
     module = None
@@ -161,6 +170,18 @@ async def generate_flashcards_from_module(
     
     module_name = module.name if module else "Selected Files"
     print(f"\n=== Generating flashcards from: {module_name} ===")
+    payload = {"user_id": current_user.id, "request": request.model_dump()}
+    
+    # Serve from the module's pre-generated pool when the request is just "this module"
+    if module and not request.file_urls and not request.include_files_tab and not request.refresh:
+        pooled = pregeneration.sample_flashcards(db, module.id, request.num_cards)
+        if pooled is not None:
+            print(f"Serving {len(pooled)} pre-generated flashcards")
+            result = GenerateFlashcardsResponse(flashcards=pooled, module_name=module_name, count=len(pooled))
+            return job_queue.enqueue(
+                db, "generate_flashcards", payload, user_id=current_user.id,
+                idempotency_key=idempotency_key, result=result.model_dump()
+            )
     
     # Generate flashcards from module content using AI
     # Get user's Canvas session cookie
@@ -171,151 +192,59 @@ async def generate_flashcards_from_module(
             detail="Canvas session cookie not available. Please provide a Canvas session cookie to generate flashcards."
         )
     
-    # Decrypt session cookie
-    session_cookie = decrypt_data(current_user.canvas_session_cookie)
-    
-    # Extract text from module items or selected files
-    all_text = ""
-    items_processed = 0
-    
-    # Parse items if they're stored as JSON string
-    import json as json_lib
-    items = []
-    if module:
-        print(f"\n=== Processing module: {module.name} ===")
-        items = module.items
-        if isinstance(items, str):
-            items = json_lib.loads(items)
-        elif items is None:
-            items = []
-        print(f"Module has {len(items)} items")
-    else:
-        print("\n=== Processing selected files (no module) ===")
-    
-    # If include_files_tab is True, fetch files from Canvas Files tab
-    files_tab_urls = []
-    if request.include_files_tab:
-        try:
-            # Get course ID from module or from first file URL (if we can extract it)
-            course = None
-            if module:
-                course = db.query(Course).filter(Course.id == module.course_id).first()
-            elif request.file_urls and len(request.file_urls) > 0:
-                # Try to extract course ID from file URL
-                # Canvas file URLs typically contain /courses/{course_id}/files/
-                import re
-                for file_url in request.file_urls:
-                    match = re.search(r'/courses/(\d+)/files/', file_url)
-                    if match:
-                        canvas_course_id = match.group(1)
-                        # Find course by canvas_id
-                        course = db.query(Course).filter(
-                            Course.canvas_id == canvas_course_id,
-                            Course.user_id == current_user.id
-                        ).first()
-                        if course:
-                            break
-            
-            if course and course.canvas_id:
-                print(f"Scanning Files tab for course {course.canvas_id}...")
-                scraper = CanvasScraper(
-                    base_url=current_user.canvas_instance_url or "https://usflearn.instructure.com",
-                    session_cookie=session_cookie
-                )
-                files_tab_files = scraper.get_course_files(course.canvas_id)
-                files_tab_urls = [f.get('url', '') for f in files_tab_files if f.get('url')]
-                print(f"Found {len(files_tab_urls)} files from Files tab")
-        except Exception as e:
-            print(f"Warning: Failed to scan Files tab: {e}")
-    
-    # Combine user-selected files with files tab files if requested
-    all_file_urls = list(request.file_urls) if request.file_urls else []
-    if files_tab_urls:
-        all_file_urls.extend(files_tab_urls)
-        # Remove duplicates
-        all_file_urls = list(dict.fromkeys(all_file_urls))
-    
-    # If specific file URLs were provided (or from files tab), use those
-    if all_file_urls and len(all_file_urls) > 0:
-        print(f"Using {len(all_file_urls)} files (user-selected + files tab)")
-        for file_url in all_file_urls:
-            # Find the item name from the module items or use URL as fallback
-            item_name = 'Unknown'
-            if module and items:
-                item_name = next((item.get('title', 'Unknown') for item in items if item.get('url') == file_url), 'Unknown')
-            else:
-                # Extract filename from URL
-                import os
-                from urllib.parse import urlparse, unquote
-                parsed = urlparse(file_url)
-                item_name = os.path.basename(unquote(parsed.path)) or 'File'
-            
-            print(f"Processing selected file: {item_name}")
-            text = extract_text_from_url(
-                file_url,
-                session_cookie,
-                current_user.canvas_instance_url or "https://usflearn.instructure.com"
-            )
-            if text and len(text) > 50:
-                print(f"  Extracted {len(text)} characters")
-                all_text += text + "\n\n"
-                items_processed += 1
-            else:
-                print(f"  Failed to extract text or too short")
-    elif module:
-        # Default behavior: process all items
-        for item in items[:10]:  # Try up to 10 items
-            item_url = item.get('url', '')
-            item_name = item.get('title', '') or item.get('name', '')
-            
-            print(f"Processing item: {item_name}")
-            
-            if item_url and '.pdf' in item_name.lower():  # Prioritize PDFs
-                print(f"  Extracting PDF: {item_name}")
-                text = extract_text_from_url(
-                    item_url,
-                    session_cookie,
-                    current_user.canvas_instance_url or "https://usflearn.instructure.com"
-                )
-                if text and len(text) > 50:
-                    print(f"  Extracted {len(text)} characters")
-                    all_text += text + "\n\n"
-                    items_processed += 1
-                else:
-                    print(f"  Failed to extract text or too short")
+    return job_queue.enqueue(
+        db, "generate_flashcards", payload, user_id=current_user.id, idempotency_key=idempotency_key
+    )
+
+
+@job_queue.handler("generate_flashcards")
+async def run_flashcard_generation(payload: dict) -> dict:
+    """Job handler: extract the module or file text and generate flashcards"""
+    request = GenerateFlashcardsRequest(**payload["request"])
+    db = SessionLocal()
+    try:
+        current_user = db.query(User).filter(User.id == payload["user_id"]).first()
+        if not current_user:
+            raise ValueError("User not found")
+        module = None
+        if request.module_id:
+            module = db.query(Module).filter(Module.id == request.module_id).first()
+            if not module:
+                raise ValueError("Module not found")
+        module_name = module.name if module else "Selected Files"
         
-        # If not enough from PDFs, try HTML pages
-        if len(all_text) < 500 and items_processed < 2:
-            for item in items[:10]:
-                item_url = item.get('url', '')
-                item_name = item.get('title', '') or item.get('name', '')
-                
-                if item_url and '.pdf' not in item_name.lower():
-                    text = extract_text_from_url(
-                        item_url,
-                        session_cookie,
-                        current_user.canvas_instance_url or "https://usflearn.instructure.com"
-                    )
-                    if text:
-                        all_text += text + "\n\n"
-    
-    print(f"Total text extracted: {len(all_text)} characters from {items_processed} items")
-    print(f"Content preview: {all_text[:300]}...")
-    
-    if len(all_text) < 200:
-        module_or_files = f"module '{module.name}'" if module else "selected files"
-        raise HTTPException(
-            status_code=400,
-            detail=f"Not enough content found in {module_or_files}. Try selecting files with more content or ensure files are accessible."
+        # Extract text from module items or selected files
+        ingestion = ContentIngestionService(db, current_user)
+        content = await ingestion.ingest(
+            module=module,
+            file_urls=request.file_urls,
+            include_files_tab=request.include_files_tab
         )
-    
-    # Generate flashcards using Groq
-    try:
+        all_text = content.text
+        print(f"Content preview: {all_text[:300]}...")
+        
+        if len(all_text) < 200:
+            module_or_files = f"module '{module.name}'" if module else "selected files"
+            raise ValueError(
+                f"Not enough content found in {module_or_files}. Try selecting files with more content or ensure files are accessible."
+            )
+        
+        # Generate flashcards using Groq
         print(f"Sending to Groq for flashcard generation...")
-        flashcards = generate_flashcards_with_groq(
-            content=all_text,
-            module_name=module_name,
-            num_cards=request.num_cards
+        context_text = content.select_context(module_name, settings.GENERATION_CONTEXT_TOKENS)
+        flashcards = await generation_cache.get_or_generate(
+            "flashcards",
+            context_text,
+            module_name,
+            request.num_cards,
+            prompt_version=FLASHCARD_PROMPT_VERSION,
+            model=MODEL,
+            generate=lambda: generate_flashcards_with_groq(
+                content=context_text,
+                module_name=module_name,
+                num_cards=request.num_cards
+            ),
+            refresh=request.refresh
         )
         print(f"Generated {len(flashcards)} flashcards")
         
@@ -323,10 +252,9 @@ async def generate_flashcards_from_module(
             flashcards=flashcards,
             module_name=module_name,
             count=len(flashcards)
-        )
-        
-    except ValueError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        ).model_dump()
+    finally:
+        db.close()
 
 
 
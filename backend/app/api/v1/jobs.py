@@ -0,0 +1,31 @@
+"""
+Background Job API Endpoints
+Polling for work queued by the generation and Canvas import endpoints
+"""
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.db.database import get_db
+from app.models.user import User
+from app.schemas.job import JobResponse
+from app.services import job_queue
+from app.api.v1.auth import get_current_user
+
+router = APIRouter()
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+def get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the status of a background job
+    
+    Poll until status is "succeeded" (result holds the endpoint's response)
+    or "failed" (error holds the reason).
+    """
+    job = job_queue.get_job(db, job_id, user_id=current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from app.db.database import get_db
 from app.models.module import Module as ModuleModel
@@ -7,6 +8,7 @@ from app.schemas.module import Module, ModuleCreate
 from app.api.v1.auth import get_current_user
 from app.models.user import User
 from app.core.encryption import decrypt_data
+from app.services import bulk_upsert
 from app.services.canvas_scraper import CanvasScraper
 from typing import List
 
@@ -57,24 +59,7 @@ def get_course_modules(
             print(f"Fetched {len(modules_data)} modules from Canvas for course {course.canvas_id}")
             
             # Save modules to database
-            for pos, module_data in enumerate(modules_data):
-                module_name = module_data.get('name', 'Unnamed Module')
-                
-                # Check if module already exists
-                existing_module = db.query(ModuleModel).filter(
-                    ModuleModel.course_id == course_id,
-                    ModuleModel.name == module_name
-                ).first()
-                
-                if not existing_module:
-                    module = ModuleModel(
-                        course_id=course_id,
-                        name=module_name,
-                        position=pos,
-                        items=module_data.get('items', [])
-                    )
-                    db.add(module)
-            
+            bulk_upsert.upsert_modules(db, {course_id: modules_data})
             db.commit()
             
             # Query again to get saved modules
@@ -105,7 +90,11 @@ def create_module(module: ModuleCreate, db: Session = Depends(get_db)):
     """Create a new module"""
     db_module = ModuleModel(**module.model_dump())
     db.add(db_module)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="A module with this name already exists in the course")
     db.refresh(db_module)
     return db_module
 
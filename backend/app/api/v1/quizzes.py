@@ -1,8 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
 
-from app.db.database import get_db
+from app.db.database import SessionLocal, get_async_db
 from app.models.user import User
 from app.models.quiz import Quiz, QuizQuestion, QuizAttempt, QuizAnswer
 from app.models.module import Module
@@ -10,70 +12,66 @@ from app.schemas.quiz import (
     QuizCreate, Quiz as QuizSchema, QuizPublic, QuizQuestionPublic,
     QuizSubmit, QuizResult, QuizResultAnswer, GenerateQuizRequest, GenerateQuizResponse
 )
-from app.api.v1.auth import get_current_user
-from app.core.encryption import decrypt_data
-from app.services.flashcard_generator import generate_quiz_with_groq, extract_text_from_url
-from app.services.canvas_scraper import CanvasScraper
-from app.models.course import Course
+from app.schemas.job import JobResponse
+from app.api.v1.auth import get_current_user_async
+from app.services.flashcard_generator import generate_quiz_with_groq, QUIZ_PROMPT_VERSION, MODEL
+from app.services import generation_cache, job_queue, pregeneration
+from app.services.ingestion import ContentIngestionService
+from app.core.config import settings
 
 router = APIRouter()
 
 @router.post("/", response_model=QuizSchema, status_code=status.HTTP_201_CREATED)
 async def create_quiz(
     quiz_data: QuizCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new quiz"""
-    # Create quiz
+    # Create quiz and questions in one flush
     new_quiz = Quiz(
         user_id=current_user.id,
         title=quiz_data.title,
         description=quiz_data.description,
-        course_id=quiz_data.course_id
+        course_id=quiz_data.course_id,
+        questions=[
+            QuizQuestion(
+                question_text=question_data.question_text,
+                option_a=question_data.option_a,
+                option_b=question_data.option_b,
+                option_c=question_data.option_c,
+                option_d=question_data.option_d,
+                correct_answer=question_data.correct_answer,
+                order=idx
+            )
+            for idx, question_data in enumerate(quiz_data.questions)
+        ]
     )
     db.add(new_quiz)
-    db.flush()
-    
-    # Add questions
-    for idx, question_data in enumerate(quiz_data.questions):
-        question = QuizQuestion(
-            quiz_id=new_quiz.id,
-            question_text=question_data.question_text,
-            option_a=question_data.option_a,
-            option_b=question_data.option_b,
-            option_c=question_data.option_c,
-            option_d=question_data.option_d,
-            correct_answer=question_data.correct_answer,
-            order=idx
-        )
-        db.add(question)
-    
-    db.commit()
-    db.refresh(new_quiz)
+    await db.commit()
     
     return new_quiz
 
 @router.get("/", response_model=List[QuizSchema])
 async def list_quizzes(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
     course_id: int = None
 ):
     """List all quizzes for current user"""
-    query = db.query(Quiz).filter(Quiz.user_id == current_user.id)
+    query = select(Quiz).options(selectinload(Quiz.questions)).where(Quiz.user_id == current_user.id)
     if course_id:
-        query = query.filter(Quiz.course_id == course_id)
-    return query.all()
+        query = query.where(Quiz.course_id == course_id)
+    return (await db.scalars(query)).all()
 
 @router.get("/{quiz_id}", response_model=QuizPublic)
 async def get_quiz(
     quiz_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a quiz (without answers for taking the quiz)"""
-    quiz = db.query(Quiz).filter(Quiz.id == quiz_id).first()
+    quiz = await db.scalar(select(Quiz).options(selectinload(Quiz.questions)).where(Quiz.id == quiz_id))
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
@@ -96,11 +94,11 @@ async def get_quiz(
 @router.post("/submit", response_model=QuizResult)
 async def submit_quiz(
     submission: QuizSubmit,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Submit quiz answers and get results"""
-    quiz = db.query(Quiz).filter(Quiz.id == submission.quiz_id).first()
+    quiz = await db.scalar(select(Quiz).options(selectinload(Quiz.questions)).where(Quiz.id == submission.quiz_id))
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
@@ -112,14 +110,19 @@ async def submit_quiz(
         total_questions=len(quiz.questions)
     )
     db.add(attempt)
-    db.flush()
+    await db.flush()
     
-    # Grade answers
+    # Grade answers (questions loaded in one query)
     score = 0
     results = []
+    question_ids = [answer_data.question_id for answer_data in submission.answers]
+    questions = {
+        question.id: question
+        for question in await db.scalars(select(QuizQuestion).where(QuizQuestion.id.in_(question_ids)))
+    }
     
     for answer_data in submission.answers:
-        question = db.query(QuizQuestion).filter(QuizQuestion.id == answer_data.question_id).first()
+        question = questions.get(answer_data.question_id)
         if not question:
             continue
         
@@ -150,7 +153,7 @@ async def submit_quiz(
     
     # Update attempt with score
     attempt.score = score
-    db.commit()
+    await db.commit()
     
     return QuizResult(
         score=score,
@@ -159,23 +162,42 @@ async def submit_quiz(
         attempt_id=attempt.id
     )
 
-@router.post("/generate", response_model=GenerateQuizResponse)
+@router.post("/generate", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
 async def generate_quiz(
     request: GenerateQuizRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key")
 ):
-    """Generate quiz questions from module content using AI"""
+    """
+    Generate quiz questions from module content, from the module's pre-generated pool if possible
+    
+    Pool hits come back as an already-succeeded job; otherwise a generation
+    job is queued (202) and GET /jobs/{id} returns the questions once done.
+    Retries carrying the same Idempotency-Key header get the original job.
+    """
     
     # Get the module (may be None if using files only)
     module = None
     if request.module_id:
-        module = db.query(Module).filter(Module.id == request.module_id).first()
+        module = await db.get(Module, request.module_id)
         if not module:
             raise HTTPException(status_code=404, detail="Module not found")
     
     module_name = module.name if module else "Selected Files"
     print(f"\n=== Generating quiz from: {module_name} ===")
+    payload = {"user_id": current_user.id, "request": request.model_dump()}
+    
+    # Serve from the module's pre-generated pool when the request is just "this module"
+    if module and not request.file_urls and not request.include_files_tab and not request.refresh:
+        pooled = await db.run_sync(pregeneration.sample_quiz_questions, module.id, request.num_questions)
+        if pooled is not None:
+            print(f"Serving {len(pooled)} pre-generated quiz questions")
+            result = GenerateQuizResponse(questions=pooled, module_name=module_name, count=len(pooled))
+            return await db.run_sync(
+                job_queue.enqueue, "generate_quiz", payload, user_id=current_user.id,
+                idempotency_key=idempotency_key, result=result.model_dump()
+            )
     
     # Get user's Canvas session cookie
     if not current_user.canvas_session_cookie:
@@ -184,130 +206,58 @@ async def generate_quiz(
             detail="Canvas session cookie not available. Please provide a Canvas session cookie to generate quiz questions."
         )
     
-    # Decrypt session cookie
-    session_cookie = decrypt_data(current_user.canvas_session_cookie)
-    
-    # Extract text from module items or selected files
-    all_text = ""
-    items_processed = 0
-    
-    # Parse items if they're stored as JSON string
-    import json as json_lib
-    items = []
-    if module:
-        print(f"\n=== Processing module: {module.name} ===")
-        items = module.items
-        if isinstance(items, str):
-            items = json_lib.loads(items)
-        elif items is None:
-            items = []
-        print(f"Module has {len(items)} items")
-    else:
-        print("\n=== Processing selected files (no module) ===")
-    
-    # If include_files_tab is True, fetch files from Canvas Files tab
-    files_tab_urls = []
-    if request.include_files_tab:
-        try:
-            # Get course ID from module or from first file URL (if we can extract it)
-            course = None
-            if module:
-                course = db.query(Course).filter(Course.id == module.course_id).first()
-            elif request.file_urls and len(request.file_urls) > 0:
-                # Try to extract course ID from file URL
-                import re
-                for file_url in request.file_urls:
-                    match = re.search(r'/courses/(\d+)/files/', file_url)
-                    if match:
-                        canvas_course_id = match.group(1)
-                        # Find course by canvas_id
-                        course = db.query(Course).filter(
-                            Course.canvas_id == canvas_course_id,
-                            Course.user_id == current_user.id
-                        ).first()
-                        if course:
-                            break
-            
-            if course and course.canvas_id:
-                print(f"Scanning Files tab for course {course.canvas_id}...")
-                scraper = CanvasScraper(
-                    base_url=current_user.canvas_instance_url or "https://usflearn.instructure.com",
-                    session_cookie=session_cookie
-                )
-                files_tab_files = scraper.get_course_files(course.canvas_id)
-                files_tab_urls = [f.get('url', '') for f in files_tab_files if f.get('url')]
-                print(f"Found {len(files_tab_urls)} files from Files tab")
-        except Exception as e:
-            print(f"Warning: Failed to scan Files tab: {e}")
-    
-    # Combine user-selected files with files tab files if requested
-    all_file_urls = list(request.file_urls) if request.file_urls else []
-    if files_tab_urls:
-        all_file_urls.extend(files_tab_urls)
-        # Remove duplicates
-        all_file_urls = list(dict.fromkeys(all_file_urls))
-    
-    # If specific file URLs were provided (or from files tab), use those
-    if all_file_urls and len(all_file_urls) > 0:
-        print(f"Using {len(all_file_urls)} files (user-selected + files tab)")
-        for file_url in all_file_urls:
-            # Find the item name from the module items or use URL as fallback
-            item_name = 'Unknown'
-            if module and items:
-                item_name = next((item.get('title', 'Unknown') for item in items if item.get('url') == file_url), 'Unknown')
-            else:
-                # Extract filename from URL
-                import os
-                from urllib.parse import urlparse, unquote
-                parsed = urlparse(file_url)
-                item_name = os.path.basename(unquote(parsed.path)) or 'File'
-            
-            print(f"Processing selected file: {item_name}")
-            text = extract_text_from_url(
-                file_url,
-                session_cookie,
-                current_user.canvas_instance_url or "https://usflearn.instructure.com"
-            )
-            if text and len(text) > 50:
-                print(f"  Extracted {len(text)} characters")
-                all_text += text + "\n\n"
-                items_processed += 1
-            else:
-                print(f"  Failed to extract text or too short")
-    elif module:
-        # Default behavior: process all items
-        for item in items[:10]:
-            item_url = item.get('url', '')
-            item_name = item.get('title', '') or item.get('name', '')
-            
-            if item_url and '.pdf' in item_name.lower():
-                print(f"  Extracting PDF: {item_name}")
-                text = extract_text_from_url(
-                    item_url,
-                    session_cookie,
-                    current_user.canvas_instance_url or "https://usflearn.instructure.com"
-                )
-                if text and len(text) > 50:
-                    print(f"  Extracted {len(text)} characters")
-                    all_text += text + "\n\n"
-                    items_processed += 1
-    
-    print(f"Total text extracted: {len(all_text)} characters from {items_processed} items")
-    
-    if len(all_text) < 200:
-        module_or_files = f"module '{module.name}'" if module else "selected files"
-        raise HTTPException(
-            status_code=400,
-            detail=f"Not enough content found in {module_or_files}. Try selecting files with more content or ensure files are accessible."
-        )
-    
-    # Generate quiz using Groq
+    return await db.run_sync(
+        job_queue.enqueue, "generate_quiz", payload, user_id=current_user.id, idempotency_key=idempotency_key
+    )
+
+
+@job_queue.handler("generate_quiz")
+async def run_quiz_generation(payload: dict) -> dict:
+    """Job handler: extract the module or file text and generate quiz questions"""
+    request = GenerateQuizRequest(**payload["request"])
+    db = SessionLocal()
     try:
+        current_user = db.query(User).filter(User.id == payload["user_id"]).first()
+        if not current_user:
+            raise ValueError("User not found")
+        module = None
+        if request.module_id:
+            module = db.query(Module).filter(Module.id == request.module_id).first()
+            if not module:
+                raise ValueError("Module not found")
+        module_name = module.name if module else "Selected Files"
+        
+        # Extract text from module items or selected files
+        ingestion = ContentIngestionService(db, current_user)
+        content = await ingestion.ingest(
+            module=module,
+            file_urls=request.file_urls,
+            include_files_tab=request.include_files_tab
+        )
+        all_text = content.text
+        
+        if len(all_text) < 200:
+            module_or_files = f"module '{module.name}'" if module else "selected files"
+            raise ValueError(
+                f"Not enough content found in {module_or_files}. Try selecting files with more content or ensure files are accessible."
+            )
+        
+        # Generate quiz using Groq
         print(f"Sending to Groq for quiz generation...")
-        questions = generate_quiz_with_groq(
-            content=all_text,
-            module_name=module_name,
-            num_questions=request.num_questions
+        context_text = content.select_context(module_name, settings.GENERATION_CONTEXT_TOKENS)
+        questions = await generation_cache.get_or_generate(
+            "quiz",
+            context_text,
+            module_name,
+            request.num_questions,
+            prompt_version=QUIZ_PROMPT_VERSION,
+            model=MODEL,
+            generate=lambda: generate_quiz_with_groq(
+                content=context_text,
+                module_name=module_name,
+                num_questions=request.num_questions
+            ),
+            refresh=request.refresh
         )
         print(f"Generated {len(questions)} quiz questions")
         
@@ -315,28 +265,27 @@ async def generate_quiz(
             questions=questions,
             module_name=module_name,
             count=len(questions)
-        )
-        
-    except ValueError as e:
-        raise HTTPException(status_code=500, detail=str(e))
+        ).model_dump()
+    finally:
+        db.close()
 
 @router.delete("/{quiz_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_quiz(
     quiz_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a quiz"""
-    quiz = db.query(Quiz).filter(
+    quiz = await db.scalar(select(Quiz).where(
         Quiz.id == quiz_id,
         Quiz.user_id == current_user.id
-    ).first()
+    ))
     
     if not quiz:
         raise HTTPException(status_code=404, detail="Quiz not found")
     
-    db.delete(quiz)
-    db.commit()
+    await db.delete(quiz)
+    await db.commit()
     
     return None
 
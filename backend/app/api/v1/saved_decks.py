@@ -1,108 +1,105 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List
 
-from app.db.database import get_db
+from app.db.database import get_async_db
 from app.models.user import User
 from app.models.saved_deck import SavedFlashcardDeck, SavedFlashcard
 from app.schemas.saved_deck import SavedDeckCreate, SavedDeck, SavedDeckList
-from app.api.v1.auth import get_current_user
+from app.api.v1.auth import get_current_user_async
 
 router = APIRouter()
 
+async def _get_user_deck(db: AsyncSession, deck_id: int, user_id: int) -> SavedFlashcardDeck:
+    """A user's deck with its cards loaded, or 404"""
+    deck = await db.scalar(
+        select(SavedFlashcardDeck)
+        .options(selectinload(SavedFlashcardDeck.cards))
+        .where(SavedFlashcardDeck.id == deck_id, SavedFlashcardDeck.user_id == user_id)
+    )
+    if not deck:
+        raise HTTPException(status_code=404, detail="Deck not found")
+    return deck
+
 @router.post("/", response_model=SavedDeck, status_code=status.HTTP_201_CREATED)
 async def create_saved_deck(
     deck_data: SavedDeckCreate,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Create a new saved flashcard deck"""
-    # Create deck
+    # Create deck and cards in one flush
     new_deck = SavedFlashcardDeck(
         user_id=current_user.id,
         name=deck_data.name,
         description=deck_data.description,
-        course_id=deck_data.course_id
+        course_id=deck_data.course_id,
+        cards=[
+            SavedFlashcard(
+                question=card_data.question,
+                answer=card_data.answer,
+                order=card_data.order
+            )
+            for card_data in deck_data.cards
+        ]
     )
     db.add(new_deck)
-    db.flush()
-    
-    # Add cards
-    for card_data in deck_data.cards:
-        card = SavedFlashcard(
-            deck_id=new_deck.id,
-            question=card_data.question,
-            answer=card_data.answer,
-            order=card_data.order
-        )
-        db.add(card)
-    
-    db.commit()
-    db.refresh(new_deck)
-    
+    await db.commit()
+
     return new_deck
 
 @router.get("/", response_model=List[SavedDeckList])
 async def list_saved_decks(
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db),
     course_id: int = None
 ):
     """List all saved flashcard decks for current user"""
-    query = db.query(SavedFlashcardDeck).filter(SavedFlashcardDeck.user_id == current_user.id)
+    # Card counts come from the same grouped query (no per-deck card load)
+    query = (
+        select(SavedFlashcardDeck, func.count(SavedFlashcard.id).label("card_count"))
+        .outerjoin(SavedFlashcard, SavedFlashcard.deck_id == SavedFlashcardDeck.id)
+        .where(SavedFlashcardDeck.user_id == current_user.id)
+        .group_by(SavedFlashcardDeck.id)
+        .order_by(SavedFlashcardDeck.id)
+    )
     if course_id:
-        query = query.filter(SavedFlashcardDeck.course_id == course_id)
-    
-    decks = query.all()
-    
-    # Build response with card count
-    result = []
-    for deck in decks:
-        result.append(SavedDeckList(
+        query = query.where(SavedFlashcardDeck.course_id == course_id)
+
+    rows = await db.execute(query)
+
+    return [
+        SavedDeckList(
             id=deck.id,
             name=deck.name,
             description=deck.description,
-            card_count=len(deck.cards),
+            card_count=card_count,
             created_at=deck.created_at
-        ))
-    
-    return result
+        )
+        for deck, card_count in rows
+    ]
 
 @router.get("/{deck_id}", response_model=SavedDeck)
 async def get_saved_deck(
     deck_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get a specific saved flashcard deck"""
-    deck = db.query(SavedFlashcardDeck).filter(
-        SavedFlashcardDeck.id == deck_id,
-        SavedFlashcardDeck.user_id == current_user.id
-    ).first()
-    
-    if not deck:
-        raise HTTPException(status_code=404, detail="Deck not found")
-    
-    return deck
+    return await _get_user_deck(db, deck_id, current_user.id)
 
 @router.delete("/{deck_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_saved_deck(
     deck_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a saved flashcard deck"""
-    deck = db.query(SavedFlashcardDeck).filter(
-        SavedFlashcardDeck.id == deck_id,
-        SavedFlashcardDeck.user_id == current_user.id
-    ).first()
-    
-    if not deck:
-        raise HTTPException(status_code=404, detail="Deck not found")
-    
-    db.delete(deck)
-    db.commit()
-    
-    return None
+    deck = await _get_user_deck(db, deck_id, current_user.id)
 
+    await db.delete(deck)
+    await db.commit()
 
+    return None
@@ -1,9 +1,18 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 
 class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = "sqlite:///./canvas_ext.db"
+
+    # SQLite production mode (file databases only; see app.db.database)
+    SQLITE_PRODUCTION_MODE: bool = True  # WAL + the pragmas below, one writer at a time (sync and async share it), a read pool
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # In WAL mode NORMAL only fsyncs at checkpoints (FULL fsyncs every commit)
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # Bytes of the file read through memory mapping
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024  # Page cache per connection
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # Wait for another process's write lock before "database is locked"
+    SQLITE_READ_POOL_SIZE: int = 8  # Read-only connections (writes queue for the single writer connection)
+    SQLITE_WRITE_TIMEOUT_SECONDS: float = 30.0  # How long a write transaction waits for the writer (sync or async)
     
     # Security
     SECRET_KEY: str = "your-secret-key-change-this-in-production"
@@ -13,11 +22,106 @@ class Settings(BaseSettings):
     # Canvas Configuration
     CANVAS_INSTANCE_URL: str = "https://usflearn.instructure.com"
     CANVAS_SESSION_COOKIE: str | None = None
-    
+
+    # Canvas scraping
+    CANVAS_SCRAPE_CONCURRENCY: int = 8  # Worker threads fanning out across courses (1 = sequential)
+    CANVAS_MAX_CONNECTIONS_PER_HOST: int = 6  # In-flight requests per Canvas host, shared by all scrapers
+    CANVAS_MAX_RETRIES: int = 3  # Retries when Canvas throttles (429, or 403 "Rate Limit Exceeded")
+    CANVAS_MAX_RETRY_DELAY_SECONDS: float = 30.0  # Cap on Retry-After / backoff sleeps
+    SYNC_FULL_INTERVAL_HOURS: int = 24  # Incremental syncs fall back to a full course sync this often
+    CANVAS_SYNC_COURSE_CONCURRENCY: int = 4  # Courses fetched at once by an API sync (1 = sequential)
+
+    # Background Canvas refresh (courses, modules and assignments; login does no Canvas I/O)
+    CANVAS_REFRESH_ENABLED: bool = True
+    CANVAS_REFRESH_INTERVAL_MINUTES: int = 60
+    CANVAS_REFRESH_JITTER: float = 0.2  # Each interval is randomly +/- this fraction, spreading users out
+    CANVAS_REFRESH_ACTIVE_DAYS: int = 14  # Only users who logged in this recently are refreshed
+    CANVAS_REFRESH_TICK_SECONDS: float = 60.0  # How often the scheduler looks for due users
+    CANVAS_REFRESH_MAX_USERS_PER_TICK: int = 20
+    CANVAS_REFRESH_MAX_BACKOFF_MINUTES: int = 24 * 60  # Cap on the retry delay after repeated failures
+
     # API Keys
     OPENAI_API_KEY: str | None = None
     ANTHROPIC_API_KEY: str | None = None
     GROQ_API_KEY: str | None = None
+    GROQ_API_BASE_URL: str = "https://api.groq.com"  # Point at a local fake server for tests
+
+    # Shared LLM HTTP client (pooled keep-alive connections to Groq)
+    LLM_MAX_CONCURRENCY: int = 16  # In-flight Groq requests per process
+    LLM_MAX_CONNECTIONS: int = 20
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20  # Keep >= LLM_MAX_CONCURRENCY or busy periods churn connections
+    LLM_KEEPALIVE_EXPIRY_SECONDS: float = 60.0
+    LLM_CONNECT_TIMEOUT: float = 10.0
+    LLM_REQUEST_TIMEOUT: float = 60.0
+    
+    # Extracted text cache (skips re-downloading and re-parsing Canvas files)
+    EXTRACTION_CACHE_ENABLED: bool = True
+    EXTRACTION_CACHE_MAX_ENTRIES: int = 2000
+    EXTRACTION_CACHE_MAX_BYTES: int = 200 * 1024 * 1024  # 200 MB of extracted text
+    
+    # File ingestion for flashcards, quizzes and the AI tutor
+    INGESTION_MAX_CONCURRENCY_PER_USER: int = 4  # Parallel Canvas downloads per user
+    INGESTION_PARSE_WORKERS: int = 4  # Worker threads for PDF/HTML parsing
+    INGESTION_REQUEST_TIMEOUT: float = 60.0
+    FILES_INDEX_TTL_SECONDS: int = 300  # How long a course's Files tab listing is reused
+    FILES_INDEX_FULL_RELIST_HOURS: int = 24  # Relist every page without the ETag this often (removals past page 1 don't change it)
+    
+    # Generated flashcard/quiz cache (same material + count reuses an earlier set)
+    GENERATION_CACHE_ENABLED: bool = True
+    GENERATION_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    GENERATION_CACHE_MAX_ENTRIES: int = 5000
+    GENERATION_CACHE_SHUFFLE: bool = True  # Shuffle cached items (and quiz options) per request
+    
+    # Flashcard/quiz pools generated for each module after import
+    PREGENERATION_ENABLED: bool = True
+    PREGENERATION_FLASHCARDS_PER_MODULE: int = 30  # Largest num_cards a request can ask for
+    PREGENERATION_QUIZ_QUESTIONS_PER_MODULE: int = 20
+    PREGENERATION_BATCH_SIZE: int = 15  # Items per Groq call (keeps each completion within its token limit)
+    PREGENERATION_MAX_MODULES_PER_USER: int = 50
+    PREGENERATION_CONCURRENCY: int = 2  # Modules generated in parallel per import
+    
+    # Background jobs (DB-backed queue, in-process workers)
+    JOB_WORKERS: int = 4  # Jobs run concurrently per process
+    JOB_KIND_CONCURRENCY: Dict[str, int] = {  # Per-kind caps within JOB_WORKERS
+        "import_courses": 2,
+        "scrape_courses": 2,
+        "index_courses": 1,
+        "pregenerate_modules": 1,
+        "refresh_canvas": 2,  # Scheduled refreshes never crowd out user-triggered imports
+    }
+    JOB_POLL_INTERVAL_SECONDS: float = 2.0  # Idle workers re-check the table this often
+    JOB_TIMEOUT_SECONDS: float = 1800.0
+    JOB_LEASE_SECONDS: float = 60.0  # A running job whose owner hasn't renewed it this long is requeued (renewed every third)
+    JOB_MAX_ATTEMPTS: int = 3  # Claims before a job whose lease keeps expiring is marked failed instead of requeued
+    JOB_RETENTION_HOURS: int = 72  # Finished jobs are deleted after this long
+    
+    # Dashboard snapshots (rebuilt only after the user's courses, assignments, flashcards or sessions change)
+    DASHBOARD_CACHE_ENABLED: bool = True
+    DASHBOARD_CACHE_MAX_ENTRIES: int = 10000  # Users kept in the in-process LRU
+    DASHBOARD_CACHE_TTL_SECONDS: int = 3600  # Upper bound on snapshot age
+    DASHBOARD_CACHE_PERSIST: bool = False  # Also keep snapshots in dashboard_snapshots (shared, survives restarts)
+    DASHBOARD_CACHE_SINGLE_PROCESS: bool = True  # Without PERSIST, use the in-process LRU (one worker only: others' writes don't invalidate it)
+    
+    # Prompt packing for Groq calls
+    PROMPT_TOKEN_BUDGET: int = 6000  # Max prompt tokens per request (template + context)
+    PROMPT_BOILERPLATE_MIN_REPEATS: int = 3  # Lines repeated this often are treated as headers/footers
+    
+    # Context retrieval (token budgets for course material in each prompt)
+    RETRIEVAL_CHUNK_TOKENS: int = 250
+    RETRIEVAL_CHUNK_OVERLAP_TOKENS: int = 50
+    GENERATION_CONTEXT_TOKENS: int = 2000  # Flashcard and quiz generation
+    CHAT_CONTEXT_TOKENS: int = 3000  # AI tutor answers
+    ACTIVE_RECALL_CONTEXT_TOKENS: int = 2000  # Active recall questions and grading
+    CHUNK_INDEX_MAX_DOCUMENTS_PER_COURSE: int = 50  # Documents kept in each course's chunk index
+    
+    # OCR for scanned PDFs
+    OCR_MAX_WORKERS: int = 0  # Tesseract worker processes (0 = one per CPU core)
+    OCR_BASE_DPI: int = 150  # First pass resolution
+    OCR_MAX_DPI: int = 300  # Re-render resolution for low-confidence pages
+    OCR_MIN_CONFIDENCE: float = 60.0  # Mean word confidence (0-100) below which a page is re-rendered
+    OCR_PAGE_TEXT_THRESHOLD: int = 20  # Pages with fewer alphanumeric characters are OCR'd
+    OCR_MAX_PAGES: int = 100  # Per-document page budget
+    OCR_TIME_BUDGET_SECONDS: float = 120.0  # Per-document time budget
     
     # CORS
     CORS_ORIGINS: List[str] = ["http://localhost:5173", "http://localhost:3000"]
@@ -0,0 +1,108 @@
+"""
+In-process metrics
+Keeps a rolling window of recent samples per name and reports count and
+p50/p95/p99 for GET /metrics. Latencies (endpoint routes, pipeline stages)
+are reported in milliseconds; values such as prompt token counts as-is.
+Counters (e.g. cache hits and misses) are plain running totals.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict
+
+WINDOW_SIZE = 1000
+
+_latencies: Dict[str, Deque[float]] = {}
+_values: Dict[str, Deque[float]] = {}
+_counts: Dict[str, int] = {}
+_counters: Dict[str, int] = {}
+_lock = threading.Lock()
+
+
+def _add(series: Dict[str, Deque[float]], name: str, value: float) -> None:
+    with _lock:
+        samples = series.get(name)
+        if samples is None:
+            samples = series[name] = deque(maxlen=WINDOW_SIZE)
+        samples.append(value)
+        _counts[name] = _counts.get(name, 0) + 1
+
+
+def record(name: str, seconds: float) -> None:
+    """Record one duration for a latency metric"""
+    _add(_latencies, name, seconds * 1000)
+
+
+def record_value(name: str, value: float) -> None:
+    """Record one sample of a value metric (e.g. prompt tokens)"""
+    _add(_values, name, value)
+
+
+def increment(name: str, amount: int = 1) -> None:
+    """Add to a counter"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def counter(name: str) -> int:
+    """Current value of a counter"""
+    with _lock:
+        return _counters.get(name, 0)
+
+
+@contextmanager
+def timer(name: str):
+    """Record how long the wrapped block takes"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(name, time.perf_counter() - start)
+
+
+def _percentile(ordered, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    index = max(0, min(len(ordered) - 1, int(round(fraction * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def _summarize(series: Dict[str, Deque[float]], suffix: str) -> Dict[str, Dict[str, float]]:
+    with _lock:
+        samples = {name: sorted(values) for name, values in series.items()}
+        counts = dict(_counts)
+
+    summary = {}
+    for name, ordered in sorted(samples.items()):
+        if not ordered:
+            continue
+        summary[name] = {
+            "count": counts[name],
+            "window": len(ordered),
+            f"p50{suffix}": round(_percentile(ordered, 0.50), 2),
+            f"p95{suffix}": round(_percentile(ordered, 0.95), 2),
+            f"p99{suffix}": round(_percentile(ordered, 0.99), 2),
+            f"max{suffix}": round(ordered[-1], 2),
+        }
+    return summary
+
+
+def snapshot() -> Dict[str, Dict[str, Dict[str, float]]]:
+    """Summary of every latency (milliseconds) and value metric, plus counters"""
+    with _lock:
+        counters = dict(sorted(_counters.items()))
+    return {
+        "latency": _summarize(_latencies, "_ms"),
+        "values": _summarize(_values, ""),
+        "counters": counters,
+    }
+
+
+def reset() -> None:
+    """Clear all recorded metrics"""
+    with _lock:
+        _latencies.clear()
+        _values.clear()
+        _counts.clear()
+        _counters.clear()
@@ -1,24 +1,236 @@
-from sqlalchemy import create_engine
+import asyncio
+import os
+import threading
+import time
+from sqlalchemy import create_engine, event, exc
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from sqlalchemy.util import await_only
 from app.core.config import settings
 
+# asyncio drivers for the async engine, by database backend
+ASYNC_DRIVERS = {"sqlite": "sqlite+aiosqlite", "postgresql": "postgresql+asyncpg"}
+
+# One write gate per SQLite file, shared by every writer pool on it in this process
+_write_gates = {}
+_write_gates_lock = threading.Lock()
+
+
+def async_database_url(url: str) -> str:
+    """The same database through its asyncio driver (aiosqlite or asyncpg)"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver configured for {backend}")
+    return parsed.set(drivername=ASYNC_DRIVERS[backend]).render_as_string(hide_password=False)
+
+
+def sqlite_production_mode(url: str) -> bool:
+    """Whether url gets the tuned SQLite engines (a file database, with SQLITE_PRODUCTION_MODE on)"""
+    parsed = make_url(url)
+    return (settings.SQLITE_PRODUCTION_MODE and parsed.get_backend_name() == "sqlite"
+            and parsed.database not in (None, "", ":memory:"))
+
+
+def _set_sqlite_pragmas(dbapi_connection, read_only: bool) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={settings.SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA mmap_size={int(settings.SQLITE_MMAP_SIZE)}")
+        cursor.execute(f"PRAGMA cache_size=-{int(settings.SQLITE_CACHE_SIZE_KB)}")
+        cursor.execute(f"PRAGMA busy_timeout={int(settings.SQLITE_BUSY_TIMEOUT_MS)}")
+        if read_only:
+            cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+def _write_gate(url: str) -> threading.Lock:
+    path = os.path.abspath(make_url(url).database)
+    with _write_gates_lock:
+        return _write_gates.setdefault(path, threading.Lock())
+
+
+def _gate_timeout(timeout: float) -> exc.TimeoutError:
+    return exc.TimeoutError(f"Timed out after {timeout:g} s waiting for the SQLite writer connection")
+
+
+class WriterPool(QueuePool):
+    """
+    Single-connection pool whose checkout also holds the file's write gate
+
+    The sync and async engines each need their own writer connection, so the
+    gate (not the pool size) is what keeps one writer per file: a checkout
+    from either pool waits until the other one's connection is checked in.
+    """
+
+    gate = None
+
+    def _do_get(self):
+        if not self.gate.acquire(timeout=self._timeout):
+            raise _gate_timeout(self._timeout)
+        try:
+            return super()._do_get()
+        except BaseException:
+            self.gate.release()
+            raise
+
+    def _do_return_conn(self, record) -> None:
+        try:
+            super()._do_return_conn(record)
+        finally:
+            self.gate.release()
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.gate = self.gate
+        return pool
+
+
+async def _acquire_gate(gate: threading.Lock, timeout: float) -> bool:
+    # Polls rather than blocking the event loop; a sync writer in a worker
+    # thread releases the gate without needing the loop
+    deadline = time.monotonic() + timeout
+    while not gate.acquire(blocking=False):
+        if time.monotonic() >= deadline:
+            return False
+        await asyncio.sleep(0.005)
+    return True
+
+
+class AsyncWriterPool(AsyncAdaptedQueuePool, WriterPool):
+    """WriterPool for the aiosqlite engine; waits for the gate without blocking the event loop"""
+
+    def _do_get(self):
+        if not await_only(_acquire_gate(self.gate, self._timeout)):
+            raise _gate_timeout(self._timeout)
+        try:
+            return QueuePool._do_get(self)
+        except BaseException:
+            self.gate.release()
+            raise
+
+
+def create_sqlite_engines(url: str, create=create_engine):
+    """
+    (writer, reader) engines for a SQLite file in production mode
+
+    WAL lets readers run alongside the writer, but SQLite still allows one
+    write transaction at a time. The writer engine has a single pooled
+    connection behind a write gate shared by every writer engine on the same
+    file, sync or async, so write transactions in this process queue for it
+    (up to SQLITE_WRITE_TIMEOUT_SECONDS) instead of retrying against the file
+    lock; busy_timeout covers writers in other processes. Readers get their
+    own pool of query_only connections. Pass create=create_async_engine for
+    the aiosqlite pair.
+    """
+    is_async = create is create_async_engine
+    options = {"connect_args": {"check_same_thread": False}}
+    # aiosqlite defaults to NullPool; both pairs need a real pool to queue on
+    writer = create(url, poolclass=AsyncWriterPool if is_async else WriterPool, pool_size=1, max_overflow=0,
+                    pool_timeout=settings.SQLITE_WRITE_TIMEOUT_SECONDS, **options)
+    reader = create(url, poolclass=AsyncAdaptedQueuePool if is_async else QueuePool,
+                    pool_size=settings.SQLITE_READ_POOL_SIZE, **options)
+    getattr(writer, "sync_engine", writer).pool.gate = _write_gate(url)
+
+    for bind, read_only in ((writer, False), (reader, True)):
+        @event.listens_for(getattr(bind, "sync_engine", bind), "connect")
+        def set_pragmas(dbapi_connection, connection_record, read_only=read_only):
+            _set_sqlite_pragmas(dbapi_connection, read_only)
+
+    return writer, reader
+
+
+class RoutingSession(Session):
+    """
+    Session that reads through read_bind and writes through its bind
+
+    Statements go to read_bind until the transaction writes (a flush or an
+    INSERT/UPDATE/DELETE); from then on the whole transaction stays on the
+    writer, so it reads its own changes. Reads before that come from a read
+    connection, outside the write transaction, so code that updates rows it
+    has read must be on the writer first: open the session with
+    for_write=True (every transaction on the writer) or call use_writer(db)
+    before the reads. Without a read_bind it's a plain Session.
+    """
+
+    def __init__(self, *args, read_bind=None, for_write=False, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_bind = read_bind
+        self.for_write = for_write
+        self._writing = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        if self.read_bind is None or self.for_write:
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        if self._writing or self._flushing or getattr(clause, "is_dml", False):
+            self._writing = True
+            return super().get_bind(mapper, clause=clause, **kwargs)
+        return self.read_bind
+
+
+@event.listens_for(RoutingSession, "after_transaction_end")
+def _end_write_transaction(session, transaction) -> None:
+    if transaction.parent is None:
+        session._writing = False
+
+
+def use_writer(db: Session) -> None:
+    """
+    Send the rest of db's current transaction to the writer, reads included
+
+    For a read-modify-write on a session that may be routing reads: call it
+    before reading the rows to update, and commit before any slow I/O, since
+    the transaction holds the SQLite writer until it ends.
+    """
+    if isinstance(db, RoutingSession):
+        db._writing = True
+
+
 # Configure engine based on database type
-if settings.DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(
-        settings.DATABASE_URL, 
+if sqlite_production_mode(settings.DATABASE_URL):
+    engine, read_engine = create_sqlite_engines(settings.DATABASE_URL)
+    async_engine, async_read_engine = create_sqlite_engines(
+        async_database_url(settings.DATABASE_URL), create=create_async_engine
+    )
+elif settings.DATABASE_URL.startswith("sqlite"):
+    engine = read_engine = create_engine(
+        settings.DATABASE_URL,
         connect_args={"check_same_thread": False}
     )
+    async_engine = async_read_engine = create_async_engine(async_database_url(settings.DATABASE_URL))
 else:
     # PostgreSQL or other databases
-    engine = create_engine(
+    engine = read_engine = create_engine(
         settings.DATABASE_URL,
         pool_pre_ping=True,
         pool_size=10,
         max_overflow=20
     )
+    async_engine = async_read_engine = create_async_engine(
+        async_database_url(settings.DATABASE_URL),
+        pool_pre_ping=True,
+        pool_size=10,
+        max_overflow=20
+    )
+
+# Reads go through read_engine when it's a separate pool (SQLite production
+# mode); SessionLocal(for_write=True) keeps every statement on the writer
+_read_bind = read_engine if read_engine is not engine else None
 
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine,
+                            class_=RoutingSession, read_bind=_read_bind)
+
+# Sessions for async def routes; objects stay usable after commit, since
+# reloading an expired attribute would need an await
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, expire_on_commit=False, sync_session_class=RoutingSession,
+    read_bind=async_read_engine.sync_engine if async_read_engine is not async_engine else None
+)
 
 Base = declarative_base()
 
@@ -29,3 +241,12 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """
+    AsyncSession dependency for async def routes
+
+    Code written for a sync Session (most services) runs on it through
+    `await db.run_sync(func, *args)`, which calls func(session, *args).
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
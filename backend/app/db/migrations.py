@@ -0,0 +1,37 @@
+"""
+Database Migrations
+Brings the schema up to date with the Alembic revisions in migrations/
+when the app starts (the same as running `alembic upgrade head`).
+
+Databases made by Base.metadata.create_all before migrations existed need
+no special handling: the baseline revision skips tables that are already
+there, and later revisions add what they're missing.
+"""
+
+from pathlib import Path
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+# Arbitrary key for the PostgreSQL advisory lock held while migrating, so
+# worker processes starting together don't run the same migration twice
+MIGRATION_LOCK_KEY = 74_210_023
+
+
+def alembic_config() -> Config:
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    return config
+
+
+def upgrade_database(engine: Engine, revision: str = "head") -> None:
+    """Apply any migrations the database hasn't had yet"""
+    config = alembic_config()
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": MIGRATION_LOCK_KEY})
+        config.attributes["connection"] = connection
+        command.upgrade(config, revision)
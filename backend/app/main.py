@@ -1,13 +1,33 @@
-from fastapi import FastAPI
+import time
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
+from app.core import metrics
 from app.api.v1 import api_router
-from app.db.database import engine, Base
+from app.db.database import async_engine, async_read_engine, engine
+from app.db.migrations import upgrade_database
+from app.services.ocr_engine import shutdown_ocr_engine
+from app.services import canvas_refresh, dashboard_cache, generation_cache, job_queue, llm_client
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Create or migrate database tables (Alembic revisions in migrations/)
+upgrade_database(engine)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await job_queue.start_workers()
+    canvas_refresh.start_scheduler()
+    yield
+    # Stop background worker pools and close pooled connections
+    await canvas_refresh.stop_scheduler()
+    await job_queue.stop_workers()
+    shutdown_ocr_engine()
+    await llm_client.close_client()
+    await async_engine.dispose()
+    await async_read_engine.dispose()
 
 app = FastAPI(
+    lifespan=lifespan,
     title="Canvas LMS Extension API",
     description="Backend API for Canvas LMS Browser Extension",
     version="1.0.0",
@@ -24,6 +44,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    """Record request latency per route for /metrics"""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    if route is not None:
+        metrics.record(f"{request.method} {route.path}", time.perf_counter() - start)
+    return response
+
 # Include API router
 app.include_router(api_router, prefix="/api/v1")
 
@@ -39,5 +69,14 @@ async def root():
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def get_metrics():
+    """Latency percentiles per route and pipeline stage, counters and cache hit rates"""
+    return {
+        **metrics.snapshot(),
+        "generation_cache": generation_cache.hit_rates(),
+        "dashboard_cache": dashboard_cache.stats()
+    }
+
 
 
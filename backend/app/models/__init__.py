@@ -7,6 +7,15 @@ from app.models.chat_message import ChatMessage
 from app.models.user_settings import UserSettings
 from app.models.quiz import Quiz, QuizQuestion, QuizAttempt, QuizAnswer
 from app.models.saved_deck import SavedFlashcardDeck, SavedFlashcard
+from app.models.extracted_document import ExtractedDocument
+from app.models.course_file import CourseFile, CourseFileIndex
+from app.models.course_chunk import CourseDocument, CourseChunk
+from app.models.generated_set import GeneratedSet
+from app.models.module_pool import ModulePregeneration, PregeneratedFlashcard, PregeneratedQuizQuestion
+from app.models.job import Job
+from app.models.course_sync_state import CourseSyncState
+from app.models.canvas_refresh_state import CanvasRefreshState
+from app.models.dashboard_snapshot import DashboardSnapshot
 
 __all__ = [
     "User",
@@ -23,5 +32,18 @@ __all__ = [
     "QuizAnswer",
     "SavedFlashcardDeck",
     "SavedFlashcard",
+    "ExtractedDocument",
+    "CourseFile",
+    "CourseFileIndex",
+    "CourseDocument",
+    "CourseChunk",
+    "GeneratedSet",
+    "ModulePregeneration",
+    "PregeneratedFlashcard",
+    "PregeneratedQuizQuestion",
+    "Job",
+    "CourseSyncState",
+    "CanvasRefreshState",
+    "DashboardSnapshot",
 ]
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 from datetime import datetime
@@ -20,6 +20,14 @@ class Assignment(Base):
     points = Column(Integer, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Imports upsert a user's assignments by course and title; the dashboard and
+    # assignment list read by user and due date, course progress by course
+    __table_args__ = (
+        Index('uq_assignments_user_course_title', 'user_id', 'course_id', 'title', unique=True),
+        Index('ix_assignments_user_due_date', 'user_id', 'due_date'),
+        Index('ix_assignments_course_submitted', 'course_id', 'submitted'),
+    )
 
 
 
@@ -0,0 +1,19 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from app.db.database import Base
+from datetime import datetime
+
+class CanvasRefreshState(Base):
+    """When a user's Canvas data was last refreshed in the background, and when it is next due"""
+    __tablename__ = "canvas_refresh_states"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, unique=True)
+    last_login_at = Column(DateTime, nullable=True)  # Users are refreshed while they keep logging in
+    next_refresh_at = Column(DateTime, nullable=True, index=True)  # Jittered, so users don't all refresh at once
+    last_refreshed_at = Column(DateTime, nullable=True)
+    last_status = Column(String, nullable=True)  # succeeded, failed, session_expired
+    last_error = Column(Text, nullable=True)
+    consecutive_failures = Column(Integer, default=0)
+    session_expired_at = Column(DateTime, nullable=True)  # Set when Canvas rejects the cookie; cleared by a new one
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
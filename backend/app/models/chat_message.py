@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from app.db.database import Base
 from datetime import datetime
 
@@ -11,6 +11,11 @@ class ChatMessage(Base):
     role = Column(String, nullable=False)  # 'user' or 'assistant'
     content = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Chat history reads a course's latest messages
+    __table_args__ = (
+        Index('ix_chat_messages_course_created', 'course_id', 'created_at'),
+    )
 
 
 
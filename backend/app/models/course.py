@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, String, Float, ForeignKey, DateTime, UniqueConstraint, Index
 from app.db.database import Base
 from datetime import datetime
 
@@ -21,6 +21,7 @@ class Course(Base):
     # Unique constraint: Each user can only have each Canvas course once
     __table_args__ = (
         UniqueConstraint('canvas_id', 'user_id', name='uq_canvas_user'),
+        Index('ix_courses_user_active', 'user_id', 'is_active'),  # A user's (active) courses
     )
 
 
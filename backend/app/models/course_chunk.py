@@ -0,0 +1,55 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, UniqueConstraint, DDL, event
+from app.db.database import Base
+from datetime import datetime
+
+class CourseDocument(Base):
+    """A course file or module item whose text is in the chunk index"""
+    __tablename__ = "course_documents"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, index=True)
+    source_url = Column(String, nullable=False)
+    name = Column(String, nullable=False)
+    version = Column(String, nullable=True)  # Canvas updated_at when the text was indexed
+    chunk_count = Column(Integer, default=0)
+    indexed_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        UniqueConstraint('course_id', 'source_url', name='uq_course_document_url'),
+    )
+
+class CourseChunk(Base):
+    """An overlapping slice of an indexed document's text"""
+    __tablename__ = "course_chunks"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    document_id = Column(Integer, ForeignKey("course_documents.id", ondelete="CASCADE"), nullable=False, index=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, index=True)
+    position = Column(Integer, nullable=False)
+    start_offset = Column(Integer, nullable=False)  # Character offsets into the document text
+    end_offset = Column(Integer, nullable=False)
+    text = Column(Text, nullable=False)
+
+
+# Full-text search over chunk text: an FTS5 table kept in sync by triggers on
+# SQLite, a generated tsvector column with a GIN index on PostgreSQL
+for statement in (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS course_chunks_fts USING fts5("
+    "text, content='course_chunks', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS course_chunks_ai AFTER INSERT ON course_chunks BEGIN "
+    "INSERT INTO course_chunks_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS course_chunks_ad AFTER DELETE ON course_chunks BEGIN "
+    "INSERT INTO course_chunks_fts(course_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS course_chunks_au AFTER UPDATE ON course_chunks BEGIN "
+    "INSERT INTO course_chunks_fts(course_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO course_chunks_fts(rowid, text) VALUES (new.id, new.text); END",
+):
+    event.listen(CourseChunk.__table__, "after_create", DDL(statement).execute_if(dialect="sqlite"))
+
+for statement in (
+    "ALTER TABLE course_chunks ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', text)) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_course_chunks_search_vector ON course_chunks USING GIN (search_vector)",
+):
+    event.listen(CourseChunk.__table__, "after_create", DDL(statement).execute_if(dialect="postgresql"))
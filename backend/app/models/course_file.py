@@ -0,0 +1,34 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
+from app.db.database import Base
+from datetime import datetime
+
+class CourseFileIndex(Base):
+    """Refresh state of a course's Files tab listing"""
+    __tablename__ = "course_file_indexes"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, unique=True)
+    etag = Column(String, nullable=True)  # ETag of the first Files API page
+    file_count = Column(Integer, default=0)
+    refreshed_at = Column(DateTime, nullable=True)
+    full_listed_at = Column(DateTime, nullable=True)  # Last refresh that listed every page without the ETag
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class CourseFile(Base):
+    """A file from a course's Canvas Files tab"""
+    __tablename__ = "course_files"
+    
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, index=True)
+    canvas_file_id = Column(String, nullable=True)
+    name = Column(String, nullable=False)
+    url = Column(String, nullable=False)
+    size = Column(Integer, nullable=True)
+    content_type = Column(String, nullable=True)
+    canvas_updated_at = Column(String, nullable=True)  # Canvas updated_at, as returned by the API
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        UniqueConstraint('course_id', 'url', name='uq_course_file_url'),
+    )
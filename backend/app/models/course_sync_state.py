@@ -0,0 +1,21 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from app.db.database import Base
+from datetime import datetime
+
+class CourseSyncState(Base):
+    """Per-course high-water marks for incremental Canvas API syncs"""
+    __tablename__ = "course_sync_states"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    course_id = Column(Integer, ForeignKey("courses.id"), nullable=False, unique=True)
+    assignments_etag = Column(String, nullable=True)  # ETag of the first assignments page
+    assignments_updated_at = Column(DateTime, nullable=True)  # Newest assignment updated_at seen
+    assignment_count = Column(Integer, default=0)
+    modules_etag = Column(String, nullable=True)
+    modules_hash = Column(String, nullable=True)  # Canvas modules carry no updated_at, so hash the listing
+    module_count = Column(Integer, default=0)
+    files_updated_at = Column(DateTime, nullable=True)  # Newest file updated_at seen (files ETag is on CourseFileIndex)
+    last_synced_at = Column(DateTime, nullable=True)
+    last_full_sync_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, DateTime, Float, ForeignKey, Text
+from app.db.database import Base
+from datetime import datetime
+
+class DashboardSnapshot(Base):
+    """A user's materialized dashboard, deleted whenever data it depends on changes"""
+    __tablename__ = "dashboard_snapshots"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, unique=True)
+    data = Column(Text, nullable=False)  # JSON in the shape of DashboardData
+    built_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False)  # Midnight, the next upcoming due date or the TTL, whichever is first
+    build_ms = Column(Float, nullable=True)
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from app.db.database import Base
+from datetime import datetime
+
+class ExtractedDocument(Base):
+    __tablename__ = "extracted_documents"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    cache_key = Column(String, unique=True, nullable=False, index=True)  # file:{id}:{updated_at} or sha256:{hash}
+    content_hash = Column(String, nullable=False, index=True)  # SHA-256 of the downloaded file
+    extractor_version = Column(Integer, nullable=False, default=1)
+    text = Column(Text, nullable=False)
+    size_bytes = Column(Integer, nullable=False, default=0)
+    hit_count = Column(Integer, default=0)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 from datetime import datetime
@@ -29,6 +29,11 @@ class Flashcard(Base):
     mastered = Column(Boolean, default=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Cards due for review, by user and course
+    __table_args__ = (
+        Index('ix_flashcards_user_course_reviewed', 'user_id', 'course_id', 'last_reviewed'),
+    )
 
 
 
@@ -0,0 +1,22 @@
+from sqlalchemy import Column, Integer, String, DateTime, Text
+from app.db.database import Base
+from datetime import datetime
+
+class GeneratedSet(Base):
+    """A cached set of AI-generated flashcards or quiz questions"""
+    __tablename__ = "generated_sets"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    cache_key = Column(String, unique=True, nullable=False, index=True)  # {base_key}:{requested count}
+    base_key = Column(String, nullable=False, index=True)  # kind + content hash + module + prompt version + model
+    kind = Column(String, nullable=False)  # "flashcards" or "quiz"
+    content_hash = Column(String, nullable=False)  # SHA-256 of the normalized prompt context
+    module_name = Column(String, nullable=False)
+    prompt_version = Column(Integer, nullable=False)
+    model = Column(String, nullable=False)
+    item_count = Column(Integer, nullable=False)  # Items actually stored (may differ from requested)
+    items = Column(Text, nullable=False)  # JSON array as returned by the generator
+    size_bytes = Column(Integer, nullable=False, default=0)
+    hit_count = Column(Integer, default=0)
+    last_accessed_at = Column(DateTime, default=datetime.utcnow, index=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
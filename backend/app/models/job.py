@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, UniqueConstraint
+from app.db.database import Base
+from datetime import datetime
+
+class Job(Base):
+    """A unit of background work (generation, Canvas import, indexing)"""
+    __tablename__ = "jobs"
+    __table_args__ = (
+        UniqueConstraint("user_id", "kind", "idempotency_key", name="uq_job_idempotency_key"),
+    )
+
+    id = Column(String, primary_key=True)  # uuid4 hex, returned to clients for polling
+    kind = Column(String, nullable=False, index=True)  # Handler name, e.g. "generate_flashcards"
+    status = Column(String, nullable=False, default="queued", index=True)  # queued, running, succeeded, failed
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)
+    idempotency_key = Column(String, nullable=True)  # Client-supplied Idempotency-Key header
+    payload = Column(JSON, nullable=True)
+    result = Column(JSON, nullable=True)
+    error = Column(Text, nullable=True)
+    attempts = Column(Integer, default=0)
+    owner = Column(String, nullable=True)  # Worker process running the job (host:pid:token)
+    lease_expires_at = Column(DateTime, nullable=True)  # Renewed by the owner's heartbeat; requeued once past
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+    started_at = Column(DateTime, nullable=True)
+    finished_at = Column(DateTime, nullable=True)
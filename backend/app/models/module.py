@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON, Index
 from app.db.database import Base
 from datetime import datetime
 
@@ -12,5 +12,11 @@ class Module(Base):
     items = Column(JSON, nullable=True)  # Store module items as JSON
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Imports upsert modules by course and name; courses list them by position
+    __table_args__ = (
+        Index('uq_modules_course_name', 'course_id', 'name', unique=True),
+        Index('ix_modules_course_position', 'course_id', 'position'),
+    )
 
 
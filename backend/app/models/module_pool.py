@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, JSON
+from app.db.database import Base
+from datetime import datetime
+
+class ModulePregeneration(Base):
+    """Pre-generation state of a module's flashcard and quiz pools"""
+    __tablename__ = "module_pregenerations"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    module_id = Column(Integer, ForeignKey("modules.id"), nullable=False, unique=True)
+    status = Column(String, nullable=False, default="pending")  # pending, running, ready, empty, failed
+    content_hash = Column(String, nullable=True)  # Hash of the context the pools were generated from
+    flashcard_count = Column(Integer, default=0)
+    quiz_question_count = Column(Integer, default=0)
+    error = Column(Text, nullable=True)
+    generated_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+class PregeneratedFlashcard(Base):
+    """A flashcard generated ahead of time for a module"""
+    __tablename__ = "pregenerated_flashcards"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    module_id = Column(Integer, ForeignKey("modules.id"), nullable=False, index=True)
+    question = Column(Text, nullable=False)
+    answer = Column(Text, nullable=False)
+    type = Column(String, nullable=True)  # definition, explanation, application, comparison
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class PregeneratedQuizQuestion(Base):
+    """A multiple-choice quiz question generated ahead of time for a module"""
+    __tablename__ = "pregenerated_quiz_questions"
+
+    id = Column(Integer, primary_key=True, index=True, autoincrement=True)
+    module_id = Column(Integer, ForeignKey("modules.id"), nullable=False, index=True)
+    question = Column(Text, nullable=False)
+    options = Column(JSON, nullable=False)  # Four option strings
+    correct_answer = Column(String, nullable=False)  # A, B, C or D
+    created_at = Column(DateTime, default=datetime.utcnow)
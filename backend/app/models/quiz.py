@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 from datetime import datetime
@@ -17,8 +17,14 @@ class Quiz(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    questions = relationship("QuizQuestion", back_populates="quiz", cascade="all, delete-orphan")
+    questions = relationship("QuizQuestion", back_populates="quiz", cascade="all, delete-orphan",
+                             order_by="QuizQuestion.order")
     attempts = relationship("QuizAttempt", back_populates="quiz", cascade="all, delete-orphan")
+    
+    # A user's quizzes, optionally for one course
+    __table_args__ = (
+        Index('ix_quizzes_user_course', 'user_id', 'course_id'),
+    )
 
 
 class QuizQuestion(Base):
@@ -38,6 +44,11 @@ class QuizQuestion(Base):
     
     # Relationships
     quiz = relationship("Quiz", back_populates="questions")
+    
+    # A quiz's questions in order
+    __table_args__ = (
+        Index('ix_quiz_questions_quiz_order', 'quiz_id', 'order'),
+    )
 
 
 class QuizAttempt(Base):
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Text, Index
 from sqlalchemy.orm import relationship
 from app.db.database import Base
 from datetime import datetime
@@ -18,6 +18,11 @@ class SavedFlashcardDeck(Base):
     
     # Relationships
     cards = relationship("SavedFlashcard", back_populates="deck", cascade="all, delete-orphan")
+    
+    # A user's decks, optionally for one course
+    __table_args__ = (
+        Index('ix_saved_decks_user_course', 'user_id', 'course_id'),
+    )
 
 
 class SavedFlashcard(Base):
@@ -33,5 +38,10 @@ class SavedFlashcard(Base):
     
     # Relationships
     deck = relationship("SavedFlashcardDeck", back_populates="cards")
+    
+    # A deck's cards in order
+    __table_args__ = (
+        Index('ix_saved_flashcards_deck_order', 'deck_id', 'order'),
+    )
 
 
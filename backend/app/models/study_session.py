@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
 from app.db.database import Base
 from datetime import datetime
 
@@ -14,6 +14,11 @@ class StudySession(Base):
     notes = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Study stats read the last N days of sessions
+    __table_args__ = (
+        Index('ix_study_sessions_session_date', 'session_date'),
+    )
 
 
 
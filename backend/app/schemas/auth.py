@@ -36,6 +36,7 @@ class Token(BaseModel):
     access_token: str
     token_type: str
     user: UserResponse
+    import_job_id: Optional[str] = None  # Background Canvas import started at signup
 
 class LoginResponse(BaseModel):
     access_token: str
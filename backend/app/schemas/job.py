@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+from typing import Optional, Dict, Any
+from datetime import datetime
+
+class JobResponse(BaseModel):
+    """State of a background job; poll GET /jobs/{id} until status is succeeded or failed"""
+    id: str
+    kind: str
+    status: str  # queued, running, succeeded, failed
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    class Config:
+        from_attributes = True
@@ -79,6 +79,7 @@ class GenerateQuizRequest(BaseModel):
     course_id: Optional[int] = None
     topics: Optional[List[str]] = None
     include_files_tab: bool = False
+    refresh: bool = False  # Generate a new set instead of reusing a cached one
 
 class GenerateQuizResponse(BaseModel):
     """Response model for generated quiz questions"""
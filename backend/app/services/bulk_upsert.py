@@ -0,0 +1,193 @@
+"""
+Bulk Upsert
+Writes imported Canvas courses, modules and assignments in a handful of
+statements instead of a SELECT per row. Existing rows are loaded in one
+query per table, then new and changed rows are written with
+INSERT ... ON CONFLICT (SQLite and PostgreSQL), batched. The unique
+indexes behind the conflict keys come from migration 0004.
+
+Conflict keys:
+- courses: (canvas_id, user_id)
+- modules: (course_id, name)
+- assignments: (user_id, course_id, title)
+
+Only the update_columns a caller passes are updated on conflict. The
+scraped imports leave status, priority and submitted alone; Canvas API syncs
+update them from the submission. Course and assignment writes invalidate
+the user's dashboard snapshot on commit.
+"""
+
+from datetime import datetime
+from typing import Dict, Iterable, List, Sequence, Tuple
+from sqlalchemy import update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.models.assignment import Assignment
+from app.models.course import Course
+from app.models.module import Module
+from app.services import dashboard_cache
+
+# Rows per INSERT statement (stays well under SQLite's bound-parameter limit)
+BATCH_SIZE = 500
+
+_DIALECT_INSERTS = {"sqlite": sqlite.insert, "postgresql": postgresql.insert}
+
+
+def upsert_rows(
+    db: Session,
+    model,
+    rows: Sequence[Dict],
+    index_elements: Sequence[str],
+    update_columns: Iterable[str] = ()
+) -> None:
+    """
+    INSERT rows, updating update_columns (or skipping) where index_elements conflict
+
+    Rows repeating a key already in the batch are dropped, since one
+    statement can't insert and update the same row.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect not in _DIALECT_INSERTS:
+        raise ValueError(f"Bulk upsert is not supported on {dialect}")
+    insert = _DIALECT_INSERTS[dialect]
+
+    unique_rows = list({tuple(row[name] for name in index_elements): row for row in reversed(rows)}.values())
+    unique_rows.reverse()
+    update_columns = list(update_columns)
+
+    for start in range(0, len(unique_rows), BATCH_SIZE):
+        stmt = insert(model.__table__).values(unique_rows[start:start + BATCH_SIZE])
+        if update_columns:
+            changes = {name: stmt.excluded[name] for name in update_columns}
+            if "updated_at" in model.__table__.c:
+                # onupdate defaults don't apply to ON CONFLICT DO UPDATE
+                changes["updated_at"] = datetime.utcnow()
+            stmt = stmt.on_conflict_do_update(index_elements=list(index_elements), set_=changes)
+        else:
+            stmt = stmt.on_conflict_do_nothing(index_elements=list(index_elements))
+        db.execute(stmt)
+
+
+def upsert_courses(
+    db: Session,
+    user_id: int,
+    courses: List[Dict],
+    update_columns: Iterable[str] = ("name", "code")
+) -> Tuple[Dict[str, int], int]:
+    """
+    Insert or update a user's courses by Canvas id
+
+    Each course dict has canvas_id plus column values for new rows. Courses
+    created before they had a canvas_id are linked by name instead of being
+    duplicated.
+
+    Returns ({canvas_id: course id}, number of new courses).
+    """
+    if not courses:
+        return {}, 0
+    for course in courses:
+        course["canvas_id"] = str(course["canvas_id"])
+
+    existing = db.query(Course.id, Course.canvas_id, Course.name).filter(Course.user_id == user_id).all()
+    known = {row.canvas_id for row in existing if row.canvas_id}
+    unlinked = {row.name: row.id for row in existing if not row.canvas_id}
+
+    links = []
+    for course in courses:
+        if course["canvas_id"] not in known and course.get("name") in unlinked:
+            links.append({"id": unlinked.pop(course["name"]), "canvas_id": course["canvas_id"]})
+            known.add(course["canvas_id"])
+    if links:
+        db.execute(update(Course), links)
+
+    new_courses = len({course["canvas_id"] for course in courses} - known)
+    dashboard_cache.mark_dirty(db, [user_id])
+    upsert_rows(
+        db, Course,
+        [{**course, "user_id": user_id} for course in courses],
+        ["canvas_id", "user_id"],
+        update_columns
+    )
+
+    course_ids = dict(
+        db.query(Course.canvas_id, Course.id).filter(
+            Course.user_id == user_id,
+            Course.canvas_id.in_([course["canvas_id"] for course in courses])
+        ).all()
+    )
+    return course_ids, new_courses
+
+
+def upsert_modules(
+    db: Session,
+    modules_by_course: Dict[int, List[Dict]],
+    update_columns: Iterable[str] = ("position", "items")
+) -> int:
+    """
+    Insert or update modules (name, items) by course and name, positions in list order
+
+    Returns the number of new modules.
+    """
+    course_ids = [course_id for course_id, modules in modules_by_course.items() if modules]
+    if not course_ids:
+        return 0
+
+    existing = set(
+        db.query(Module.course_id, Module.name).filter(Module.course_id.in_(course_ids)).all()
+    )
+    rows = [
+        {
+            "course_id": course_id,
+            "name": module.get("name") or "Unnamed Module",
+            "position": position,
+            "items": module.get("items", [])
+        }
+        for course_id in course_ids
+        for position, module in enumerate(modules_by_course[course_id])
+    ]
+    new_modules = len({(row["course_id"], row["name"]) for row in rows} - existing)
+    upsert_rows(db, Module, rows, ["course_id", "name"], update_columns)
+    return new_modules
+
+
+def upsert_assignments(
+    db: Session,
+    user_id: int,
+    assignments: List[Dict],
+    update_columns: Iterable[str] = ("due_date",)
+) -> int:
+    """
+    Insert or update a user's assignments by course and title
+
+    Each dict has course_id, title, course (code), due_date and optional
+    type/description/points; new rows start pending with medium priority.
+
+    Returns the number of new assignments.
+    """
+    if not assignments:
+        return 0
+
+    course_ids = {assignment["course_id"] for assignment in assignments}
+    existing = set(
+        db.query(Assignment.course_id, Assignment.title).filter(
+            Assignment.user_id == user_id,
+            Assignment.course_id.in_(course_ids)
+        ).all()
+    )
+    rows = [
+        {
+            "type": "Assignment",
+            "priority": "medium",
+            "status": "pending",
+            "submitted": False,
+            "description": None,
+            "points": None,
+            **assignment,
+            "user_id": user_id
+        }
+        for assignment in assignments
+    ]
+    new_assignments = len({(row["course_id"], row["title"]) for row in rows} - existing)
+    dashboard_cache.mark_dirty(db, [user_id])
+    upsert_rows(db, Assignment, rows, ["user_id", "course_id", "title"], update_columns)
+    return new_assignments
@@ -3,13 +3,28 @@ Canvas LMS API Client
 Handles authentication and data fetching from Canvas LMS
 """
 import httpx
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+from typing import List, Dict, Any, Optional, Tuple
+from datetime import datetime, timezone
 import logging
+from app.core.config import settings
+from app.services.canvas_pagination import paginate_async, parse_link_header
 
 logger = logging.getLogger(__name__)
 
 
+def parse_canvas_datetime(value: Optional[str]) -> Optional[datetime]:
+    """Parse a Canvas ISO 8601 timestamp to naive UTC, or None"""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
 class CanvasClient:
     """Client for interacting with Canvas LMS API"""
     
@@ -27,7 +42,14 @@ class CanvasClient:
             "Authorization": f"Bearer {access_token}",
             "Content-Type": "application/json"
         }
-        self.client = httpx.AsyncClient(headers=self.headers, timeout=30.0)
+        # Concurrent course syncs and page fetches share one capped pool;
+        # requests beyond the cap wait for a connection rather than time out
+        self.client = httpx.AsyncClient(
+            headers=self.headers,
+            timeout=httpx.Timeout(30.0, pool=None),
+            limits=httpx.Limits(max_connections=settings.CANVAS_MAX_CONNECTIONS_PER_HOST)
+        )
+        self.page_concurrency = settings.CANVAS_MAX_CONNECTIONS_PER_HOST
     
     async def close(self):
         """Close the HTTP client"""
@@ -44,45 +66,60 @@ class CanvasClient:
             logger.error(f"Canvas API error: {e}")
             raise
     
+    async def _fetch_page(self, url: str, params: Optional[Dict] = None) -> Tuple[List[Any], str]:
+        """Fetch one page of a list endpoint as (items, Link header)"""
+        response = await self.client.get(url, params=params)
+        response.raise_for_status()
+        return response.json(), response.headers.get('Link', '')
+    
     async def _get_paginated(self, endpoint: str, params: Optional[Dict] = None) -> List[Any]:
-        """Get all pages from a paginated Canvas API endpoint"""
-        all_items = []
+        """
+        Get all pages from a paginated Canvas API endpoint
+        
+        Remaining pages are fetched concurrently when Canvas reports the last
+        page (see canvas_pagination). Raises on any failed page rather than
+        returning a partial list.
+        """
         url = f"{self.api_base}/{endpoint}"
         
         if params is None:
             params = {}
         params['per_page'] = 100  # Max items per page
         
-        while url:
-            try:
-                response = await self.client.get(url, params=params)
-                response.raise_for_status()
-                
-                items = response.json()
-                all_items.extend(items)
-                
-                # Check for next page
-                link_header = response.headers.get('Link', '')
-                url = self._parse_next_link(link_header)
-                params = None  # Don't send params again (they're in the URL)
-                
-            except httpx.HTTPError as e:
-                logger.error(f"Canvas API pagination error: {e}")
-                break
-        
-        return all_items
+        try:
+            return await paginate_async(self._fetch_page, url, params, max_concurrency=self.page_concurrency)
+        except httpx.HTTPError as e:
+            logger.error(f"Canvas API pagination error: {e}")
+            raise
     
-    def _parse_next_link(self, link_header: str) -> Optional[str]:
-        """Parse the 'next' URL from Link header"""
-        if not link_header:
-            return None
+    async def _get_paginated_if_changed(
+        self,
+        endpoint: str,
+        params: Optional[Dict] = None,
+        etag: Optional[str] = None
+    ) -> Tuple[Optional[List[Any]], Optional[str]]:
+        """
+        Get all pages unless the first page is unchanged since etag
         
-        links = link_header.split(',')
-        for link in links:
-            if 'rel="next"' in link:
-                url = link.split(';')[0].strip('<> ')
-                return url
-        return None
+        Returns (None, etag) when Canvas answers 304 Not Modified, otherwise
+        (items, ETag of the first page).
+        """
+        url = f"{self.api_base}/{endpoint}"
+        params = {**(params or {}), 'per_page': 100}
+        
+        try:
+            response = await self.client.get(url, params=params, headers={"If-None-Match": etag} if etag else None)
+            if response.status_code == 304:
+                return None, etag
+            response.raise_for_status()
+            first_page = (response.json(), response.headers.get('Link', ''))
+            items = await paginate_async(
+                self._fetch_page, url, params, max_concurrency=self.page_concurrency, first_page=first_page
+            )
+            return items, response.headers.get('ETag')
+        except httpx.HTTPError as e:
+            logger.error(f"Canvas API pagination error: {e}")
+            raise
     
     # ===== User Info =====
     
@@ -116,6 +153,13 @@ class CanvasClient:
         params = {"include": ["submission", "score_statistics"]}
         return await self._get_paginated(f"courses/{course_id}/assignments", params)
     
+    async def get_assignments_if_changed(
+        self, course_id: str, etag: Optional[str] = None
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """Get all assignments unless unchanged since etag (then (None, etag))"""
+        params = {"include": ["submission", "score_statistics"]}
+        return await self._get_paginated_if_changed(f"courses/{course_id}/assignments", params, etag)
+    
     async def get_assignment(self, course_id: str, assignment_id: str) -> Dict[str, Any]:
         """Get detailed information about a specific assignment"""
         return await self._get(f"courses/{course_id}/assignments/{assignment_id}")
@@ -131,6 +175,13 @@ class CanvasClient:
         params = {"include": ["items", "content_details"]}
         return await self._get_paginated(f"courses/{course_id}/modules", params)
     
+    async def get_modules_if_changed(
+        self, course_id: str, etag: Optional[str] = None
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """Get all modules with their items unless unchanged since etag (then (None, etag))"""
+        params = {"include": ["items", "content_details"]}
+        return await self._get_paginated_if_changed(f"courses/{course_id}/modules", params, etag)
+    
     async def get_module_items(self, course_id: str, module_id: str) -> List[Dict[str, Any]]:
         """Get all items in a module"""
         params = {"include": ["content_details"]}
@@ -145,6 +196,49 @@ class CanvasClient:
         """Get all files for a course"""
         return await self._get_paginated(f"courses/{course_id}/files")
     
+    async def get_course_files_since(
+        self,
+        course_id: str,
+        since: Optional[datetime] = None,
+        etag: Optional[str] = None
+    ) -> Tuple[Optional[List[Dict[str, Any]]], Optional[str]]:
+        """
+        Get files updated after since, newest first (all files when since is None)
+        
+        Pages are read one at a time and reading stops at the first file not
+        newer than since, so an incremental sync only downloads the pages that
+        changed. Returns (None, etag) when the listing is not modified.
+        """
+        endpoint = f"courses/{course_id}/files"
+        params = {"sort": "updated_at", "order": "desc"}
+        if since is None:
+            return await self._get_paginated_if_changed(endpoint, params, etag)
+        
+        url = f"{self.api_base}/{endpoint}"
+        params['per_page'] = 100
+        try:
+            response = await self.client.get(url, params=params, headers={"If-None-Match": etag} if etag else None)
+            if response.status_code == 304:
+                return None, etag
+            response.raise_for_status()
+            new_etag = response.headers.get('ETag')
+            
+            files = []
+            while True:
+                for api_file in response.json():
+                    updated_at = parse_canvas_datetime(api_file.get('updated_at'))
+                    if updated_at is not None and updated_at <= since:
+                        return files, new_etag
+                    files.append(api_file)
+                next_url = parse_link_header(response.headers.get('Link', '')).get('next')
+                if not next_url:
+                    return files, new_etag
+                response = await self.client.get(next_url)
+                response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error(f"Canvas API files error: {e}")
+            raise
+    
     async def get_file(self, file_id: str) -> Dict[str, Any]:
         """Get information about a specific file"""
         return await self._get(f"files/{file_id}")
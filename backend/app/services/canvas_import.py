@@ -0,0 +1,178 @@
+"""
+Canvas Course Import
+Scrapes a user's active Canvas courses (with modules and assignments) into
+the database. Runs as background jobs queued by signup, session updates and
+/canvas/scrape-courses; each successful import queues chunk indexing and
+flashcard/quiz pre-generation for the imported modules.
+"""
+
+import asyncio
+from datetime import datetime as dt
+from typing import Dict, List, Optional
+from dateutil import parser as date_parser
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.encryption import decrypt_data, encrypt_data
+from app.db.database import SessionLocal
+from app.models.user import User
+from app.services import bulk_upsert, job_queue
+from app.services.canvas_scraper import CanvasScraper
+
+COURSE_COLORS = ["#3B82F6", "#10B981", "#F59E0B", "#EF4444", "#8B5CF6", "#EC4899",
+                 "#06B6D4", "#F97316", "#84CC16", "#A855F7"]
+
+
+def course_code(name: str) -> str:
+    """Course code from a Canvas course name like 'COP4600.001 Operating Systems'"""
+    return name.split('.')[0] if '.' in name else name.split()[0]
+
+
+def parse_due_date(due_date_str: str) -> dt:
+    due_date = dt.utcnow()  # Default to now
+    if due_date_str:
+        try:
+            due_date = date_parser.parse(due_date_str)
+        except Exception:
+            pass
+    return due_date
+
+
+def _course_rows(courses_data: List[Dict]) -> List[Dict]:
+    """Course rows for bulk_upsert.upsert_courses from scraped course data"""
+    return [
+        {
+            "canvas_id": course_data['id'],
+            "code": course_code(course_data['name']),
+            "name": course_data['name'],
+            "instructor": "TBD",
+            "term": "Current Semester",
+            "progress": 0.0,
+            "color": COURSE_COLORS[idx % len(COURSE_COLORS)],
+            "is_active": 1
+        }
+        for idx, course_data in enumerate(courses_data)
+    ]
+
+
+def _import(user_id: int, courses_data: List[Dict], with_assignments: bool) -> Dict[str, int]:
+    """Write scraped courses, modules and (optionally) assignments in bulk"""
+    db = SessionLocal()
+    try:
+        course_ids, courses_new = bulk_upsert.upsert_courses(db, user_id, _course_rows(courses_data))
+        modules_new = bulk_upsert.upsert_modules(db, {
+            course_ids[str(course_data['id'])]: course_data.get('modules', [])
+            for course_data in courses_data
+        })
+
+        assignments_new = 0
+        if with_assignments:
+            assignments_new = bulk_upsert.upsert_assignments(db, user_id, [
+                {
+                    "course_id": course_ids[str(course_data['id'])],
+                    "title": assign_data.get('name') or 'Unnamed Assignment',
+                    "course": course_code(course_data['name']),
+                    "due_date": parse_due_date(assign_data.get('due_date', ''))
+                }
+                for course_data in courses_data
+                for assign_data in course_data.get('assignments', [])
+            ])
+
+        db.commit()
+        return {"courses": courses_new, "modules": modules_new, "assignments": assignments_new}
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+def import_user_courses(user_id: int, canvas_url: str, session_cookie: str) -> Dict:
+    """
+    Import or update a user's courses, modules and assignments
+
+    Existing courses are matched by canvas_id (or by name for courses created
+    before they had one). Existing modules get fresh positions and items and
+    existing assignments fresh due dates; per-user assignment state is kept.
+    """
+    scraper = CanvasScraper(base_url=canvas_url, session_cookie=session_cookie)
+    counts = _import(user_id, scraper.scrape_all_active_courses(), with_assignments=True)
+    return {
+        "courses_synced": counts["courses"],
+        "modules_synced": counts["modules"],
+        "assignments_synced": counts["assignments"]
+    }
+
+
+def scrape_courses(user_id: int, canvas_url: str, session_cookie: str) -> Dict:
+    """Import courses and modules (no assignments) for /canvas/scrape-courses"""
+    scraper = CanvasScraper(base_url=canvas_url, session_cookie=session_cookie)
+    counts = _import(user_id, scraper.scrape_all_active_courses(), with_assignments=False)
+    return {
+        "courses_imported": counts["courses"],
+        "modules_imported": counts["modules"],
+        "message": f"Successfully imported {counts['courses']} courses and {counts['modules']} modules"
+    }
+
+
+def canvas_credentials(payload: Dict) -> tuple:
+    """(canvas_url, session_cookie) from a job payload, falling back to the user's stored session"""
+    canvas_url = payload.get("canvas_url")
+    session_cookie = decrypt_data(payload["session_cookie"]) if payload.get("session_cookie") else None
+    if canvas_url and session_cookie:
+        return canvas_url, session_cookie
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == payload["user_id"]).first()
+        if not user:
+            raise ValueError("User not found")
+        canvas_url = canvas_url or user.canvas_instance_url or settings.CANVAS_INSTANCE_URL
+        if not session_cookie and user.canvas_session_cookie:
+            session_cookie = decrypt_data(user.canvas_session_cookie)
+    finally:
+        db.close()
+
+    if not session_cookie:
+        raise ValueError("No Canvas session cookie available")
+    return canvas_url, session_cookie
+
+
+def import_payload(user_id: int, canvas_url: Optional[str] = None, session_cookie: Optional[str] = None) -> Dict:
+    """Job payload for an import; an explicit session cookie is stored encrypted"""
+    return {
+        "user_id": user_id,
+        "canvas_url": canvas_url,
+        "session_cookie": encrypt_data(session_cookie) if session_cookie else None
+    }
+
+
+def queue_post_import_jobs(db: Session, payload: Dict) -> Dict[str, str]:
+    """Queue chunk indexing and flashcard/quiz pre-generation after an import"""
+    return {
+        kind: job_queue.enqueue(db, kind, payload, user_id=payload["user_id"]).id
+        for kind in ("index_courses", "pregenerate_modules")
+    }
+
+
+async def _run_import(payload: Dict, importer) -> Dict:
+    canvas_url, session_cookie = await asyncio.to_thread(canvas_credentials, payload)
+    result = await asyncio.to_thread(importer, payload["user_id"], canvas_url, session_cookie)
+
+    db = SessionLocal()
+    try:
+        result["follow_up_jobs"] = queue_post_import_jobs(db, payload)
+    finally:
+        db.close()
+    return result
+
+
+@job_queue.handler("import_courses")
+async def run_import_courses(payload: Dict) -> Dict:
+    """Signup and session-update import: courses, modules and assignments"""
+    return await _run_import(payload, import_user_courses)
+
+
+@job_queue.handler("scrape_courses")
+async def run_scrape_courses(payload: Dict) -> Dict:
+    """/canvas/scrape-courses import: courses and modules"""
+    return await _run_import(payload, scrape_courses)
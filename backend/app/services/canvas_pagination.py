@@ -0,0 +1,172 @@
+"""
+Canvas Pagination
+Shared paginator for CanvasScraper (requests, worker threads) and
+CanvasClient (httpx, asyncio). Canvas paginates list endpoints through the
+Link header:
+
+- If a page has rel="last" with a page number, the remaining pages are
+  known up front and fetched concurrently.
+- If there is only a numbered rel="next", the next few pages are requested
+  ahead (a window of max_concurrency); pages past the end come back empty
+  and are discarded.
+- Bookmark-style next links (page=bookmark:...) can only be followed one
+  at a time.
+
+A fetcher takes (url, params) and returns (items, link_header), raising on
+errors. Items are returned in page order.
+"""
+
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlparse, urlunparse
+
+Page = Tuple[List[Any], str]
+PageFetcher = Callable[[str, Optional[Dict]], Page]
+AsyncPageFetcher = Callable[[str, Optional[Dict]], Awaitable[Page]]
+
+
+def parse_link_header(link_header: str) -> Dict[str, str]:
+    """Map each rel in a Link header to its URL"""
+    links = {}
+    for part in (link_header or "").split(","):
+        sections = part.split(";")
+        url = sections[0].strip().strip("<>")
+        for section in sections[1:]:
+            name, _, value = section.strip().partition("=")
+            if name == "rel" and url:
+                links[value.strip('"')] = url
+    return links
+
+
+def _page_number(url: Optional[str]) -> Optional[int]:
+    """The numeric page parameter of a URL, or None for bookmarks / no page"""
+    if not url:
+        return None
+    for name, value in parse_qsl(urlparse(url).query):
+        if name == "page":
+            return int(value) if value.isdigit() else None
+    return None
+
+
+def _page_url(url: str, page: int) -> str:
+    """url with its page parameter set to page (other parameters kept as-is)"""
+    parsed = urlparse(url)
+    query = [(name, str(page) if name == "page" else value) for name, value in parse_qsl(parsed.query)]
+    return urlunparse(parsed._replace(query=urlencode(query)))
+
+
+def _plan(link_header: str) -> Tuple[Optional[str], Optional[int], Optional[int]]:
+    """(next url, next page number, last page number) for the pages after this one"""
+    links = parse_link_header(link_header)
+    next_url = links.get("next")
+    return next_url, _page_number(next_url), _page_number(links.get("last"))
+
+
+def paginate(
+    fetch: PageFetcher,
+    url: str,
+    params: Optional[Dict] = None,
+    max_concurrency: int = 4,
+    first_page: Optional[Page] = None
+) -> List[Any]:
+    """
+    All items from a paginated endpoint, fetching pages on worker threads
+
+    Args:
+        first_page: (items, link_header) when the caller already fetched
+            page one itself (e.g. to check for an expired session)
+    """
+    items, link_header = first_page if first_page is not None else fetch(url, params)
+    results = list(items)
+    next_url, next_page, last_page = _plan(link_header)
+    if not next_url:
+        return results
+
+    if next_page is None or max_concurrency <= 1:
+        while next_url:
+            items, link_header = fetch(next_url, None)
+            results.extend(items)
+            next_url = parse_link_header(link_header).get("next")
+        return results
+
+    if last_page is not None:
+        urls = [_page_url(next_url, page) for page in range(next_page, last_page + 1)]
+        if not urls:
+            return results
+        with ThreadPoolExecutor(max_workers=min(max_concurrency, len(urls))) as pool:
+            for items, _ in pool.map(lambda page_url: fetch(page_url, None), urls):
+                results.extend(items)
+        return results
+
+    # Numbered next links without a last: keep a window of pages in flight
+    with ThreadPoolExecutor(max_workers=max_concurrency) as pool:
+        pending = deque(
+            pool.submit(fetch, _page_url(next_url, page), None)
+            for page in range(next_page, next_page + max_concurrency)
+        )
+        upcoming = next_page + max_concurrency
+        while pending:
+            items, link_header = pending.popleft().result()
+            results.extend(items)
+            if "next" not in parse_link_header(link_header):
+                for future in pending:
+                    future.cancel()
+                break
+            pending.append(pool.submit(fetch, _page_url(next_url, upcoming), None))
+            upcoming += 1
+    return results
+
+
+async def paginate_async(
+    fetch: AsyncPageFetcher,
+    url: str,
+    params: Optional[Dict] = None,
+    max_concurrency: int = 4,
+    first_page: Optional[Page] = None
+) -> List[Any]:
+    """All items from a paginated endpoint, fetching pages concurrently on the event loop"""
+    items, link_header = first_page if first_page is not None else await fetch(url, params)
+    results = list(items)
+    next_url, next_page, last_page = _plan(link_header)
+    if not next_url:
+        return results
+
+    if next_page is None or max_concurrency <= 1:
+        while next_url:
+            items, link_header = await fetch(next_url, None)
+            results.extend(items)
+            next_url = parse_link_header(link_header).get("next")
+        return results
+
+    if last_page is not None:
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def fetch_page(page: int) -> Page:
+            async with semaphore:
+                return await fetch(_page_url(next_url, page), None)
+
+        for items, _ in await asyncio.gather(*(fetch_page(page) for page in range(next_page, last_page + 1))):
+            results.extend(items)
+        return results
+
+    # Numbered next links without a last: keep a window of pages in flight
+    pending = deque(
+        asyncio.ensure_future(fetch(_page_url(next_url, page), None))
+        for page in range(next_page, next_page + max_concurrency)
+    )
+    upcoming = next_page + max_concurrency
+    try:
+        while pending:
+            items, link_header = await pending.popleft()
+            results.extend(items)
+            if "next" not in parse_link_header(link_header):
+                break
+            pending.append(asyncio.ensure_future(fetch(_page_url(next_url, upcoming), None)))
+            upcoming += 1
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    return results
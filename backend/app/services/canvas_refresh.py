@@ -0,0 +1,235 @@
+"""
+Canvas Refresh Scheduler
+Keeps each active user's courses, modules and assignments fresh in the
+background, so login never waits on Canvas and the dashboard isn't only as
+fresh as the last login.
+
+A scheduler task (started from the app lifespan) wakes every
+CANVAS_REFRESH_TICK_SECONDS and queues a "refresh_canvas" job for each
+user whose next_refresh_at has passed. Only users who logged in within
+CANVAS_REFRESH_ACTIVE_DAYS and whose session cookie isn't known to be
+expired are considered. Each refresh schedules the next one
+CANVAS_REFRESH_INTERVAL_MINUTES later, randomly stretched or shrunk by
+CANVAS_REFRESH_JITTER so users spread out instead of refreshing in bursts;
+failures back off exponentially.
+
+Load on Canvas is bounded globally: JOB_KIND_CONCURRENCY caps how many
+refreshes run at once, and every scraper shares the per-host request cap
+(CANVAS_MAX_CONNECTIONS_PER_HOST).
+"""
+
+import asyncio
+import random
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import SessionLocal, use_writer
+from app.models.canvas_refresh_state import CanvasRefreshState
+from app.models.job import Job
+from app.models.user import User
+from app.services import canvas_import, job_queue
+
+REFRESH_KIND = "refresh_canvas"
+
+_scheduler: Optional[asyncio.Task] = None
+
+
+def is_session_error(error: Exception) -> bool:
+    """Whether a scraper error means Canvas rejected the session cookie"""
+    message = str(error)
+    return (
+        message.startswith("401") or message.startswith("400")
+        or "session expired" in message.lower()
+    )
+
+
+def next_refresh_time(now: datetime, failures: int = 0) -> datetime:
+    """When to refresh next: the jittered interval, doubled per consecutive failure"""
+    minutes = settings.CANVAS_REFRESH_INTERVAL_MINUTES * (2 ** failures)
+    minutes = min(minutes, max(settings.CANVAS_REFRESH_MAX_BACKOFF_MINUTES, settings.CANVAS_REFRESH_INTERVAL_MINUTES))
+    jitter = settings.CANVAS_REFRESH_JITTER
+    return now + timedelta(minutes=minutes * random.uniform(1 - jitter, 1 + jitter))
+
+
+def _get_state(db: Session, user_id: int) -> CanvasRefreshState:
+    use_writer(db)  # The caller updates the row
+    state = db.query(CanvasRefreshState).filter(CanvasRefreshState.user_id == user_id).first()
+    if state is None:
+        state = CanvasRefreshState(user_id=user_id, consecutive_failures=0)
+        db.add(state)
+    return state
+
+
+def _refresh_pending(db: Session, user_ids) -> set:
+    """Users with a refresh already queued or running"""
+    if not user_ids:
+        return set()
+    return {
+        user_id for (user_id,) in db.query(Job.user_id).filter(
+            Job.kind == REFRESH_KIND,
+            Job.status.in_(["queued", "running"]),
+            Job.user_id.in_(list(user_ids))
+        ).all()
+    }
+
+
+def record_login(db: Session, user: User) -> bool:
+    """
+    Mark a user active and queue a refresh if their data is stale (no Canvas I/O)
+
+    Returns whether the stored session cookie is usable, i.e. the user has
+    one and Canvas hasn't rejected it since it was saved.
+    """
+    now = datetime.utcnow()
+    state = _get_state(db, user.id)
+    state.last_login_at = now
+    session_valid = bool(user.canvas_session_cookie) and state.session_expired_at is None
+
+    stale = (
+        state.last_refreshed_at is None
+        or now - state.last_refreshed_at > timedelta(minutes=settings.CANVAS_REFRESH_INTERVAL_MINUTES)
+    )
+    if session_valid and stale and settings.CANVAS_REFRESH_ENABLED and not _refresh_pending(db, [user.id]):
+        # Refresh now instead of waiting for the next scheduler tick
+        state.next_refresh_at = next_refresh_time(now)
+        job_queue.enqueue(db, REFRESH_KIND, {"user_id": user.id}, user_id=user.id)  # Commits the state too
+    db.commit()
+    return session_valid
+
+
+def session_updated(db: Session, user_id: int) -> None:
+    """
+    A new session cookie was saved and an import queued: clear the expired
+    flag and count the user as refreshed from now
+    """
+    now = datetime.utcnow()
+    state = _get_state(db, user_id)
+    state.last_login_at = state.last_login_at or now
+    state.session_expired_at = None
+    state.consecutive_failures = 0
+    state.next_refresh_at = next_refresh_time(now)
+    db.commit()
+
+
+def schedule_due_refreshes(db: Session, now: Optional[datetime] = None) -> int:
+    """Queue refresh jobs for active users whose next refresh is due; returns how many"""
+    now = now or datetime.utcnow()
+    active_since = now - timedelta(days=settings.CANVAS_REFRESH_ACTIVE_DAYS)
+    due = (
+        db.query(CanvasRefreshState)
+        .join(User, User.id == CanvasRefreshState.user_id)
+        .filter(
+            User.canvas_session_cookie.isnot(None),
+            User.canvas_session_cookie != "",
+            CanvasRefreshState.session_expired_at.is_(None),
+            CanvasRefreshState.last_login_at >= active_since,
+            or_(CanvasRefreshState.next_refresh_at.is_(None), CanvasRefreshState.next_refresh_at <= now)
+        )
+        .order_by(CanvasRefreshState.next_refresh_at)
+        .limit(settings.CANVAS_REFRESH_MAX_USERS_PER_TICK)
+        .all()
+    )
+    pending = _refresh_pending(db, [state.user_id for state in due])
+
+    queued = 0
+    for state in due:
+        # Pushed out now, so the next tick doesn't queue the same user again
+        state.next_refresh_at = next_refresh_time(now, state.consecutive_failures or 0)
+        if state.user_id in pending:
+            continue
+        job_queue.enqueue(db, REFRESH_KIND, {"user_id": state.user_id}, user_id=state.user_id)
+        queued += 1
+    db.commit()
+
+    if queued:
+        metrics.increment(f"jobs.{REFRESH_KIND}.scheduled", queued)
+        print(f"Canvas refresh: queued {queued} of {len(due)} due users")
+    return queued
+
+
+def _record_outcome(user_id: int, error: Optional[Exception]) -> None:
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        state = _get_state(db, user_id)
+        if error is None:
+            state.last_refreshed_at = now
+            state.last_status = "succeeded"
+            state.last_error = None
+            state.consecutive_failures = 0
+            state.next_refresh_at = next_refresh_time(now)
+            db.query(User).filter(User.id == user_id).update({User.last_sync: now}, synchronize_session=False)
+        elif is_session_error(error):
+            # Skipped by the scheduler until the user saves a new cookie
+            state.last_status = "session_expired"
+            state.last_error = str(error)[:1000]
+            state.session_expired_at = now
+        else:
+            state.last_status = "failed"
+            state.last_error = str(error)[:1000]
+            state.consecutive_failures = (state.consecutive_failures or 0) + 1
+            state.next_refresh_at = next_refresh_time(now, state.consecutive_failures)
+        db.commit()
+    finally:
+        db.close()
+
+
+@job_queue.handler(REFRESH_KIND)
+async def run_refresh_canvas(payload: Dict) -> Dict:
+    """Scheduled refresh: re-import courses, modules and assignments"""
+    user_id = payload["user_id"]
+    try:
+        canvas_url, session_cookie = await asyncio.to_thread(canvas_import.canvas_credentials, payload)
+        result = await asyncio.to_thread(canvas_import.import_user_courses, user_id, canvas_url, session_cookie)
+    except Exception as e:
+        await asyncio.to_thread(_record_outcome, user_id, e)
+        raise
+    await asyncio.to_thread(_record_outcome, user_id, None)
+
+    # Only new courses or modules need indexing and pre-generation
+    if result["courses_synced"] or result["modules_synced"]:
+        db = SessionLocal()
+        try:
+            result["follow_up_jobs"] = canvas_import.queue_post_import_jobs(db, payload)
+        finally:
+            db.close()
+    return result
+
+
+def _tick() -> None:
+    db = SessionLocal()
+    try:
+        schedule_due_refreshes(db)
+    except Exception as e:
+        print(f"Warning: Canvas refresh scheduling failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+async def _run_scheduler() -> None:
+    while True:
+        await asyncio.to_thread(_tick)
+        await asyncio.sleep(settings.CANVAS_REFRESH_TICK_SECONDS)
+
+
+def start_scheduler() -> None:
+    """Start the refresh scheduler (called from the app lifespan)"""
+    global _scheduler
+    if _scheduler is not None or not settings.CANVAS_REFRESH_ENABLED:
+        return
+    _scheduler = asyncio.create_task(_run_scheduler())
+    print(f"Started Canvas refresh scheduler (every {settings.CANVAS_REFRESH_INTERVAL_MINUTES} min per user)")
+
+
+async def stop_scheduler() -> None:
+    """Cancel the scheduler task"""
+    global _scheduler
+    if _scheduler is None:
+        return
+    _scheduler.cancel()
+    await asyncio.gather(_scheduler, return_exceptions=True)
+    _scheduler = None
@@ -1,13 +1,85 @@
 """
 Canvas Course Scraper Service
 Scrapes course structure and modules from Canvas using session cookie
+
+Requests go through CanvasScraper._get, which caps in-flight requests per
+Canvas host (shared by every scraper in the process) and backs off when
+Canvas throttles. scrape_all_active_courses fans out across courses, and
+across the assignment and module fetches within a course, on a thread pool.
 """
 
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin, urlparse
-import re
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.services.canvas_pagination import paginate
+
+# In-flight request limits per (host, limit), shared by all scrapers in the process
+_host_limits: Dict[Tuple[str, int], threading.BoundedSemaphore] = {}
+_host_limits_lock = threading.Lock()
+
+
+def _host_limit(url: str) -> threading.BoundedSemaphore:
+    key = (urlparse(url).netloc, settings.CANVAS_MAX_CONNECTIONS_PER_HOST)
+    with _host_limits_lock:
+        if key not in _host_limits:
+            _host_limits[key] = threading.BoundedSemaphore(max(1, key[1]))
+        return _host_limits[key]
+
+
+def _is_throttled(resp: requests.Response) -> bool:
+    """Canvas signals throttling with 429, or 403 'Rate Limit Exceeded'"""
+    if resp.status_code == 429:
+        return True
+    return resp.status_code == 403 and 'rate limit exceeded' in resp.text[:500].lower()
+
+
+def _retry_delay(resp: requests.Response, attempt: int) -> float:
+    """Seconds to wait before retrying: Retry-After if given, else jittered exponential backoff"""
+    retry_after = resp.headers.get('Retry-After', '').strip()
+    delay = None
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+            except (TypeError, ValueError):
+                delay = None
+    if delay is None:
+        delay = 0.5 * (2 ** attempt) + random.uniform(0, 0.25)
+    return min(max(delay, 0.0), settings.CANVAS_MAX_RETRY_DELAY_SECONDS)
+
+
+def parse_api_file(base_url: str, course_id: str, api_file: Dict) -> Optional[Dict]:
+    """Convert a Files API object to the file dictionary used by the files index"""
+    # Get file URL - Canvas API provides different URL formats
+    file_id = api_file.get('id')
+    file_url = api_file.get('url', '')
+    if not file_url and file_id:
+        # Construct download URL from file ID
+        file_url = urljoin(base_url, f"/courses/{course_id}/files/{file_id}/download")
+    
+    if not file_url:
+        return None
+    
+    return {
+        'id': str(file_id) if file_id else None,
+        'name': api_file.get('display_name', api_file.get('filename', 'Unknown')),
+        'url': file_url,
+        'size': api_file.get('size', 0),
+        'content_type': api_file.get('content-type', api_file.get('content_type', 'application/octet-stream')),
+        'updated_at': api_file.get('updated_at', '')
+    }
 
 
 class CanvasScraper:
@@ -48,6 +120,36 @@ class CanvasScraper:
             "Referer": self.base_url
         })
         # Note: Removed Accept-Encoding: gzip, deflate, br as it might cause issues with response decoding
+        
+        # Enough pooled connections for the per-host cap, so parallel fetches reuse them
+        adapter = HTTPAdapter(pool_maxsize=max(10, settings.CANVAS_MAX_CONNECTIONS_PER_HOST))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+    
+    def _get(self, url: str, **kwargs) -> requests.Response:
+        """GET within the per-host request cap, retrying when Canvas throttles"""
+        limit = _host_limit(url)
+        for attempt in range(settings.CANVAS_MAX_RETRIES + 1):
+            with limit:
+                resp = self.session.get(url, **kwargs)
+            if not _is_throttled(resp) or attempt == settings.CANVAS_MAX_RETRIES:
+                return resp
+            # Sleep outside the cap so other requests can proceed
+            delay = _retry_delay(resp, attempt)
+            print(f"Canvas throttled {urlparse(url).path} ({resp.status_code}), retrying in {delay:.1f}s")
+            time.sleep(delay)
+        return resp
+    
+    def _json_page(self, url: str, params: Optional[Dict] = None) -> Tuple[List, str]:
+        """Fetch one page of an API list endpoint as (items, Link header)"""
+        resp = self._get(url, params=params)
+        resp.raise_for_status()
+        return resp.json(), resp.headers.get('Link', '')
+    
+    def _paginate(self, url: str, params: Optional[Dict] = None, first_page: Optional[Tuple[List, str]] = None) -> List:
+        """All items from an API list endpoint, fetching remaining pages in parallel"""
+        return paginate(self._json_page, url, params,
+                        max_concurrency=settings.CANVAS_MAX_CONNECTIONS_PER_HOST, first_page=first_page)
     
     def get_all_courses(self) -> Dict[str, str]:
         """Get all available courses"""
@@ -57,7 +159,7 @@ class CanvasScraper:
         try:
             api_url = urljoin(self.base_url, "/api/v1/courses")
             # Try with simpler params first
-            api_resp = self.session.get(api_url, params={'per_page': 100}, allow_redirects=False)
+            api_resp = self._get(api_url, params={'per_page': 100}, allow_redirects=False)
             
             print(f"Canvas API response status: {api_resp.status_code}")
             print(f"Canvas API response Content-Type: {api_resp.headers.get('Content-Type', 'unknown')}")
@@ -82,7 +184,10 @@ class CanvasScraper:
                         pass
                     else:
                         api_courses = api_resp.json()
-                        # Successfully parsed JSON - session is valid!
+                        # Successfully parsed JSON - session is valid! Fetch any further pages
+                        api_courses = self._paginate(
+                            api_url, first_page=(api_courses, api_resp.headers.get('Link', ''))
+                        )
                         for course in api_courses:
                             course_id = str(course.get('id', ''))
                             course_name = course.get('name', '')
@@ -153,7 +258,7 @@ class CanvasScraper:
         # Fallback to HTML scraping
         try:
             url = urljoin(self.base_url, "/courses")
-            resp = self.session.get(url, allow_redirects=False)
+            resp = self._get(url, allow_redirects=False)
             
             # Check if we got redirected to login (session expired)
             if resp.status_code in [301, 302, 303, 307, 308]:
@@ -225,15 +330,13 @@ class CanvasScraper:
         params = {
             'include[]': 'assignments',
             'exclude_assignment_submission_types[]': 'wiki_page',
-            'override_assignment_dates': 'false'
+            'override_assignment_dates': 'false',
+            'per_page': 100
         }
         
         try:
-            resp = self.session.get(api_url, params=params)
-            resp.raise_for_status()
-            
-            # Parse JSON response
-            data = resp.json()
+            # Assignment groups, across all pages
+            data = self._paginate(api_url, params)
             
             assignments = []
             
@@ -259,7 +362,7 @@ class CanvasScraper:
         url = urljoin(self.base_url, f"/courses/{course_id}/modules")
         
         try:
-            resp = self.session.get(url)
+            resp = self._get(url)
             resp.raise_for_status()
             soup = BeautifulSoup(resp.text, 'html.parser')
             
@@ -303,108 +406,160 @@ class CanvasScraper:
         return course_data
     
     def scrape_all_active_courses(self) -> List[Dict]:
-        """Scrape all active courses"""
+        """
+        Scrape all active courses
+        
+        Each course's assignments and modules are fetched in parallel on up to
+        CANVAS_SCRAPE_CONCURRENCY threads (the per-host cap still bounds what
+        reaches Canvas). Courses are returned in listing order.
+        """
         # Get all courses
         all_courses = self.get_all_courses()
         
         # Filter to active courses
         active_courses = self.filter_active_courses(all_courses)
         
-        # Scrape each course
-        all_data = []
-        for course_id, course_name in active_courses.items():
-            course_data = self.scrape_course(course_id, course_name)
-            all_data.append(course_data)
+        if settings.CANVAS_SCRAPE_CONCURRENCY <= 1 or not active_courses:
+            return [self.scrape_course(course_id, course_name) for course_id, course_name in active_courses.items()]
         
-        return all_data
+        workers = min(settings.CANVAS_SCRAPE_CONCURRENCY, 2 * len(active_courses))
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            pending = [
+                (course_id, course_name,
+                 pool.submit(self.get_course_assignments, course_id),
+                 pool.submit(self.get_course_modules, course_id))
+                for course_id, course_name in active_courses.items()
+            ]
+            # Both fetchers catch their own errors, so result() doesn't raise
+            return [
+                {
+                    'id': course_id,
+                    'name': course_name,
+                    'assignments': assignments.result(),
+                    'modules': modules.result()
+                }
+                for course_id, course_name, assignments, modules in pending
+            ]
     
     def get_course_files(self, course_id: str) -> List[Dict]:
         """
         Get all files from the Files tab of a Canvas course
         
         Returns a list of file dictionaries with:
+        - id: Canvas file ID (when known)
         - name: File name
         - url: Direct download URL
         - size: File size in bytes
         - content_type: MIME type
         - updated_at: Last modified date
         """
-        files = []
+        files, _ = self.get_course_files_if_changed(course_id)
+        return files or []
+    
+    def get_course_files_if_changed(self, course_id: str, etag: Optional[str] = None) -> Tuple[Optional[List[Dict]], Optional[str]]:
+        """
+        Get all files from the Files tab unless the listing is unchanged
         
+        Sends If-None-Match with the ETag from a previous listing. Returns
+        (None, etag) when Canvas reports the listing as not modified, otherwise
+        (files, new_etag). Files are listed across all API pages, falling back
+        to scraping the Files HTML page if the API is unavailable.
+        """
         # Primary method: Use Canvas API endpoint (works with session cookie)
         try:
-            api_url = urljoin(self.base_url, f"/api/v1/courses/{course_id}/files")
-            print(f"Fetching files from Canvas API: {api_url}")
-            api_resp = self.session.get(api_url, params={'per_page': 100})
-            
-            print(f"API response status: {api_resp.status_code}")
-            
-            # Check content type - if it's HTML, the session probably expired
-            content_type = api_resp.headers.get('Content-Type', '').lower()
-            if 'text/html' in content_type:
-                print(f"Received HTML instead of JSON - Canvas session may be expired for course {course_id}")
-                raise Exception("Canvas session expired - received HTML instead of JSON")
-            
-            if api_resp.status_code == 200:
-                # Only try to parse as JSON if content type indicates JSON
-                if 'application/json' in content_type or not content_type:
-                    try:
-                        api_files = api_resp.json()
-                        print(f"Canvas API returned {len(api_files)} files for course {course_id}")
-                        
-                        for api_file in api_files:
-                            # Get file URL - Canvas API provides different URL formats
-                            file_url = api_file.get('url', '')
-                            if not file_url:
-                                # Construct download URL from file ID
-                                file_id = api_file.get('id')
-                                if file_id:
-                                    file_url = urljoin(self.base_url, f"/courses/{course_id}/files/{file_id}/download")
-                            
-                            # Only add if we have a valid URL
-                            if file_url:
-                                files.append({
-                                    'name': api_file.get('display_name', api_file.get('filename', 'Unknown')),
-                                    'url': file_url,
-                                    'size': api_file.get('size', 0),
-                                    'content_type': api_file.get('content-type', api_file.get('content_type', 'application/octet-stream')),
-                                    'updated_at': api_file.get('updated_at', '')
-                                })
-                        
-                        # If we got files from API, return them (no need to scrape HTML)
-                        if files:
-                            print(f"Returning {len(files)} files from API")
-                            return files
-                    except ValueError as json_err:
-                        # If JSON parsing fails, it might be HTML
-                        raise Exception("Canvas session expired - received HTML instead of JSON")
-                else:
-                    raise Exception("Canvas session expired - received HTML instead of JSON")
-            elif api_resp.status_code == 401:
-                print(f"Unauthorized (401) - Canvas session may be expired for course {course_id}")
-                raise Exception("401: Unauthorized - Canvas session cookie is invalid or expired")
-            else:
-                print(f"Canvas API returned status {api_resp.status_code} for course {course_id}")
-                # Try to get error details
-                try:
-                    if 'application/json' in content_type:
-                        error_data = api_resp.json()
-                        print(f"API error details: {error_data}")
-                    else:
-                        print(f"API error response (HTML): {api_resp.text[:200]}")
-                        raise Exception("Canvas session expired - received HTML instead of JSON")
-                except ValueError:
-                    print(f"API error response: {api_resp.text[:200]}")
-                    raise Exception("Canvas session expired - received HTML instead of JSON")
+            files, new_etag, not_modified = self._get_course_files_api(course_id, etag)
+            if not_modified:
+                print(f"Files listing for course {course_id} not modified")
+                return None, etag
+            # If we got files from API, return them (no need to scrape HTML)
+            if files:
+                print(f"Returning {len(files)} files from API")
+                return files, new_etag
         except Exception as api_error:
             print(f"Canvas API error for course {course_id}: {api_error}")
             import traceback
             traceback.print_exc()
         
         # Fallback method: Try HTML scraping if API fails
+        return self._scrape_course_files_html(course_id), None
+    
+    def _get_course_files_api(self, course_id: str, etag: Optional[str] = None) -> Tuple[List[Dict], Optional[str], bool]:
+        """
+        List course files through the Files API, across all Link pages
+        
+        Returns (files, etag of the first page, not_modified).
+        """
+        url = urljoin(self.base_url, f"/api/v1/courses/{course_id}/files")
+        # Newest first, so the first page (and its ETag) changes whenever any file does
+        params = {'per_page': 100, 'sort': 'updated_at', 'order': 'desc'}
+        headers = {'If-None-Match': etag} if etag else {}
+        
+        print(f"Fetching files from Canvas API: {url}")
+        api_resp = self._get(url, params=params, headers=headers)
+        print(f"API response status: {api_resp.status_code}")
+        
+        if api_resp.status_code == 304:
+            return [], etag, True
+        
+        first_page = (self._files_json(course_id, api_resp), api_resp.headers.get('Link', ''))
+        api_files = paginate(
+            lambda page_url, page_params: self._files_page(course_id, page_url, page_params),
+            url,
+            max_concurrency=settings.CANVAS_MAX_CONNECTIONS_PER_HOST,
+            first_page=first_page
+        )
+        
+        files = []
+        for api_file in api_files:
+            file_data = self._parse_api_file(course_id, api_file)
+            # Only add if we have a valid URL
+            if file_data:
+                files.append(file_data)
+        
+        print(f"Canvas API returned {len(files)} files for course {course_id}")
+        return files, api_resp.headers.get('ETag'), False
+    
+    def _files_page(self, course_id: str, url: str, params: Optional[Dict] = None) -> Tuple[List[Dict], str]:
+        """Fetch one further page of the Files API as (items, Link header)"""
+        api_resp = self._get(url, params=params)
+        return self._files_json(course_id, api_resp), api_resp.headers.get('Link', '')
+    
+    def _files_json(self, course_id: str, api_resp: requests.Response) -> List[Dict]:
+        """Decode a Files API page, raising if the session has expired"""
+        # Check content type - if it's HTML, the session probably expired
+        content_type = api_resp.headers.get('Content-Type', '').lower()
+        if 'text/html' in content_type:
+            print(f"Received HTML instead of JSON - Canvas session may be expired for course {course_id}")
+            raise Exception("Canvas session expired - received HTML instead of JSON")
+        
+        if api_resp.status_code == 401:
+            print(f"Unauthorized (401) - Canvas session may be expired for course {course_id}")
+            raise Exception("401: Unauthorized - Canvas session cookie is invalid or expired")
+        if api_resp.status_code != 200:
+            print(f"Canvas API returned status {api_resp.status_code} for course {course_id}")
+            print(f"API error response: {api_resp.text[:200]}")
+            raise Exception(f"Canvas API returned status {api_resp.status_code}")
+        
+        # Only try to parse as JSON if content type indicates JSON
+        if content_type and 'application/json' not in content_type:
+            raise Exception("Canvas session expired - received HTML instead of JSON")
+        try:
+            return api_resp.json()
+        except ValueError:
+            # If JSON parsing fails, it might be HTML
+            raise Exception("Canvas session expired - received HTML instead of JSON")
+    
+    def _parse_api_file(self, course_id: str, api_file: Dict) -> Optional[Dict]:
+        """Convert a Files API object to our file dictionary"""
+        return parse_api_file(self.base_url, course_id, api_file)
+    
+    def _scrape_course_files_html(self, course_id: str) -> List[Dict]:
+        """Fallback: scrape file links from the course's Files HTML page"""
+        files = []
+        
         try:
             url = urljoin(self.base_url, f"/courses/{course_id}/files")
-            resp = self.session.get(url, allow_redirects=True)
+            resp = self._get(url, allow_redirects=True)
             
             # Check if we got redirected to login (session expired)
             if 'login' in resp.url.lower() or resp.status_code == 401:
@@ -413,7 +568,7 @@ class CanvasScraper:
             
             if resp.status_code != 200:
                 print(f"HTML page returned status {resp.status_code} for course {course_id}")
-                return files  # Return whatever we got from API
+                return files
             
             soup = BeautifulSoup(resp.text, 'html.parser')
             
@@ -421,8 +576,8 @@ class CanvasScraper:
             # Look for file links in various possible structures
             file_links = soup.find_all("a", href=re.compile(r"/files/\d+"))
             
-            # Track URLs we already have from API
-            existing_urls = {f.get('url', '') for f in files}
+            # Track URLs we already added (the same file is often linked twice)
+            existing_urls = set()
             
             for link in file_links:
                 file_data = {}
@@ -444,25 +599,22 @@ class CanvasScraper:
                 
                 # Get file URL
                 href = link.get('href', '')
-                if href:
-                    # Convert to direct download URL
-                    if '/files/' in href:
-                        file_id_match = re.search(r'/files/(\d+)', href)
-                        if file_id_match:
-                            file_id = file_id_match.group(1)
-                            # Canvas file download URL format
-                            file_url = urljoin(self.base_url, f"/courses/{course_id}/files/{file_id}/download")
-                            file_data['url'] = file_url
-                            
-                            # Skip if we already have this URL from API
-                            if file_url in existing_urls:
-                                continue
-                        else:
-                            file_data['url'] = urljoin(self.base_url, href)
-                    else:
-                        file_data['url'] = urljoin(self.base_url, href)
+                if not href:
+                    continue
+                
+                # Convert to direct download URL
+                file_id_match = re.search(r'/files/(\d+)', href)
+                if file_id_match:
+                    file_id = file_id_match.group(1)
+                    file_data['id'] = file_id
+                    # Canvas file download URL format
+                    file_data['url'] = urljoin(self.base_url, f"/courses/{course_id}/files/{file_id}/download")
                 else:
+                    file_data['url'] = urljoin(self.base_url, href)
+                
+                if file_data['url'] in existing_urls:
                     continue
+                existing_urls.add(file_data['url'])
                 
                 # Try to get file size and other metadata
                 parent = link.find_parent(["tr", "li", "div"])
@@ -505,5 +657,3 @@ class CanvasScraper:
             print(f"HTML scraping error for course {course_id}: {html_error}")
         
         return files
-
-
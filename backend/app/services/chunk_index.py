@@ -0,0 +1,360 @@
+"""
+Course Chunk Index
+A persistent per-course full-text index of extracted document chunks.
+
+Courses are indexed in the background after import: every document in the
+Files tab and every PDF module item is extracted once, split into chunks and
+stored in course_chunks, searchable through SQLite FTS5 or a PostgreSQL
+tsvector column. Re-indexing only re-extracts documents whose Canvas
+updated_at changed, so the AI tutor can answer from the index in
+milliseconds instead of downloading files on every message.
+"""
+
+import asyncio
+import json
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import bindparam, text as sql_text
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.encryption import decrypt_data
+from app.db.database import SessionLocal
+from app.models.course import Course
+from app.models.course_chunk import CourseChunk, CourseDocument
+from app.models.module import Module
+from app.models.user import User
+from app.services import course_files_index, ingestion, job_queue
+from app.services.retrieval import (
+    BM25Index,
+    Chunk,
+    chunk_text,
+    estimate_tokens,
+    pack_chunks,
+    render_document,
+    spread_chunks,
+    tokenize,
+)
+
+# File types the extractors can read
+INDEXABLE_EXTENSIONS = ('.pdf', '.txt', '.md', '.html', '.htm')
+
+# Courses currently being indexed, so overlapping triggers don't duplicate work
+_indexing_courses = set()
+_indexing_lock = threading.Lock()
+
+
+def _is_indexable(name: str, content_type: Optional[str]) -> bool:
+    """Whether a file's text can be extracted"""
+    content_type = (content_type or '').lower()
+    if 'pdf' in content_type or content_type.startswith('text/'):
+        return True
+    return (name or '').lower().endswith(INDEXABLE_EXTENSIONS)
+
+
+def module_document_urls(module: Module) -> List[Tuple[str, str]]:
+    """(url, name) of a module's PDF items, the ones the index covers"""
+    items = module.items or []
+    if isinstance(items, str):
+        items = json.loads(items)
+    documents = []
+    for item in items:
+        url = item.get('url', '')
+        name = item.get('title', '') or item.get('name', '')
+        if url and '.pdf' in name.lower():
+            documents.append((url, name))
+    return documents
+
+
+def _course_sources(
+    db: Session,
+    course: Course,
+    canvas_url: str,
+    session_cookie: str
+) -> List[Tuple[str, str, Optional[str]]]:
+    """(url, name, version) of every document that should be in the index"""
+    sources: Dict[str, Tuple[str, str, Optional[str]]] = {}
+
+    # Errors propagate: indexing against a partial listing would drop documents
+    files = course_files_index.get_course_files(db, course, canvas_url, session_cookie)
+    for file_data in files:
+        url = file_data.get('url')
+        if url and _is_indexable(file_data.get('name'), file_data.get('content_type')):
+            sources[url] = (url, file_data.get('name') or 'File', file_data.get('updated_at'))
+
+    for module in db.query(Module).filter(Module.course_id == course.id).all():
+        for url, name in module_document_urls(module):
+            sources.setdefault(url, (url, name, None))
+
+    return list(sources.values())[:settings.CHUNK_INDEX_MAX_DOCUMENTS_PER_COURSE]
+
+
+def _replace_chunks(db: Session, document: CourseDocument, text: str) -> None:
+    """Swap a document's chunks for ones built from new text"""
+    db.query(CourseChunk).filter(CourseChunk.document_id == document.id).delete(synchronize_session=False)
+    chunks = chunk_text(text)
+    db.add_all([
+        CourseChunk(
+            document_id=document.id,
+            course_id=document.course_id,
+            position=position,
+            start_offset=chunk.start,
+            end_offset=chunk.end,
+            text=chunk.text
+        )
+        for position, chunk in enumerate(chunks)
+    ])
+    document.chunk_count = len(chunks)
+
+
+def _delete_document(db: Session, document: CourseDocument) -> None:
+    """Remove a document and its chunks from the index"""
+    db.query(CourseChunk).filter(CourseChunk.document_id == document.id).delete(synchronize_session=False)
+    db.delete(document)
+
+
+def index_course(course_id: int, canvas_url: str, session_cookie: str) -> Dict[str, int]:
+    """
+    Bring a course's chunk index up to date
+
+    Documents whose Canvas version is unchanged are skipped, changed ones are
+    re-extracted and re-chunked, and documents no longer in the course are
+    removed. Each document is committed on its own so the index is usable
+    while a long course is still being processed.
+    """
+    stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0, "failed": 0}
+
+    with _indexing_lock:
+        if course_id in _indexing_courses:
+            print(f"Chunk index for course {course_id} is already being built")
+            return stats
+        _indexing_courses.add(course_id)
+
+    db = SessionLocal()
+    try:
+        course = db.query(Course).filter(Course.id == course_id).first()
+        if not course or not course.canvas_id:
+            return stats
+
+        print(f"Indexing course {course.canvas_id} ({course.name})...")
+        sources = _course_sources(db, course, canvas_url, session_cookie)
+        existing = {
+            document.source_url: document
+            for document in db.query(CourseDocument).filter(CourseDocument.course_id == course_id).all()
+        }
+
+        changed = []
+        for url, name, version in sources:
+            document = existing.pop(url, None)
+            if document and document.version == version:
+                stats["unchanged"] += 1
+            else:
+                changed.append((url, name, version, document))
+
+        # Extract through the async ingestion path a batch at a time (downloads
+        # bounded per user), committing each document so the index fills in as it goes
+        batch_size = max(1, settings.INGESTION_MAX_CONCURRENCY_PER_USER)
+        for start in range(0, len(changed), batch_size):
+            batch = changed[start:start + batch_size]
+            texts = asyncio.run(ingestion.extract_texts_from_urls(
+                [url for url, _, _, _ in batch], session_cookie, canvas_url, course.user_id
+            ))
+            for (url, name, version, document), text in zip(batch, texts):
+                if not text or not text.strip():
+                    stats["failed"] += 1
+                    continue
+
+                if document is None:
+                    document = CourseDocument(course_id=course_id, source_url=url, name=name)
+                    db.add(document)
+                    db.flush()
+                    stats["added"] += 1
+                else:
+                    stats["updated"] += 1
+
+                document.name = name
+                document.version = version
+                document.indexed_at = datetime.utcnow()
+                _replace_chunks(db, document, text)
+                db.commit()
+
+        # Anything left is no longer in the course
+        for document in existing.values():
+            _delete_document(db, document)
+            stats["removed"] += 1
+        db.commit()
+
+        print(f"Chunk index for course {course.canvas_id}: {stats['added']} added, {stats['updated']} updated, "
+              f"{stats['removed']} removed, {stats['unchanged']} unchanged, {stats['failed']} failed")
+        return stats
+    except Exception as e:
+        print(f"Chunk indexing failed for course {course_id}: {e}")
+        db.rollback()
+        return stats
+    finally:
+        db.close()
+        with _indexing_lock:
+            _indexing_courses.discard(course_id)
+
+
+def index_user_courses(
+    user_id: int,
+    canvas_url: Optional[str] = None,
+    session_cookie: Optional[str] = None
+) -> None:
+    """
+    Index every course a user has imported (run as a background task)
+
+    Uses the user's stored Canvas session unless one is passed in.
+    """
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user:
+            return
+        if not session_cookie and user.canvas_session_cookie:
+            session_cookie = decrypt_data(user.canvas_session_cookie)
+        canvas_url = canvas_url or user.canvas_instance_url or settings.CANVAS_INSTANCE_URL
+        course_ids = [
+            course_id for (course_id,) in db.query(Course.id).filter(Course.user_id == user_id).all()
+        ]
+    finally:
+        db.close()
+
+    if not session_cookie:
+        return
+    for course_id in course_ids:
+        index_course(course_id, canvas_url, session_cookie)
+
+
+@job_queue.handler("index_courses")
+async def run_index_courses(payload: Dict) -> None:
+    """Job handler: index a user's courses after an import"""
+    session_cookie = decrypt_data(payload["session_cookie"]) if payload.get("session_cookie") else None
+    await asyncio.to_thread(index_user_courses, payload["user_id"], payload.get("canvas_url"), session_cookie)
+
+
+def _match_chunk_ids(
+    db: Session,
+    course_id: int,
+    document_ids: List[int],
+    query: str,
+    limit: int
+) -> Optional[List[int]]:
+    """
+    Chunk ids matching any query term, best first
+
+    Returns None when the database has no full-text search support, so the
+    caller can rank in Python instead.
+    """
+    terms = list(dict.fromkeys(tokenize(query)))[:32]
+    if not terms:
+        return []
+
+    dialect = db.get_bind().dialect.name
+    params = {"course_id": course_id, "document_ids": document_ids, "limit": limit}
+    if dialect == "sqlite":
+        statement = sql_text(
+            "SELECT c.id FROM course_chunks_fts "
+            "JOIN course_chunks c ON c.id = course_chunks_fts.rowid "
+            "WHERE course_chunks_fts MATCH :query AND c.course_id = :course_id "
+            "AND c.document_id IN :document_ids "
+            "ORDER BY bm25(course_chunks_fts) LIMIT :limit"
+        )
+        params["query"] = " OR ".join(f'"{term}"' for term in terms)
+    elif dialect == "postgresql":
+        statement = sql_text(
+            "SELECT id FROM course_chunks "
+            "WHERE course_id = :course_id AND document_id IN :document_ids "
+            "AND search_vector @@ to_tsquery('english', :query) "
+            "ORDER BY ts_rank(search_vector, to_tsquery('english', :query)) DESC LIMIT :limit"
+        )
+        params["query"] = " | ".join(terms)
+    else:
+        return None
+
+    try:
+        statement = statement.bindparams(bindparam("document_ids", expanding=True))
+        return [row[0] for row in db.execute(statement, params)]
+    except Exception as e:
+        print(f"Warning: Full-text search failed, ranking in Python: {e}")
+        db.rollback()
+        return None
+
+
+def search(
+    db: Session,
+    course_id: int,
+    query: str,
+    token_budget: int,
+    source_urls: Optional[List[str]] = None
+) -> Optional[List[Tuple[str, str]]]:
+    """
+    Select indexed passages for a query
+
+    Args:
+        course_id: Course to search
+        query: Question the passages should answer
+        token_budget: Approximate maximum tokens of text to return
+        source_urls: Limit the search to these documents (default: whole course)
+
+    Returns (document name, text) sections in document order, or None when
+    the requested documents are not all indexed yet.
+    """
+    documents_query = db.query(CourseDocument).filter(CourseDocument.course_id == course_id)
+    if source_urls:
+        documents_query = documents_query.filter(CourseDocument.source_url.in_(source_urls))
+    documents = documents_query.order_by(CourseDocument.id).all()
+
+    if not documents or (source_urls and len(documents) < len(set(source_urls))):
+        return None
+
+    document_ids = [document.id for document in documents]
+    doc_index = {document.id: i for i, document in enumerate(documents)}
+    names = [document.name for document in documents]
+    candidate_limit = max(token_budget // settings.RETRIEVAL_CHUNK_TOKENS, 1) * 2 + 4
+
+    matched_ids = _match_chunk_ids(db, course_id, document_ids, query, candidate_limit)
+    if matched_ids is None:
+        # No full-text support: rank the documents' chunks in Python
+        rows = db.query(CourseChunk).filter(CourseChunk.document_id.in_(document_ids)).all()
+        ranked = BM25Index([_to_chunk(row, doc_index) for row in rows]).rank(query)
+        matched = [chunk for score, chunk in ranked if score > 0][:candidate_limit]
+    else:
+        rows = db.query(CourseChunk).filter(CourseChunk.id.in_(matched_ids)).all() if matched_ids else []
+        by_id = {row.id: row for row in rows}
+        matched = [_to_chunk(by_id[row_id], doc_index) for row_id in matched_ids if row_id in by_id]
+
+    # Fill leftover budget with passages spread across the documents
+    used_tokens = sum(estimate_tokens(chunk.text) for chunk in matched)
+    if used_tokens < token_budget:
+        matched_keys = {(chunk.doc_index, chunk.start) for chunk in matched}
+        other_ids = [
+            row_id for (row_id, document_id, start) in db.query(
+                CourseChunk.id, CourseChunk.document_id, CourseChunk.start_offset
+            ).filter(
+                CourseChunk.document_id.in_(document_ids)
+            ).order_by(CourseChunk.document_id, CourseChunk.position).all()
+            if (doc_index[document_id], start) not in matched_keys
+        ]
+        needed = (token_budget - used_tokens) // settings.RETRIEVAL_CHUNK_TOKENS + 2
+        spread_ids = spread_chunks(other_ids)[:needed]
+        if spread_ids:
+            rows = db.query(CourseChunk).filter(CourseChunk.id.in_(spread_ids)).all()
+            by_id = {row.id: row for row in rows}
+            matched += [_to_chunk(by_id[row_id], doc_index) for row_id in spread_ids if row_id in by_id]
+
+    selected = pack_chunks(matched, names, token_budget)
+    print(f"Chunk index: selected {len(selected)} chunks from {len(documents)} indexed documents")
+
+    sections = []
+    for i, name in enumerate(names):
+        doc_chunks = [chunk for chunk in selected if chunk.doc_index == i]
+        if doc_chunks:
+            sections.append((name, render_document(doc_chunks)))
+    return sections
+
+
+def _to_chunk(row: CourseChunk, doc_index: Dict[int, int]) -> Chunk:
+    """Convert a stored chunk to a retrieval chunk"""
+    return Chunk(doc_index[row.document_id], row.start_offset, row.end_offset, row.text)
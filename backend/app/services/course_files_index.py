@@ -0,0 +1,144 @@
+"""
+Course Files Index
+Keeps each course's Canvas Files tab listing in the database. The listing is
+served from the index for FILES_INDEX_TTL_SECONDS and then refreshed with a
+conditional request; when Canvas reports changes only new, changed and
+removed files are written.
+
+The conditional request only carries the first page's ETag, so a file
+removed from a later page goes unnoticed. Every FILES_INDEX_FULL_RELIST_HOURS
+the refresh lists every page without it to catch those.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, List
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.course import Course
+from app.models.course_file import CourseFile, CourseFileIndex
+from app.services.canvas_scraper import CanvasScraper
+
+
+def _file_to_dict(course_file: CourseFile) -> Dict:
+    """Convert an indexed file to the dictionary format returned by CanvasScraper"""
+    return {
+        'id': course_file.canvas_file_id,
+        'name': course_file.name,
+        'url': course_file.url,
+        'size': course_file.size,
+        'content_type': course_file.content_type,
+        'updated_at': course_file.canvas_updated_at
+    }
+
+
+def _indexed_files(db: Session, course_id: int) -> List[Dict]:
+    """All indexed files for a course"""
+    rows = db.query(CourseFile).filter(
+        CourseFile.course_id == course_id
+    ).order_by(CourseFile.name).all()
+    return [_file_to_dict(row) for row in rows]
+
+
+def apply_listing(db: Session, course_id: int, files: List[Dict], remove_missing: bool = True) -> Dict[str, int]:
+    """
+    Write only the differences between the index and a listing
+
+    Pass remove_missing=False for a partial listing (e.g. only files changed
+    since the last sync), so files it doesn't mention are kept.
+    """
+    existing = {
+        row.url: row
+        for row in db.query(CourseFile).filter(CourseFile.course_id == course_id).all()
+    }
+    added = updated = unchanged = 0
+
+    for file_data in files:
+        url = file_data.get('url')
+        if not url:
+            continue
+
+        size = file_data.get('size')
+        values = {
+            'canvas_file_id': file_data.get('id'),
+            'name': file_data.get('name', 'Unknown'),
+            'size': size if isinstance(size, int) else None,
+            'content_type': file_data.get('content_type'),
+            'canvas_updated_at': file_data.get('updated_at') or None,
+        }
+
+        row = existing.pop(url, None)
+        if row is None:
+            db.add(CourseFile(course_id=course_id, url=url, **values))
+            added += 1
+        elif row.canvas_updated_at != values['canvas_updated_at'] or row.name != values['name']:
+            for key, value in values.items():
+                setattr(row, key, value)
+            updated += 1
+        else:
+            unchanged += 1
+
+    # Anything left was removed from the Files tab
+    removed = 0
+    if remove_missing:
+        for row in existing.values():
+            db.delete(row)
+        removed = len(existing)
+
+    print(f"Files index for course {course_id}: {added} added, {updated} updated, "
+          f"{removed} removed, {unchanged} unchanged")
+    return {"added": added, "updated": updated, "removed": removed, "unchanged": unchanged}
+
+
+def get_course_files(
+    db: Session,
+    course: Course,
+    canvas_url: str,
+    session_cookie: str,
+    force_refresh: bool = False
+) -> List[Dict]:
+    """
+    Get a course's Files tab listing, refreshing the index when it is stale
+
+    Returns file dictionaries in the same format as CanvasScraper.get_course_files.
+    """
+    index = db.query(CourseFileIndex).filter(CourseFileIndex.course_id == course.id).first()
+    now = datetime.utcnow()
+
+    if (
+        index and index.refreshed_at and not force_refresh
+        and now - index.refreshed_at < timedelta(seconds=settings.FILES_INDEX_TTL_SECONDS)
+    ):
+        print(f"Serving Files tab for course {course.canvas_id} from index")
+        return _indexed_files(db, course.id)
+
+    full_relist = (
+        index is None or index.full_listed_at is None
+        or now - index.full_listed_at >= timedelta(hours=settings.FILES_INDEX_FULL_RELIST_HOURS)
+    )
+    print(f"Refreshing Files tab index for course {course.canvas_id}"
+          f"{' (full relist)' if full_relist else ''}...")
+    scraper = CanvasScraper(base_url=canvas_url, session_cookie=session_cookie)
+    try:
+        files, etag = scraper.get_course_files_if_changed(
+            course.canvas_id, None if full_relist else index.etag
+        )
+    except Exception as e:
+        print(f"Warning: Files tab refresh failed for course {course.canvas_id}: {e}")
+        return _indexed_files(db, course.id) if index else []
+
+    if index is None:
+        index = CourseFileIndex(course_id=course.id, file_count=0)
+        db.add(index)
+
+    # An empty listing for a course we know has files is almost always an
+    # expired session, so keep the existing index rather than wiping it
+    if files is not None and (files or not index.file_count):
+        apply_listing(db, course.id, files)
+        index.etag = etag
+        index.file_count = len(files)
+        # Any listing Canvas sends back covers every page
+        index.full_listed_at = now
+
+    index.refreshed_at = now
+    db.commit()
+    return _indexed_files(db, course.id)
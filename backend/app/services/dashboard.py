@@ -0,0 +1,181 @@
+"""
+Dashboard
+Builds the dashboard from three aggregate queries, however many courses
+and assignments a user has:
+
+1. Course progress: courses LEFT JOIN assignments, grouped by course, with
+   COUNT and SUM(submitted)
+2. Due windows: assignments JOIN courses from the start of today, in due
+   date order, read until today's and the next two days' items and the
+   next five upcoming assignments are in hand
+3. Flashcards due: unmastered flashcards not reviewed yet today, counted
+   per course
+
+Due date windows use range predicates (not DATE(due_date)) so an index on
+(user_id, due_date) can serve them.
+"""
+
+from datetime import datetime, time, timedelta
+from typing import Dict, List, Optional
+from sqlalchemy import case, func, or_
+from sqlalchemy.orm import Session
+from app.models.assignment import Assignment
+from app.models.course import Course
+from app.models.flashcard import Flashcard
+
+UPCOMING_LIMIT = 5
+SOON_DAYS = 2  # "Due in 48 hours" suggestion window after today
+MAX_FLASHCARD_SUGGESTIONS = 3
+
+
+def _priority(due_date: datetime, today) -> str:
+    days_until_due = (due_date.date() - today).days
+    if days_until_due <= 1:
+        return "urgent"
+    elif days_until_due <= 3:
+        return "high"
+    return "normal"
+
+
+def course_progress(db: Session, user_id: int) -> List[Dict]:
+    """Each course with the share of its assignments submitted (one grouped query)"""
+    rows = (
+        db.query(
+            Course.id,
+            Course.code,
+            Course.name,
+            func.count(Assignment.id).label("total"),
+            func.coalesce(func.sum(case((Assignment.submitted == True, 1), else_=0)), 0).label("submitted")
+        )
+        .outerjoin(Assignment, Assignment.course_id == Course.id)
+        .filter(Course.user_id == user_id)
+        .group_by(Course.id, Course.code, Course.name)
+        .order_by(Course.id)
+        .all()
+    )
+    return [
+        {
+            "id": row.id,
+            "code": row.code,
+            "name": row.name,
+            "progress": round(row.submitted / row.total * 100, 1) if row.total else 0
+        }
+        for row in rows
+    ]
+
+
+def due_windows(db: Session, user_id: int, now: datetime) -> Dict:
+    """
+    Assignments due today, the count due in the next SOON_DAYS days and the
+    next UPCOMING_LIMIT upcoming assignments (one joined query)
+    """
+    today = now.date()
+    today_start = datetime.combine(today, time.min)
+    tomorrow_start = today_start + timedelta(days=1)
+    soon_end = tomorrow_start + timedelta(days=SOON_DAYS)
+
+    query = (
+        db.query(Assignment.id, Assignment.title, Assignment.due_date, Course.code, Course.name)
+        .outerjoin(Course, Course.id == Assignment.course_id)
+        .filter(Assignment.user_id == user_id, Assignment.due_date >= today_start)
+        .order_by(Assignment.due_date, Assignment.id)
+    )
+    # Streamed, so stopping early leaves later assignments unfetched
+    result = db.execute(query.statement.execution_options(yield_per=100))
+
+    due_today, upcoming = [], []
+    due_soon = 0
+    try:
+        for row in result:
+            if row.due_date >= soon_end and len(upcoming) >= UPCOMING_LIMIT:
+                break
+            item = {
+                "id": row.id,
+                "title": row.title,
+                "course_code": row.code or "Unknown",
+                "course_name": row.name or "Unknown Course",
+                "due_date": row.due_date
+            }
+            if row.due_date < tomorrow_start:
+                due_today.append(item)
+            elif row.due_date < soon_end:
+                due_soon += 1
+            if row.due_date > now and len(upcoming) < UPCOMING_LIMIT:
+                upcoming.append({**item, "priority": _priority(row.due_date, today)})
+    finally:
+        result.close()
+
+    return {"due_today": due_today, "due_soon": due_soon, "upcoming": upcoming}
+
+
+def flashcards_due(db: Session, user_id: int, now: datetime) -> Dict[int, int]:
+    """{course_id: unmastered flashcards not reviewed yet today} (one grouped query)"""
+    today_start = datetime.combine(now.date(), time.min)
+    return dict(
+        db.query(Flashcard.course_id, func.count(Flashcard.id))
+        .filter(
+            Flashcard.user_id == user_id,
+            Flashcard.mastered == False,
+            or_(Flashcard.last_reviewed.is_(None), Flashcard.last_reviewed < today_start)
+        )
+        .group_by(Flashcard.course_id)
+        .all()
+    )
+
+
+def build_dashboard(db: Session, user_id: int, study_streak_days: int, now: Optional[datetime] = None) -> Dict:
+    """Dashboard data in the shape of the dashboard router's DashboardData"""
+    now = now or datetime.utcnow()
+    courses = course_progress(db, user_id)
+    windows = due_windows(db, user_id, now)
+    cards_due = flashcards_due(db, user_id, now)
+    courses_by_id = {course["id"]: course for course in courses}
+
+    due_today = [{**item, "type": "assignment", "priority": "urgent"} for item in windows["due_today"]]
+    end_of_today = datetime.combine(now.date(), time.max)
+    # One review item per course with cards due, with an id that can't collide with an assignment's
+    for course_id, count in sorted(cards_due.items(), key=lambda entry: -entry[1]):
+        course = courses_by_id.get(course_id, {})
+        due_today.append({
+            "id": f"flashcards-{course_id}",
+            "title": f"Review {count} flashcard{'s' if count != 1 else ''}",
+            "course_code": course.get("code", "Unknown"),
+            "course_name": course.get("name", "Unknown Course"),
+            "due_date": end_of_today,
+            "type": "flashcard",
+            "priority": "normal"
+        })
+
+    study_suggestions = []
+    if windows["due_soon"] > 0:
+        study_suggestions.append({
+            "message": f"{windows['due_soon']} assignments due in 48 hours",
+            "action": "review"
+        })
+    for course_id, count in sorted(cards_due.items(), key=lambda entry: -entry[1])[:MAX_FLASHCARD_SUGGESTIONS]:
+        study_suggestions.append({
+            "message": f"{count} flashcard{'s' if count != 1 else ''} due today",
+            "action": "review",
+            "course_code": courses_by_id.get(course_id, {}).get("code")
+        })
+
+    todays_tasks = [
+        {
+            "id": item["id"],
+            "title": item["title"],
+            "course_code": item["course_code"],
+            "due_date": item["due_date"],
+            "priority": item["priority"],
+            "completed": False
+        }
+        for item in due_today
+    ]
+
+    return {
+        "due_today": due_today,
+        "study_suggestions": study_suggestions,
+        "courses": courses,
+        "upcoming_assignments": [{**item, "type": "assignment"} for item in windows["upcoming"]],
+        "study_streak_days": study_streak_days or 0,
+        "todays_tasks": todays_tasks
+    }
@@ -0,0 +1,268 @@
+"""
+Dashboard Cache
+Materializes each user's dashboard so a load is a single cache lookup. A
+snapshot is built by app.services.dashboard on a miss and kept in an
+in-process LRU (DASHBOARD_CACHE_MAX_ENTRIES users) and, with
+DASHBOARD_CACHE_PERSIST, in the dashboard_snapshots table, which survives
+restarts and is shared by worker processes.
+
+Snapshots are invalidated when the data behind them changes: the stored
+row is deleted in the writing transaction and the in-memory copy once it
+commits. Writes are found through:
+- ORM writes to a user's courses, assignments, flashcards (e.g. reviews),
+  study sessions or user row are picked up by a session flush hook
+- Bulk Canvas writes (imports, scheduled refreshes, CanvasSyncService) go
+  through bulk_upsert, which calls mark_dirty()
+
+An invalidation only reaches the LRU of the process that made the write.
+With DASHBOARD_CACHE_PERSIST a memory hit is checked against the stored
+row's built_at (one indexed lookup instead of loading the snapshot), so a
+snapshot another worker deleted or rebuilt isn't served. Without it the
+LRU assumes a single worker process; set DASHBOARD_CACHE_SINGLE_PROCESS to
+False when running several, and every load is built fresh.
+
+Time moves the dashboard too, so a snapshot also expires at midnight UTC,
+when its first upcoming assignment falls due, or after
+DASHBOARD_CACHE_TTL_SECONDS. Hits, misses and rebuild time are exposed
+through /metrics.
+"""
+
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, time as day_time, timedelta
+from itertools import chain
+from typing import Dict, Iterable, Optional, Tuple
+from sqlalchemy import delete, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.assignment import Assignment
+from app.models.course import Course
+from app.models.dashboard_snapshot import DashboardSnapshot
+from app.models.flashcard import Flashcard
+from app.models.study_session import StudySession
+from app.models.user import User
+from app.services import dashboard
+
+# Model -> attribute holding the owning user's id
+_TRACKED = {
+    Assignment: "user_id",
+    Course: "user_id",
+    Flashcard: "user_id",
+    StudySession: "user_id",
+    User: "id",
+}
+_DIRTY_KEY = "dashboard_dirty_users"
+
+_snapshots: "OrderedDict[int, Tuple[datetime, datetime, Dict]]" = OrderedDict()  # (expires_at, built_at, data)
+_generations: Dict[int, int] = {}  # Bumped by every invalidation; stale rebuilds aren't stored
+_lock = threading.Lock()
+
+
+def mark_dirty(db: Session, user_ids: Iterable[int]) -> None:
+    """Invalidate these users' dashboards when db's transaction commits"""
+    db.info.setdefault(_DIRTY_KEY, set()).update(user_id for user_id in user_ids if user_id is not None)
+
+
+@event.listens_for(Session, "before_flush")
+def _collect_dirty_users(session, flush_context, instances) -> None:
+    for obj in chain(session.new, session.dirty, session.deleted):
+        attribute = _TRACKED.get(type(obj))
+        if attribute:
+            mark_dirty(session, [getattr(obj, attribute, None)])
+
+
+@event.listens_for(Session, "before_commit")
+def _delete_stored_before_commit(session) -> None:
+    # In the committing transaction, on its own connection: a second session
+    # would wait on the single SQLite writer connection this one holds
+    if not settings.DASHBOARD_CACHE_PERSIST:
+        return
+    session.flush()  # Collect users from the final flush too
+    user_ids = session.info.get(_DIRTY_KEY)
+    if user_ids:
+        session.execute(delete(DashboardSnapshot).where(DashboardSnapshot.user_id.in_(list(user_ids))))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session) -> None:
+    user_ids = session.info.pop(_DIRTY_KEY, None)
+    if user_ids:
+        _forget(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_on_rollback(session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
+
+
+def _forget(user_ids: Iterable[int]) -> None:
+    """Drop these users' in-memory snapshots"""
+    user_ids = set(user_ids)
+    with _lock:
+        for user_id in user_ids:
+            _snapshots.pop(user_id, None)
+            _generations[user_id] = _generations.get(user_id, 0) + 1
+    metrics.increment("dashboard_cache.invalidations", len(user_ids))
+
+
+def _expires_at(data: Dict, now: datetime) -> datetime:
+    """Midnight, the first upcoming assignment's due date or the TTL, whichever is first"""
+    candidates = [
+        datetime.combine(now.date() + timedelta(days=1), day_time.min),
+        now + timedelta(seconds=settings.DASHBOARD_CACHE_TTL_SECONDS),
+    ]
+    upcoming = data.get("upcoming_assignments") or []
+    if upcoming:
+        candidates.append(upcoming[0]["due_date"])
+    return min(candidates)
+
+
+def _memory_enabled() -> bool:
+    """Whether the in-process LRU can be trusted (see the module docstring)"""
+    return settings.DASHBOARD_CACHE_PERSIST or settings.DASHBOARD_CACHE_SINGLE_PROCESS
+
+
+def _memory_get(user_id: int, now: datetime) -> Optional[Tuple[datetime, Dict]]:
+    """(built_at, data) of an unexpired in-memory snapshot"""
+    with _lock:
+        entry = _snapshots.get(user_id)
+        if entry is None:
+            return None
+        expires_at, built_at, data = entry
+        if expires_at <= now:
+            del _snapshots[user_id]
+            return None
+        _snapshots.move_to_end(user_id)
+        return built_at, data
+
+
+def _memory_drop(user_id: int, built_at: datetime) -> None:
+    with _lock:
+        entry = _snapshots.get(user_id)
+        if entry is not None and entry[1] == built_at:
+            del _snapshots[user_id]
+
+
+def _memory_put(user_id: int, expires_at: datetime, built_at: datetime, data: Dict, generation: int) -> bool:
+    if not _memory_enabled():
+        return True
+    with _lock:
+        if _generations.get(user_id, 0) != generation:
+            return False  # Invalidated while this snapshot was being built
+        _snapshots[user_id] = (expires_at, built_at, data)
+        _snapshots.move_to_end(user_id)
+        while len(_snapshots) > settings.DASHBOARD_CACHE_MAX_ENTRIES:
+            _snapshots.popitem(last=False)
+        return True
+
+
+def _stored_built_at(db: Session, user_id: int) -> Optional[datetime]:
+    return db.query(DashboardSnapshot.built_at).filter(DashboardSnapshot.user_id == user_id).scalar()
+
+
+def _stored_get(db: Session, user_id: int, now: datetime) -> Optional[Tuple[datetime, datetime, Dict]]:
+    row = db.query(DashboardSnapshot).filter(
+        DashboardSnapshot.user_id == user_id,
+        DashboardSnapshot.expires_at > now
+    ).first()
+    if row is None:
+        return None
+    return row.expires_at, row.built_at, json.loads(row.data)
+
+
+def _store(user_id: int, expires_at: datetime, built_at: datetime, data: Dict, build_ms: float) -> None:
+    """Upsert the snapshot row (own session, so the caller's transaction is untouched)"""
+    db = SessionLocal(for_write=True)
+    try:
+        values = {
+            "data": json.dumps(data, default=lambda value: value.isoformat()),
+            "built_at": built_at,
+            "expires_at": expires_at,
+            "build_ms": build_ms,
+        }
+        row = db.query(DashboardSnapshot).filter(DashboardSnapshot.user_id == user_id).first()
+        if row is None:
+            db.add(DashboardSnapshot(user_id=user_id, **values))
+        else:
+            for key, value in values.items():
+                setattr(row, key, value)
+        db.commit()
+    except IntegrityError:
+        # Another worker stored this user's snapshot first
+        db.rollback()
+    except Exception as e:
+        print(f"Warning: Dashboard snapshot store failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def get_dashboard(db: Session, user: User) -> Dict:
+    """The user's dashboard from the cache, built and cached on a miss"""
+    if not settings.DASHBOARD_CACHE_ENABLED:
+        return dashboard.build_dashboard(db, user.id, user.study_streak_days)
+
+    now = datetime.utcnow()
+    cached = _memory_get(user.id, now)
+    if cached is not None:
+        built_at, data = cached
+        if not settings.DASHBOARD_CACHE_PERSIST or _stored_built_at(db, user.id) == built_at:
+            metrics.increment("dashboard_cache.hit")
+            return data
+        # Another worker invalidated or rebuilt this snapshot
+        metrics.increment("dashboard_cache.stale")
+        _memory_drop(user.id, built_at)
+
+    with _lock:
+        generation = _generations.get(user.id, 0)
+
+    if settings.DASHBOARD_CACHE_PERSIST:
+        stored = _stored_get(db, user.id, now)
+        if stored is not None:
+            metrics.increment("dashboard_cache.db_hit")
+            _memory_put(user.id, *stored, generation)
+            return stored[2]
+
+    metrics.increment("dashboard_cache.miss")
+    started = time.perf_counter()
+    data = dashboard.build_dashboard(db, user.id, user.study_streak_days, now)
+    build_seconds = time.perf_counter() - started
+    metrics.record("dashboard_cache.rebuild", build_seconds)
+
+    expires_at = _expires_at(data, now)
+    built_at = datetime.utcnow()
+    if _memory_put(user.id, expires_at, built_at, data, generation) and settings.DASHBOARD_CACHE_PERSIST:
+        _store(user.id, expires_at, built_at, data, round(build_seconds * 1000, 2))
+    return data
+
+
+def stats() -> Dict[str, float]:
+    """Hit counts, hit rate, invalidations, stale memory hits and snapshots held since startup"""
+    hits = metrics.counter("dashboard_cache.hit")
+    db_hits = metrics.counter("dashboard_cache.db_hit")
+    misses = metrics.counter("dashboard_cache.miss")
+    total = hits + db_hits + misses
+    with _lock:
+        entries = len(_snapshots)
+    return {
+        "hits": hits,
+        "db_hits": db_hits,
+        "misses": misses,
+        "hit_rate": round((hits + db_hits) / total, 3) if total else 0.0,
+        "invalidations": metrics.counter("dashboard_cache.invalidations"),
+        "stale_hits": metrics.counter("dashboard_cache.stale"),
+        "entries": entries,
+    }
+
+
+def clear() -> None:
+    """Drop every in-memory snapshot"""
+    with _lock:
+        for user_id in _snapshots:
+            _generations[user_id] = _generations.get(user_id, 0) + 1
+        _snapshots.clear()
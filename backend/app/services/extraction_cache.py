@@ -0,0 +1,150 @@
+"""
+Extracted Text Cache
+Persists text extracted from Canvas files so repeat requests skip both the
+download and the PDF/OCR parse. Entries are keyed by Canvas file id plus its
+updated_at version, falling back to a SHA-256 of the downloaded content, and
+are evicted least-recently-used once the configured size limits are exceeded.
+"""
+
+from datetime import datetime
+from typing import Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.extracted_document import ExtractedDocument
+
+# Bump whenever extraction output changes so stale text is not served
+EXTRACTOR_VERSION = 2
+
+
+def file_cache_key(file_id: str, version: str) -> str:
+    """Cache key for a Canvas file at a specific updated_at/ETag version"""
+    return f"file:{file_id}:{version}:v{EXTRACTOR_VERSION}"
+
+
+def content_cache_key(content_hash: str) -> str:
+    """Cache key for a document identified only by its content hash"""
+    return f"sha256:{content_hash}:v{EXTRACTOR_VERSION}"
+
+
+def _touch(db, entry: ExtractedDocument) -> str:
+    """Record a cache hit and return the cached text"""
+    entry.hit_count = (entry.hit_count or 0) + 1
+    entry.last_accessed_at = datetime.utcnow()
+    db.commit()
+    return entry.text
+
+
+def get_text(cache_key: str) -> Optional[str]:
+    """Return cached text for a cache key, or None on a miss"""
+    if not settings.EXTRACTION_CACHE_ENABLED:
+        return None
+
+    db = SessionLocal(for_write=True)
+    try:
+        entry = db.query(ExtractedDocument).filter(
+            ExtractedDocument.cache_key == cache_key
+        ).first()
+        if not entry:
+            return None
+        return _touch(db, entry)
+    except Exception as e:
+        print(f"Warning: Extraction cache lookup failed: {e}")
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+def get_text_by_hash(content_hash: str) -> Optional[str]:
+    """Return cached text for any entry extracted from identical content"""
+    if not settings.EXTRACTION_CACHE_ENABLED:
+        return None
+
+    db = SessionLocal(for_write=True)
+    try:
+        entry = db.query(ExtractedDocument).filter(
+            ExtractedDocument.content_hash == content_hash,
+            ExtractedDocument.extractor_version == EXTRACTOR_VERSION
+        ).first()
+        if not entry:
+            return None
+        return _touch(db, entry)
+    except Exception as e:
+        print(f"Warning: Extraction cache lookup failed: {e}")
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+def store_text(cache_key: str, content_hash: str, text: str) -> None:
+    """Store extracted text and evict least-recently-used entries if over budget"""
+    if not settings.EXTRACTION_CACHE_ENABLED or not text:
+        return
+
+    db = SessionLocal(for_write=True)
+    try:
+        existing = db.query(ExtractedDocument).filter(
+            ExtractedDocument.cache_key == cache_key
+        ).first()
+        if existing:
+            existing.text = text
+            existing.content_hash = content_hash
+            existing.size_bytes = len(text.encode('utf-8'))
+            existing.last_accessed_at = datetime.utcnow()
+        else:
+            db.add(ExtractedDocument(
+                cache_key=cache_key,
+                content_hash=content_hash,
+                extractor_version=EXTRACTOR_VERSION,
+                text=text,
+                size_bytes=len(text.encode('utf-8'))
+            ))
+        db.commit()
+        _evict(db)
+    except IntegrityError:
+        # Another request stored the same document first
+        db.rollback()
+    except Exception as e:
+        print(f"Warning: Extraction cache store failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def _evict(db) -> None:
+    """Delete least-recently-used entries until the cache fits its limits"""
+    # Entries from older extractor versions can never be served again
+    db.query(ExtractedDocument).filter(
+        ExtractedDocument.extractor_version != EXTRACTOR_VERSION
+    ).delete(synchronize_session=False)
+
+    count, total_bytes = db.query(
+        func.count(ExtractedDocument.id),
+        func.coalesce(func.sum(ExtractedDocument.size_bytes), 0)
+    ).one()
+
+    if count <= settings.EXTRACTION_CACHE_MAX_ENTRIES and total_bytes <= settings.EXTRACTION_CACHE_MAX_BYTES:
+        db.commit()
+        return
+
+    oldest = db.query(
+        ExtractedDocument.id, ExtractedDocument.size_bytes
+    ).order_by(ExtractedDocument.last_accessed_at).all()
+
+    to_delete = []
+    for entry_id, size_bytes in oldest:
+        if count <= settings.EXTRACTION_CACHE_MAX_ENTRIES and total_bytes <= settings.EXTRACTION_CACHE_MAX_BYTES:
+            break
+        to_delete.append(entry_id)
+        count -= 1
+        total_bytes -= size_bytes or 0
+
+    if to_delete:
+        db.query(ExtractedDocument).filter(
+            ExtractedDocument.id.in_(to_delete)
+        ).delete(synchronize_session=False)
+        print(f"Extraction cache evicted {len(to_delete)} entries")
+    db.commit()
@@ -3,153 +3,165 @@ AI Flashcard Generator Service using Groq
 Generates flashcards from module content using LLM
 """
 
-import requests
 import json
-from typing import List, Dict
+import hashlib
+import re
+from typing import AsyncIterator, List, Dict, Optional
+from urllib.parse import urljoin
 from bs4 import BeautifulSoup
 from PyPDF2 import PdfReader
 import io
-from groq import Groq
 from app.core.config import settings
+from app.services import extraction_cache, llm_client
+from app.services.prompt_packer import pack_prompt
+from app.services.ocr_engine import OCR_AVAILABLE, ocr_pdf
 import os
 
-# OCR imports (optional - will fail gracefully if not installed)
-try:
-    from pdf2image import convert_from_bytes
-    import pytesseract
-    OCR_AVAILABLE = True
-except ImportError:
-    OCR_AVAILABLE = False
-    print("Warning: OCR libraries not available. Install pdf2image and pytesseract for OCR support.")
-
-# Groq API Configuration
-GROQ_API_URL = "https://api.groq.com/openai/v1/chat/completions"
+# Groq model used for every generator
 MODEL = "llama-3.1-8b-instant"
 
+# Completion tokens reserved for each kind of response
+FLASHCARD_MAX_TOKENS = 2000
+QUIZ_MAX_TOKENS = 2500
+CHAT_MAX_TOKENS = 1000
+QUESTION_MAX_TOKENS = 200
+GRADE_MAX_TOKENS = 500
 
-def extract_text_from_url(url: str, session_cookie: str, canvas_url: str) -> str:
+# Bump when a generation prompt changes so cached sets from the old prompt are not served
+FLASHCARD_PROMPT_VERSION = 1
+QUIZ_PROMPT_VERSION = 1
+
+# Canvas file URLs look like /courses/{course_id}/files/{file_id}/download
+CANVAS_FILE_ID_PATTERN = re.compile(r'/files/(\d+)')
+
+
+def canvas_file_id(url: str) -> Optional[str]:
+    """Return the Canvas file id embedded in a file URL, if any"""
+    match = CANVAS_FILE_ID_PATTERN.search(url or "")
+    return match.group(1) if match else None
+
+
+def find_document_links(html: str, canvas_url: str) -> List[str]:
     """
-    Download content from Canvas URL and extract text
+    Find candidate file URLs on a Canvas module item page, in the order they
+    should be tried
     """
-    try:
-        # Create session with cookie
-        session = requests.Session()
-        from urllib.parse import urlparse, urljoin
-        domain = urlparse(canvas_url).hostname
-        session.cookies.set("canvas_session", session_cookie, domain=domain)
-        session.headers.update({
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"
-        })
-        
-        print(f"Fetching: {url}")
-        
-        # First, get the Canvas module item page
-        response = session.get(url, allow_redirects=True)
-        content_type = response.headers.get('Content-Type', '')
-        
-        print(f"Content-Type: {content_type}, Status: {response.status_code}")
-        
-        # If it's HTML, look for the actual file download link
-        if 'text/html' in content_type:
-            soup = BeautifulSoup(response.text, 'html.parser')
+    soup = BeautifulSoup(html, 'html.parser')
+    candidates = []
+    
+    # Strategy 1: Look for file preview iframe
+    iframe = soup.find('iframe', {'id': 'file_content'})
+    if iframe and iframe.get('src'):
+        print(f"Found iframe src: {iframe['src']}")
+        candidates.append(iframe['src'])
+    
+    # Strategy 2: Look for any link with /files/ and download in URL
+    for link in soup.find_all('a', href=True):
+        href = link['href']
+        if '/files/' in href and ('download' in href or 'preview' in href):
+            candidates.append(urljoin(canvas_url, href))
+    
+    return candidates
+
+
+def _meaningful_length(text: str) -> int:
+    """Count alphanumeric characters, ignoring whitespace and layout noise"""
+    return sum(1 for c in text if c.isalnum())
+
+
+def extract_text_from_content(content: bytes, content_type: str) -> str:
+    """
+    Extract text from downloaded PDF or HTML content
+    """
+    # If it's a PDF
+    if 'application/pdf' in content_type:
+        try:
+            print(f"PDF found! Size: {len(content)} bytes")
+            pdf_reader = PdfReader(io.BytesIO(content))
+            page_texts = []
             
-            # Strategy 1: Look for file preview iframe
-            iframe = soup.find('iframe', {'id': 'file_content'})
-            if iframe and iframe.get('src'):
-                file_url = iframe['src']
-                print(f"Found iframe src: {file_url}")
-                response = session.get(file_url, allow_redirects=True)
-                content_type = response.headers.get('Content-Type', '')
+            # First, try to extract text directly
+            for i, page in enumerate(pdf_reader.pages):
+                page_text = page.extract_text() or ""
+                page_texts.append(page_text)
+                if i == 0:  # Log first page sample
+                    print(f"First page sample: {page_text[:200]}...")
             
-            # Strategy 2: Look for any link with /files/ and download in URL
-            if 'application/pdf' not in content_type:
-                for link in soup.find_all('a', href=True):
-                    href = link['href']
-                    if '/files/' in href and ('download' in href or 'preview' in href):
-                        download_url = urljoin(canvas_url, href)
-                        print(f"Found file link: {download_url}")
-                        response = session.get(download_url, allow_redirects=True)
-                        content_type = response.headers.get('Content-Type', '')
-                        if 'application/pdf' in content_type:
-                            break
-        
-        # If it's a PDF
-        if 'application/pdf' in content_type:
-            try:
-                print(f"PDF found! Size: {len(response.content)} bytes")
-                pdf_reader = PdfReader(io.BytesIO(response.content))
-                text = ""
-                
-                # First, try to extract text directly
-                for i, page in enumerate(pdf_reader.pages):
-                    page_text = page.extract_text()
-                    text += page_text + "\n"
-                    if i == 0:  # Log first page sample
-                        print(f"First page sample: {page_text[:200]}...")
-                
-                # Check if we got meaningful text (more than just whitespace and minimal content)
-                text_stripped = text.strip()
-                meaningful_text = ''.join(c for c in text_stripped if c.isalnum())
-                
-                # If we have less than 100 alphanumeric characters, the PDF might be image-based
-                # Try OCR if available
-                if len(meaningful_text) < 100 and OCR_AVAILABLE:
-                    print(f"PDF appears to be image-based (only {len(meaningful_text)} chars extracted). Attempting OCR...")
-                    try:
-                        # Convert PDF pages to images
-                        images = convert_from_bytes(response.content, dpi=300)
-                        ocr_text = ""
-                        
-                        for i, image in enumerate(images):
-                            print(f"  Processing page {i+1}/{len(images)} with OCR...")
-                            # Use pytesseract to extract text
-                            page_ocr_text = pytesseract.image_to_string(image, lang='eng')
-                            ocr_text += page_ocr_text + "\n"
-                        
-                        # If OCR extracted more text, use it
-                        ocr_meaningful = ''.join(c for c in ocr_text if c.isalnum())
-                        if len(ocr_meaningful) > len(meaningful_text):
-                            print(f"OCR extracted {len(ocr_meaningful)} characters (vs {len(meaningful_text)} from direct extraction)")
-                            text = ocr_text
-                        else:
-                            print(f"OCR didn't improve extraction ({len(ocr_meaningful)} vs {len(meaningful_text)}), using original")
-                    except Exception as ocr_error:
-                        print(f"OCR failed: {ocr_error}. Using original text extraction.")
-                        # Continue with original text even if OCR fails
-                
-                print(f"Total extracted: {len(text)} characters from {len(pdf_reader.pages)} pages")
-                return text
-            except Exception as e:
-                print(f"PDF extraction error: {e}")
-                # If direct extraction fails and OCR is available, try OCR only
-                if OCR_AVAILABLE:
-                    try:
-                        print("Direct extraction failed, trying OCR...")
-                        images = convert_from_bytes(response.content, dpi=300)
-                        ocr_text = ""
-                        for image in images:
-                            ocr_text += pytesseract.image_to_string(image, lang='eng') + "\n"
-                        print(f"OCR extracted {len(ocr_text)} characters")
-                        return ocr_text
-                    except Exception as ocr_error:
-                        print(f"OCR also failed: {ocr_error}")
-                return ""
-        
-        # If it's HTML
-        elif 'text/html' in content_type:
-            soup = BeautifulSoup(response.text, 'html.parser')
-            # Remove script and style elements
-            for script in soup(["script", "style"]):
-                script.decompose()
-            return soup.get_text()
-        
-        return ""
-    except Exception as e:
-        print(f"Error extracting text from {url}: {e}")
-        return ""
+            # Pages without a usable text layer are image-only slides or scans;
+            # only those go to OCR, the rest keep their extracted text
+            image_pages = [
+                i + 1 for i, page_text in enumerate(page_texts)
+                if _meaningful_length(page_text) < settings.OCR_PAGE_TEXT_THRESHOLD
+            ]
+            if image_pages and OCR_AVAILABLE:
+                print(f"{len(image_pages)} of {len(page_texts)} pages have no text layer. Attempting OCR on those pages...")
+                try:
+                    ocr_pages = ocr_pdf(content, image_pages)
+                    improved = 0
+                    for page_number, ocr_text in ocr_pages.items():
+                        if _meaningful_length(ocr_text) > _meaningful_length(page_texts[page_number - 1]):
+                            page_texts[page_number - 1] = ocr_text
+                            improved += 1
+                    print(f"OCR improved {improved} of {len(image_pages)} pages")
+                except Exception as ocr_error:
+                    print(f"OCR failed: {ocr_error}. Using original text extraction.")
+                    # Continue with original text even if OCR fails
+            
+            # Merge pages back in page order
+            text = "".join(page_text + "\n" for page_text in page_texts)
+            
+            print(f"Total extracted: {len(text)} characters from {len(pdf_reader.pages)} pages")
+            return text
+        except Exception as e:
+            print(f"PDF extraction error: {e}")
+            # If direct extraction fails and OCR is available, try OCR only
+            if OCR_AVAILABLE:
+                try:
+                    print("Direct extraction failed, trying OCR...")
+                    ocr_pages = ocr_pdf(content)
+                    ocr_text = "\n".join(ocr_pages[page] for page in sorted(ocr_pages))
+                    print(f"OCR extracted {len(ocr_text)} characters")
+                    return ocr_text
+                except Exception as ocr_error:
+                    print(f"OCR also failed: {ocr_error}")
+            return ""
+    
+    # If it's HTML
+    elif 'text/html' in content_type:
+        soup = BeautifulSoup(content, 'html.parser')
+        # Remove script and style elements
+        for script in soup(["script", "style"]):
+            script.decompose()
+        return soup.get_text()
+    
+    return ""
 
 
-def generate_flashcards_with_groq(
+def extract_and_cache_text(content: bytes, content_type: str, file_key: Optional[str] = None) -> str:
+    """
+    Extract text from downloaded content, reusing and populating the extraction cache
+    
+    Identical content already parsed under another URL or file version skips the parse.
+    """
+    content_hash = hashlib.sha256(content).hexdigest()
+    text = extraction_cache.get_text_by_hash(content_hash)
+    if text is not None:
+        print(f"Extraction cache hit for content {content_hash[:12]} ({len(text)} characters)")
+        if file_key:
+            # So the next lookup for this file version hits without a download
+            extraction_cache.store_text(file_key, content_hash, text)
+        return text
+
+    text = extract_text_from_content(content, content_type)
+    extraction_cache.store_text(
+        file_key or extraction_cache.content_cache_key(content_hash),
+        content_hash,
+        text
+    )
+    return text
+
+
+async def generate_flashcards_with_groq(
     content: str,
     module_name: str,
     num_cards: int = 15
@@ -157,17 +169,14 @@ def generate_flashcards_with_groq(
     """
     Generate flashcards from content using Groq LLM
     """
-    groq_api_key = settings.GROQ_API_KEY
-    if not groq_api_key:
+    if not settings.GROQ_API_KEY:
         raise ValueError("GROQ_API_KEY not configured. Please set it in .env file")
     
-    # Truncate content if too long
-    max_content_length = 8000
-    if len(content) > max_content_length:
-        content = content[:max_content_length] + "..."
+    system_prompt = "You are an expert educational content creator who generates high-quality study flashcards. Always return valid JSON."
     
-    # Create prompt
-    prompt = f"""You are an expert educational content creator. Generate exactly {num_cards} high-quality study flashcards from the following course material.
+    # Create prompt, fitting the content to the token budget
+    def build_prompt(material: str) -> str:
+        return f"""You are an expert educational content creator. Generate exactly {num_cards} high-quality study flashcards from the following course material.
 
 IMPORTANT GUIDELINES:
 1. Create diverse types of questions:
@@ -188,7 +197,7 @@ IMPORTANT GUIDELINES:
 CONTENT FROM: {module_name}
 
 TEXT:
-{content}
+{material}
 
 Generate exactly {num_cards} flashcards in this JSON format:
 [
@@ -197,38 +206,35 @@ Generate exactly {num_cards} flashcards in this JSON format:
 ]
 
 JSON array:"""
+    
+    prompt = pack_prompt(
+        build_prompt,
+        content,
+        endpoint="flashcards",
+        model=MODEL,
+        max_output_tokens=FLASHCARD_MAX_TOKENS,
+        context_budget=settings.GENERATION_CONTEXT_TOKENS,
+        query=module_name,
+        system_prompt=system_prompt
+    ).prompt
 
     try:
-        response = requests.post(
-            GROQ_API_URL,
-            headers={
-                "Authorization": f"Bearer {groq_api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": MODEL,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are an expert educational content creator who generates high-quality study flashcards. Always return valid JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 2000
-            },
-            timeout=60
+        content_text = await llm_client.chat_completion(
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            model=MODEL,
+            temperature=0.7,
+            max_tokens=FLASHCARD_MAX_TOKENS
         )
         
-        if response.status_code != 200:
-            raise ValueError(f"Groq API error: {response.status_code}")
-        
-        result = response.json()
-        content_text = result['choices'][0]['message']['content'].strip()
-        
         # Extract JSON
         if "```json" in content_text:
             content_text = content_text.split("```json")[1].split("```")[0].strip()
@@ -270,7 +276,7 @@ JSON array:"""
         raise ValueError(f"Flashcard generation failed: {e}")
 
 
-def generate_quiz_with_groq(
+async def generate_quiz_with_groq(
     content: str,
     module_name: str,
     num_questions: int = 10
@@ -278,17 +284,14 @@ def generate_quiz_with_groq(
     """
     Generate quiz questions from content using Groq LLM
     """
-    groq_api_key = settings.GROQ_API_KEY
-    if not groq_api_key:
+    if not settings.GROQ_API_KEY:
         raise ValueError("GROQ_API_KEY not configured. Please set it in .env file")
     
-    # Truncate content if too long
-    max_content_length = 8000
-    if len(content) > max_content_length:
-        content = content[:max_content_length] + "..."
+    system_prompt = "You are an expert educational content creator who generates high-quality multiple-choice quiz questions. Always return valid JSON."
     
-    # Create prompt for quiz generation
-    prompt = f"""You are an expert educational content creator. Generate exactly {num_questions} multiple-choice quiz questions from the following course material.
+    # Create prompt for quiz generation, fitting the content to the token budget
+    def build_prompt(material: str) -> str:
+        return f"""You are an expert educational content creator. Generate exactly {num_questions} multiple-choice quiz questions from the following course material.
 
 IMPORTANT GUIDELINES:
 1. Create diverse question types:
@@ -314,7 +317,7 @@ IMPORTANT GUIDELINES:
 CONTENT FROM: {module_name}
 
 TEXT:
-{content}
+{material}
 
 Generate exactly {num_questions} questions in this JSON format:
 [
@@ -326,38 +329,35 @@ Generate exactly {num_questions} questions in this JSON format:
 ]
 
 JSON array:"""
+    
+    prompt = pack_prompt(
+        build_prompt,
+        content,
+        endpoint="quiz",
+        model=MODEL,
+        max_output_tokens=QUIZ_MAX_TOKENS,
+        context_budget=settings.GENERATION_CONTEXT_TOKENS,
+        query=module_name,
+        system_prompt=system_prompt
+    ).prompt
 
     try:
-        response = requests.post(
-            GROQ_API_URL,
-            headers={
-                "Authorization": f"Bearer {groq_api_key}",
-                "Content-Type": "application/json"
-            },
-            json={
-                "model": MODEL,
-                "messages": [
-                    {
-                        "role": "system",
-                        "content": "You are an expert educational content creator who generates high-quality multiple-choice quiz questions. Always return valid JSON."
-                    },
-                    {
-                        "role": "user",
-                        "content": prompt
-                    }
-                ],
-                "temperature": 0.7,
-                "max_tokens": 2500
-            },
-            timeout=60
+        content_text = await llm_client.chat_completion(
+            messages=[
+                {
+                    "role": "system",
+                    "content": system_prompt
+                },
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ],
+            model=MODEL,
+            temperature=0.7,
+            max_tokens=QUIZ_MAX_TOKENS
         )
         
-        if response.status_code != 200:
-            raise ValueError(f"Groq API error: {response.status_code}")
-        
-        result = response.json()
-        content_text = result['choices'][0]['message']['content'].strip()
-        
         # Extract JSON
         if "```json" in content_text:
             content_text = content_text.split("```json")[1].split("```")[0].strip()
@@ -396,29 +396,24 @@ JSON array:"""
         raise ValueError(f"Quiz generation failed: {e}")
 
 
-def generate_chat_response_with_groq(question: str, context: str, module_name: str) -> str:
-    """
-    Generate an AI tutor chat response using course material context (RAG).
-    
-    Args:
-        question: Student's question
-        context: Extracted text from course materials (PDFs, documents)
-        module_name: Name of the module for reference
-        
-    Returns:
-        AI-generated response based on the context
-    """
-    if not settings.GROQ_API_KEY:
-        raise ValueError("GROQ_API_KEY not configured")
-    
-    client = Groq(api_key=settings.GROQ_API_KEY)
-    
-    prompt = f"""You are a direct, no-nonsense AI tutor for "{module_name}".
+def _user_message(prompt: str) -> List[Dict[str, str]]:
+    return [
+        {
+            "role": "user",
+            "content": prompt
+        }
+    ]
+
+
+def _chat_prompt(question: str, context: str, module_name: str) -> str:
+    """AI tutor prompt with the context packed to budget"""
+    def build_prompt(material: str) -> str:
+        return f"""You are a direct, no-nonsense AI tutor for "{module_name}".
 
 Question: {question}
 
 Course material context:
-{context}
+{material}
 
 Instructions:
 - Answer ONLY what was asked - no introductions, no pleasantries
@@ -430,29 +425,62 @@ Instructions:
 
 Answer:"""
     
+    return pack_prompt(
+        build_prompt,
+        context,
+        endpoint="chat",
+        model=MODEL,
+        max_output_tokens=CHAT_MAX_TOKENS,
+        context_budget=settings.CHAT_CONTEXT_TOKENS,
+        query=question
+    ).prompt
+
+
+async def generate_chat_response_with_groq(question: str, context: str, module_name: str) -> str:
+    """
+    Generate an AI tutor chat response using course material context (RAG).
+    
+    Args:
+        question: Student's question
+        context: Extracted text from course materials (PDFs, documents)
+        module_name: Name of the module for reference
+        
+    Returns:
+        AI-generated response based on the context
+    """
+    prompt = _chat_prompt(question, context, module_name)
+    
     try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+        return await llm_client.chat_completion(
+            _user_message(prompt),
             model=MODEL,  # Use same model as flashcards (llama-3.1-8b-instant)
             temperature=0.7,
-            max_tokens=1000,
-            top_p=1,
-            stream=False
+            max_tokens=CHAT_MAX_TOKENS
         )
         
-        response = chat_completion.choices[0].message.content
-        return response.strip()
-        
     except Exception as e:
         raise ValueError(f"Chat response generation failed: {e}")
 
 
-def generate_active_recall_question_with_groq(context: str, module_name: str) -> str:
+async def stream_chat_response_with_groq(question: str, context: str, module_name: str) -> AsyncIterator[str]:
+    """
+    Stream an AI tutor chat response token by token.
+    
+    Same prompt as generate_chat_response_with_groq, but text is yielded as
+    Groq produces it so the first words reach the student immediately.
+    """
+    prompt = _chat_prompt(question, context, module_name)
+    
+    try:
+        async for token in llm_client.stream_chat_completion(
+            _user_message(prompt), model=MODEL, temperature=0.7, max_tokens=CHAT_MAX_TOKENS
+        ):
+            yield token
+    except Exception as e:
+        raise ValueError(f"Chat response generation failed: {e}")
+
+
+async def generate_active_recall_question_with_groq(context: str, module_name: str) -> str:
     """
     Generate an active recall question based on course material context.
     
@@ -463,14 +491,10 @@ def generate_active_recall_question_with_groq(context: str, module_name: str) ->
     Returns:
         A challenging question based on the context
     """
-    if not settings.GROQ_API_KEY:
-        raise ValueError("GROQ_API_KEY not configured")
-    
-    client = Groq(api_key=settings.GROQ_API_KEY)
-    
-    prompt = f"""Based on this course material from "{module_name}", generate ONE challenging question that tests understanding:
+    def build_prompt(material: str) -> str:
+        return f"""Based on this course material from "{module_name}", generate ONE challenging question that tests understanding:
 
-{context}
+{material}
 
 Generate a question that:
 - Tests deep understanding, not just memorization
@@ -480,51 +504,30 @@ Generate a question that:
 
 Return ONLY the question, nothing else."""
     
+    prompt = pack_prompt(
+        build_prompt,
+        context,
+        endpoint="active_recall_question",
+        model=MODEL,
+        max_output_tokens=QUESTION_MAX_TOKENS,
+        context_budget=settings.ACTIVE_RECALL_CONTEXT_TOKENS,
+        query=module_name
+    ).prompt
+    
     try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
+        return await llm_client.chat_completion(
+            _user_message(prompt),
             model=MODEL,
             temperature=0.8,  # Slightly higher for variety
-            max_tokens=200,
-            top_p=1,
-            stream=False
+            max_tokens=QUESTION_MAX_TOKENS
         )
         
-        question = chat_completion.choices[0].message.content
-        return question.strip()
-        
     except Exception as e:
         raise ValueError(f"Question generation failed: {e}")
 
 
-def grade_active_recall_answer_with_groq(
-    question: str, 
-    user_answer: str, 
-    context: str, 
-    difficulty: str
-) -> Dict[str, any]:
-    """
-    Grade a user's answer using AI based on course material and difficulty level.
-    
-    Args:
-        question: The question asked
-        user_answer: Student's answer
-        context: Course material context
-        difficulty: Grading mode - "easy", "balanced", or "tough"
-        
-    Returns:
-        Dict with score, feedback, and correct answer
-    """
-    if not settings.GROQ_API_KEY:
-        raise ValueError("GROQ_API_KEY not configured")
-    
-    client = Groq(api_key=settings.GROQ_API_KEY)
-    
+def _grade_prompt(question: str, user_answer: str, context: str, difficulty: str) -> str:
+    """Grading prompt for the difficulty level, with the context packed to budget"""
     # Adjust grading criteria based on difficulty
     if difficulty == "easy":
         criteria = """- Award points for partial understanding
@@ -542,12 +545,13 @@ def grade_active_recall_answer_with_groq(
 - Deduct points for minor inaccuracies
 - 90%+ only for excellent answers"""
     
-    prompt = f"""Grade this student answer using {difficulty} grading standards.
+    def build_prompt(material: str) -> str:
+        return f"""Grade this student answer using {difficulty} grading standards.
 
 Question: {question}
 
 Course Material Context:
-{context}
+{material}
 
 Student's Answer:
 {user_answer}
@@ -565,35 +569,83 @@ Provide your grading in this EXACT JSON format:
 
 Be direct and specific. No introductions."""
     
+    return pack_prompt(
+        build_prompt,
+        context,
+        endpoint="active_recall_grade",
+        model=MODEL,
+        max_output_tokens=GRADE_MAX_TOKENS,
+        context_budget=settings.ACTIVE_RECALL_CONTEXT_TOKENS,
+        query=f"{question}\n{user_answer}"
+    ).prompt
+
+
+def parse_grade_response(response_text: str) -> Dict[str, any]:
+    """Parse the grading JSON, unwrapping markdown code blocks"""
+    response_text = response_text.strip()
+    if "```json" in response_text:
+        response_text = response_text.split("```json")[1].split("```")[0].strip()
+    elif "```" in response_text:
+        response_text = response_text.split("```")[1].split("```")[0].strip()
+    
     try:
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model=MODEL,
-            temperature=0.3,  # Lower for more consistent grading
-            max_tokens=500,
-            top_p=1,
-            stream=False
-        )
-        
-        response_text = chat_completion.choices[0].message.content.strip()
-        
-        # Parse JSON response
-        # Try to extract JSON if wrapped in markdown code blocks
-        if "```json" in response_text:
-            response_text = response_text.split("```json")[1].split("```")[0].strip()
-        elif "```" in response_text:
-            response_text = response_text.split("```")[1].split("```")[0].strip()
-        
-        result = json.loads(response_text)
-        return result
-        
+        return json.loads(response_text)
     except json.JSONDecodeError as e:
         print(f"Failed to parse grading response. Content:\n{response_text}")
         raise ValueError(f"Failed to parse grading response: {e}")
+
+
+async def grade_active_recall_answer_with_groq(
+    question: str, 
+    user_answer: str, 
+    context: str, 
+    difficulty: str
+) -> Dict[str, any]:
+    """
+    Grade a user's answer using AI based on course material and difficulty level.
+    
+    Args:
+        question: The question asked
+        user_answer: Student's answer
+        context: Course material context
+        difficulty: Grading mode - "easy", "balanced", or "tough"
+        
+    Returns:
+        Dict with score, feedback, and correct answer
+    """
+    prompt = _grade_prompt(question, user_answer, context, difficulty)
+    
+    try:
+        response_text = await llm_client.chat_completion(
+            _user_message(prompt),
+            model=MODEL,
+            temperature=0.3,  # Lower for more consistent grading
+            max_tokens=GRADE_MAX_TOKENS
+        )
+    except Exception as e:
+        raise ValueError(f"Answer grading failed: {e}")
+    
+    return parse_grade_response(response_text)
+
+
+async def stream_grade_active_recall_answer_with_groq(
+    question: str,
+    user_answer: str,
+    context: str,
+    difficulty: str
+) -> AsyncIterator[str]:
+    """
+    Stream the grading response token by token.
+    
+    Yields the raw JSON text as Groq produces it; pass the joined text to
+    parse_grade_response once the stream ends.
+    """
+    prompt = _grade_prompt(question, user_answer, context, difficulty)
+    
+    try:
+        async for token in llm_client.stream_chat_completion(
+            _user_message(prompt), model=MODEL, temperature=0.3, max_tokens=GRADE_MAX_TOKENS
+        ):
+            yield token
     except Exception as e:
         raise ValueError(f"Answer grading failed: {e}")
@@ -0,0 +1,214 @@
+"""
+Generation Cache
+Reuses AI-generated flashcard and quiz sets across requests. Students in the
+same section generate from the same module files with the same counts, so a
+set is keyed by a hash of the (whitespace-normalized) prompt context plus
+module name, count, prompt version and model. Hits are served without a
+Groq call; larger cached sets are sampled down, and items (and quiz
+options) are shuffled so each student sees some variety. Entries expire
+after a TTL and are evicted least-recently-used beyond the size limit.
+Hit and miss counts are exposed through /metrics.
+"""
+
+import hashlib
+import json
+import random
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.generated_set import GeneratedSet
+
+KINDS = ("flashcards", "quiz")
+OPTION_LETTERS = "ABCD"
+
+
+def content_hash(content: str) -> str:
+    """SHA-256 of the content with whitespace differences removed"""
+    return hashlib.sha256(" ".join(content.split()).encode("utf-8")).hexdigest()
+
+
+def base_key(kind: str, content: str, module_name: str, prompt_version: int, model: str) -> str:
+    """Key shared by every cached set for the same material, whatever the count"""
+    return f"{kind}:{content_hash(content)}:{module_name.strip().lower()}:p{prompt_version}:{model}"
+
+
+def _expiry_cutoff() -> datetime:
+    return datetime.utcnow() - timedelta(seconds=settings.GENERATION_CACHE_TTL_SECONDS)
+
+
+def shuffle_quiz_options(question: Dict) -> Dict:
+    """Shuffle a quiz question's options, keeping correct_answer pointing at the same text"""
+    options = question.get("options")
+    letter = str(question.get("correct_answer", "")).strip().upper()[:1]
+    if not isinstance(options, list) or len(options) > len(OPTION_LETTERS) or letter not in OPTION_LETTERS[:len(options)]:
+        return question
+    correct = options[OPTION_LETTERS.index(letter)]
+    shuffled = random.sample(options, len(options))
+    return {**question, "options": shuffled, "correct_answer": OPTION_LETTERS[shuffled.index(correct)]}
+
+
+def _present(kind: str, items: List[Dict], count: int) -> List[Dict]:
+    """Sample a cached set down to the requested count, shuffling if enabled"""
+    if not settings.GENERATION_CACHE_SHUFFLE:
+        return items[:count]
+    items = random.sample(items, min(count, len(items)))
+    if kind == "quiz":
+        items = [shuffle_quiz_options(item) for item in items]
+    return items
+
+
+def get_items(kind: str, key: str, count: int) -> Optional[List[Dict]]:
+    """
+    Return a cached set for the material, or None on a miss
+
+    The set generated for exactly this count is preferred; otherwise any
+    unexpired set for the same material with at least count items is sampled.
+    """
+    if not settings.GENERATION_CACHE_ENABLED:
+        return None
+
+    db = SessionLocal(for_write=True)
+    try:
+        fresh = db.query(GeneratedSet).filter(
+            GeneratedSet.base_key == key,
+            GeneratedSet.created_at >= _expiry_cutoff()
+        )
+        entry = fresh.filter(GeneratedSet.cache_key == f"{key}:{count}").first()
+        if entry is None:
+            entry = fresh.filter(
+                GeneratedSet.item_count >= count
+            ).order_by(GeneratedSet.item_count).first()
+        if entry is None:
+            metrics.increment(f"generation_cache.{kind}.miss")
+            return None
+
+        entry.hit_count = (entry.hit_count or 0) + 1
+        entry.last_accessed_at = datetime.utcnow()
+        db.commit()
+        metrics.increment(f"generation_cache.{kind}.hit")
+        return _present(kind, json.loads(entry.items), count)
+    except Exception as e:
+        print(f"Warning: Generation cache lookup failed: {e}")
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+def store_items(
+    kind: str,
+    key: str,
+    count: int,
+    items: List[Dict],
+    content: str,
+    module_name: str,
+    prompt_version: int,
+    model: str
+) -> None:
+    """Store a generated set and evict expired or least-recently-used entries"""
+    if not settings.GENERATION_CACHE_ENABLED or not items:
+        return
+
+    payload = json.dumps(items)
+    db = SessionLocal(for_write=True)
+    try:
+        cache_key = f"{key}:{count}"
+        existing = db.query(GeneratedSet).filter(GeneratedSet.cache_key == cache_key).first()
+        if existing:
+            existing.items = payload
+            existing.item_count = len(items)
+            existing.size_bytes = len(payload.encode('utf-8'))
+            existing.created_at = datetime.utcnow()
+            existing.last_accessed_at = datetime.utcnow()
+        else:
+            db.add(GeneratedSet(
+                cache_key=cache_key,
+                base_key=key,
+                kind=kind,
+                content_hash=content_hash(content),
+                module_name=module_name,
+                prompt_version=prompt_version,
+                model=model,
+                item_count=len(items),
+                items=payload,
+                size_bytes=len(payload.encode('utf-8'))
+            ))
+        db.commit()
+        _evict(db)
+    except IntegrityError:
+        # Another request stored the same set first
+        db.rollback()
+    except Exception as e:
+        print(f"Warning: Generation cache store failed: {e}")
+        db.rollback()
+    finally:
+        db.close()
+
+
+def _evict(db) -> None:
+    """Delete expired entries, then least-recently-used ones beyond the size limit"""
+    db.query(GeneratedSet).filter(
+        GeneratedSet.created_at < _expiry_cutoff()
+    ).delete(synchronize_session=False)
+
+    count = db.query(func.count(GeneratedSet.id)).scalar()
+    excess = count - settings.GENERATION_CACHE_MAX_ENTRIES
+    if excess > 0:
+        oldest = [
+            entry_id for (entry_id,) in db.query(GeneratedSet.id)
+            .order_by(GeneratedSet.last_accessed_at)
+            .limit(excess)
+        ]
+        db.query(GeneratedSet).filter(
+            GeneratedSet.id.in_(oldest)
+        ).delete(synchronize_session=False)
+        print(f"Generation cache evicted {len(oldest)} entries")
+    db.commit()
+
+
+async def get_or_generate(
+    kind: str,
+    content: str,
+    module_name: str,
+    count: int,
+    prompt_version: int,
+    model: str,
+    generate: Callable[[], Awaitable[List[Dict]]],
+    refresh: bool = False
+) -> List[Dict]:
+    """
+    Serve a cached set for this material, or generate and cache a new one
+
+    Args:
+        generate: Makes the Groq call on a miss
+        refresh: Skip the lookup and replace the cached set
+    """
+    key = base_key(kind, content, module_name, prompt_version, model)
+    if not refresh:
+        items = get_items(kind, key, count)
+        if items is not None:
+            print(f"Generation cache hit: {len(items)} {kind} items for '{module_name}'")
+            return items
+
+    items = await generate()
+    store_items(kind, key, count, items, content, module_name, prompt_version, model)
+    return items
+
+
+def hit_rates() -> Dict[str, Dict[str, float]]:
+    """Hits, misses and hit rate per kind since startup"""
+    rates = {}
+    for kind in KINDS:
+        hits = metrics.counter(f"generation_cache.{kind}.hit")
+        misses = metrics.counter(f"generation_cache.{kind}.miss")
+        total = hits + misses
+        rates[kind] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+    return rates
@@ -0,0 +1,434 @@
+"""
+Content Ingestion Service
+Resolves the Canvas files behind flashcard, quiz and AI tutor requests,
+downloads them concurrently with httpx and parses them off the event loop
+"""
+
+import asyncio
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+from urllib.parse import urljoin, urlparse, unquote
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.encryption import decrypt_data
+from app.db.database import SessionLocal
+from app.models.course import Course
+from app.models.module import Module
+from app.models.user import User
+from app.services import chunk_index, course_files_index, extraction_cache
+from app.services.prompt_packer import strip_boilerplate
+from app.services.retrieval import select_context
+from app.services.flashcard_generator import (
+    canvas_file_id,
+    find_document_links,
+    extract_and_cache_text,
+)
+
+# PDF parsing, OCR and cache writes are blocking, so they run on this pool
+_parse_executor = ThreadPoolExecutor(
+    max_workers=settings.INGESTION_PARSE_WORKERS,
+    thread_name_prefix="ingestion"
+)
+
+# Bounds concurrent Canvas downloads per user so one large request can't hog the host
+# (per event loop: background indexing runs its own loop in a worker thread)
+_user_semaphores: Dict[Optional[int], Tuple[asyncio.AbstractEventLoop, asyncio.Semaphore]] = {}
+
+# Canvas file URLs look like /courses/{course_id}/files/{file_id}
+CANVAS_COURSE_FILES_PATTERN = re.compile(r'/courses/(\d+)/files/')
+
+# Module item pages (/courses/{course_id}/modules/items/{item_id}) redirect to their content
+CANVAS_MODULE_ITEM_PATTERN = re.compile(r'/modules/items/(\d+)')
+
+
+def _user_semaphore(user_id: Optional[int]) -> asyncio.Semaphore:
+    """Get the download semaphore for a user on the running event loop"""
+    loop = asyncio.get_running_loop()
+    entry = _user_semaphores.get(user_id)
+    if entry is None or entry[0] is not loop:
+        entry = (loop, asyncio.Semaphore(settings.INGESTION_MAX_CONCURRENCY_PER_USER))
+        _user_semaphores[user_id] = entry
+    return entry[1]
+
+
+async def _run_blocking(func, *args):
+    """Run a blocking function on the parse worker pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_parse_executor, func, *args)
+
+
+def _create_canvas_client(session_cookie: str, canvas_url: str) -> httpx.AsyncClient:
+    """Create an async HTTP client authenticated with the Canvas session cookie"""
+    cookies = httpx.Cookies()
+    cookies.set("canvas_session", session_cookie, domain=urlparse(canvas_url).hostname or "")
+    return httpx.AsyncClient(
+        cookies=cookies,
+        headers={"User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36"},
+        follow_redirects=True,
+        timeout=settings.INGESTION_REQUEST_TIMEOUT
+    )
+
+
+async def _get_file_version(client: httpx.AsyncClient, canvas_url: str, file_id: str) -> Optional[str]:
+    """Look up a Canvas file's updated_at without downloading it"""
+    try:
+        response = await client.get(
+            urljoin(canvas_url, f"/api/v1/files/{file_id}"),
+            follow_redirects=False,
+            timeout=15.0
+        )
+        if response.status_code != 200 or 'json' not in response.headers.get('Content-Type', ''):
+            return None
+        data = response.json()
+        return data.get('updated_at') or data.get('modified_at') or response.headers.get('ETag')
+    except Exception as e:
+        print(f"Could not fetch file metadata for {file_id}: {e}")
+        return None
+
+
+async def _module_item_file_id(client: httpx.AsyncClient, url: str) -> Optional[str]:
+    """The Canvas file id a module item URL redirects to, without following it"""
+    try:
+        response = await client.get(url, follow_redirects=False, timeout=15.0)
+        if response.is_redirect:
+            return canvas_file_id(response.headers.get('Location', ''))
+    except Exception as e:
+        print(f"Could not resolve module item {url}: {e}")
+    return None
+
+
+async def _download_document(client: httpx.AsyncClient, url: str, canvas_url: str) -> Tuple[bytes, str]:
+    """Download a Canvas URL, following module item pages to the underlying file"""
+    print(f"Fetching: {url}")
+    response = await client.get(url)
+    content_type = response.headers.get('Content-Type', '')
+    print(f"Content-Type: {content_type}, Status: {response.status_code}")
+
+    if 'text/html' in content_type:
+        links = await _run_blocking(find_document_links, response.text, canvas_url)
+        for file_url in links:
+            print(f"Found file link: {file_url}")
+            response = await client.get(file_url)
+            content_type = response.headers.get('Content-Type', '')
+            if 'application/pdf' in content_type:
+                break
+
+    return response.content, content_type
+
+
+async def extract_text_from_url_async(
+    client: httpx.AsyncClient,
+    url: str,
+    canvas_url: str,
+    file_id: Optional[str] = None
+) -> str:
+    """
+    Download a Canvas URL and extract its text
+
+    Extracted text is cached by Canvas file id + updated_at (or by content
+    hash when the file version is unknown), so a cached file costs one
+    metadata request and no download or parse. The file id comes from
+    file_id (a module item's content_id), the URL itself, or for a module
+    item URL the file it redirects to.
+    """
+    try:
+        file_key = None
+        file_id = file_id or canvas_file_id(url)
+        if not file_id and CANVAS_MODULE_ITEM_PATTERN.search(url):
+            file_id = await _module_item_file_id(client, url)
+        if file_id:
+            version = await _get_file_version(client, canvas_url, file_id)
+            if version:
+                file_key = extraction_cache.file_cache_key(file_id, version)
+                cached_text = await _run_blocking(extraction_cache.get_text, file_key)
+                if cached_text is not None:
+                    print(f"Extraction cache hit for file {file_id} ({len(cached_text)} characters)")
+                    return cached_text
+
+        content, content_type = await _download_document(client, url, canvas_url)
+        return await _run_blocking(extract_and_cache_text, content, content_type, file_key)
+    except Exception as e:
+        print(f"Error extracting text from {url}: {e}")
+        return ""
+
+
+async def extract_texts_from_urls(
+    urls: List[str],
+    session_cookie: str,
+    canvas_url: str,
+    user_id: Optional[int] = None,
+    file_ids: Optional[Dict[str, str]] = None
+) -> List[str]:
+    """
+    Extract text from several Canvas URLs concurrently
+
+    Downloads run in parallel (bounded per user) and parsing runs on a worker
+    pool, so wall-clock time tracks the slowest file rather than the sum.
+    file_ids maps URLs whose Canvas file id is already known (module items)
+    to it. Returns texts in the same order as urls; failed files yield "".
+    """
+    if not urls:
+        return []
+
+    semaphore = _user_semaphore(user_id)
+
+    async with _create_canvas_client(session_cookie, canvas_url) as client:
+        async def ingest(url: str) -> str:
+            async with semaphore:
+                return await extract_text_from_url_async(client, url, canvas_url, (file_ids or {}).get(url))
+
+        return list(await asyncio.gather(*(ingest(url) for url in urls)))
+
+
+class IngestedContent:
+    """Text extracted for a request, plus where it came from"""
+
+    def __init__(self, text: str = "", references: Optional[List[str]] = None, items_processed: int = 0):
+        self.text = text
+        self.references = references or []
+        self.items_processed = items_processed
+        self.documents: List[Tuple[str, str]] = []  # (name, text) per extracted source
+
+    def select_context(self, query: str, token_budget: int) -> str:
+        """The passages most relevant to query, within token_budget"""
+        # Drop repeated slide headers/footers before they take up budget
+        documents = [(name, strip_boilerplate(text)[0]) for name, text in self.documents]
+        return select_context(documents, query, token_budget)
+
+
+class ContentIngestionService:
+    """
+    Resolves the Canvas files a flashcard, quiz or AI tutor request refers to
+    and extracts their text
+
+    Shared by every RAG endpoint so course lookup, Files tab listing,
+    concurrent extraction and the text budget live in one code path.
+    Works with a Session (job handlers) or an AsyncSession (async routes).
+    """
+
+    # Module items considered when no files are selected explicitly
+    MAX_MODULE_ITEMS = 10
+
+    def __init__(self, db: Union[Session, AsyncSession], user: User):
+        self.db = db
+        self.user = user
+        self.canvas_url = user.canvas_instance_url or settings.CANVAS_INSTANCE_URL
+        self.session_cookie = decrypt_data(user.canvas_session_cookie) if user.canvas_session_cookie else ""
+
+    async def _run_db(self, func, *args):
+        """func(session, *args) on this service's session, without blocking the loop for an AsyncSession"""
+        if isinstance(self.db, AsyncSession):
+            return await self.db.run_sync(func, *args)
+        return func(self.db, *args)
+
+    async def resolve_course(self, module: Optional[Module], file_urls: List[str]) -> Optional[Course]:
+        """Find the course from the module, or from /courses/{id}/files/ URLs in one query"""
+        if module:
+            return await self._run_db(lambda db: db.get(Course, module.course_id))
+
+        canvas_course_ids = []
+        for file_url in file_urls:
+            match = CANVAS_COURSE_FILES_PATTERN.search(file_url)
+            if match and match.group(1) not in canvas_course_ids:
+                canvas_course_ids.append(match.group(1))
+        if not canvas_course_ids:
+            return None
+
+        courses = await self._run_db(lambda db: db.query(Course).filter(
+            Course.canvas_id.in_(canvas_course_ids),
+            Course.user_id == self.user.id
+        ).all())
+        by_canvas_id = {course.canvas_id: course for course in courses}
+        return next((by_canvas_id[cid] for cid in canvas_course_ids if cid in by_canvas_id), None)
+
+    async def search_index(
+        self,
+        course: Course,
+        query: str,
+        token_budget: int,
+        module: Optional[Module] = None,
+        file_urls: Optional[List[str]] = None,
+        include_files_tab: bool = False
+    ) -> Optional[IngestedContent]:
+        """
+        Answer from the course's chunk index without downloading anything
+
+        Searches the selected files, else the module's PDFs, else (with
+        include_files_tab) the whole course. Returns None when those documents
+        are not indexed yet so the caller can fall back to ingest().
+        """
+        if include_files_tab:
+            source_urls = None
+        elif file_urls:
+            source_urls = list(dict.fromkeys(file_urls))
+        elif module:
+            source_urls = [url for url, _ in chunk_index.module_document_urls(module)]
+            if not source_urls:
+                return None
+        else:
+            return None
+
+        sections = await self._run_db(chunk_index.search, course.id, query, token_budget, source_urls)
+        if sections is None:
+            return None
+
+        content = IngestedContent()
+        for name, text in sections:
+            content.text += text + "\n\n"
+            content.references.append(name)
+            content.documents.append((name, text))
+            content.items_processed += 1
+        return content
+
+    async def get_files_tab_urls(self, course: Course) -> List[str]:
+        """List download URLs from a course's Files tab, served from the files index"""
+        files = await _run_blocking(_list_course_files, course.id, self.canvas_url, self.session_cookie)
+        urls = [f.get('url', '') for f in files if f.get('url')]
+        print(f"Found {len(urls)} files from Files tab")
+        return urls
+
+    async def collect_file_urls(
+        self,
+        module: Optional[Module],
+        file_urls: List[str],
+        include_files_tab: bool = False
+    ) -> List[str]:
+        """Combine user-selected files with the Files tab listing, without duplicates"""
+        all_file_urls = list(file_urls or [])
+
+        if include_files_tab:
+            try:
+                course = await self.resolve_course(module, all_file_urls)
+                if course and course.canvas_id:
+                    all_file_urls.extend(await self.get_files_tab_urls(course))
+            except Exception as e:
+                print(f"Warning: Failed to scan Files tab: {e}")
+
+        return list(dict.fromkeys(all_file_urls))
+
+    async def ingest(
+        self,
+        module: Optional[Module] = None,
+        file_urls: Optional[List[str]] = None,
+        include_files_tab: bool = False,
+        max_files: Optional[int] = None,
+        max_chars: Optional[int] = None
+    ) -> IngestedContent:
+        """
+        Extract text for a request
+
+        Selected files (plus the Files tab if requested) are used when present;
+        otherwise the module's PDF items, falling back to its other pages when
+        the PDFs yield too little text. Texts are concatenated in source order
+        until max_chars is reached.
+        """
+        items = _module_items(module)
+        all_file_urls = await self.collect_file_urls(module, file_urls or [], include_files_tab)
+
+        if all_file_urls:
+            print(f"Using {len(all_file_urls)} files (user-selected + files tab)")
+            sources = [(url, _item_name(url, items)) for url in all_file_urls]
+            fallback_sources = []
+        elif module:
+            print(f"Processing module: {module.name} ({len(items)} items)")
+            sources = []
+            fallback_sources = []
+            for item in items[:self.MAX_MODULE_ITEMS]:
+                item_url = item.get('url', '')
+                item_name = item.get('title', '') or item.get('name', '')
+                if not item_url:
+                    continue
+                if '.pdf' in item_name.lower():  # Prioritize PDFs
+                    sources.append((item_url, item_name))
+                else:
+                    fallback_sources.append((item_url, item_name))
+        else:
+            return IngestedContent()
+
+        if max_files is not None:
+            sources = sources[:max_files]
+
+        content = IngestedContent()
+        file_ids = _item_file_ids(items)
+        await self._extract_into(content, sources, max_chars, file_ids=file_ids)
+
+        # If not enough from PDFs, try the module's HTML pages
+        if fallback_sources and len(content.text) < 500 and content.items_processed < 2:
+            await self._extract_into(content, fallback_sources, max_chars, min_length=1, file_ids=file_ids)
+
+        print(f"Total text extracted: {len(content.text)} characters from {content.items_processed} items")
+        return content
+
+    async def _extract_into(
+        self,
+        content: IngestedContent,
+        sources: List[Tuple[str, str]],
+        max_chars: Optional[int],
+        min_length: int = 51,
+        file_ids: Optional[Dict[str, str]] = None
+    ) -> None:
+        """Extract sources concurrently and append them to content within the text budget"""
+        texts = await extract_texts_from_urls(
+            [url for url, _ in sources],
+            self.session_cookie,
+            self.canvas_url,
+            self.user.id,
+            file_ids
+        )
+
+        for (url, name), text in zip(sources, texts):
+            if not text or len(text) < min_length:
+                print(f"  ✗ {name}: failed to extract text or too short")
+                continue
+
+            if max_chars is not None:
+                remaining = max_chars - len(content.text)
+                if remaining <= 0:
+                    print(f"  Text budget of {max_chars} characters reached, skipping {name}")
+                    continue
+                text = text[:remaining]
+
+            print(f"  ✓ {name}: extracted {len(text)} characters")
+            content.text += text + "\n\n"
+            content.references.append(name)
+            content.documents.append((name, text))
+            content.items_processed += 1
+
+
+def _list_course_files(course_id: int, canvas_url: str, session_cookie: str) -> List[Dict]:
+    """Files tab listing for a course (runs on the worker pool with its own session)"""
+    db = SessionLocal()
+    try:
+        course = db.query(Course).filter(Course.id == course_id).first()
+        if not course or not course.canvas_id:
+            return []
+        return course_files_index.get_course_files(db, course, canvas_url, session_cookie)
+    finally:
+        db.close()
+
+
+def _module_items(module: Optional[Module]) -> List[Dict]:
+    """Module items, parsed if they were stored as a JSON string"""
+    if not module or module.items is None:
+        return []
+    if isinstance(module.items, str):
+        return json.loads(module.items)
+    return module.items
+
+
+def _item_file_ids(items: List[Dict]) -> Dict[str, str]:
+    """Canvas file ids of module items that are files (synced items carry content_id)"""
+    return {item['url']: str(item['content_id']) for item in items if item.get('url') and item.get('content_id')}
+
+
+def _item_name(file_url: str, items: List[Dict]) -> str:
+    """Name a file from its module item title, or from the URL's filename"""
+    name = next((item.get('title') for item in items if item.get('url') == file_url and item.get('title')), None)
+    if name:
+        return name
+    return os.path.basename(unquote(urlparse(file_url).path)) or 'File'
@@ -0,0 +1,340 @@
+"""
+Job Queue
+Runs long network/OCR/LLM work (Canvas imports, indexing, flashcard and quiz
+generation) outside the HTTP request. Jobs are rows in the jobs table, so no
+broker is needed: endpoints enqueue and return 202 with the job id, and a
+fixed pool of in-process async workers claims queued jobs oldest first.
+JOB_WORKERS bounds total concurrency and JOB_KIND_CONCURRENCY caps
+individual kinds. Clients poll GET /api/v1/jobs/{id}; an Idempotency-Key
+maps retries of the same request to the original job.
+
+Several processes can share the table. A claim is one UPDATE that also
+checks the per-kind limits (on PostgreSQL under an advisory lock, since
+concurrent transactions wouldn't see each other's claims). The claiming
+process owns the job and a heartbeat renews its lease every third of
+JOB_LEASE_SECONDS; a running job whose lease runs out (its process died)
+is requeued by whichever process notices first, or marked failed once it
+has been claimed JOB_MAX_ATTEMPTS times.
+
+Handlers are async functions registered with @handler("kind"); they receive
+the job payload and return a JSON-serializable result.
+"""
+
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from sqlalchemy import and_, case, func, or_, select, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, aliased
+from app.core import metrics
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.job import Job
+
+# Arbitrary key for the PostgreSQL advisory lock held while claiming a job
+CLAIM_LOCK_KEY = 74_210_014
+
+# This process, as recorded in jobs.owner
+_owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_handlers: Dict[str, Callable[[Dict], Awaitable[Any]]] = {}
+_workers: List[asyncio.Task] = []
+_heartbeat: Optional[asyncio.Task] = None
+_wakeup: Optional[asyncio.Event] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def handler(kind: str):
+    """Register an async function as the handler for a job kind"""
+    def register(func: Callable[[Dict], Awaitable[Any]]):
+        _handlers[kind] = func
+        return func
+    return register
+
+
+def _notify() -> None:
+    """Wake idle workers (safe to call from request threads)"""
+    if _loop is not None and _wakeup is not None and not _loop.is_closed():
+        _loop.call_soon_threadsafe(_wakeup.set)
+
+
+def enqueue(
+    db: Session,
+    kind: str,
+    payload: Optional[Dict] = None,
+    user_id: Optional[int] = None,
+    idempotency_key: Optional[str] = None,
+    result: Any = None
+) -> Job:
+    """
+    Queue a job, or return the existing one for the same idempotency key
+
+    Passing result records a job that was completed inline (e.g. served from
+    a pre-generated pool), so clients handle every response the same way.
+    """
+    if kind not in _handlers:
+        raise ValueError(f"No handler registered for job kind '{kind}'")
+
+    if idempotency_key:
+        existing = get_job_by_key(db, kind, user_id, idempotency_key)
+        if existing:
+            return existing
+
+    now = datetime.utcnow()
+    job = Job(
+        id=uuid.uuid4().hex,
+        kind=kind,
+        user_id=user_id,
+        idempotency_key=idempotency_key,
+        payload=payload or {},
+        status="queued" if result is None else "succeeded",
+        result=result,
+        created_at=now,
+        finished_at=None if result is None else now
+    )
+    db.add(job)
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent retry with the same key got there first
+        db.rollback()
+        return get_job_by_key(db, kind, user_id, idempotency_key)
+
+    db.refresh(job)
+    if result is None:
+        metrics.increment(f"jobs.{kind}.queued")
+        _notify()
+    return job
+
+
+def get_job(db: Session, job_id: str, user_id: Optional[int] = None) -> Optional[Job]:
+    """A job by id, restricted to a user's jobs when user_id is given"""
+    query = db.query(Job).filter(Job.id == job_id)
+    if user_id is not None:
+        query = query.filter(Job.user_id == user_id)
+    return query.first()
+
+
+def get_job_by_key(db: Session, kind: str, user_id: Optional[int], idempotency_key: str) -> Optional[Job]:
+    return db.query(Job).filter(
+        Job.kind == kind,
+        Job.user_id == user_id,
+        Job.idempotency_key == idempotency_key
+    ).first()
+
+
+def _claim_next() -> Optional[Job]:
+    """Mark the oldest runnable queued job as running under this process's lease and return it"""
+    db = SessionLocal()
+    try:
+        if db.get_bind().dialect.name == "postgresql":
+            db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CLAIM_LOCK_KEY})
+
+        candidate, running = aliased(Job), aliased(Job)
+        runnable = candidate.status == "queued"
+        limits = settings.JOB_KIND_CONCURRENCY
+        if limits:
+            running_count = (
+                select(func.count()).select_from(running)
+                .where(running.kind == candidate.kind, running.status == "running")
+                .scalar_subquery()
+            )
+            runnable = and_(runnable, or_(
+                candidate.kind.notin_(list(limits)),
+                running_count < case(limits, value=candidate.kind)
+            ))
+        oldest = select(candidate.id).where(runnable).order_by(candidate.created_at).limit(1).scalar_subquery()
+
+        # One statement, so the limits are checked against the claims before it
+        now = datetime.utcnow()
+        job_id = db.execute(
+            update(Job).where(Job.id == oldest, Job.status == "queued").values(
+                status="running",
+                owner=_owner,
+                started_at=now,
+                lease_expires_at=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                attempts=Job.attempts + 1
+            ).returning(Job.id).execution_options(synchronize_session=False)
+        ).scalar()
+        db.commit()
+        if job_id is None:
+            return None
+
+        job = db.query(Job).filter(Job.id == job_id).first()
+        db.expunge(job)
+        return job
+    except Exception as e:
+        print(f"Warning: Job claim failed: {e}")
+        db.rollback()
+        return None
+    finally:
+        db.close()
+
+
+def _finish(job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+    db = SessionLocal()
+    try:
+        # Only while this process still owns it (an expired lease may have handed it on)
+        finished = db.query(Job).filter(Job.id == job_id, Job.owner == _owner).update({
+            Job.status: status,
+            Job.result: result,
+            Job.error: error,
+            Job.lease_expires_at: None,
+            Job.finished_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.commit()
+        if not finished:
+            print(f"Warning: Job {job_id[:8]} lost its lease; its {status} result was dropped")
+    finally:
+        db.close()
+
+
+def _requeue_expired(db: Session, now: datetime) -> int:
+    """
+    Requeue running jobs whose lease has expired (or that predate leases)
+
+    A job already claimed JOB_MAX_ATTEMPTS times is marked failed instead, so
+    one that takes down its worker every time isn't retried forever.
+    """
+    expired = and_(Job.status == "running", or_(Job.lease_expires_at.is_(None), Job.lease_expires_at < now))
+    exhausted = db.query(Job).filter(expired, func.coalesce(Job.attempts, 0) >= settings.JOB_MAX_ATTEMPTS).update({
+        Job.status: "failed",
+        Job.owner: None,
+        Job.lease_expires_at: None,
+        Job.error: f"Gave up after {settings.JOB_MAX_ATTEMPTS} attempts (its worker stopped before finishing)",
+        Job.finished_at: now
+    }, synchronize_session=False)
+    if exhausted:
+        metrics.increment("jobs.exhausted", exhausted)
+        print(f"Jobs: failed {exhausted} out of attempts")
+    return db.query(Job).filter(expired).update(
+        {Job.status: "queued", Job.owner: None, Job.lease_expires_at: None}, synchronize_session=False
+    )
+
+
+def _renew_leases() -> None:
+    """Extend the leases of this process's running jobs, then requeue other processes' expired ones"""
+    db = SessionLocal()
+    try:
+        now = datetime.utcnow()
+        db.query(Job).filter(Job.owner == _owner, Job.status == "running").update(
+            {Job.lease_expires_at: now + timedelta(seconds=settings.JOB_LEASE_SECONDS)},
+            synchronize_session=False
+        )
+        requeued = _requeue_expired(db, now)
+        db.commit()
+        if requeued:
+            print(f"Jobs: requeued {requeued} with expired leases")
+            _notify()
+    finally:
+        db.close()
+
+
+def _release_owned() -> None:
+    """Hand this process's running jobs back to the queue"""
+    db = SessionLocal()
+    try:
+        released = db.query(Job).filter(Job.owner == _owner, Job.status == "running").update(
+            {Job.status: "queued", Job.owner: None, Job.lease_expires_at: None}, synchronize_session=False
+        )
+        db.commit()
+        if released:
+            print(f"Jobs: requeued {released} interrupted by shutdown")
+    finally:
+        db.close()
+
+
+async def run_job(job: Job) -> None:
+    """Run a claimed job's handler and record the outcome"""
+    started = datetime.utcnow()
+    try:
+        result = await asyncio.wait_for(
+            _handlers[job.kind](job.payload or {}),
+            timeout=settings.JOB_TIMEOUT_SECONDS
+        )
+        _finish(job.id, "succeeded", result=result)
+        metrics.increment(f"jobs.{job.kind}.succeeded")
+        print(f"Job {job.kind} {job.id[:8]} succeeded")
+    except Exception as e:
+        # HTTPException carries its message in detail
+        error = getattr(e, "detail", None) or str(e) or type(e).__name__
+        if isinstance(e, asyncio.TimeoutError):
+            error = f"Timed out after {settings.JOB_TIMEOUT_SECONDS:.0f} seconds"
+        _finish(job.id, "failed", error=str(error)[:1000])
+        metrics.increment(f"jobs.{job.kind}.failed")
+        print(f"Job {job.kind} {job.id[:8]} failed: {error}")
+    finally:
+        metrics.record(f"jobs.{job.kind}", (datetime.utcnow() - started).total_seconds())
+
+
+async def _worker(number: int) -> None:
+    while True:
+        job = await asyncio.to_thread(_claim_next)
+        if job is None:
+            try:
+                await asyncio.wait_for(_wakeup.wait(), timeout=settings.JOB_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            _wakeup.clear()
+            continue
+
+        if job.kind not in _handlers:
+            _finish(job.id, "failed", error=f"No handler registered for job kind '{job.kind}'")
+            continue
+        await run_job(job)
+
+
+async def _heartbeat_loop() -> None:
+    while True:
+        await asyncio.sleep(settings.JOB_LEASE_SECONDS / 3)
+        try:
+            await asyncio.to_thread(_renew_leases)
+        except Exception as e:
+            print(f"Warning: Job lease renewal failed: {e}")
+
+
+def _recover_and_purge() -> None:
+    """Requeue jobs whose process died (expired leases) and drop old finished jobs"""
+    db = SessionLocal()
+    try:
+        interrupted = _requeue_expired(db, datetime.utcnow())
+        cutoff = datetime.utcnow() - timedelta(hours=settings.JOB_RETENTION_HOURS)
+        purged = db.query(Job).filter(
+            Job.status.in_(["succeeded", "failed"]),
+            Job.finished_at < cutoff
+        ).delete(synchronize_session=False)
+        db.commit()
+        if interrupted or purged:
+            print(f"Jobs: requeued {interrupted} interrupted, purged {purged} finished")
+    finally:
+        db.close()
+
+
+async def start_workers() -> None:
+    """Start the worker pool (called from the app lifespan)"""
+    global _wakeup, _loop, _heartbeat
+    if _workers:
+        return
+    _loop = asyncio.get_running_loop()
+    _wakeup = asyncio.Event()
+    await asyncio.to_thread(_recover_and_purge)
+    _heartbeat = asyncio.create_task(_heartbeat_loop())
+    for number in range(settings.JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker(number)))
+    print(f"Started {settings.JOB_WORKERS} job workers")
+
+
+async def stop_workers() -> None:
+    """Cancel the worker pool and requeue the jobs it was running"""
+    global _loop, _heartbeat
+    tasks = _workers + ([_heartbeat] if _heartbeat else [])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    _workers.clear()
+    _heartbeat = None
+    _loop = None
+    await asyncio.to_thread(_release_owned)
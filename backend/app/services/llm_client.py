@@ -0,0 +1,144 @@
+"""
+LLM Client
+Process-wide async client for Groq's OpenAI-compatible chat completions API.
+One pooled httpx.AsyncClient (HTTP/2 when the h2 package is installed) is
+shared by every generator, so calls reuse warm keep-alive connections
+instead of paying a TLS handshake each, and never block the event loop.
+In-flight requests are capped by LLM_MAX_CONCURRENCY.
+"""
+
+import asyncio
+import json
+from typing import AsyncIterator, Dict, List, Optional
+import httpx
+from app.core.config import settings
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+_client: Optional[httpx.AsyncClient] = None
+_semaphore: Optional[asyncio.Semaphore] = None
+_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _completions_url() -> str:
+    return f"{settings.GROQ_API_BASE_URL.rstrip('/')}{COMPLETIONS_PATH}"
+
+
+def _headers() -> Dict[str, str]:
+    if not settings.GROQ_API_KEY:
+        raise ValueError("GROQ_API_KEY not configured. Please set it in .env file")
+    return {
+        "Authorization": f"Bearer {settings.GROQ_API_KEY}",
+        "Content-Type": "application/json"
+    }
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    The shared client for the running event loop
+
+    Pooled connections belong to the loop that opened them, so a client is
+    created per loop (in the app there is only one).
+    """
+    global _client, _semaphore, _loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _loop is not loop:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY_SECONDS
+            ),
+            timeout=httpx.Timeout(settings.LLM_REQUEST_TIMEOUT, connect=settings.LLM_CONNECT_TIMEOUT)
+        )
+        _semaphore = asyncio.Semaphore(settings.LLM_MAX_CONCURRENCY)
+        _loop = loop
+    return _client
+
+
+async def close_client() -> None:
+    """Close pooled connections (called on app shutdown)"""
+    global _client, _loop
+    if _client is not None and not _client.is_closed:
+        await _client.aclose()
+    _client = None
+    _loop = None
+
+
+def _payload(
+    messages: List[Dict[str, str]],
+    model: str,
+    temperature: float,
+    max_tokens: int,
+    stream: bool
+) -> Dict:
+    return {
+        "model": model,
+        "messages": messages,
+        "temperature": temperature,
+        "max_tokens": max_tokens,
+        "top_p": 1,
+        "stream": stream
+    }
+
+
+async def chat_completion(
+    messages: List[Dict[str, str]],
+    model: str,
+    temperature: float,
+    max_tokens: int
+) -> str:
+    """
+    Return the completion text for a list of chat messages
+
+    Raises ValueError on a missing API key or a non-200 response.
+    """
+    headers = _headers()
+    client = get_client()
+    async with _semaphore:
+        response = await client.post(
+            _completions_url(),
+            headers=headers,
+            json=_payload(messages, model, temperature, max_tokens, stream=False)
+        )
+
+    if response.status_code != 200:
+        raise ValueError(f"Groq API error: {response.status_code}")
+    return response.json()['choices'][0]['message']['content'].strip()
+
+
+async def stream_chat_completion(
+    messages: List[Dict[str, str]],
+    model: str,
+    temperature: float,
+    max_tokens: int
+) -> AsyncIterator[str]:
+    """Yield completion text as Groq streams it"""
+    headers = _headers()
+    client = get_client()
+    async with _semaphore:
+        async with client.stream(
+            "POST",
+            _completions_url(),
+            headers=headers,
+            json=_payload(messages, model, temperature, max_tokens, stream=True)
+        ) as response:
+            if response.status_code != 200:
+                raise ValueError(f"Groq API error: {response.status_code}")
+
+            async for line in response.aiter_lines():
+                if not line.startswith("data:"):
+                    continue
+                data = line[len("data:"):].strip()
+                if data == "[DONE]":
+                    break
+                choices = json.loads(data).get("choices") or []
+                if choices and choices[0].get("delta", {}).get("content"):
+                    yield choices[0]["delta"]["content"]
@@ -0,0 +1,192 @@
+"""
+OCR Engine
+Runs Tesseract over scanned PDFs in a process pool, one page at a time.
+
+Pages are rendered individually (pdf2image first_page/last_page) so a large
+deck is never rasterized into memory at once. Each page is first OCR'd at a
+low DPI and only re-rendered at a higher DPI when Tesseract's confidence is
+low. A per-document page and time budget bounds the total work.
+"""
+
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+
+# OCR imports (optional - will fail gracefully if not installed)
+try:
+    from pdf2image import convert_from_path, pdfinfo_from_path
+    import pytesseract
+    OCR_AVAILABLE = True
+except ImportError:
+    OCR_AVAILABLE = False
+    print("Warning: OCR libraries not available. Install pdf2image and pytesseract for OCR support.")
+
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    """Lazily create the OCR process pool, sized to the host's cores by default"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            workers = settings.OCR_MAX_WORKERS or os.cpu_count() or 1
+            # spawn avoids forking a process that already runs uvicorn/worker threads
+            _executor = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _executor
+
+
+def shutdown_ocr_engine() -> None:
+    """Stop the OCR process pool"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+def _remove_file(path: str) -> None:
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _remove_when_done(path: str, futures: List[Future]) -> None:
+    """
+    Delete path once no future still needs it
+
+    Pages already running when the budget runs out can't be cancelled, so
+    the last of them to finish removes the file instead of ocr_pdf.
+    """
+    running = [future for future in futures if not future.done()]
+    if not running:
+        _remove_file(path)
+        return
+
+    lock = threading.Lock()
+    remaining = [len(running)]
+
+    def finished(_future):
+        with lock:
+            remaining[0] -= 1
+            last = remaining[0] == 0
+        if last:
+            _remove_file(path)
+
+    for future in running:
+        future.add_done_callback(finished)
+
+
+def _ocr_page(pdf_path: str, page_number: int, dpi: int) -> Tuple[int, str, float, int]:
+    """
+    Render and OCR a single page (runs in a worker process)
+
+    Returns (page_number, text, mean word confidence, dpi used).
+    """
+    images = convert_from_path(pdf_path, dpi=dpi, first_page=page_number, last_page=page_number)
+    if not images:
+        return page_number, "", 0.0, dpi
+
+    image = images[0]
+    try:
+        data = pytesseract.image_to_data(image, lang='eng', output_type=pytesseract.Output.DICT)
+    finally:
+        image.close()
+
+    # Rebuild line-oriented text from Tesseract's word boxes
+    lines: Dict[Tuple[int, int, int], List[str]] = {}
+    confidences = []
+    for i, word in enumerate(data['text']):
+        if not word or not word.strip():
+            continue
+        key = (data['block_num'][i], data['par_num'][i], data['line_num'][i])
+        lines.setdefault(key, []).append(word)
+        confidence = float(data['conf'][i])
+        if confidence >= 0:
+            confidences.append(confidence)
+
+    text = "\n".join(" ".join(words) for words in lines.values())
+    mean_confidence = sum(confidences) / len(confidences) if confidences else 0.0
+    return page_number, text, mean_confidence, dpi
+
+
+def ocr_pdf(content: bytes, page_numbers: Optional[List[int]] = None) -> Dict[int, str]:
+    """
+    OCR a PDF and return text keyed by 1-based page number
+
+    Args:
+        content: Raw PDF bytes
+        page_numbers: Pages to OCR (default: every page in the document)
+
+    Pages that could not be processed within the budget are omitted.
+    """
+    if not OCR_AVAILABLE:
+        return {}
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as pdf_file:
+        pdf_file.write(content)
+        pdf_path = pdf_file.name
+
+    submitted: List[Future] = []
+    try:
+        if page_numbers is None:
+            page_count = pdfinfo_from_path(pdf_path).get('Pages', 0)
+            page_numbers = list(range(1, page_count + 1))
+
+        if len(page_numbers) > settings.OCR_MAX_PAGES:
+            print(f"OCR page budget: processing {settings.OCR_MAX_PAGES} of {len(page_numbers)} pages")
+            page_numbers = page_numbers[:settings.OCR_MAX_PAGES]
+
+        executor = _get_executor()
+        deadline = time.monotonic() + settings.OCR_TIME_BUDGET_SECONDS
+        results: Dict[int, str] = {}
+        confidences: Dict[int, float] = {}
+        pending = {
+            executor.submit(_ocr_page, pdf_path, page, settings.OCR_BASE_DPI): page
+            for page in page_numbers
+        }
+        submitted.extend(pending)
+
+        print(f"OCR: {len(page_numbers)} pages at {settings.OCR_BASE_DPI} DPI")
+
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                page = pending.pop(future)
+                try:
+                    page, text, confidence, dpi = future.result()
+                except Exception as e:
+                    print(f"  OCR failed on page {page}: {e}")
+                    continue
+
+                # Keep the low-DPI text in case the re-render misses the budget
+                if page not in results or confidence >= confidences[page]:
+                    results[page] = text
+                    confidences[page] = confidence
+                if confidence < settings.OCR_MIN_CONFIDENCE and dpi < settings.OCR_MAX_DPI:
+                    print(f"  Page {page} confidence {confidence:.0f} at {dpi} DPI, re-rendering at {settings.OCR_MAX_DPI} DPI")
+                    retry = executor.submit(_ocr_page, pdf_path, page, settings.OCR_MAX_DPI)
+                    pending[retry] = page
+                    submitted.append(retry)
+
+        if pending:
+            print(f"OCR time budget of {settings.OCR_TIME_BUDGET_SECONDS}s exhausted, skipping {len(pending)} pages")
+            for future in pending:
+                future.cancel()
+
+        return results
+    finally:
+        _remove_when_done(pdf_path, submitted)
@@ -0,0 +1,268 @@
+"""
+Module Pre-generation
+Builds a pool of flashcards and quiz questions for every imported module in
+the background, so /flashcards/generate and /quizzes/generate can answer
+with a random sample from the pool instead of waiting on Groq.
+
+Runs after signup, course scraping and Canvas session updates. Module text
+is extracted once through ContentIngestionService (which also warms the
+extraction cache), and a module is only regenerated when the context its
+pools were built from has changed.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.core import metrics
+from app.core.config import settings
+from app.core.encryption import decrypt_data
+from app.db.database import SessionLocal, use_writer
+from app.models.course import Course
+from app.models.module import Module
+from app.models.module_pool import ModulePregeneration, PregeneratedFlashcard, PregeneratedQuizQuestion
+from app.models.user import User
+from app.services.flashcard_generator import generate_flashcards_with_groq, generate_quiz_with_groq
+from app.services import job_queue
+from app.services.generation_cache import content_hash, shuffle_quiz_options
+from app.services.ingestion import ContentIngestionService
+
+# Same minimum as the live /generate endpoints
+MIN_CONTENT_CHARS = 200
+
+# Modules currently being pre-generated, so overlapping imports don't duplicate work
+_running_modules = set()
+
+
+def _dedupe(items: List[Dict]) -> List[Dict]:
+    """Drop items whose question repeats one already in the list"""
+    seen = set()
+    unique = []
+    for item in items:
+        key = " ".join(str(item.get("question", "")).lower().split())
+        if key and key not in seen:
+            seen.add(key)
+            unique.append(item)
+    return unique
+
+
+async def _generate_pool(generate, context: str, module_name: str, target: int) -> List[Dict]:
+    """Call a generator in batches until target unique items are collected"""
+    items: List[Dict] = []
+    batches = -(-target // settings.PREGENERATION_BATCH_SIZE) + 1  # One spare batch for duplicates
+    for _ in range(batches):
+        if len(items) >= target:
+            break
+        batch = min(settings.PREGENERATION_BATCH_SIZE, target - len(items))
+        items = _dedupe(items + await generate(context, module_name, batch))
+    return items[:target]
+
+
+async def _flashcard_batch(context: str, module_name: str, count: int) -> List[Dict]:
+    return await generate_flashcards_with_groq(content=context, module_name=module_name, num_cards=count)
+
+
+async def _quiz_batch(context: str, module_name: str, count: int) -> List[Dict]:
+    questions = await generate_quiz_with_groq(content=context, module_name=module_name, num_questions=count)
+    return [q for q in questions if isinstance(q.get("options"), list) and q.get("correct_answer")]
+
+
+def _state(db: Session, module_id: int) -> ModulePregeneration:
+    use_writer(db)  # The caller updates the row
+    state = db.query(ModulePregeneration).filter(ModulePregeneration.module_id == module_id).first()
+    if state is None:
+        state = ModulePregeneration(module_id=module_id)
+        db.add(state)
+    return state
+
+
+def _replace_pools(db: Session, module_id: int, flashcards: List[Dict], questions: List[Dict]) -> None:
+    """Swap a module's pools for newly generated ones"""
+    db.query(PregeneratedFlashcard).filter(
+        PregeneratedFlashcard.module_id == module_id
+    ).delete(synchronize_session=False)
+    db.query(PregeneratedQuizQuestion).filter(
+        PregeneratedQuizQuestion.module_id == module_id
+    ).delete(synchronize_session=False)
+
+    db.add_all([
+        PregeneratedFlashcard(
+            module_id=module_id,
+            question=str(card.get("question", "")),
+            answer=str(card.get("answer", "")),
+            type=card.get("type")
+        )
+        for card in flashcards if card.get("question") and card.get("answer")
+    ])
+    db.add_all([
+        PregeneratedQuizQuestion(
+            module_id=module_id,
+            question=str(question.get("question", "")),
+            options=question["options"],
+            correct_answer=str(question["correct_answer"]).strip().upper()[:1]
+        )
+        for question in questions if question.get("question")
+    ])
+
+
+async def pregenerate_module(
+    db: Session,
+    user: User,
+    module: Module,
+    canvas_url: Optional[str] = None,
+    session_cookie: Optional[str] = None
+) -> str:
+    """
+    Fill one module's flashcard and quiz pools
+
+    Returns the resulting status: "ready", "unchanged", "empty" or "failed",
+    or "running" if this process is already pre-generating the module.
+    """
+    if module.id in _running_modules:
+        return "running"
+    _running_modules.add(module.id)
+    try:
+        # The state row is read on the writer only around each update, so the
+        # writer isn't held through ingestion or generation
+        ingestion = ContentIngestionService(db, user)
+        ingestion.canvas_url = canvas_url or ingestion.canvas_url
+        ingestion.session_cookie = session_cookie or ingestion.session_cookie
+        content = await ingestion.ingest(module=module)
+        if len(content.text) < MIN_CONTENT_CHARS:
+            state = _state(db, module.id)
+            state.status = "empty"
+            db.commit()
+            return state.status
+
+        context = content.select_context(module.name, settings.GENERATION_CONTEXT_TOKENS)
+        context_hash = content_hash(context)
+        state = _state(db, module.id)
+        if state.status == "ready" and state.content_hash == context_hash:
+            db.rollback()
+            return "unchanged"
+
+        state.status = "running"
+        db.commit()
+
+        started = datetime.utcnow()
+        flashcards = await _generate_pool(
+            _flashcard_batch, context, module.name, settings.PREGENERATION_FLASHCARDS_PER_MODULE
+        )
+        questions = await _generate_pool(
+            _quiz_batch, context, module.name, settings.PREGENERATION_QUIZ_QUESTIONS_PER_MODULE
+        )
+
+        state = _state(db, module.id)
+        _replace_pools(db, module.id, flashcards, questions)
+        state.status = "ready"
+        state.content_hash = context_hash
+        state.flashcard_count = len(flashcards)
+        state.quiz_question_count = len(questions)
+        state.error = None
+        state.generated_at = datetime.utcnow()
+        db.commit()
+        metrics.record("pregeneration.module", (state.generated_at - started).total_seconds())
+        print(f"Pre-generated {len(flashcards)} flashcards and {len(questions)} quiz questions for '{module.name}'")
+        return state.status
+    except Exception as e:
+        print(f"Pre-generation failed for module {module.id}: {e}")
+        db.rollback()
+        state = _state(db, module.id)
+        state.status = "failed"
+        state.error = str(e)[:500]
+        db.commit()
+        return state.status
+    finally:
+        _running_modules.discard(module.id)
+
+
+async def pregenerate_user_modules(
+    user_id: int,
+    canvas_url: Optional[str] = None,
+    session_cookie: Optional[str] = None
+) -> Dict[str, int]:
+    """
+    Pre-generate pools for every module a user has imported (run as a background task)
+
+    Uses the user's stored Canvas session unless one is passed in.
+    """
+    stats: Dict[str, int] = {}
+    if not settings.PREGENERATION_ENABLED or not settings.GROQ_API_KEY:
+        return stats
+
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).first()
+        if not user or not (session_cookie or user.canvas_session_cookie):
+            return stats
+
+        module_ids = [
+            module_id for (module_id,) in db.query(Module.id)
+            .join(Course, Course.id == Module.course_id)
+            .filter(Course.user_id == user_id)
+            .order_by(Module.course_id, Module.position)
+            .limit(settings.PREGENERATION_MAX_MODULES_PER_USER)
+        ]
+    finally:
+        db.close()
+
+    semaphore = asyncio.Semaphore(settings.PREGENERATION_CONCURRENCY)
+
+    async def run(module_id: int) -> str:
+        async with semaphore:
+            module_db = SessionLocal()
+            try:
+                module = module_db.query(Module).filter(Module.id == module_id).first()
+                if not module:
+                    return "missing"
+                return await pregenerate_module(module_db, user, module, canvas_url, session_cookie)
+            finally:
+                module_db.close()
+
+    for result in await asyncio.gather(*(run(module_id) for module_id in module_ids)):
+        stats[result] = stats.get(result, 0) + 1
+    print(f"Pre-generation for user {user_id}: {stats}")
+    return stats
+
+
+@job_queue.handler("pregenerate_modules")
+async def run_pregenerate_modules(payload: Dict) -> Dict[str, int]:
+    """Job handler: pre-generate pools for a user's modules after an import"""
+    session_cookie = decrypt_data(payload["session_cookie"]) if payload.get("session_cookie") else None
+    return await pregenerate_user_modules(payload["user_id"], payload.get("canvas_url"), session_cookie)
+
+
+def sample_flashcards(db: Session, module_id: int, count: int) -> Optional[List[Dict]]:
+    """
+    Random flashcards from a module's pool, or None if it has fewer than count
+
+    One indexed query; no Canvas or Groq calls.
+    """
+    cards = db.query(PregeneratedFlashcard).filter(
+        PregeneratedFlashcard.module_id == module_id
+    ).order_by(func.random()).limit(count).all()
+    if len(cards) < count:
+        metrics.increment("pregeneration.flashcards.miss")
+        return None
+    metrics.increment("pregeneration.flashcards.hit")
+    return [{"question": card.question, "answer": card.answer, "type": card.type} for card in cards]
+
+
+def sample_quiz_questions(db: Session, module_id: int, count: int) -> Optional[List[Dict]]:
+    """Random quiz questions (options shuffled) from a module's pool, or None if it has fewer than count"""
+    questions = db.query(PregeneratedQuizQuestion).filter(
+        PregeneratedQuizQuestion.module_id == module_id
+    ).order_by(func.random()).limit(count).all()
+    if len(questions) < count:
+        metrics.increment("pregeneration.quiz.miss")
+        return None
+    metrics.increment("pregeneration.quiz.hit")
+    return [
+        shuffle_quiz_options({
+            "question": question.question,
+            "options": list(question.options),
+            "correct_answer": question.correct_answer
+        })
+        for question in questions
+    ]
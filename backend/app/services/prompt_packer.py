@@ -0,0 +1,172 @@
+"""
+Prompt Packer
+Fits course material into every Groq prompt by token count rather than by
+character limits. Repeated slide headers, footers and page numbers are
+removed first, then the context is trimmed to what the model's context
+window and the endpoint's budget leave after the prompt template and the
+tokens reserved for output. Packing stats are returned and recorded per
+endpoint for /metrics.
+"""
+
+import re
+from collections import Counter
+from typing import Callable, Dict, Optional, Tuple
+from app.core import metrics
+from app.core.config import settings
+from app.services.retrieval import CHARS_PER_TOKEN, estimate_tokens, select_context
+
+# Context windows (tokens) of the Groq models we call
+MODEL_CONTEXT_WINDOWS = {
+    "llama-3.1-8b-instant": 131072,
+}
+DEFAULT_CONTEXT_WINDOW = 8192
+
+# Chat format overhead per message (role markers, separators)
+MESSAGE_OVERHEAD_TOKENS = 8
+
+DIGITS_PATTERN = re.compile(r'\d+')
+
+# Headers and footers are short; longer repeated lines are left alone
+BOILERPLATE_MAX_LINE_LENGTH = 80
+
+# "[Lecture 3.pdf]" source labels added by select_context are never boilerplate
+SOURCE_LABEL_PATTERN = re.compile(r'^\[.*\]$')
+
+
+def count_tokens(text: str) -> int:
+    """Approximate Llama 3 token count (fast, no tokenizer download)"""
+    return estimate_tokens(text) if text else 0
+
+
+def _line_key(line: str) -> str:
+    """Normalize a line so 'Page 3 of 20' and 'Page 4 of 20' compare equal"""
+    return DIGITS_PATTERN.sub('#', " ".join(line.split()).lower())
+
+
+def strip_boilerplate(text: str, min_repeats: Optional[int] = None) -> Tuple[str, int]:
+    """
+    Remove lines repeated across pages, such as slide headers and footers
+
+    A short line is boilerplate when (after normalizing digits) it occurs at
+    least min_repeats times. Its first occurrence is kept unless it is only a
+    page/slide number. Returns (text, number of lines removed).
+    """
+    min_repeats = min_repeats or settings.PROMPT_BOILERPLATE_MIN_REPEATS
+    lines = text.split("\n")
+    keys = [_line_key(line) for line in lines]
+    counts = Counter(
+        key for key in keys
+        if key and len(key) <= BOILERPLATE_MAX_LINE_LENGTH and not SOURCE_LABEL_PATTERN.match(key)
+    )
+    repeated = {key for key, count in counts.items() if count >= min_repeats}
+    if not repeated:
+        return text, 0
+
+    kept = []
+    seen = set()
+    removed = 0
+    for line, key in zip(lines, keys):
+        if key in repeated:
+            if key in seen or not any(c.isalpha() for c in key):
+                removed += 1
+                continue
+            seen.add(key)
+        kept.append(line)
+
+    return "\n".join(kept), removed
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """The longest prefix of text, ending at a word boundary, within max_tokens"""
+    if count_tokens(text) <= max_tokens:
+        return text
+    cut = text[:max_tokens * CHARS_PER_TOKEN]
+    while cut and count_tokens(cut) > max_tokens:
+        cut = cut[:int(len(cut) * 0.9)]
+    space = cut.rfind(" ")
+    return cut[:space] if space > 0 else cut
+
+
+class PackedPrompt:
+    """A prompt that fits its budget, plus how it was packed"""
+
+    def __init__(self, prompt: str, stats: Dict):
+        self.prompt = prompt
+        self.stats = stats
+
+
+def pack_prompt(
+    build: Callable[[str], str],
+    context: str,
+    endpoint: str,
+    model: str,
+    max_output_tokens: int,
+    context_budget: Optional[int] = None,
+    query: str = "",
+    system_prompt: str = ""
+) -> PackedPrompt:
+    """
+    Build a prompt whose context fits the model and endpoint budgets
+
+    Args:
+        build: Returns the full user prompt for a given context string
+        context: Course material to include
+        endpoint: Name used for stats (e.g. "chat", "flashcards")
+        model: Groq model the prompt is for
+        max_output_tokens: Tokens reserved for the completion
+        context_budget: Maximum context tokens for this endpoint
+        query: What the context should support; used to keep the most
+            relevant passages when trimming
+        system_prompt: System message sent alongside the prompt
+    """
+    context_window = MODEL_CONTEXT_WINDOWS.get(model, DEFAULT_CONTEXT_WINDOW)
+    prompt_budget = min(settings.PROMPT_TOKEN_BUDGET, context_window - max_output_tokens)
+
+    template_tokens = count_tokens(build("")) + count_tokens(system_prompt) + 2 * MESSAGE_OVERHEAD_TOKENS
+    available = prompt_budget - template_tokens
+    if context_budget is not None:
+        available = min(available, context_budget)
+    available = max(available, 0)
+
+    raw_tokens = count_tokens(context)
+    context, boilerplate_removed = strip_boilerplate(context)
+    context_tokens = count_tokens(context)
+
+    truncated = False
+    if context_tokens > available:
+        truncated = True
+        budget = available
+        fitted = ""
+        # Selection budgets count chunk text only, so tighten until it fits;
+        # when no chunk fits at all, cut the text instead
+        while budget > 0:
+            fitted = select_context([("", context)], query, budget)
+            if not fitted or count_tokens(fitted) <= available:
+                break
+            budget = int(budget * 0.9)
+        if not fitted or count_tokens(fitted) > available:
+            fitted = truncate_to_tokens(context, available)
+        context = fitted
+        context_tokens = count_tokens(context)
+
+    prompt = build(context)
+    stats = {
+        "endpoint": endpoint,
+        "model": model,
+        "prompt_budget": prompt_budget,
+        "max_output_tokens": max_output_tokens,
+        "template_tokens": template_tokens,
+        "context_tokens_raw": raw_tokens,
+        "context_tokens": context_tokens,
+        "boilerplate_lines_removed": boilerplate_removed,
+        "truncated": truncated,
+        "prompt_tokens": count_tokens(prompt) + count_tokens(system_prompt) + 2 * MESSAGE_OVERHEAD_TOKENS,
+    }
+
+    print(f"Prompt [{endpoint}]: {stats['prompt_tokens']}/{prompt_budget} tokens "
+          f"(context {raw_tokens} -> {context_tokens}, {boilerplate_removed} boilerplate lines removed"
+          f"{', trimmed' if truncated else ''})")
+    metrics.record_value(f"prompt_tokens.{endpoint}", stats["prompt_tokens"])
+    metrics.record_value(f"context_tokens.{endpoint}", context_tokens)
+
+    return PackedPrompt(prompt, stats)
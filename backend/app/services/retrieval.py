@@ -0,0 +1,256 @@
+"""
+Context Retrieval Service
+Splits extracted course documents into overlapping chunks and ranks them with
+BM25 so each LLM prompt gets the passages most relevant to its question,
+under a token budget, instead of the first N characters of the material.
+"""
+
+import math
+import re
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+
+# Words too common in course material to help ranking
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below
+between both but by can could did do does doing down during each few for from further had has
+have having he her here hers him his how i if in into is it its itself just me more most my no
+nor not now of off on once only or other our ours out over own same she should so some such than
+that the their theirs them then there these they this those through to too under until up very
+was we were what when where which while who whom why will with would you your yours
+""".split())
+
+# BM25 parameters (standard values)
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# Rough characters-per-token ratio for English text with Llama tokenizers
+CHARS_PER_TOKEN = 4
+
+# Word pieces as a BPE tokenizer sees them: letter runs, digit groups, symbols
+TOKEN_PIECE_PATTERN = re.compile(r'[A-Za-z]+|\d{1,3}|[^\sA-Za-z\d]')
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate the number of Llama 3 tokens in text
+
+    Common words are one token and long words split roughly every 7
+    letters; digits group in threes and each symbol is its own token.
+    Within ~10% of the real tokenizer on English course material.
+    """
+    tokens = 0
+    for piece in TOKEN_PIECE_PATTERN.findall(text):
+        tokens += 1 + (len(piece) - 1) // 7 if piece[0].isalpha() else 1
+    return tokens
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word terms used for ranking, without stopwords"""
+    return [
+        term for term in TOKEN_PATTERN.findall(text.lower())
+        if len(term) > 1 and term not in STOPWORDS
+    ]
+
+
+class Chunk:
+    """A slice of a document: document[start:end]"""
+
+    def __init__(self, doc_index: int, start: int, end: int, text: str):
+        self.doc_index = doc_index
+        self.start = start
+        self.end = end
+        self.text = text
+        self.terms = Counter(tokenize(text))
+        self.length = sum(self.terms.values())
+
+
+def chunk_text(
+    text: str,
+    doc_index: int = 0,
+    chunk_chars: Optional[int] = None,
+    overlap_chars: Optional[int] = None
+) -> List[Chunk]:
+    """
+    Split text into overlapping chunks, preferring paragraph and sentence breaks
+
+    Chunks are exact slices of text so overlapping neighbours can be merged
+    back together without duplicating the overlap.
+    """
+    chunk_chars = chunk_chars or settings.RETRIEVAL_CHUNK_TOKENS * CHARS_PER_TOKEN
+    overlap_chars = overlap_chars if overlap_chars is not None else settings.RETRIEVAL_CHUNK_OVERLAP_TOKENS * CHARS_PER_TOKEN
+    overlap_chars = min(overlap_chars, chunk_chars // 2)
+
+    chunks = []
+    length = len(text)
+    start = 0
+    while start < length:
+        end = min(start + chunk_chars, length)
+        if end < length:
+            # Break at the last paragraph, sentence or word boundary in the back half
+            window_start = start + chunk_chars // 2
+            for separator in ("\n\n", "\n", ". ", " "):
+                position = text.rfind(separator, window_start, end)
+                if position != -1:
+                    end = position + len(separator)
+                    break
+
+        chunk = text[start:end]
+        if chunk.strip():
+            chunks.append(Chunk(doc_index, start, end, chunk))
+        if end >= length:
+            break
+
+        # Start the next chunk inside the overlap, at a word boundary
+        next_start = max(end - overlap_chars, start + 1)
+        space = text.find(" ", next_start, end)
+        start = space + 1 if space != -1 else next_start
+
+    return chunks
+
+
+class BM25Index:
+    """In-memory BM25 ranker over a list of chunks"""
+
+    def __init__(self, chunks: List[Chunk]):
+        self.chunks = chunks
+        self.document_frequency: Dict[str, int] = Counter()
+        for chunk in chunks:
+            self.document_frequency.update(chunk.terms.keys())
+        total_length = sum(chunk.length for chunk in chunks)
+        self.average_length = total_length / len(chunks) if chunks else 0.0
+
+    def idf(self, term: str) -> float:
+        """BM25 inverse document frequency (always positive)"""
+        df = self.document_frequency.get(term, 0)
+        n = len(self.chunks)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def score(self, chunk: Chunk, query_terms: List[str]) -> float:
+        """BM25 score of a chunk for the query terms"""
+        if not chunk.length:
+            return 0.0
+        score = 0.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * chunk.length / (self.average_length or 1))
+        for term in query_terms:
+            frequency = chunk.terms.get(term, 0)
+            if frequency:
+                score += self.idf(term) * frequency * (BM25_K1 + 1) / (frequency + norm)
+        return score
+
+    def rank(self, query: str) -> List[Tuple[float, Chunk]]:
+        """All chunks with their scores, best first (ties keep document order)"""
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        scored = [(self.score(chunk, query_terms), chunk) for chunk in self.chunks]
+        return sorted(scored, key=lambda item: -item[0])
+
+
+def spread_chunks(chunks: List[Chunk]) -> List[Chunk]:
+    """Order chunks so that taking a prefix samples evenly across the material"""
+    if len(chunks) <= 2:
+        return list(chunks)
+    order = []
+    seen = set()
+    step = len(chunks)
+    while step >= 1:
+        for i in range(0, len(chunks), step):
+            if i not in seen:
+                seen.add(i)
+                order.append(chunks[i])
+        step //= 2
+    return order
+
+
+def select_context(
+    documents: List[Tuple[str, str]],
+    query: str,
+    token_budget: int
+) -> str:
+    """
+    Build prompt context from the chunks most relevant to a query
+
+    Args:
+        documents: (name, text) pairs in source order
+        query: Question or topic the context should support
+        token_budget: Approximate maximum tokens of context to return
+
+    Chunks matching the query are taken best-first; any remaining budget is
+    filled with chunks sampled evenly across the documents so generic
+    requests (e.g. "flashcards for this module") still cover the material.
+    Selected chunks are returned in document order, grouped by source.
+    """
+    documents = [(name, text) for name, text in documents if text and text.strip()]
+    if not documents:
+        return ""
+
+    full_text = render_sections(documents)
+    if estimate_tokens(full_text) <= token_budget:
+        return full_text
+
+    chunks = [
+        chunk
+        for doc_index, (_, text) in enumerate(documents)
+        for chunk in chunk_text(text, doc_index)
+    ]
+    ranked = BM25Index(chunks).rank(query)
+    matching = [chunk for score, chunk in ranked if score > 0]
+    matched_ids = {id(chunk) for chunk in matching}
+    others = spread_chunks([chunk for chunk in chunks if id(chunk) not in matched_ids])
+
+    names = [name for name, _ in documents]
+    selected = pack_chunks(matching + others, names, token_budget)
+    print(f"Retrieval: selected {len(selected)}/{len(chunks)} chunks ({len(matching)} matched query)")
+
+    return render_chunks(names, selected)
+
+
+def pack_chunks(chunks: List[Chunk], names: List[str], token_budget: int) -> List[Chunk]:
+    """Take chunks in priority order until the token budget is spent"""
+    # Reserve room for source headers and separators so the rendered context fits
+    used_tokens = sum(estimate_tokens(f"[{name}]\n\n") for name in names) if len(names) > 1 else 0
+    selected = []
+    for chunk in chunks:
+        chunk_tokens = estimate_tokens(chunk.text) + 2
+        if used_tokens + chunk_tokens > token_budget:
+            continue
+        selected.append(chunk)
+        used_tokens += chunk_tokens
+    return selected
+
+
+def render_document(chunks: List[Chunk]) -> str:
+    """Join one document's chunks in order, merging overlapping neighbours"""
+    parts = []
+    last_end = None
+    for chunk in sorted(chunks, key=lambda c: c.start):
+        if last_end is not None and chunk.start <= last_end:
+            if chunk.end > last_end:
+                parts[-1] += chunk.text[last_end - chunk.start:]
+                last_end = chunk.end
+            continue
+        parts.append(chunk.text)
+        last_end = chunk.end
+
+    return "\n...\n".join(part.strip() for part in parts)
+
+
+def render_sections(sections: List[Tuple[str, str]]) -> str:
+    """Join (name, text) sections, labelling each when there is more than one"""
+    if len(sections) == 1:
+        return sections[0][1]
+    return "\n\n".join(f"[{name}]\n{text}" for name, text in sections)
+
+
+def render_chunks(names: List[str], selected: List[Chunk]) -> str:
+    """Join chunks in document order, grouped by source"""
+    sections = []
+    for doc_index, name in enumerate(names):
+        doc_chunks = [c for c in selected if c.doc_index == doc_index]
+        if doc_chunks:
+            sections.append((name, render_document(doc_chunks)))
+    if not sections:
+        return ""
+    return render_sections(sections) if len(names) > 1 else sections[0][1]
@@ -0,0 +1,375 @@
+"""
+Fake Canvas server for local testing
+
+Serves the Canvas endpoints CanvasScraper uses (course list, assignment
+groups, modules page, files) for a configurable number of courses, with a
+fixed per-request latency and optional throttling, so scraping can be
+measured without a real Canvas session. API lists are paginated with Link
+headers like Canvas: next + last, numbered next only, or bookmark next.
+Pages carry an ETag and answer If-None-Match with 304 Not Modified, and
+touch_assignments()/touch_files() bump updated_at to simulate edits.
+
+Usage:
+    python fake_canvas_server.py --port 8090 --courses 7 --latency 0.1
+
+Then point a CanvasScraper at http://127.0.0.1:8090 with any session cookie.
+"""
+import argparse
+import hashlib
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlparse
+
+PAGINATION_MODES = ("last", "next", "bookmark")
+BASE_UPDATED_AT = "2025-10-01T12:00:00Z"
+
+
+def _course_name(course_id: int) -> str:
+    # Names carry the term so filter_active_courses keeps them
+    return f"COP{4000 + course_id}.001 Course {course_id} F25"
+
+
+def _assignments(course_id: int, count: int = 3, updated=None, submissions=None):
+    updated = updated or {}
+    submissions = submissions or {}
+    return [
+        {
+            "id": course_id * 1000 + n,
+            "name": f"Course {course_id} Homework {n}",
+            "due_at": f"2025-{10 + n % 3}-{1 + n % 28:02d}T23:59:00Z",
+            "html_url": f"/courses/{course_id}/assignments/{course_id * 1000 + n}",
+            "points_possible": 10 + updated.get(n, (0,))[0],
+            "submission_types": ["online_upload"],
+            "updated_at": updated.get(n, (0, BASE_UPDATED_AT))[1],
+            "submission": submissions.get(n)
+        }
+        for n in range(1, count + 1)
+    ]
+
+
+def _assignment_groups(course_id: int, count: int = 3):
+    return [{"name": "Assignments", "assignments": _assignments(course_id, count)}]
+
+
+def _files(course_id: int, count: int, updated=None):
+    updated = updated or {}
+    return [
+        {
+            "id": course_id * 10000 + n,
+            "display_name": f"lecture_{n:04d}.pdf",
+            "url": f"/files/{course_id * 10000 + n}/download",
+            "size": 1024 * n + updated.get(n, (0,))[0],
+            "content-type": "application/pdf",
+            "updated_at": updated.get(n, (0, BASE_UPDATED_AT))[1]
+        }
+        for n in range(1, count + 1)
+    ]
+
+
+def _modules(course_id: int):
+    return [
+        {
+            "id": course_id * 100 + n,
+            "name": f"Week {n}",
+            "position": n,
+            "items": [
+                {"title": f"Week {n} slides {i}", "html_url": f"/courses/{course_id}/files/{n}{i}"}
+                for i in range(1, 3)
+            ]
+        }
+        for n in range(1, 4)
+    ]
+
+
+def _modules_page(course_id: int) -> str:
+    modules = []
+    for n in range(1, 4):
+        items = "".join(
+            f'<li class="context_module_item"><a class="ig-title title" href="/courses/{course_id}/files/{n}{i}">'
+            f'Week {n} slides {i}</a></li>'
+            for i in range(1, 3)
+        )
+        modules.append(
+            f'<div class="context_module"><h2><span class="name">Week {n}</span></h2><ul>{items}</ul></div>'
+        )
+    return f"<html><body>{''.join(modules)}</body></html>"
+
+
+class FakeCanvasHandler(BaseHTTPRequestHandler):
+    """Handles Canvas GET requests using the server's latency and throttle settings"""
+
+    # Keep-alive, so pooled sessions can reuse connections
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_GET(self):
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            throttle = server.throttle_every and server.request_count % server.throttle_every == 0
+        try:
+            time.sleep(server.latency)
+            if throttle:
+                self._throttle()
+            elif server.session_expired:
+                self._send(401, "application/json", b'{"status": "unauthenticated"}')
+            else:
+                parsed = urlparse(self.path)
+                self._route(parsed.path, dict(parse_qsl(parsed.query)))
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+    def _throttle(self):
+        with self.server.lock:
+            self.server.throttled_count += 1
+        if self.server.throttle_status == 403:
+            # How Canvas itself reports an exhausted rate limit bucket
+            self._send(403, "text/plain", b"403 Forbidden (Rate Limit Exceeded)")
+        else:
+            self._send(429, "application/json", b'{"message": "Too Many Requests"}',
+                       {"Retry-After": str(self.server.retry_after)})
+
+    def _route(self, path: str, query: dict):
+        if path == "/api/v1/courses":
+            courses = [{"id": cid, "name": _course_name(cid)} for cid in range(1, self.server.num_courses + 1)]
+            self._send_page(courses, path, query)
+            return
+
+        match = re.fullmatch(r"/api/v1/courses/(\d+)/assignment_groups", path)
+        if match:
+            self._send_page(_assignment_groups(int(match.group(1)), self.server.num_assignments), path, query)
+            return
+
+        match = re.fullmatch(r"/api/v1/courses/(\d+)/assignments", path)
+        if match:
+            course_id = int(match.group(1))
+            assignments = _assignments(course_id, self.server.num_assignments,
+                                       self.server.updated.get(("assignments", course_id)),
+                                       self.server.submissions.get(course_id))
+            self._send_page(assignments, path, query)
+            return
+
+        match = re.fullmatch(r"/api/v1/courses/(\d+)/modules", path)
+        if match:
+            self._send_page(_modules(int(match.group(1))), path, query)
+            return
+
+        match = re.fullmatch(r"/courses/(\d+)/modules", path)
+        if match:
+            self._send(200, "text/html; charset=utf-8", _modules_page(int(match.group(1))).encode())
+            return
+
+        match = re.fullmatch(r"/api/v1/courses/(\d+)/files", path)
+        if match:
+            course_id = int(match.group(1))
+            files = _files(course_id, self.server.num_files, self.server.updated.get(("files", course_id)))
+            removed = self.server.removed.get(("files", course_id), set())
+            files = [f for f in files if f["id"] - course_id * 10000 not in removed]
+            if query.get("sort") == "updated_at":
+                files.sort(key=lambda f: f["updated_at"], reverse=query.get("order") == "desc")
+            self._send_page(files, path, query)
+            return
+
+        self._send(404, "application/json", b'{"message": "Not Found"}')
+
+    def _send_page(self, items, path: str, query: dict):
+        """Send one page of a list with Canvas-style Link headers"""
+        per_page = min(int(query.get("per_page", 10)), self.server.page_size)
+        page_param = query.get("page", "1")
+        page = int(page_param.split(":", 1)[1]) if page_param.startswith("bookmark:") else int(page_param)
+        last_page = max(1, -(-len(items) // per_page))
+        mode = self.server.pagination
+
+        def link(number: int, rel: str) -> str:
+            value = f"bookmark:{number}" if mode == "bookmark" else str(number)
+            return f'<{self.server.base_url}{path}?{urlencode({**query, "page": value})}>; rel="{rel}"'
+
+        links = [link(page, "current"), link(1, "first")]
+        if page < last_page:
+            links.append(link(page + 1, "next"))
+        if page > 1:
+            links.append(link(page - 1, "prev"))
+        if mode == "last":
+            links.append(link(last_page, "last"))
+        self._send_json(items[(page - 1) * per_page:page * per_page], {"Link": ",".join(links)})
+
+    def _send_json(self, data, headers=None):
+        body = json.dumps(data).encode()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if self.headers.get("If-None-Match") == etag:
+            with self.server.lock:
+                self.server.not_modified_count += 1
+            self._send(304, "application/json; charset=utf-8", b"", {"ETag": etag})
+            return
+        self._send(200, "application/json; charset=utf-8", body, {**(headers or {}), "ETag": etag})
+
+    def _send(self, status: int, content_type: str, body: bytes, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        if status != 304:
+            self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class FakeCanvasServer:
+    """
+    Run the fake Canvas server in a background thread
+
+        with FakeCanvasServer(num_courses=7, latency=0.1) as server:
+            scraper = CanvasScraper(base_url=server.url, session_cookie="test")
+
+    throttle_every=N answers every Nth request with 429 + Retry-After (or
+    Canvas's 403 "Rate Limit Exceeded" when throttle_status=403). Lists are
+    cut into pages of at most page_size items; pagination is one of
+    PAGINATION_MODES.
+
+    touch_assignments()/touch_files() mark items as edited on Canvas: they get
+    a later updated_at and a changed field, so their pages' ETags change.
+    remove_files() takes files off the listing without touching the others.
+    submit_assignments() adds the student's submission, which (as on Canvas)
+    leaves the assignment's updated_at alone.
+    expire_session() answers every request with 401, like a stale cookie.
+    """
+
+    def __init__(self, port: int = 0, num_courses: int = 7, latency: float = 0.1,
+                 throttle_every: int = 0, throttle_status: int = 429, retry_after: float = 0.2,
+                 num_files: int = 0, num_assignments: int = 3, page_size: int = 100,
+                 pagination: str = "last", verbose: bool = False):
+        if pagination not in PAGINATION_MODES:
+            raise ValueError(f"pagination must be one of {PAGINATION_MODES}")
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), FakeCanvasHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.base_url = self.url
+        self.httpd.num_courses = num_courses
+        self.httpd.num_files = num_files
+        self.httpd.num_assignments = num_assignments
+        self.httpd.page_size = page_size
+        self.httpd.pagination = pagination
+        self.httpd.latency = latency
+        self.httpd.throttle_every = throttle_every
+        self.httpd.throttle_status = throttle_status
+        self.httpd.retry_after = retry_after
+        self.httpd.verbose = verbose
+        self.httpd.request_count = 0
+        self.httpd.throttled_count = 0
+        self.httpd.not_modified_count = 0
+        self.httpd.updated = {}  # (kind, course_id) -> {n: (revision, updated_at)}
+        self.httpd.removed = {}  # (kind, course_id) -> {n}
+        self.httpd.submissions = {}  # course_id -> {n: submission}
+        self.httpd.revision = 0
+        self.httpd.session_expired = False
+        self.httpd.in_flight = 0
+        self.httpd.max_in_flight = 0
+        self.httpd.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self) -> int:
+        return self.httpd.request_count
+
+    @property
+    def throttled_count(self) -> int:
+        return self.httpd.throttled_count
+
+    @property
+    def max_in_flight(self) -> int:
+        return self.httpd.max_in_flight
+
+    @property
+    def not_modified_count(self) -> int:
+        return self.httpd.not_modified_count
+
+    def expire_session(self, expired: bool = True):
+        """Reject every request with 401, as Canvas does once the session cookie expires"""
+        self.httpd.session_expired = expired
+
+    def touch_assignments(self, course_id: int, numbers):
+        """Edit assignments (1-based numbers within the course) so they sort as updated now"""
+        self._touch("assignments", course_id, numbers)
+
+    def touch_files(self, course_id: int, numbers):
+        """Edit files (1-based numbers within the course) so they sort as updated now"""
+        self._touch("files", course_id, numbers)
+
+    def submit_assignments(self, course_id: int, numbers, workflow_state: str = "submitted"):
+        """Submit (or with workflow_state="graded", grade) assignments (1-based numbers within the course)"""
+        with self.httpd.lock:
+            self.httpd.revision += 1
+            minutes = self.httpd.revision
+            timestamp = f"2025-10-02T{minutes // 60:02d}:{minutes % 60:02d}:00Z"
+            entries = self.httpd.submissions.setdefault(course_id, {})
+            for n in numbers:
+                submission = {**entries.get(n, {"submitted_at": timestamp}), "workflow_state": workflow_state}
+                if workflow_state == "graded":
+                    submission["graded_at"] = timestamp
+                entries[n] = submission
+
+    def remove_files(self, course_id: int, numbers):
+        """Delete files (1-based numbers within the course) from the Files tab"""
+        with self.httpd.lock:
+            self.httpd.removed.setdefault(("files", course_id), set()).update(numbers)
+
+    def _touch(self, kind: str, course_id: int, numbers):
+        with self.httpd.lock:
+            self.httpd.revision += 1
+            # One minute per edit keeps timestamps strictly increasing
+            minutes = self.httpd.revision
+            updated_at = f"2025-10-02T{minutes // 60:02d}:{minutes % 60:02d}:00Z"
+            entries = self.httpd.updated.setdefault((kind, course_id), {})
+            for n in numbers:
+                entries[n] = (self.httpd.revision, updated_at)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Canvas server for local testing")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--courses", type=int, default=7, help="Number of active courses")
+    parser.add_argument("--latency", type=float, default=0.1, help="Seconds added to every response")
+    parser.add_argument("--throttle-every", type=int, default=0, help="Throttle every Nth request (0 = never)")
+    parser.add_argument("--files", type=int, default=0, help="Files per course")
+    parser.add_argument("--assignments", type=int, default=3, help="Assignments per course")
+    parser.add_argument("--page-size", type=int, default=100, help="Maximum items per page")
+    parser.add_argument("--pagination", choices=PAGINATION_MODES, default="last")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    server = FakeCanvasServer(port=args.port, num_courses=args.courses, latency=args.latency,
+                              throttle_every=args.throttle_every, num_files=args.files,
+                              num_assignments=args.assignments,
+                              page_size=args.page_size, pagination=args.pagination, verbose=args.verbose)
+    print(f"Fake Canvas server listening on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
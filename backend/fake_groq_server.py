@@ -0,0 +1,215 @@
+"""
+Fake Groq API server for local testing
+
+Serves an OpenAI-compatible POST /openai/v1/chat/completions, with and
+without stream=true, with configurable latency so streaming and client
+behaviour can be measured without a Groq API key.
+
+Usage:
+    python fake_groq_server.py --port 8089 --first-token-delay 0.3 --token-delay 0.02
+
+Then start the backend with GROQ_API_BASE_URL=http://127.0.0.1:8089 and any GROQ_API_KEY.
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+GRADE_RESPONSE = {
+    "score": 85,
+    "feedback": "Covers the key idea and explains it clearly, but misses one detail.",
+    "correct_answer": "A complete answer names the concept, explains how it works and gives an example.",
+    "passed": True
+}
+
+FLASHCARD_RESPONSE = [
+    {"question": "What is a process?", "answer": "A program in execution with its own address space.", "type": "definition"},
+    {"question": "Explain context switching.", "answer": "Saving one process's state and restoring another's.", "type": "explanation"}
+]
+
+QUIZ_RESPONSE = [
+    {
+        "question": "Which component decides which process runs next?",
+        "options": ["The scheduler", "The compiler", "The file system", "The linker"],
+        "correct_answer": "A"
+    }
+]
+
+
+def _reply_for(prompt: str, num_words: int) -> str:
+    """Pick a canned completion that matches what the prompt asks for"""
+    if "EXACT JSON format" in prompt:
+        return json.dumps(GRADE_RESPONSE, indent=2)
+    if "multiple-choice quiz questions" in prompt:
+        return json.dumps(QUIZ_RESPONSE)
+    if "flashcards" in prompt and "JSON" in prompt:
+        return json.dumps(FLASHCARD_RESPONSE)
+    if "generate ONE challenging question" in prompt:
+        return "How does virtual memory let a process use more memory than is physically available?"
+    return " ".join(f"word{i}" for i in range(num_words))
+
+
+def _split_tokens(text: str):
+    """Split a reply into token-sized pieces (words with their spacing)"""
+    tokens = []
+    current = ""
+    for char in text:
+        current += char
+        if char in " \n":
+            tokens.append(current)
+            current = ""
+    if current:
+        tokens.append(current)
+    return tokens
+
+
+class FakeGroqHandler(BaseHTTPRequestHandler):
+    """Handles chat completion requests using the server's latency settings"""
+
+    # Keep-alive, so clients that pool connections can reuse them
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connection_count += 1
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def do_POST(self):
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_error(404)
+            return
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length) or b"{}")
+        with self.server.lock:
+            self.server.request_count += 1
+
+        prompt = "\n".join(message.get("content", "") for message in body.get("messages", []))
+        model = body.get("model", "llama-3.1-8b-instant")
+        tokens = _split_tokens(_reply_for(prompt, self.server.num_words))
+
+        if body.get("stream"):
+            self._stream(tokens, model)
+        else:
+            self._complete(tokens, model)
+
+    def _complete(self, tokens, model):
+        time.sleep(self.server.first_token_delay + self.server.token_delay * len(tokens))
+        payload = json.dumps({
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": "".join(tokens)},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": 0, "completion_tokens": len(tokens), "total_tokens": len(tokens)}
+        }).encode()
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _stream(self, tokens, model):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        # No Content-Length for a stream, so the end of the body is the end of the connection
+        self.send_header("Connection", "close")
+        self.close_connection = True
+        self.end_headers()
+
+        time.sleep(self.server.first_token_delay)
+        created = int(time.time())
+        for i, token in enumerate(tokens):
+            if i:
+                time.sleep(self.server.token_delay)
+            self._send_chunk({"role": "assistant", "content": token} if i == 0 else {"content": token}, None, model, created)
+        self._send_chunk({}, "stop", model, created)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+    def _send_chunk(self, delta, finish_reason, model, created):
+        chunk = {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": created,
+            "model": model,
+            "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+        }
+        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.flush()
+
+
+class FakeGroqServer:
+    """
+    Run the fake Groq API in a background thread
+
+        with FakeGroqServer(first_token_delay=0.2) as server:
+            settings.GROQ_API_BASE_URL = server.url
+    """
+
+    def __init__(self, port: int = 0, first_token_delay: float = 0.2, token_delay: float = 0.01,
+                 num_words: int = 200, verbose: bool = False):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), FakeGroqHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.first_token_delay = first_token_delay
+        self.httpd.token_delay = token_delay
+        self.httpd.num_words = num_words
+        self.httpd.verbose = verbose
+        self.httpd.request_count = 0
+        self.httpd.connection_count = 0
+        self.httpd.lock = threading.Lock()
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def request_count(self) -> int:
+        return self.httpd.request_count
+
+    @property
+    def connection_count(self) -> int:
+        return self.httpd.connection_count
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake Groq chat completions API")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--first-token-delay", type=float, default=0.3, help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=0.02, help="Seconds between tokens")
+    parser.add_argument("--num-words", type=int, default=200, help="Words in free-text replies")
+    args = parser.parse_args()
+
+    server = FakeGroqServer(args.port, args.first_token_delay, args.token_delay, args.num_words, verbose=True)
+    print(f"Fake Groq API listening on {server.url} (GROQ_API_BASE_URL={server.url})")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,62 @@
+"""
+Alembic environment
+
+Runs against settings.DATABASE_URL, or against the connection passed in
+config.attributes["connection"] when migrations run at startup
+(app.db.migrations.upgrade_database).
+"""
+from logging.config import fileConfig
+from alembic import context
+from app.db.database import Base, engine
+import app.models  # noqa: F401 (registers every table on Base.metadata)
+import app.models.module  # noqa: F401
+
+config = context.config
+if config.config_file_name is not None and "connection" not in config.attributes:
+    fileConfig(config.config_file_name)  # Log to stderr from the alembic command line only
+target_metadata = Base.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    """Leave the FTS5 table behind course chunk search (and its shadow tables) out of autogenerate"""
+    return not (type_ == "table" and name.startswith("course_chunks_fts"))
+
+
+def run_migrations_offline() -> None:
+    """Emit the SQL instead of running it (alembic upgrade head --sql)"""
+    context.configure(
+        url=str(engine.url.render_as_string(hide_password=False)),
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        render_as_batch=engine.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def _run(connection) -> None:
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        # SQLite can't ALTER most constraints; batch mode rebuilds the table instead
+        render_as_batch=connection.dialect.name == "sqlite",
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online() -> None:
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        _run(connection)
+        return
+    with engine.connect() as connection:
+        _run(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,582 @@
+"""Baseline schema
+
+The tables Base.metadata.create_all built before migrations were added.
+Tables that already exist are skipped, so databases created that way are
+brought under Alembic by the normal upgrade.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 11:30:35.618816
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = [
+    'extracted_documents',
+    'generated_sets',
+    'user_settings',
+    'users',
+    'canvas_refresh_states',
+    'courses',
+    'dashboard_snapshots',
+    'jobs',
+    'assignments',
+    'chat_messages',
+    'course_documents',
+    'course_file_indexes',
+    'course_files',
+    'course_sync_states',
+    'flashcard_sets',
+    'modules',
+    'quizzes',
+    'saved_flashcard_decks',
+    'study_sessions',
+    'course_chunks',
+    'flashcards',
+    'module_pregenerations',
+    'pregenerated_flashcards',
+    'pregenerated_quiz_questions',
+    'quiz_attempts',
+    'quiz_questions',
+    'saved_flashcards',
+    'quiz_answers',
+]
+
+# Full-text search over course_chunks (see app/models/course_chunk.py)
+SQLITE_CHUNK_SEARCH = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS course_chunks_fts USING fts5("
+    "text, content='course_chunks', content_rowid='id', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS course_chunks_ai AFTER INSERT ON course_chunks BEGIN "
+    "INSERT INTO course_chunks_fts(rowid, text) VALUES (new.id, new.text); END",
+    "CREATE TRIGGER IF NOT EXISTS course_chunks_ad AFTER DELETE ON course_chunks BEGIN "
+    "INSERT INTO course_chunks_fts(course_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); END",
+    "CREATE TRIGGER IF NOT EXISTS course_chunks_au AFTER UPDATE ON course_chunks BEGIN "
+    "INSERT INTO course_chunks_fts(course_chunks_fts, rowid, text) VALUES ('delete', old.id, old.text); "
+    "INSERT INTO course_chunks_fts(rowid, text) VALUES (new.id, new.text); END",
+]
+POSTGRESQL_CHUNK_SEARCH = [
+    "ALTER TABLE course_chunks ADD COLUMN IF NOT EXISTS search_vector tsvector "
+    "GENERATED ALWAYS AS (to_tsvector('english', text)) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_course_chunks_search_vector ON course_chunks USING GIN (search_vector)",
+]
+
+
+def _existing_tables() -> set:
+    if context.is_offline_mode():
+        return set()
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def _create_chunk_search() -> None:
+    dialect = op.get_context().dialect.name
+    statements = {"sqlite": SQLITE_CHUNK_SEARCH, "postgresql": POSTGRESQL_CHUNK_SEARCH}.get(dialect, [])
+    for statement in statements:
+        op.execute(statement)
+
+
+def upgrade() -> None:
+    existing = _existing_tables()
+
+    if 'extracted_documents' not in existing:
+        op.create_table('extracted_documents',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('cache_key', sa.String(), nullable=False),
+            sa.Column('content_hash', sa.String(), nullable=False),
+            sa.Column('extractor_version', sa.Integer(), nullable=False),
+            sa.Column('text', sa.Text(), nullable=False),
+            sa.Column('size_bytes', sa.Integer(), nullable=False),
+            sa.Column('hit_count', sa.Integer(), nullable=True),
+            sa.Column('last_accessed_at', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_extracted_documents_cache_key'), 'extracted_documents', ['cache_key'], unique=True)
+        op.create_index(op.f('ix_extracted_documents_content_hash'), 'extracted_documents', ['content_hash'], unique=False)
+        op.create_index(op.f('ix_extracted_documents_id'), 'extracted_documents', ['id'], unique=False)
+        op.create_index(op.f('ix_extracted_documents_last_accessed_at'), 'extracted_documents', ['last_accessed_at'], unique=False)
+
+    if 'generated_sets' not in existing:
+        op.create_table('generated_sets',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('cache_key', sa.String(), nullable=False),
+            sa.Column('base_key', sa.String(), nullable=False),
+            sa.Column('kind', sa.String(), nullable=False),
+            sa.Column('content_hash', sa.String(), nullable=False),
+            sa.Column('module_name', sa.String(), nullable=False),
+            sa.Column('prompt_version', sa.Integer(), nullable=False),
+            sa.Column('model', sa.String(), nullable=False),
+            sa.Column('item_count', sa.Integer(), nullable=False),
+            sa.Column('items', sa.Text(), nullable=False),
+            sa.Column('size_bytes', sa.Integer(), nullable=False),
+            sa.Column('hit_count', sa.Integer(), nullable=True),
+            sa.Column('last_accessed_at', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_generated_sets_base_key'), 'generated_sets', ['base_key'], unique=False)
+        op.create_index(op.f('ix_generated_sets_cache_key'), 'generated_sets', ['cache_key'], unique=True)
+        op.create_index(op.f('ix_generated_sets_created_at'), 'generated_sets', ['created_at'], unique=False)
+        op.create_index(op.f('ix_generated_sets_id'), 'generated_sets', ['id'], unique=False)
+        op.create_index(op.f('ix_generated_sets_last_accessed_at'), 'generated_sets', ['last_accessed_at'], unique=False)
+
+    if 'user_settings' not in existing:
+        op.create_table('user_settings',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('theme', sa.String(), nullable=True),
+            sa.Column('dark_mode', sa.Boolean(), nullable=True),
+            sa.Column('font_size', sa.String(), nullable=True),
+            sa.Column('font_family', sa.String(), nullable=True),
+            sa.Column('card_style', sa.String(), nullable=True),
+            sa.Column('spacing', sa.String(), nullable=True),
+            sa.Column('accent_color', sa.String(), nullable=True),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_user_settings_id'), 'user_settings', ['id'], unique=False)
+
+    if 'users' not in existing:
+        op.create_table('users',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('first_name', sa.String(), nullable=False),
+            sa.Column('last_name', sa.String(), nullable=False),
+            sa.Column('email', sa.String(), nullable=False),
+            sa.Column('password_hash', sa.String(), nullable=False),
+            sa.Column('canvas_user_id', sa.String(), nullable=True),
+            sa.Column('canvas_instance_url', sa.String(), nullable=True),
+            sa.Column('canvas_access_token', sa.String(), nullable=True),
+            sa.Column('canvas_session_cookie', sa.String(), nullable=True),
+            sa.Column('email_notifications', sa.Boolean(), nullable=True),
+            sa.Column('push_notifications', sa.Boolean(), nullable=True),
+            sa.Column('study_reminders', sa.Boolean(), nullable=True),
+            sa.Column('deadline_alerts', sa.Boolean(), nullable=True),
+            sa.Column('dark_mode', sa.Boolean(), nullable=True),
+            sa.Column('study_streak_days', sa.Integer(), nullable=True),
+            sa.Column('last_study_date', sa.DateTime(), nullable=True),
+            sa.Column('last_sync', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('canvas_user_id')
+        )
+        op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+        op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+
+    if 'canvas_refresh_states' not in existing:
+        op.create_table('canvas_refresh_states',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('last_login_at', sa.DateTime(), nullable=True),
+            sa.Column('next_refresh_at', sa.DateTime(), nullable=True),
+            sa.Column('last_refreshed_at', sa.DateTime(), nullable=True),
+            sa.Column('last_status', sa.String(), nullable=True),
+            sa.Column('last_error', sa.Text(), nullable=True),
+            sa.Column('consecutive_failures', sa.Integer(), nullable=True),
+            sa.Column('session_expired_at', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id')
+        )
+        op.create_index(op.f('ix_canvas_refresh_states_id'), 'canvas_refresh_states', ['id'], unique=False)
+        op.create_index(op.f('ix_canvas_refresh_states_next_refresh_at'), 'canvas_refresh_states', ['next_refresh_at'], unique=False)
+
+    if 'courses' not in existing:
+        op.create_table('courses',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('canvas_id', sa.String(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('code', sa.String(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('instructor', sa.String(), nullable=True),
+            sa.Column('term', sa.String(), nullable=True),
+            sa.Column('progress', sa.Float(), nullable=True),
+            sa.Column('color', sa.String(), nullable=False),
+            sa.Column('is_active', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('canvas_id', 'user_id', name='uq_canvas_user')
+        )
+        op.create_index(op.f('ix_courses_canvas_id'), 'courses', ['canvas_id'], unique=False)
+        op.create_index(op.f('ix_courses_id'), 'courses', ['id'], unique=False)
+
+    if 'dashboard_snapshots' not in existing:
+        op.create_table('dashboard_snapshots',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('data', sa.Text(), nullable=False),
+            sa.Column('built_at', sa.DateTime(), nullable=True),
+            sa.Column('expires_at', sa.DateTime(), nullable=False),
+            sa.Column('build_ms', sa.Float(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id')
+        )
+        op.create_index(op.f('ix_dashboard_snapshots_id'), 'dashboard_snapshots', ['id'], unique=False)
+
+    if 'jobs' not in existing:
+        op.create_table('jobs',
+            sa.Column('id', sa.String(), nullable=False),
+            sa.Column('kind', sa.String(), nullable=False),
+            sa.Column('status', sa.String(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=True),
+            sa.Column('idempotency_key', sa.String(), nullable=True),
+            sa.Column('payload', sa.JSON(), nullable=True),
+            sa.Column('result', sa.JSON(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('attempts', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('finished_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('user_id', 'kind', 'idempotency_key', name='uq_job_idempotency_key')
+        )
+        op.create_index(op.f('ix_jobs_created_at'), 'jobs', ['created_at'], unique=False)
+        op.create_index(op.f('ix_jobs_kind'), 'jobs', ['kind'], unique=False)
+        op.create_index(op.f('ix_jobs_status'), 'jobs', ['status'], unique=False)
+        op.create_index(op.f('ix_jobs_user_id'), 'jobs', ['user_id'], unique=False)
+
+    if 'assignments' not in existing:
+        op.create_table('assignments',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(), nullable=False),
+            sa.Column('course', sa.String(), nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=False),
+            sa.Column('due_date', sa.DateTime(), nullable=False),
+            sa.Column('type', sa.String(), nullable=False),
+            sa.Column('priority', sa.String(), nullable=True),
+            sa.Column('status', sa.String(), nullable=True),
+            sa.Column('submitted', sa.Boolean(), nullable=True),
+            sa.Column('description', sa.String(), nullable=True),
+            sa.Column('points', sa.Integer(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_assignments_id'), 'assignments', ['id'], unique=False)
+        op.create_index('uq_assignments_user_course_title', 'assignments', ['user_id', 'course_id', 'title'], unique=True)
+
+    if 'chat_messages' not in existing:
+        op.create_table('chat_messages',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=True),
+            sa.Column('role', sa.String(), nullable=False),
+            sa.Column('content', sa.Text(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_chat_messages_id'), 'chat_messages', ['id'], unique=False)
+
+    if 'course_documents' not in existing:
+        op.create_table('course_documents',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=False),
+            sa.Column('source_url', sa.String(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('version', sa.String(), nullable=True),
+            sa.Column('chunk_count', sa.Integer(), nullable=True),
+            sa.Column('indexed_at', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('course_id', 'source_url', name='uq_course_document_url')
+        )
+        op.create_index(op.f('ix_course_documents_course_id'), 'course_documents', ['course_id'], unique=False)
+        op.create_index(op.f('ix_course_documents_id'), 'course_documents', ['id'], unique=False)
+
+    if 'course_file_indexes' not in existing:
+        op.create_table('course_file_indexes',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=False),
+            sa.Column('etag', sa.String(), nullable=True),
+            sa.Column('file_count', sa.Integer(), nullable=True),
+            sa.Column('refreshed_at', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('course_id')
+        )
+        op.create_index(op.f('ix_course_file_indexes_id'), 'course_file_indexes', ['id'], unique=False)
+
+    if 'course_files' not in existing:
+        op.create_table('course_files',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=False),
+            sa.Column('canvas_file_id', sa.String(), nullable=True),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('url', sa.String(), nullable=False),
+            sa.Column('size', sa.Integer(), nullable=True),
+            sa.Column('content_type', sa.String(), nullable=True),
+            sa.Column('canvas_updated_at', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('course_id', 'url', name='uq_course_file_url')
+        )
+        op.create_index(op.f('ix_course_files_course_id'), 'course_files', ['course_id'], unique=False)
+        op.create_index(op.f('ix_course_files_id'), 'course_files', ['id'], unique=False)
+
+    if 'course_sync_states' not in existing:
+        op.create_table('course_sync_states',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=False),
+            sa.Column('assignments_etag', sa.String(), nullable=True),
+            sa.Column('assignments_updated_at', sa.DateTime(), nullable=True),
+            sa.Column('assignment_count', sa.Integer(), nullable=True),
+            sa.Column('modules_etag', sa.String(), nullable=True),
+            sa.Column('modules_hash', sa.String(), nullable=True),
+            sa.Column('module_count', sa.Integer(), nullable=True),
+            sa.Column('files_updated_at', sa.DateTime(), nullable=True),
+            sa.Column('last_synced_at', sa.DateTime(), nullable=True),
+            sa.Column('last_full_sync_at', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('course_id')
+        )
+        op.create_index(op.f('ix_course_sync_states_id'), 'course_sync_states', ['id'], unique=False)
+
+    if 'flashcard_sets' not in existing:
+        op.create_table('flashcard_sets',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=False),
+            sa.Column('title', sa.String(), nullable=False),
+            sa.Column('description', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_flashcard_sets_id'), 'flashcard_sets', ['id'], unique=False)
+
+    if 'modules' not in existing:
+        op.create_table('modules',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('position', sa.Integer(), nullable=True),
+            sa.Column('items', sa.JSON(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_modules_id'), 'modules', ['id'], unique=False)
+        op.create_index('uq_modules_course_name', 'modules', ['course_id', 'name'], unique=True)
+
+    if 'quizzes' not in existing:
+        op.create_table('quizzes',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=True),
+            sa.Column('title', sa.String(), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_quizzes_id'), 'quizzes', ['id'], unique=False)
+
+    if 'saved_flashcard_decks' not in existing:
+        op.create_table('saved_flashcard_decks',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=True),
+            sa.Column('name', sa.String(), nullable=False),
+            sa.Column('description', sa.Text(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_saved_flashcard_decks_id'), 'saved_flashcard_decks', ['id'], unique=False)
+
+    if 'study_sessions' not in existing:
+        op.create_table('study_sessions',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=False),
+            sa.Column('duration_minutes', sa.Integer(), nullable=False),
+            sa.Column('session_date', sa.DateTime(), nullable=True),
+            sa.Column('activity_type', sa.String(), nullable=True),
+            sa.Column('notes', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_study_sessions_id'), 'study_sessions', ['id'], unique=False)
+
+    if 'course_chunks' not in existing:
+        op.create_table('course_chunks',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('document_id', sa.Integer(), nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=False),
+            sa.Column('position', sa.Integer(), nullable=False),
+            sa.Column('start_offset', sa.Integer(), nullable=False),
+            sa.Column('end_offset', sa.Integer(), nullable=False),
+            sa.Column('text', sa.Text(), nullable=False),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.ForeignKeyConstraint(['document_id'], ['course_documents.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_course_chunks_course_id'), 'course_chunks', ['course_id'], unique=False)
+        op.create_index(op.f('ix_course_chunks_document_id'), 'course_chunks', ['document_id'], unique=False)
+        op.create_index(op.f('ix_course_chunks_id'), 'course_chunks', ['id'], unique=False)
+        _create_chunk_search()
+
+    if 'flashcards' not in existing:
+        op.create_table('flashcards',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('set_id', sa.Integer(), nullable=True),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('course_id', sa.Integer(), nullable=False),
+            sa.Column('question', sa.Text(), nullable=False),
+            sa.Column('answer', sa.Text(), nullable=False),
+            sa.Column('difficulty', sa.String(), nullable=True),
+            sa.Column('last_reviewed', sa.DateTime(), nullable=True),
+            sa.Column('times_reviewed', sa.Integer(), nullable=True),
+            sa.Column('mastered', sa.Boolean(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['course_id'], ['courses.id'], ),
+            sa.ForeignKeyConstraint(['set_id'], ['flashcard_sets.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_flashcards_id'), 'flashcards', ['id'], unique=False)
+
+    if 'module_pregenerations' not in existing:
+        op.create_table('module_pregenerations',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('module_id', sa.Integer(), nullable=False),
+            sa.Column('status', sa.String(), nullable=False),
+            sa.Column('content_hash', sa.String(), nullable=True),
+            sa.Column('flashcard_count', sa.Integer(), nullable=True),
+            sa.Column('quiz_question_count', sa.Integer(), nullable=True),
+            sa.Column('error', sa.Text(), nullable=True),
+            sa.Column('generated_at', sa.DateTime(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['module_id'], ['modules.id'], ),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('module_id')
+        )
+        op.create_index(op.f('ix_module_pregenerations_id'), 'module_pregenerations', ['id'], unique=False)
+
+    if 'pregenerated_flashcards' not in existing:
+        op.create_table('pregenerated_flashcards',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('module_id', sa.Integer(), nullable=False),
+            sa.Column('question', sa.Text(), nullable=False),
+            sa.Column('answer', sa.Text(), nullable=False),
+            sa.Column('type', sa.String(), nullable=True),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['module_id'], ['modules.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_pregenerated_flashcards_id'), 'pregenerated_flashcards', ['id'], unique=False)
+        op.create_index(op.f('ix_pregenerated_flashcards_module_id'), 'pregenerated_flashcards', ['module_id'], unique=False)
+
+    if 'pregenerated_quiz_questions' not in existing:
+        op.create_table('pregenerated_quiz_questions',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('module_id', sa.Integer(), nullable=False),
+            sa.Column('question', sa.Text(), nullable=False),
+            sa.Column('options', sa.JSON(), nullable=False),
+            sa.Column('correct_answer', sa.String(), nullable=False),
+            sa.Column('created_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['module_id'], ['modules.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_pregenerated_quiz_questions_id'), 'pregenerated_quiz_questions', ['id'], unique=False)
+        op.create_index(op.f('ix_pregenerated_quiz_questions_module_id'), 'pregenerated_quiz_questions', ['module_id'], unique=False)
+
+    if 'quiz_attempts' not in existing:
+        op.create_table('quiz_attempts',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('quiz_id', sa.Integer(), nullable=False),
+            sa.Column('user_id', sa.Integer(), nullable=False),
+            sa.Column('score', sa.Integer(), nullable=False),
+            sa.Column('total_questions', sa.Integer(), nullable=False),
+            sa.Column('started_at', sa.DateTime(), nullable=True),
+            sa.Column('completed_at', sa.DateTime(), nullable=True),
+            sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ),
+            sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_quiz_attempts_id'), 'quiz_attempts', ['id'], unique=False)
+
+    if 'quiz_questions' not in existing:
+        op.create_table('quiz_questions',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('quiz_id', sa.Integer(), nullable=False),
+            sa.Column('question_text', sa.Text(), nullable=False),
+            sa.Column('option_a', sa.String(), nullable=False),
+            sa.Column('option_b', sa.String(), nullable=False),
+            sa.Column('option_c', sa.String(), nullable=False),
+            sa.Column('option_d', sa.String(), nullable=False),
+            sa.Column('correct_answer', sa.String(), nullable=False),
+            sa.Column('order', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['quiz_id'], ['quizzes.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_quiz_questions_id'), 'quiz_questions', ['id'], unique=False)
+
+    if 'saved_flashcards' not in existing:
+        op.create_table('saved_flashcards',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('deck_id', sa.Integer(), nullable=False),
+            sa.Column('question', sa.Text(), nullable=False),
+            sa.Column('answer', sa.Text(), nullable=False),
+            sa.Column('order', sa.Integer(), nullable=True),
+            sa.ForeignKeyConstraint(['deck_id'], ['saved_flashcard_decks.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_saved_flashcards_id'), 'saved_flashcards', ['id'], unique=False)
+
+    if 'quiz_answers' not in existing:
+        op.create_table('quiz_answers',
+            sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+            sa.Column('attempt_id', sa.Integer(), nullable=False),
+            sa.Column('question_id', sa.Integer(), nullable=False),
+            sa.Column('user_answer', sa.String(), nullable=False),
+            sa.Column('is_correct', sa.Boolean(), nullable=False),
+            sa.ForeignKeyConstraint(['attempt_id'], ['quiz_attempts.id'], ),
+            sa.ForeignKeyConstraint(['question_id'], ['quiz_questions.id'], ),
+            sa.PrimaryKeyConstraint('id')
+        )
+        op.create_index(op.f('ix_quiz_answers_id'), 'quiz_answers', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    if op.get_context().dialect.name == "sqlite":
+        op.execute("DROP TABLE IF EXISTS course_chunks_fts")
+    for table in reversed(TABLES):
+        op.drop_table(table)
@@ -0,0 +1,46 @@
+"""Hot path indexes
+
+Composite indexes for the queries behind the dashboard, assignment, module,
+flashcard, study session, chat history, saved deck and quiz endpoints.
+Indexes that already exist (databases whose tables create_all made after
+the indexes were declared) are left alone.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 11:31:37.984700
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INDEXES = [
+    ('ix_assignments_user_due_date', 'assignments', ['user_id', 'due_date']),
+    ('ix_assignments_course_submitted', 'assignments', ['course_id', 'submitted']),
+    ('ix_courses_user_active', 'courses', ['user_id', 'is_active']),
+    ('ix_modules_course_position', 'modules', ['course_id', 'position']),
+    ('ix_flashcards_user_course_reviewed', 'flashcards', ['user_id', 'course_id', 'last_reviewed']),
+    ('ix_study_sessions_session_date', 'study_sessions', ['session_date']),
+    ('ix_chat_messages_course_created', 'chat_messages', ['course_id', 'created_at']),
+    ('ix_saved_decks_user_course', 'saved_flashcard_decks', ['user_id', 'course_id']),
+    ('ix_saved_flashcards_deck_order', 'saved_flashcards', ['deck_id', 'order']),
+    ('ix_quizzes_user_course', 'quizzes', ['user_id', 'course_id']),
+    ('ix_quiz_questions_quiz_order', 'quiz_questions', ['quiz_id', 'order']),
+]
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, unique=False, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
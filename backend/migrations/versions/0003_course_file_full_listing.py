@@ -0,0 +1,38 @@
+"""Course file full listing
+
+Adds course_file_indexes.full_listed_at, the last time a course's Files tab
+was listed without the first page's ETag. Databases whose table create_all
+made with the column already have it.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 15:02:11.420613
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing_columns(table: str) -> set:
+    if context.is_offline_mode():
+        return set()
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    if 'full_listed_at' not in _existing_columns('course_file_indexes'):
+        op.add_column('course_file_indexes', sa.Column('full_listed_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('course_file_indexes') as batch_op:
+        batch_op.drop_column('full_listed_at')
@@ -0,0 +1,64 @@
+"""Upsert unique indexes
+
+The unique indexes the Canvas import upserts conflict on (see
+app/services/bulk_upsert.py): modules by (course_id, name) and assignments
+by (user_id, course_id, title). Databases from before they were declared
+can hold duplicates, which would fail the index, so the duplicates are
+deleted first; the oldest row of each group is kept (the one the per-row
+imports used to update). Pregenerated content of a deleted module goes
+with it.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 15:40:52.117308
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DUPLICATE_MODULES = (
+    "SELECT id FROM modules WHERE id NOT IN "
+    "(SELECT MIN(id) FROM modules GROUP BY course_id, name)"
+)
+DUPLICATE_ASSIGNMENTS = (
+    "SELECT id FROM assignments WHERE id NOT IN "
+    "(SELECT MIN(id) FROM assignments GROUP BY user_id, course_id, title)"
+)
+MODULE_DEPENDENTS = ['pregenerated_flashcards', 'pregenerated_quiz_questions', 'module_pregenerations']
+
+INDEXES = [
+    ('uq_modules_course_name', 'modules', ['course_id', 'name'], DUPLICATE_MODULES),
+    ('uq_assignments_user_course_title', 'assignments', ['user_id', 'course_id', 'title'], DUPLICATE_ASSIGNMENTS),
+]
+
+
+def _existing_indexes(table: str) -> set:
+    if context.is_offline_mode():
+        return set()
+    return {index['name'] for index in sa.inspect(op.get_bind()).get_indexes(table)}
+
+
+def upgrade() -> None:
+    for name, table, columns, duplicates in INDEXES:
+        if name in _existing_indexes(table):
+            continue
+        if table == 'modules':
+            for dependent in MODULE_DEPENDENTS:
+                op.execute(f"DELETE FROM {dependent} WHERE module_id IN ({DUPLICATE_MODULES})")
+        op.execute(f"DELETE FROM {table} WHERE id IN ({duplicates})")
+        op.create_index(name, table, columns, unique=True)
+
+
+def downgrade() -> None:
+    # Databases the baseline created have had these indexes from the start,
+    # and deleted duplicates can't be brought back
+    pass
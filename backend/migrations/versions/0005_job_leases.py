@@ -0,0 +1,47 @@
+"""Job leases
+
+Adds jobs.owner and jobs.lease_expires_at. A worker process owns the jobs
+it claims and renews their lease while they run; only jobs whose lease has
+expired are requeued. Databases whose table create_all made with the
+columns already have them.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 16:27:45.803114
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = [
+    sa.Column('owner', sa.String(), nullable=True),
+    sa.Column('lease_expires_at', sa.DateTime(), nullable=True),
+]
+
+
+def _existing_columns(table: str) -> set:
+    if context.is_offline_mode():
+        return set()
+    return {column['name'] for column in sa.inspect(op.get_bind()).get_columns(table)}
+
+
+def upgrade() -> None:
+    existing = _existing_columns('jobs')
+    for column in COLUMNS:
+        if column.name not in existing:
+            op.add_column('jobs', column)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('jobs') as batch_op:
+        for column in reversed(COLUMNS):
+            batch_op.drop_column(column.name)
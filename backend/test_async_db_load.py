@@ -0,0 +1,216 @@
+"""
+Load benchmark for the async database path
+
+Serves the app on a single uvicorn worker and fires GET /dashboard,
+/saved-decks, /quizzes and /auth/me at a fixed concurrency, twice:
+
+- before: the same routes on a blocking session (a sync Session behind the
+  AsyncSession methods the routes await, so every query runs on the event
+  loop, as the routes did with SessionLocal)
+- after: the AsyncSession from get_async_db (aiosqlite/asyncpg)
+
+Both runs must return the same responses; requests/sec and p95 latency are
+printed for each. LOAD_DB_LATENCY_MS adds that much time to every SQL
+statement inside the driver, to stand in for a database across a network
+(5 ms by default). With 0 a local SQLite file answers faster than the hop to
+aiosqlite's thread costs, so "after" is expected to be slower there; the
+faster-than assertion only applies with latency.
+
+    python test_async_db_load.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_async_db_load_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import httpx
+import uvicorn
+from sqlalchemy import event
+from app.main import app
+from app.api.v1.auth import create_access_token
+from app.db.database import (Base, SessionLocal, async_engine, async_read_engine, engine, get_async_db,
+                             read_engine)
+from app.models import User, Course, Assignment, Flashcard, Quiz, QuizQuestion, SavedFlashcardDeck, SavedFlashcard
+
+Base.metadata.create_all(bind=engine)
+
+CONCURRENCY = 20
+REQUESTS = 400
+DB_LATENCY_MS = float(os.environ.get("LOAD_DB_LATENCY_MS", "5"))
+# Every engine the two paths read or write through (the read pools are the writers outside SQLite production mode)
+ENGINES = list({engine, read_engine, async_engine.sync_engine, async_read_engine.sync_engine})
+ENDPOINTS = ["/api/v1/dashboard/", "/api/v1/saved-decks/", "/api/v1/quizzes/", "/api/v1/auth/me"]
+
+
+def _seed() -> str:
+    """A user with courses, assignments, cards, decks and quizzes; returns their bearer token"""
+    db = SessionLocal()
+    try:
+        user = User(first_name="Load", last_name="Test", email="async-db-load@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        for c in range(4):
+            course = Course(user_id=user.id, code=f"COP{4100 + c}", name=f"Course {c}", color="#3B82F6")
+            db.add(course)
+            db.flush()
+            db.add_all(Assignment(user_id=user.id, course_id=course.id, course=course.code, type="Assignment",
+                                  title=f"Homework {a}", submitted=a % 2 == 0,
+                                  due_date=datetime.utcnow() + timedelta(days=a - 3)) for a in range(10))
+            db.add_all(Flashcard(user_id=user.id, course_id=course.id, question=f"Q{n}", answer=f"A{n}")
+                       for n in range(5))
+            deck = SavedFlashcardDeck(user_id=user.id, course_id=course.id, name=f"Deck {c}")
+            deck.cards = [SavedFlashcard(question=f"Q{n}", answer=f"A{n}", order=n) for n in range(5)]
+            quiz = Quiz(user_id=user.id, course_id=course.id, title=f"Quiz {c}")
+            quiz.questions = [QuizQuestion(question_text=f"Q{n}", option_a="a", option_b="b", option_c="c",
+                                           option_d="d", correct_answer="A", order=n) for n in range(5)]
+            db.add_all([deck, quiz])
+        db.commit()
+        return create_access_token({"sub": user.email})
+    finally:
+        db.close()
+
+
+def _add_driver_latency(dbapi_connection, connection_record):
+    """Hold every statement DB_LATENCY_MS inside the driver (in aiosqlite's thread for the async engine)"""
+    raw = getattr(dbapi_connection, "driver_connection", dbapi_connection)
+    raw = getattr(raw, "_conn", raw)  # aiosqlite wraps the sqlite3 connection
+
+    def set_trace():
+        raw.set_trace_callback(lambda statement: time.sleep(DB_LATENCY_MS / 1000))
+
+    if raw is dbapi_connection:
+        set_trace()
+    else:
+        # sqlite3 objects belong to the aiosqlite thread; queue the call there
+        dbapi_connection.await_(dbapi_connection.driver_connection._execute(set_trace))
+
+
+class _BlockingSession:
+    """The AsyncSession methods the routes await, run directly on a sync Session (the old blocking path)"""
+
+    def __init__(self, session):
+        self.session = session
+
+    def add(self, instance):
+        self.session.add(instance)
+
+    async def execute(self, *args, **kwargs):
+        return self.session.execute(*args, **kwargs)
+
+    async def scalar(self, *args, **kwargs):
+        return self.session.scalar(*args, **kwargs)
+
+    async def scalars(self, *args, **kwargs):
+        return self.session.scalars(*args, **kwargs)
+
+    async def get(self, *args, **kwargs):
+        return self.session.get(*args, **kwargs)
+
+    async def delete(self, instance):
+        self.session.delete(instance)
+
+    async def commit(self):
+        self.session.commit()
+
+    async def run_sync(self, func, *args, **kwargs):
+        return func(self.session, *args, **kwargs)
+
+
+async def _blocking_db():
+    # Opened and closed on the event loop too (a sync generator would close it in
+    # the threadpool after the loop may already be blocked waiting on the pool)
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        yield _BlockingSession(db)
+    finally:
+        db.close()
+
+
+async def _load(base_url: str, token: str) -> dict:
+    """Fire REQUESTS requests, CONCURRENCY at a time; returns rate, p95 and one body per endpoint"""
+    latencies, bodies = [], {}
+    pending = iter(range(REQUESTS))
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=60,
+                                 headers={"Authorization": f"Bearer {token}"}) as client:
+        async def worker():
+            for n in pending:
+                path = ENDPOINTS[n % len(ENDPOINTS)]
+                started = time.perf_counter()
+                response = await client.get(path)
+                latencies.append(time.perf_counter() - started)
+                assert response.status_code == 200, f"{path}: {response.status_code} {response.text}"
+                bodies.setdefault(path, response.json())
+
+        # Warm both pools before timing
+        await asyncio.gather(*(client.get(path) for path in ENDPOINTS for _ in range(CONCURRENCY // 4)))
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+        seconds = time.perf_counter() - started
+
+    latencies.sort()
+    return {"rate": REQUESTS / seconds, "p95": latencies[int(len(latencies) * 0.95)], "bodies": bodies}
+
+
+def _serve_and_load(token: str) -> dict:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, workers=1, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        while not server.started:
+            time.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        return asyncio.run(_load(f"http://127.0.0.1:{port}", token))
+    finally:
+        server.should_exit = True
+        thread.join(timeout=10)
+
+
+def test_async_session_load():
+    """Async routes serve more requests/sec than the same routes on a blocking session"""
+    token = _seed()
+    if DB_LATENCY_MS:
+        for bind in ENGINES:
+            event.listen(bind, "connect", _add_driver_latency)
+    engine.dispose()
+    read_engine.dispose()
+    try:
+        app.dependency_overrides[get_async_db] = _blocking_db
+        before = _serve_and_load(token)
+        app.dependency_overrides.pop(get_async_db)
+        after = _serve_and_load(token)
+    finally:
+        app.dependency_overrides.pop(get_async_db, None)
+        if DB_LATENCY_MS:
+            for bind in ENGINES:
+                event.remove(bind, "connect", _add_driver_latency)
+        engine.dispose()
+        read_engine.dispose()
+
+    print(f"{REQUESTS} requests, concurrency {CONCURRENCY}, {DB_LATENCY_MS:g} ms per statement:")
+    for label, result in (("before (blocking Session)", before), ("after (AsyncSession)", after)):
+        print(f"  {label}: {result['rate']:.0f} req/s, p95 {result['p95'] * 1000:.0f} ms")
+
+    assert after["bodies"] == before["bodies"]
+    if DB_LATENCY_MS:
+        assert after["rate"] > before["rate"]
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" ASYNC DATABASE LOAD BENCHMARK (temporary SQLite database)")
+    print("=" * 70)
+    for test in [test_async_session_load]:
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
@@ -0,0 +1,267 @@
+"""
+Test and benchmark script for bulk Canvas imports
+
+Imports 7 courses with ~300 assignments into a temporary SQLite database and
+counts the SQL statements issued, first with the old per-row pattern (a
+SELECT for every course, module and assignment) and then through
+app.services.bulk_upsert. Also checks that re-imports update Canvas-owned
+fields without duplicating rows or touching per-user state, that the
+migration adding the upsert indexes deletes duplicates first, and runs
+CanvasSyncService against the local fake Canvas server.
+
+    python test_bulk_upsert.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_bulk_upsert_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.orm import sessionmaker
+from app.db.database import Base, SessionLocal, engine, read_engine
+from app.db.migrations import upgrade_database
+from app.models import User, Course
+from app.models.assignment import Assignment
+from app.models.module import Module
+from app.models.module_pool import ModulePregeneration, PregeneratedFlashcard
+from app.services import canvas_import
+from app.services.canvas_client import CanvasClient
+from app.services.canvas_sync import CanvasSyncService
+from fake_canvas_server import FakeCanvasServer
+
+Base.metadata.create_all(bind=engine)
+
+NUM_COURSES = 7
+ASSIGNMENTS_PER_COURSE = 43  # 301 assignments in total
+MODULES_PER_COURSE = 8
+
+
+def _scraped_courses(due_month: int = 10):
+    """Scraped course data in the shape CanvasScraper.scrape_all_active_courses returns"""
+    return [
+        {
+            "id": str(1000 + c),
+            "name": f"COP{4000 + c}.001 Course {c} F25",
+            "modules": [{"name": f"Week {m}", "items": [{"name": f"Slides {m}"}]} for m in range(MODULES_PER_COURSE)],
+            "assignments": [
+                {"name": f"Homework {a}", "due_date": f"2025-{due_month:02d}-{1 + a % 28:02d}T23:59:00Z"}
+                for a in range(ASSIGNMENTS_PER_COURSE)
+            ]
+        }
+        for c in range(NUM_COURSES)
+    ]
+
+
+def _new_user(email: str) -> int:
+    db = SessionLocal()
+    try:
+        user = User(first_name="Test", last_name="Student", email=email, password_hash="x")
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+@contextmanager
+def _count_statements():
+    """Count SQL statements sent to the database"""
+    counter = {"statements": 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counter["statements"] += 1
+
+    binds = {engine, read_engine}  # the same engine unless SQLite reads have their own pool
+    for bind in binds:
+        event.listen(bind, "before_cursor_execute", count)
+    try:
+        yield counter
+    finally:
+        for bind in binds:
+            event.remove(bind, "before_cursor_execute", count)
+
+
+def _per_row_import(user_id: int, courses_data):
+    """The previous import loop: one SELECT per course, module and assignment"""
+    db = SessionLocal()
+    try:
+        for idx, course_data in enumerate(courses_data):
+            course = db.query(Course).filter(Course.canvas_id == course_data['id'], Course.user_id == user_id).first()
+            if not course:
+                course = Course(canvas_id=course_data['id'], user_id=user_id, code=canvas_import.course_code(course_data['name']),
+                                name=course_data['name'], color="#3B82F6")
+                db.add(course)
+                db.flush()
+            for pos, module_data in enumerate(course_data['modules']):
+                if not db.query(Module).filter(Module.course_id == course.id, Module.name == module_data['name']).first():
+                    db.add(Module(course_id=course.id, name=module_data['name'], position=pos, items=module_data['items']))
+            for assign_data in course_data['assignments']:
+                if not db.query(Assignment).filter(Assignment.user_id == user_id, Assignment.course_id == course.id,
+                                                   Assignment.title == assign_data['name']).first():
+                    db.add(Assignment(user_id=user_id, course_id=course.id, title=assign_data['name'], course=course.code,
+                                      due_date=canvas_import.parse_due_date(assign_data['due_date']), type="Assignment"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_bulk_import_statement_count():
+    """Statements for 7 courses / 301 assignments: per-row loop vs bulk upsert"""
+    courses = _scraped_courses()
+    with _count_statements() as per_row:
+        _per_row_import(_new_user("per-row@example.com"), courses)
+    with _count_statements() as bulk:
+        counts = canvas_import._import(_new_user("bulk@example.com"), courses, with_assignments=True)
+
+    total_assignments = NUM_COURSES * ASSIGNMENTS_PER_COURSE
+    print(f"  {NUM_COURSES} courses, {NUM_COURSES * MODULES_PER_COURSE} modules, {total_assignments} assignments")
+    print(f"  per-row loop: {per_row['statements']} statements")
+    print(f"  bulk upsert:  {bulk['statements']} statements")
+    assert counts == {"courses": NUM_COURSES, "modules": NUM_COURSES * MODULES_PER_COURSE, "assignments": total_assignments}
+    assert bulk["statements"] <= 10
+
+
+def test_reimport_updates_without_duplicates():
+    """Re-import updates due dates and module items, keeps student state, adds nothing"""
+    user_id = _new_user("reimport@example.com")
+    canvas_import._import(user_id, _scraped_courses(due_month=10), with_assignments=True)
+
+    db = SessionLocal()
+    first = db.query(Assignment).filter(Assignment.user_id == user_id).first()
+    first.status = "completed"
+    db.commit()
+    first_id = first.id
+    db.close()
+
+    counts = canvas_import._import(user_id, _scraped_courses(due_month=11), with_assignments=True)
+    assert counts == {"courses": 0, "modules": 0, "assignments": 0}
+
+    db = SessionLocal()
+    try:
+        assert db.query(Course).filter(Course.user_id == user_id).count() == NUM_COURSES
+        assert db.query(Assignment).filter(Assignment.user_id == user_id).count() == NUM_COURSES * ASSIGNMENTS_PER_COURSE
+        updated = db.query(Assignment).filter(Assignment.id == first_id).first()
+        assert updated.status == "completed"
+        assert updated.due_date.month == 11
+    finally:
+        db.close()
+
+
+def test_links_courses_created_without_canvas_id():
+    """A course added by name before it had a canvas_id is linked, not duplicated"""
+    user_id = _new_user("link@example.com")
+    courses = _scraped_courses()
+    db = SessionLocal()
+    db.add(Course(user_id=user_id, code="COP4000", name=courses[0]["name"], color="#3B82F6"))
+    db.commit()
+    db.close()
+
+    counts = canvas_import._import(user_id, courses, with_assignments=False)
+    assert counts["courses"] == NUM_COURSES - 1
+
+    db = SessionLocal()
+    try:
+        assert db.query(Course).filter(Course.user_id == user_id).count() == NUM_COURSES
+        assert db.query(Course).filter(Course.user_id == user_id, Course.canvas_id.is_(None)).count() == 0
+    finally:
+        db.close()
+
+
+def test_migration_removes_duplicates():
+    """Migrating a database that predates the upsert indexes keeps the oldest of each duplicate"""
+    path = Path(tempfile.gettempdir()) / "canvas_ext_upsert_migration_test.db"
+    path.unlink(missing_ok=True)
+    old_engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(bind=old_engine)
+        with old_engine.begin() as connection:
+            for index in ("uq_modules_course_name", "uq_assignments_user_course_title"):
+                connection.exec_driver_sql(f"DROP INDEX {index}")
+
+        db = sessionmaker(bind=old_engine)()
+        try:
+            user = User(first_name="Test", last_name="Student", email="old@example.com", password_hash="x")
+            db.add(user)
+            db.flush()
+            course = Course(user_id=user.id, code="COP4000", name="Course", color="#3B82F6")
+            db.add(course)
+            db.flush()
+            modules = [Module(course_id=course.id, name=name, position=n) for n, name in enumerate(["Week 1", "Week 1", "Week 2"])]
+            db.add_all(modules)
+            db.add_all(Assignment(user_id=user.id, course_id=course.id, course=course.code, title=title,
+                                  status=status, type="Assignment", due_date=datetime.utcnow())
+                       for title, status in (("Homework 1", "completed"), ("Homework 1", "pending"), ("Homework 2", "pending")))
+            db.flush()
+            db.add(ModulePregeneration(module_id=modules[1].id, status="ready"))
+            db.add(PregeneratedFlashcard(module_id=modules[1].id, question="Q", answer="A"))
+            db.commit()
+            kept_module = modules[0].id
+        finally:
+            db.close()
+
+        upgrade_database(old_engine)
+
+        indexes = {index["name"]: index["unique"] for table in ("modules", "assignments")
+                   for index in inspect(old_engine).get_indexes(table)}
+        assert indexes["uq_modules_course_name"] and indexes["uq_assignments_user_course_title"]
+        with old_engine.connect() as connection:
+            rows = lambda sql: connection.exec_driver_sql(sql).all()
+            assert rows("SELECT id, name FROM modules ORDER BY name") == [(kept_module, "Week 1"), (kept_module + 2, "Week 2")]
+            assert rows("SELECT title, status FROM assignments ORDER BY title") == [("Homework 1", "completed"),
+                                                                                    ("Homework 2", "pending")]
+            assert rows("SELECT COUNT(*) FROM module_pregenerations") == [(0,)]
+            assert rows("SELECT COUNT(*) FROM pregenerated_flashcards") == [(0,)]
+    finally:
+        old_engine.dispose()
+        path.unlink(missing_ok=True)
+
+
+def test_canvas_sync_service():
+    """CanvasSyncService stores Canvas ids in canvas_id and rows under the user"""
+    user_id = _new_user("sync@example.com")
+
+    async def sync(url: str):
+        canvas = CanvasClient(url, "test-token")
+        db = SessionLocal()
+        try:
+            return await CanvasSyncService(db=db, canvas_client=canvas, user_id=user_id).sync_all()
+        finally:
+            db.close()
+            await canvas.close()
+
+    with FakeCanvasServer(num_courses=3, num_assignments=5, latency=0.0) as server:
+        results = asyncio.run(sync(server.url))
+        results_again = asyncio.run(sync(server.url))
+
+    assert (results["courses"], results["assignments"], results["errors"]) == (3, 15, [])
+    assert results_again["errors"] == []
+    db = SessionLocal()
+    try:
+        courses = db.query(Course).filter(Course.user_id == user_id).order_by(Course.canvas_id).all()
+        assert [course.canvas_id for course in courses] == ["1", "2", "3"]
+        assignments = db.query(Assignment).filter(Assignment.user_id == user_id).all()
+        assert len(assignments) == 15
+        assert all(isinstance(assignment.due_date, datetime) for assignment in assignments)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING BULK CANVAS IMPORTS (temporary SQLite database)")
+    print("=" * 70)
+    for test in (test_bulk_import_statement_count, test_reimport_updates_without_duplicates,
+                 test_links_courses_created_without_canvas_id, test_migration_removes_duplicates,
+                 test_canvas_sync_service):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
@@ -0,0 +1,204 @@
+"""
+Test script for the background Canvas refresh scheduler
+
+Uses the local fake Canvas server and a temporary SQLite database. Checks
+that login makes no Canvas requests (whatever the course count) and only
+queues a refresh when data is stale, that the scheduler picks exactly the
+due, active users with a usable session, that a refresh job imports
+courses and reschedules itself with jitter, and that an expired session
+cookie stops refreshes until a new one is saved.
+
+    python test_canvas_refresh.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_refresh_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from fastapi.testclient import TestClient
+from app.main import app
+from app.api.v1.auth import get_password_hash
+from app.core.config import settings
+from app.core.encryption import encrypt_data
+from app.db.database import SessionLocal
+from app.models import User, Course, Job, CanvasRefreshState
+from app.services import canvas_refresh
+from fake_canvas_server import FakeCanvasServer
+
+PASSWORD = "correct horse battery staple"
+PASSWORD_HASH = get_password_hash(PASSWORD)
+
+
+def _new_user(email: str, canvas_url: str = "http://127.0.0.1:9", cookie: str = "test-cookie") -> int:
+    db = SessionLocal()
+    try:
+        user = User(first_name="Test", last_name="Student", email=email, password_hash=PASSWORD_HASH,
+                    canvas_instance_url=canvas_url, canvas_session_cookie=encrypt_data(cookie))
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def _set_state(user_id: int, **values):
+    db = SessionLocal()
+    try:
+        state = db.query(CanvasRefreshState).filter(CanvasRefreshState.user_id == user_id).first()
+        if state is None:
+            state = CanvasRefreshState(user_id=user_id, consecutive_failures=0)
+            db.add(state)
+        for key, value in values.items():
+            setattr(state, key, value)
+        db.commit()
+    finally:
+        db.close()
+
+
+def _state(user_id: int) -> CanvasRefreshState:
+    db = SessionLocal()
+    try:
+        state = db.query(CanvasRefreshState).filter(CanvasRefreshState.user_id == user_id).one()
+        db.expunge(state)
+        return state
+    finally:
+        db.close()
+
+
+def _refresh_jobs(user_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Job).filter(Job.kind == canvas_refresh.REFRESH_KIND, Job.user_id == user_id).count()
+    finally:
+        db.close()
+
+
+def _login(client: TestClient, email: str):
+    started = time.perf_counter()
+    response = client.post("/api/v1/auth/login", json={"email": email, "password": PASSWORD})
+    assert response.status_code == 200, response.text
+    return response.json(), time.perf_counter() - started
+
+
+def test_login_makes_no_canvas_requests():
+    """Login time doesn't grow with course count; a stale user gets one refresh queued"""
+    client = TestClient(app)  # No lifespan: jobs stay queued
+    for num_courses in (1, 20):
+        with FakeCanvasServer(num_courses=num_courses, latency=0.05) as server:
+            email = f"login{num_courses}@example.com"
+            user_id = _new_user(email, canvas_url=server.url)
+            body, seconds = _login(client, email)
+            _login(client, email)
+            requests = server.request_count
+        print(f"  {num_courses:>2} courses: login {seconds * 1000:.0f} ms, {requests} Canvas requests")
+        assert requests == 0
+        assert body["has_canvas_session"] and body["canvas_session_valid"]
+        assert _refresh_jobs(user_id) == 1  # The second login sees the pending job
+
+
+def test_scheduler_queues_due_active_users():
+    """Only due, recently active users with a usable cookie and no pending refresh are queued"""
+    now = datetime.utcnow()
+    due = _new_user("due@example.com")
+    _set_state(due, last_login_at=now, next_refresh_at=now - timedelta(minutes=1))
+    not_due = _new_user("not-due@example.com")
+    _set_state(not_due, last_login_at=now, next_refresh_at=now + timedelta(minutes=30))
+    inactive = _new_user("inactive@example.com")
+    _set_state(inactive, last_login_at=now - timedelta(days=settings.CANVAS_REFRESH_ACTIVE_DAYS + 1),
+               next_refresh_at=now - timedelta(minutes=1))
+    expired = _new_user("expired@example.com")
+    _set_state(expired, last_login_at=now, next_refresh_at=now - timedelta(minutes=1), session_expired_at=now)
+    no_cookie = _new_user("no-cookie@example.com", cookie="")
+    _set_state(no_cookie, last_login_at=now, next_refresh_at=now - timedelta(minutes=1))
+
+    db = SessionLocal()
+    try:
+        canvas_refresh.schedule_due_refreshes(db, now)
+        queued_again = canvas_refresh.schedule_due_refreshes(db, now)
+    finally:
+        db.close()
+
+    assert [_refresh_jobs(user_id) for user_id in (due, not_due, inactive, expired, no_cookie)] == [1, 0, 0, 0, 0]
+    assert queued_again == 0
+    interval = timedelta(minutes=settings.CANVAS_REFRESH_INTERVAL_MINUTES)
+    next_at = _state(due).next_refresh_at
+    assert now + interval * (1 - settings.CANVAS_REFRESH_JITTER) <= next_at <= now + interval * (1 + settings.CANVAS_REFRESH_JITTER)
+
+
+def test_jitter_spreads_refreshes():
+    """Users refreshed at the same moment get different next refresh times"""
+    now = datetime.utcnow()
+    times = [canvas_refresh.next_refresh_time(now) for _ in range(50)]
+    spread = (max(times) - min(times)).total_seconds() / 60
+    print(f"  50 users refreshed together: next refreshes spread over {spread:.0f} minutes")
+    assert spread > settings.CANVAS_REFRESH_INTERVAL_MINUTES * settings.CANVAS_REFRESH_JITTER
+    backoff = canvas_refresh.next_refresh_time(now, failures=3) - now
+    assert backoff >= timedelta(minutes=settings.CANVAS_REFRESH_INTERVAL_MINUTES * 8 * (1 - settings.CANVAS_REFRESH_JITTER))
+
+
+def test_refresh_job_imports_courses():
+    """A refresh job imports courses, records success and schedules the next refresh"""
+    with FakeCanvasServer(num_courses=4, latency=0.0) as server:
+        user_id = _new_user("refresh@example.com", canvas_url=server.url)
+        _set_state(user_id, last_login_at=datetime.utcnow())
+        result = asyncio.run(canvas_refresh.run_refresh_canvas({"user_id": user_id}))
+
+    assert result["courses_synced"] == 4
+    assert "follow_up_jobs" in result
+    state = _state(user_id)
+    assert state.last_status == "succeeded" and state.consecutive_failures == 0
+    assert state.next_refresh_at > datetime.utcnow()
+    db = SessionLocal()
+    try:
+        assert db.query(Course).filter(Course.user_id == user_id).count() == 4
+        assert db.query(User).filter(User.id == user_id).one().last_sync is not None
+    finally:
+        db.close()
+
+
+def test_expired_session_stops_refreshes():
+    """A rejected cookie marks the session expired until a new one is saved"""
+    with FakeCanvasServer(num_courses=2, latency=0.0) as server:
+        email = "stale-cookie@example.com"
+        user_id = _new_user(email, canvas_url=server.url)
+        _set_state(user_id, last_login_at=datetime.utcnow())
+        server.expire_session()
+        try:
+            asyncio.run(canvas_refresh.run_refresh_canvas({"user_id": user_id}))
+            raise AssertionError("refresh with an expired session should fail")
+        except Exception as e:
+            assert canvas_refresh.is_session_error(e), e
+
+    state = _state(user_id)
+    assert state.last_status == "session_expired" and state.session_expired_at is not None
+    body, _ = _login(TestClient(app), email)
+    assert body["has_canvas_session"] and not body["canvas_session_valid"]
+    assert _refresh_jobs(user_id) == 0
+
+    db = SessionLocal()
+    try:
+        canvas_refresh.session_updated(db, user_id)
+    finally:
+        db.close()
+    assert _state(user_id).session_expired_at is None
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING BACKGROUND CANVAS REFRESH (fake Canvas server, temporary SQLite database)")
+    print("=" * 70)
+    for test in (test_login_makes_no_canvas_requests, test_scheduler_queues_due_active_users,
+                 test_jitter_spreads_refreshes, test_refresh_job_imports_courses,
+                 test_expired_session_stops_refreshes):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
@@ -0,0 +1,112 @@
+"""
+Test and benchmark script for concurrent Canvas scraping
+
+Runs CanvasScraper against the local fake Canvas server
+(fake_canvas_server.py). Checks that the concurrent scrape returns the same
+data as the sequential one, stays within the per-host request cap and
+recovers from throttling, then measures how wall time scales with the
+number of courses in each mode.
+
+    python test_canvas_scraper.py
+"""
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from app.core.config import settings
+from app.services.canvas_scraper import CanvasScraper
+from fake_canvas_server import FakeCanvasServer
+
+LATENCY = 0.1  # Seconds per Canvas round trip
+COURSE_COUNTS = (1, 3, 7, 12)
+
+
+@contextmanager
+def _scrape_settings(**overrides):
+    """Temporarily override scraping settings"""
+    saved = {name: getattr(settings, name) for name in overrides}
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            setattr(settings, name, value)
+
+
+def _scrape(server: FakeCanvasServer):
+    return CanvasScraper(base_url=server.url, session_cookie="test-cookie").scrape_all_active_courses()
+
+
+def test_concurrent_matches_sequential():
+    """Concurrent scrape returns the same courses, in the same order, as the sequential one"""
+    with FakeCanvasServer(num_courses=5, latency=0.01) as server:
+        with _scrape_settings(CANVAS_SCRAPE_CONCURRENCY=1):
+            sequential = _scrape(server)
+        with _scrape_settings(CANVAS_SCRAPE_CONCURRENCY=8):
+            concurrent = _scrape(server)
+
+    assert len(sequential) == 5
+    assert all(course['assignments'] and course['modules'] for course in sequential)
+    assert concurrent == sequential
+
+
+def test_per_host_cap():
+    """No more than CANVAS_MAX_CONNECTIONS_PER_HOST requests reach Canvas at once"""
+    with _scrape_settings(CANVAS_SCRAPE_CONCURRENCY=16, CANVAS_MAX_CONNECTIONS_PER_HOST=3):
+        with FakeCanvasServer(num_courses=10, latency=0.05) as server:
+            courses = _scrape(server)
+            max_in_flight = server.max_in_flight
+
+    print(f"  max in-flight requests: {max_in_flight} (cap 3)")
+    assert len(courses) == 10
+    assert max_in_flight <= 3
+
+
+def test_retries_throttled_requests():
+    """429 + Retry-After and Canvas's 403 'Rate Limit Exceeded' are retried, not lost"""
+    for status in (429, 403):
+        with FakeCanvasServer(num_courses=4, latency=0.01, throttle_every=3,
+                              throttle_status=status, retry_after=0.1) as server:
+            courses = _scrape(server)
+            throttled = server.throttled_count
+
+        print(f"  {status}: {throttled} throttled responses retried")
+        assert throttled > 0
+        assert len(courses) == 4
+        assert all(len(course['assignments']) == 3 and len(course['modules']) == 3 for course in courses)
+
+
+def test_benchmark_wall_time_by_course_count():
+    """Wall time vs course count: sequential scrape against the concurrent scrape"""
+    print(f"  {LATENCY * 1000:.0f} ms per Canvas request, "
+          f"concurrency {settings.CANVAS_SCRAPE_CONCURRENCY}, "
+          f"per-host cap {settings.CANVAS_MAX_CONNECTIONS_PER_HOST}")
+    print(f"  {'courses':>7}  {'sequential':>10}  {'concurrent':>10}  {'speedup':>7}")
+    for num_courses in COURSE_COUNTS:
+        timings = {}
+        for mode, concurrency in (("sequential", 1), ("concurrent", settings.CANVAS_SCRAPE_CONCURRENCY)):
+            with _scrape_settings(CANVAS_SCRAPE_CONCURRENCY=concurrency):
+                with FakeCanvasServer(num_courses=num_courses, latency=LATENCY) as server:
+                    started = time.perf_counter()
+                    courses = _scrape(server)
+                    timings[mode] = time.perf_counter() - started
+            assert len(courses) == num_courses
+
+        print(f"  {num_courses:>7}  {timings['sequential']:>9.2f}s  {timings['concurrent']:>9.2f}s  "
+              f"{timings['sequential'] / timings['concurrent']:>6.1f}x")
+        if num_courses >= 3:
+            assert timings['concurrent'] < timings['sequential']
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING CONCURRENT CANVAS SCRAPING (fake Canvas server)")
+    print("=" * 70)
+    for test in (test_concurrent_matches_sequential, test_per_host_cap,
+                 test_retries_throttled_requests, test_benchmark_wall_time_by_course_count):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
@@ -0,0 +1,194 @@
+"""
+Test script for streaming AI tutor and active recall grading responses
+
+Runs against the local fake Groq server (fake_groq_server.py), so no Groq API
+key or Canvas session is needed. Compares time-to-first-token of the
+streaming endpoints with the full wait of the blocking ones.
+
+    python test_chat_streaming.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import json
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/canvas_ext_streaming_test.db")
+
+import threading
+import httpx
+import uvicorn
+from app.main import app
+from app.core.config import settings
+from app.core.encryption import encrypt_data
+from app.api.v1.auth import get_current_user_async
+from app.models.user import User
+from app.services import flashcard_generator
+from app.services.ingestion import ContentIngestionService, IngestedContent
+from fake_groq_server import FakeGroqServer
+
+COURSE_TEXT = (
+    "Virtual memory lets each process use a private address space that can be larger than physical memory. "
+    "The operating system keeps page tables that map virtual pages to physical frames. "
+    "When a process touches a page that is not resident, a page fault occurs and the kernel loads the page from disk. "
+) * 20
+
+
+def _fake_user() -> User:
+    return User(
+        id=1,
+        first_name="Test",
+        last_name="User",
+        email="test@example.com",
+        password_hash="",
+        canvas_instance_url="https://canvas.example.com",
+        canvas_session_cookie=encrypt_data("fake-session")
+    )
+
+
+async def _fake_ingest(self, module=None, file_urls=None, include_files_tab=False, max_files=None, max_chars=None):
+    content = IngestedContent(COURSE_TEXT, ["Lecture 5 - Virtual Memory.pdf"], 1)
+    content.documents.append(("Lecture 5 - Virtual Memory.pdf", COURSE_TEXT))
+    return content
+
+
+def _read_events(response, started):
+    """Parse a Server-Sent Events stream into (event, data, seconds since started) tuples"""
+    events = []
+    event_name = "message"
+    for line in response.iter_lines():
+        if line.startswith("event: "):
+            event_name = line[len("event: "):]
+        elif line.startswith("data: "):
+            events.append((event_name, json.loads(line[len("data: "):]), time.perf_counter() - started))
+            event_name = "message"
+    return events
+
+
+class _StreamingTestContext:
+    """
+    Fake Groq server, fake user and fake ingestion for the duration of a test
+
+    The API runs under uvicorn on a local port (rather than TestClient, which
+    buffers whole responses) so time-to-first-token is measured over real HTTP.
+    """
+
+    def __enter__(self):
+        self.groq = FakeGroqServer(first_token_delay=0.2, token_delay=0.01, num_words=150).start()
+        self.saved = (settings.GROQ_API_KEY, settings.GROQ_API_BASE_URL, ContentIngestionService.ingest)
+        settings.GROQ_API_KEY = "test-key"
+        settings.GROQ_API_BASE_URL = self.groq.url
+        ContentIngestionService.ingest = _fake_ingest
+        app.dependency_overrides[get_current_user_async] = _fake_user
+
+        self.api = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning"))
+        self.api_thread = threading.Thread(target=self.api.run, daemon=True)
+        self.api_thread.start()
+        while not self.api.started:
+            time.sleep(0.01)
+        port = self.api.servers[0].sockets[0].getsockname()[1]
+        self.client = httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=30)
+        return self
+
+    def __exit__(self, *exc):
+        self.client.close()
+        self.api.should_exit = True
+        self.api_thread.join(timeout=5)
+        settings.GROQ_API_KEY, settings.GROQ_API_BASE_URL, ContentIngestionService.ingest = self.saved
+        app.dependency_overrides.pop(get_current_user_async, None)
+        self.groq.stop()
+
+
+def test_stream_matches_blocking_response():
+    """Streamed tokens join up to the same text as the blocking call, but arrive much sooner"""
+    with _StreamingTestContext():
+        started = time.perf_counter()
+        blocking = asyncio.run(
+            flashcard_generator.generate_chat_response_with_groq("What is a page fault?", COURSE_TEXT, "OS")
+        )
+        blocking_seconds = time.perf_counter() - started
+
+        async def stream():
+            first_token_seconds = None
+            tokens = []
+            async for token in flashcard_generator.stream_chat_response_with_groq(
+                "What is a page fault?", COURSE_TEXT, "OS"
+            ):
+                if first_token_seconds is None:
+                    first_token_seconds = time.perf_counter() - started
+                tokens.append(token)
+            return first_token_seconds, tokens
+
+        started = time.perf_counter()
+        first_token_seconds, tokens = asyncio.run(stream())
+
+        print(f"Blocking response: {blocking_seconds * 1000:.0f} ms, "
+              f"streamed first token: {first_token_seconds * 1000:.0f} ms")
+        assert "".join(tokens).strip() == blocking
+        assert first_token_seconds < blocking_seconds / 2
+
+
+def test_chat_stream_endpoint():
+    """POST /chat/stream sends references, then tokens, then done"""
+    with _StreamingTestContext() as ctx:
+        started = time.perf_counter()
+        response = ctx.client.post("/api/v1/chat/", json={"message": "What is a page fault?"})
+        blocking_seconds = time.perf_counter() - started
+        assert response.status_code == 200
+
+        started = time.perf_counter()
+        with ctx.client.stream("POST", "/api/v1/chat/stream", json={"message": "What is a page fault?"}) as stream:
+            assert stream.status_code == 200
+            assert stream.headers["content-type"].startswith("text/event-stream")
+            events = _read_events(stream, started)
+
+        names = [name for name, _, _ in events]
+        assert names[0] == "references"
+        assert events[0][1]["references"] == ["Lecture 5 - Virtual Memory.pdf"]
+        assert names[-1] == "done"
+        tokens = [data["token"] for name, data, _ in events if name == "message"]
+        assert "".join(tokens).strip() == response.json()["message"]
+
+        first_token_seconds = next(seconds for name, _, seconds in events if name == "message")
+        total_seconds = events[-1][2]
+        print(f"POST /chat/: {blocking_seconds * 1000:.0f} ms, POST /chat/stream first token: "
+              f"{first_token_seconds * 1000:.0f} ms, last: {total_seconds * 1000:.0f} ms ({len(tokens)} tokens)")
+        assert first_token_seconds < blocking_seconds / 2
+
+
+def test_grade_stream_endpoint():
+    """POST /chat/active-recall/grade/stream ends with the parsed grade"""
+    with _StreamingTestContext() as ctx:
+        request = {
+            "question": "What happens on a page fault?",
+            "user_answer": "The kernel loads the missing page from disk.",
+            "difficulty": "balanced"
+        }
+        started = time.perf_counter()
+        with ctx.client.stream("POST", "/api/v1/chat/active-recall/grade/stream", json=request) as stream:
+            assert stream.status_code == 200
+            events = _read_events(stream, started)
+
+        results = [data for name, data, _ in events if name == "result"]
+        assert len(results) == 1
+        assert results[0]["score"] == 85
+        assert results[0]["passed"] is True
+        assert events[-1][0] == "done"
+
+        blocking = ctx.client.post("/api/v1/chat/active-recall/grade", json=request)
+        assert blocking.status_code == 200
+        assert blocking.json() == results[0]
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING STREAMING CHAT AND GRADING (fake Groq server)")
+    print("=" * 70)
+    for test in (test_stream_matches_blocking_response, test_chat_stream_endpoint, test_grade_stream_endpoint):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
@@ -0,0 +1,169 @@
+"""
+Test script for the course chunk index
+
+Uses a temporary SQLite database; the Canvas file listing and text
+extraction are stubbed. Indexes a course, searches it through FTS5, and
+checks that the triggers keep course_chunks_fts in step with course_chunks
+when a chunk's text is updated or a document is removed, and that an FTS5
+rebuild gives the same matches.
+
+    python test_chunk_index.py
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_chunk_index_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import text as sql_text
+
+import app.main  # Creates the tables
+from app.db.database import SessionLocal
+from app.models.course import Course
+from app.models.course_chunk import CourseChunk, CourseDocument
+from app.models.user import User
+from app.services import chunk_index, course_files_index, ingestion
+
+CANVAS_URL = "https://canvas.test"
+DOCUMENTS = {
+    f"{CANVAS_URL}/files/1": ("Lecture 4.pdf", "Mitochondria produce ATP through oxidative phosphorylation. " * 40),
+    f"{CANVAS_URL}/files/2": ("Lab 2.pdf", "Chloroplasts capture light energy during photosynthesis. " * 40),
+}
+
+
+def _create_course() -> int:
+    db = SessionLocal()
+    try:
+        user = User(first_name="Test", last_name="Student", email="chunk-index@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        course = Course(canvas_id="501", user_id=user.id, code="BSC2010", name="Biology", color="#3B82F6")
+        db.add(course)
+        db.commit()
+        return course.id
+    finally:
+        db.close()
+
+
+def _course_id() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Course.id).filter(Course.canvas_id == "501").scalar()
+    finally:
+        db.close()
+
+
+def _index(course_id: int, urls) -> dict:
+    """Index the course as if its Files tab held these documents"""
+    def get_course_files(db, course, canvas_url, session_cookie):
+        return [{"url": url, "name": DOCUMENTS[url][0], "content_type": "application/pdf", "updated_at": "v1"}
+                for url in urls]
+
+    async def extract_texts_from_urls(urls, session_cookie, canvas_url, user_id=None, file_ids=None):
+        return [DOCUMENTS[url][1] for url in urls]
+
+    stubs = course_files_index.get_course_files, ingestion.extract_texts_from_urls
+    course_files_index.get_course_files = get_course_files
+    ingestion.extract_texts_from_urls = extract_texts_from_urls
+    try:
+        return chunk_index.index_course(course_id, CANVAS_URL, "cookie")
+    finally:
+        course_files_index.get_course_files, ingestion.extract_texts_from_urls = stubs
+
+
+def _fts_ids(term: str) -> set:
+    """Rowids the FTS5 table matches for a term"""
+    db = SessionLocal()
+    try:
+        return {row[0] for row in db.execute(
+            sql_text("SELECT rowid FROM course_chunks_fts WHERE course_chunks_fts MATCH :term"), {"term": term}
+        )}
+    finally:
+        db.close()
+
+
+def _chunk_ids(**filters) -> set:
+    db = SessionLocal()
+    try:
+        return {chunk_id for (chunk_id,) in db.query(CourseChunk.id).filter_by(**filters)}
+    finally:
+        db.close()
+
+
+def _document_id(url: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(CourseDocument.id).filter(CourseDocument.source_url == url).scalar()
+    finally:
+        db.close()
+
+
+def test_index_and_search():
+    """An indexed course is searchable through FTS5; the matching document's passages are returned"""
+    course_id = _create_course()
+    stats = _index(course_id, list(DOCUMENTS))
+    assert stats["added"] == 2 and stats["failed"] == 0
+
+    lecture = _chunk_ids(document_id=_document_id(f"{CANVAS_URL}/files/1"))
+    assert lecture and _fts_ids("mitochondria") == lecture
+    assert _fts_ids("producing") == lecture  # Porter stemming
+
+    db = SessionLocal()
+    try:
+        document_ids = [document_id for (document_id,) in db.query(CourseDocument.id)]
+        matched = chunk_index._match_chunk_ids(db, course_id, document_ids, "How is ATP made?", 50)
+        assert matched and set(matched) <= lecture
+
+        sections = chunk_index.search(db, course_id, "photosynthesis light", 200)
+        assert sections[0][0] == "Lab 2.pdf"
+        assert "Chloroplasts" in sections[0][1]
+    finally:
+        db.close()
+
+    assert _index(course_id, list(DOCUMENTS))["unchanged"] == 2
+
+
+def test_triggers_follow_update_and_delete():
+    """Updating a chunk's text and removing a document are reflected in FTS5, and a rebuild agrees"""
+    lecture = _chunk_ids(document_id=_document_id(f"{CANVAS_URL}/files/1"))
+    edited = min(lecture)
+
+    db = SessionLocal(for_write=True)
+    try:
+        db.query(CourseChunk).filter(CourseChunk.id == edited).update(
+            {CourseChunk.text: "Ribosomes translate messenger RNA into protein."}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+    assert _fts_ids("mitochondria") == lecture - {edited}
+    assert _fts_ids("ribosomes") == {edited}
+
+    course_id = _course_id()
+    assert _index(course_id, [f"{CANVAS_URL}/files/1"])["removed"] == 1
+    assert _fts_ids("chloroplasts") == set()
+    assert _chunk_ids() == lecture
+
+    before = {term: _fts_ids(term) for term in ("mitochondria", "ribosomes", "chloroplasts")}
+    db = SessionLocal(for_write=True)
+    try:
+        db.execute(sql_text("INSERT INTO course_chunks_fts(course_chunks_fts) VALUES('rebuild')"))
+        db.commit()
+    finally:
+        db.close()
+    assert {term: _fts_ids(term) for term in before} == before
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING THE COURSE CHUNK INDEX (temporary SQLite database)")
+    print("=" * 70)
+    for test in (test_index_and_search, test_triggers_follow_update_and_delete):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
@@ -0,0 +1,299 @@
+"""
+Test and benchmark script for dashboard snapshots
+
+Uses a temporary SQLite database. Checks that a cached dashboard load
+issues no SQL, that snapshots are invalidated (only for the affected
+user, and only on commit) by flashcard reviews, study sessions, Canvas
+imports and syncs, that a rebuild racing an invalidation isn't cached,
+that persisted snapshots are served after the in-process cache is
+cleared, and that another worker's invalidation reaches this process's
+cache. Prints cached vs rebuilt load times and the cache stats.
+
+    python test_dashboard_cache.py
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_dashboard_cache_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import event
+import app.main  # Creates the tables
+from app.core.config import settings
+from app.db.database import SessionLocal, engine, read_engine
+from app.models import User, Course, Assignment, Flashcard, StudySession, DashboardSnapshot
+from app.services import canvas_import, dashboard, dashboard_cache
+
+REPEATS = 50
+
+
+def _seed(email: str, num_courses: int = 3, per_course: int = 10) -> int:
+    db = SessionLocal()
+    try:
+        user = User(first_name="Test", last_name="Student", email=email, password_hash="x")
+        db.add(user)
+        db.flush()
+        now = datetime.utcnow()
+        for c in range(num_courses):
+            course = Course(user_id=user.id, code=f"COP{4000 + c}", name=f"Course {c}", color="#3B82F6")
+            db.add(course)
+            db.flush()
+            db.add_all(
+                Assignment(user_id=user.id, course_id=course.id, course=course.code, type="Assignment",
+                           title=f"Homework {a}", due_date=now + timedelta(days=1 + a, minutes=c))
+                for a in range(per_course)
+            )
+            db.add(Flashcard(user_id=user.id, course_id=course.id, question="Q", answer="A"))
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def _load(user_id: int):
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).one()
+        return dashboard_cache.get_dashboard(db, user)
+    finally:
+        db.close()
+
+
+@contextmanager
+def _count_statements():
+    counter = {"statements": 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counter["statements"] += 1
+
+    binds = {engine, read_engine}  # the same engine unless SQLite reads have their own pool
+    for bind in binds:
+        event.listen(bind, "before_cursor_execute", count)
+    try:
+        yield counter
+    finally:
+        for bind in binds:
+            event.remove(bind, "before_cursor_execute", count)
+
+
+def _submit_one(user_id: int) -> None:
+    """Mark one of the user's assignments submitted (an ORM write the session hooks see)"""
+    db = SessionLocal()
+    try:
+        assignment = db.query(Assignment).filter(Assignment.user_id == user_id, Assignment.submitted == False).first()
+        assignment.submitted = True
+        db.commit()
+    finally:
+        db.close()
+
+
+def _cached(user_id: int) -> bool:
+    return dashboard_cache._memory_get(user_id, datetime.utcnow()) is not None
+
+
+def test_cached_load_runs_no_queries():
+    """The second load is served from memory without touching the database"""
+    user_id = _seed("snapshot-cached@example.com")
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).one()
+        first = dashboard_cache.get_dashboard(db, user)
+        with _count_statements() as counter:
+            second = dashboard_cache.get_dashboard(db, user)
+    finally:
+        db.close()
+    assert counter["statements"] == 0
+    assert second == first
+
+
+def test_flashcard_review_invalidates():
+    """A flashcard review refreshes the reviewing user's dashboard only"""
+    user_id = _seed("snapshot-review@example.com")
+    other_id = _seed("snapshot-bystander@example.com")
+    before = _load(user_id)
+    _load(other_id)
+    reviews = [item for item in before["due_today"] if item["type"] == "flashcard"]
+    assert len(reviews) == 3
+
+    # What POST /flashcards/review does
+    db = SessionLocal()
+    try:
+        card = db.query(Flashcard).filter(Flashcard.user_id == user_id).first()
+        card.last_reviewed = datetime.utcnow()
+        card.times_reviewed += 1
+        db.commit()
+    finally:
+        db.close()
+
+    assert not _cached(user_id)
+    assert _cached(other_id)
+    after = _load(user_id)
+    assert len([item for item in after["due_today"] if item["type"] == "flashcard"]) == 2
+
+
+def test_study_session_and_rollback():
+    """Recording a study session invalidates on commit; a rolled back write doesn't"""
+    user_id = _seed("snapshot-session@example.com")
+    _load(user_id)
+
+    db = SessionLocal()
+    try:
+        course_id = db.query(Course.id).filter(Course.user_id == user_id).first()[0]
+        db.add(StudySession(user_id=user_id, course_id=course_id, duration_minutes=25))
+        db.flush()
+        assert _cached(user_id)  # Nothing is visible to other requests yet
+        db.rollback()
+        assert _cached(user_id)
+
+        db.add(StudySession(user_id=user_id, course_id=course_id, duration_minutes=25))
+        db.commit()
+        assert not _cached(user_id)
+    finally:
+        db.close()
+
+
+def test_canvas_import_invalidates():
+    """Bulk Canvas writes (bulk_upsert) invalidate the importing user's dashboard"""
+    user_id = _seed("snapshot-import@example.com")
+    _load(user_id)
+    due = (datetime.utcnow() + timedelta(hours=2)).strftime("%Y-%m-%dT%H:%M:%SZ")
+    canvas_import._import(user_id, [{
+        "id": "77", "name": "CDA3103.001 Computer Organization F25", "modules": [],
+        "assignments": [{"name": "Lab 1", "due_date": due}]
+    }], with_assignments=True)
+
+    assert not _cached(user_id)
+    assert _load(user_id)["upcoming_assignments"][0]["title"] == "Lab 1"
+
+
+def test_rebuild_racing_invalidation_is_not_cached():
+    """A snapshot built from data that changed mid-build is served once but not kept"""
+    user_id = _seed("snapshot-race@example.com")
+    build = dashboard.build_dashboard
+
+    def build_then_write(db, *args, **kwargs):
+        data = build(db, *args, **kwargs)
+        _submit_one(user_id)  # Another request's write commits meanwhile
+        return data
+
+    dashboard.build_dashboard = build_then_write
+    try:
+        _load(user_id)
+    finally:
+        dashboard.build_dashboard = build
+    assert not _cached(user_id)
+    _load(user_id)
+    assert _cached(user_id)
+
+
+def test_expires_at_first_upcoming_due_date():
+    """A snapshot expires when its first upcoming assignment falls due, or at midnight"""
+    now = datetime(2025, 10, 6, 9, 0)
+    soon = {"upcoming_assignments": [{"due_date": now + timedelta(minutes=30)}]}
+    assert dashboard_cache._expires_at(soon, now) == now + timedelta(minutes=30)
+    assert dashboard_cache._expires_at({"upcoming_assignments": []}, now) == \
+        min(datetime(2025, 10, 7), now + timedelta(seconds=settings.DASHBOARD_CACHE_TTL_SECONDS))
+
+
+def test_persisted_snapshots():
+    """With DASHBOARD_CACHE_PERSIST, a snapshot outlives the in-process cache until invalidated"""
+    settings.DASHBOARD_CACHE_PERSIST = True
+    try:
+        user_id = _seed("snapshot-persist@example.com")
+        first = _load(user_id)
+        dashboard_cache.clear()
+        db_hits = dashboard_cache.stats()["db_hits"]
+        served = _load(user_id)
+        assert dashboard_cache.stats()["db_hits"] == db_hits + 1
+        assert [item["id"] for item in served["upcoming_assignments"]] == \
+            [item["id"] for item in first["upcoming_assignments"]]
+
+        _submit_one(user_id)
+        assert not _cached(user_id)
+        db = SessionLocal()
+        try:
+            assert db.query(DashboardSnapshot).filter(DashboardSnapshot.user_id == user_id).count() == 0
+        finally:
+            db.close()
+    finally:
+        settings.DASHBOARD_CACHE_PERSIST = False
+
+
+def test_other_worker_invalidation():
+    """With DASHBOARD_CACHE_PERSIST a memory hit is checked against the stored snapshot"""
+    settings.DASHBOARD_CACHE_PERSIST = True
+    try:
+        user_id = _seed("snapshot-workers@example.com")
+        _load(user_id)
+        with _count_statements() as counter:
+            _load(user_id)
+        assert counter["statements"] == 2  # the user row, the stored built_at
+        stale = dashboard_cache.stats()["stale_hits"]
+
+        # Another worker process records submissions: its session hooks
+        # invalidate its own cache and the stored row, but not this LRU
+        with engine.begin() as connection:
+            connection.exec_driver_sql("UPDATE assignments SET submitted = 1 WHERE user_id = ?", (user_id,))
+            connection.exec_driver_sql("DELETE FROM dashboard_snapshots WHERE user_id = ?", (user_id,))
+
+        assert {course["progress"] for course in _load(user_id)["courses"]} == {100}
+        assert dashboard_cache.stats()["stale_hits"] == stale + 1
+    finally:
+        settings.DASHBOARD_CACHE_PERSIST = False
+
+
+def test_memory_cache_off_for_several_workers():
+    """Without DASHBOARD_CACHE_PERSIST and with DASHBOARD_CACHE_SINGLE_PROCESS off, nothing is kept"""
+    settings.DASHBOARD_CACHE_SINGLE_PROCESS = False
+    try:
+        user_id = _seed("snapshot-multiprocess@example.com")
+        _load(user_id)
+        assert not _cached(user_id)
+    finally:
+        settings.DASHBOARD_CACHE_SINGLE_PROCESS = True
+
+
+def test_benchmark_cached_vs_rebuilt():
+    """Dashboard load time: rebuilt every time vs served from the snapshot"""
+    user_id = _seed("snapshot-benchmark@example.com", num_courses=25, per_course=80)
+    db = SessionLocal()
+    try:
+        user = db.query(User).filter(User.id == user_id).one()
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            dashboard.build_dashboard(db, user.id, user.study_streak_days)
+        rebuilt = (time.perf_counter() - started) / REPEATS
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            dashboard_cache.get_dashboard(db, user)
+        cached = (time.perf_counter() - started) / REPEATS
+    finally:
+        db.close()
+
+    stats = dashboard_cache.stats()
+    print(f"  25 courses, 2000 assignments: rebuilt {rebuilt * 1000:.2f} ms, cached {cached * 1000:.3f} ms per load")
+    print(f"  cache stats: {stats}")
+    assert cached < rebuilt
+    assert stats["hit_rate"] > 0
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING DASHBOARD SNAPSHOTS (temporary SQLite database)")
+    print("=" * 70)
+    for test in (test_cached_load_runs_no_queries, test_flashcard_review_invalidates,
+                 test_study_session_and_rollback, test_canvas_import_invalidates,
+                 test_rebuild_racing_invalidation_is_not_cached, test_expires_at_first_upcoming_due_date,
+                 test_persisted_snapshots, test_other_worker_invalidation, test_memory_cache_off_for_several_workers,
+                 test_benchmark_cached_vs_rebuilt):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
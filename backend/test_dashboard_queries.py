@@ -0,0 +1,193 @@
+"""
+Test and benchmark script for the dashboard queries
+
+Seeds users with growing numbers of courses, assignments and flashcards
+in a temporary SQLite database, then compares the previous dashboard code
+(a Course lookup per listed assignment plus two counts per course) with
+app.services.dashboard: same results, statement count and latency.
+
+    python test_dashboard_queries.py
+"""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_dashboard_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from sqlalchemy import event, func
+from app.db.database import Base, SessionLocal, engine, read_engine
+from app.models import User, Course, Assignment, Flashcard
+from app.models.module import Module  # Registers the modules table for create_all
+from app.services import dashboard
+
+Base.metadata.create_all(bind=engine)
+
+SIZES = [(5, 10), (10, 40), (25, 80)]  # (courses, assignments per course)
+REPEATS = 5
+
+
+def _seed(num_courses: int, assignments_per_course: int) -> int:
+    """A user whose assignments are due from 5 days ago to ~2 months ahead"""
+    db = SessionLocal()
+    try:
+        user = User(first_name="Test", last_name="Student", password_hash="x",
+                    email=f"dashboard-{num_courses}-{assignments_per_course}@example.com")
+        db.add(user)
+        db.flush()
+        start = datetime.utcnow().replace(hour=0, minute=30, second=0, microsecond=0) - timedelta(days=5)
+        for c in range(num_courses):
+            course = Course(user_id=user.id, code=f"COP{4000 + c}", name=f"Course {c}", color="#3B82F6")
+            db.add(course)
+            db.flush()
+            db.add_all(
+                Assignment(user_id=user.id, course_id=course.id, course=course.code, type="Assignment",
+                           title=f"Homework {a}", submitted=a % 3 == 0,
+                           # Distinct times, spread over the next weeks
+                           due_date=start + timedelta(hours=(a * num_courses + c) * 37 % (65 * 24), minutes=c))
+                for a in range(assignments_per_course)
+            )
+            db.add_all(
+                Flashcard(user_id=user.id, course_id=course.id, question=f"Q{n}", answer=f"A{n}",
+                          mastered=n % 4 == 0,
+                          last_reviewed=None if n % 2 else datetime.utcnow() - timedelta(days=n % 3))
+                for n in range(c % 4 * 3)
+            )
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+@contextmanager
+def _count_statements():
+    counter = {"statements": 0}
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        counter["statements"] += 1
+
+    binds = {engine, read_engine}  # the same engine unless SQLite reads have their own pool
+    for bind in binds:
+        event.listen(bind, "before_cursor_execute", count)
+    try:
+        yield counter
+    finally:
+        for bind in binds:
+            event.remove(bind, "before_cursor_execute", count)
+
+
+def _legacy_dashboard(db, user_id: int):
+    """The previous dashboard queries (ids and progress only)"""
+    today = datetime.utcnow().date()
+    due_today = []
+    for assignment in db.query(Assignment).filter(Assignment.user_id == user_id,
+                                                  func.date(Assignment.due_date) == today).all():
+        course = db.query(Course).filter(Course.id == assignment.course_id).first()
+        due_today.append((assignment.id, course.code))
+    due_soon = db.query(Assignment).filter(
+        Assignment.user_id == user_id,
+        func.date(Assignment.due_date) > today,
+        func.date(Assignment.due_date) <= today + timedelta(days=2)
+    ).count()
+    progress = []
+    for course in db.query(Course).filter(Course.user_id == user_id).all():
+        total = db.query(Assignment).filter(Assignment.course_id == course.id).count()
+        completed = db.query(Assignment).filter(Assignment.course_id == course.id, Assignment.submitted == True).count()
+        progress.append((course.id, round(completed / total * 100, 1) if total > 0 else 0))
+    upcoming = []
+    for assignment in db.query(Assignment).filter(Assignment.user_id == user_id, Assignment.due_date > datetime.utcnow()) \
+            .order_by(Assignment.due_date).limit(5).all():
+        course = db.query(Course).filter(Course.id == assignment.course_id).first()
+        upcoming.append((assignment.id, course.code))
+    return {"due_today": due_today, "due_soon": due_soon, "progress": progress, "upcoming": upcoming}
+
+
+def _timed(func_, *args):
+    db = SessionLocal()
+    try:
+        with _count_statements() as counter:
+            result = func_(db, *args)
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            func_(db, *args)
+        return result, counter["statements"], (time.perf_counter() - started) / REPEATS
+    finally:
+        db.close()
+
+
+def test_matches_previous_dashboard():
+    """Same courses, progress, due-today and upcoming assignments as the previous code"""
+    user_id = _seed(6, 30)
+    db = SessionLocal()
+    try:
+        legacy = _legacy_dashboard(db, user_id)
+        data = dashboard.build_dashboard(db, user_id, 3)
+    finally:
+        db.close()
+
+    assignments_today = [item for item in data["due_today"] if item["type"] == "assignment"]
+    # Previously in table order, now in due date order
+    assert sorted((item["id"], item["course_code"]) for item in assignments_today) == sorted(legacy["due_today"])
+    assert [(course["id"], course["progress"]) for course in data["courses"]] == legacy["progress"]
+    assert [(item["id"], item["course_code"]) for item in data["upcoming_assignments"]] == legacy["upcoming"]
+    if legacy["due_soon"]:
+        assert data["study_suggestions"][0]["message"] == f"{legacy['due_soon']} assignments due in 48 hours"
+    assert data["study_streak_days"] == 3
+
+
+def test_flashcards_due_from_table():
+    """Flashcard counts come from unmastered cards not reviewed today, not a fixed mock"""
+    user_id = _seed(4, 5)
+    db = SessionLocal()
+    try:
+        today_start = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        expected = dict(
+            db.query(Flashcard.course_id, func.count(Flashcard.id)).filter(
+                Flashcard.user_id == user_id, Flashcard.mastered == False,
+                (Flashcard.last_reviewed == None) | (Flashcard.last_reviewed < today_start)
+            ).group_by(Flashcard.course_id).all()
+        )
+        data = dashboard.build_dashboard(db, user_id, 0)
+    finally:
+        db.close()
+
+    reviews = {item["id"]: item["title"] for item in data["due_today"] if item["type"] == "flashcard"}
+    assert expected and set(reviews) == {f"flashcards-{course_id}" for course_id in expected}
+    for course_id, count in expected.items():
+        assert reviews[f"flashcards-{course_id}"].startswith(f"Review {count} flashcard")
+    assert not any(suggestion["message"] == "5 flashcards due today" and suggestion.get("course_code") == "CS 101"
+                   for suggestion in data["study_suggestions"])
+    assert all(task["id"] != 9999 for task in data["todays_tasks"])
+    task_ids = [task["id"] for task in data["todays_tasks"]]
+    assert len(task_ids) == len(set(task_ids))  # Review items don't collide with assignment ids
+
+
+def test_benchmark_queries():
+    """Statements and latency per dashboard load: previous code vs aggregate queries"""
+    print(f"  {'courses':>7} {'assignments':>11} | {'previous':>20} | {'aggregated':>20}")
+    for num_courses, per_course in SIZES:
+        user_id = _seed(num_courses, per_course)
+        _, legacy_statements, legacy_seconds = _timed(_legacy_dashboard, user_id)
+        _, statements, seconds = _timed(dashboard.build_dashboard, user_id, 0)
+        print(f"  {num_courses:>7} {num_courses * per_course:>11} | "
+              f"{legacy_statements:>4} stmts {legacy_seconds * 1000:>6.1f} ms | "
+              f"{statements:>4} stmts {seconds * 1000:>6.1f} ms")
+        assert statements == 3
+        assert legacy_statements > 2 * num_courses
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING DASHBOARD QUERIES (temporary SQLite database)")
+    print("=" * 70)
+    for test in (test_matches_previous_dashboard, test_flashcards_due_from_table, test_benchmark_queries):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
@@ -0,0 +1,266 @@
+"""
+Test and benchmark script for incremental Canvas API syncs
+
+Runs CanvasSyncService against the local fake Canvas server (which sends
+ETags, answers If-None-Match with 304 and can mark items as edited) on a
+temporary SQLite database. The first sync is full; later syncs should
+skip unchanged resources with conditional requests and write only the
+assignments and files edited since (plus assignments whose priority or
+overdue status changed with the clock). Prints requests and rows written for
+a full sync vs an incremental one. Also checks that the Files tab index
+notices files removed past the first page.
+
+    python test_delta_sync.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_delta_sync_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from app.core.config import settings
+from app.db.database import Base, SessionLocal, engine
+from app.models import User, Course
+from app.models.assignment import Assignment
+from app.models.course_file import CourseFile, CourseFileIndex
+from app.models.course_sync_state import CourseSyncState
+from app.services import course_files_index
+from app.services.canvas_client import CanvasClient
+from app.services.canvas_sync import CanvasSyncService
+from fake_canvas_server import FakeCanvasServer
+
+Base.metadata.create_all(bind=engine)
+
+NUM_COURSES = 5
+NUM_ASSIGNMENTS = 40
+NUM_FILES = 250
+PAGE_SIZE = 50  # 5 pages of files per course
+
+
+def _new_user(email: str) -> int:
+    db = SessionLocal()
+    try:
+        user = User(first_name="Test", last_name="Student", email=email, password_hash="x")
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def _sync(server: FakeCanvasServer, user_id: int, full: bool = False):
+    """Run one sync, returning (results, requests sent to Canvas)"""
+    async def run():
+        canvas = CanvasClient(server.url, "test-token")
+        db = SessionLocal()
+        try:
+            return await CanvasSyncService(db=db, canvas_client=canvas, user_id=user_id).sync_all(full=full)
+        finally:
+            db.close()
+            await canvas.close()
+
+    before = server.request_count
+    results = asyncio.run(run())
+    assert results["errors"] == [], results["errors"]
+    return results, server.request_count - before
+
+
+def _server():
+    return FakeCanvasServer(num_courses=NUM_COURSES, num_assignments=NUM_ASSIGNMENTS, num_files=NUM_FILES,
+                            page_size=PAGE_SIZE, latency=0.0)
+
+
+def _course_id(user_id: int, canvas_id: str) -> int:
+    db = SessionLocal()
+    try:
+        return db.query(Course.id).filter(Course.user_id == user_id, Course.canvas_id == canvas_id).scalar()
+    finally:
+        db.close()
+
+
+def test_unchanged_courses_are_skipped():
+    """A second sync with nothing changed downloads and writes no course data"""
+    user_id = _new_user("unchanged@example.com")
+    with _server() as server:
+        first, first_requests = _sync(server, user_id)
+        second, second_requests = _sync(server, user_id)
+
+    assert first["full_syncs"] == NUM_COURSES
+    assert first["assignments"] == NUM_COURSES * NUM_ASSIGNMENTS
+    assert first["files"] == NUM_COURSES * NUM_FILES
+    assert first["modules"] == NUM_COURSES * 3
+
+    assert second["full_syncs"] == 0
+    assert second["not_modified"] == NUM_COURSES * 3  # assignments, modules, files
+    assert second["rows_touched"] == 0
+    assert second["rows_skipped"] == first["rows_touched"]
+    # Course list + one conditional request per resource
+    assert second_requests == 1 + NUM_COURSES * 3
+    assert second_requests < first_requests
+
+
+def test_only_edited_items_are_written():
+    """Edited assignments and files are written; everything else is left alone"""
+    user_id = _new_user("edited@example.com")
+    with _server() as server:
+        _sync(server, user_id)
+        server.touch_assignments(1, [3, 7])
+        server.touch_files(2, [10, 200, 201])
+        results, requests = _sync(server, user_id)
+
+    assert results["assignments"] == 2
+    assert results["files"] == 3
+    assert results["modules"] == 0
+    assert results["rows_touched"] == 5
+    # Only the first page of course 2's files is read (edited files sort first)
+    assert requests == 1 + NUM_COURSES * 3
+
+    db = SessionLocal()
+    try:
+        course_1 = _course_id(user_id, "1")
+        edited = db.query(Assignment).filter(Assignment.course_id == course_1,
+                                             Assignment.title == "Course 1 Homework 3").one()
+        assert edited.points == 10 + 1
+        assert db.query(Assignment).filter(Assignment.user_id == user_id).count() == NUM_COURSES * NUM_ASSIGNMENTS
+        course_2 = _course_id(user_id, "2")
+        assert db.query(CourseFile).filter(CourseFile.course_id == course_2).count() == NUM_FILES
+        touched = db.query(CourseFile).filter(CourseFile.course_id == course_2,
+                                              CourseFile.canvas_updated_at > "2025-10-01T12:00:00Z").count()
+        assert touched == 3
+        state = db.query(CourseSyncState).filter(CourseSyncState.course_id == course_2).one()
+        assert state.files_updated_at is not None and state.files_updated_at.day == 2
+    finally:
+        db.close()
+
+
+def test_full_sync_on_request():
+    """full=True ignores ETags and high-water marks (the files index still only writes differences)"""
+    user_id = _new_user("full@example.com")
+    with _server() as server:
+        first, first_requests = _sync(server, user_id)
+        again, again_requests = _sync(server, user_id, full=True)
+
+    assert again["full_syncs"] == NUM_COURSES
+    assert again["not_modified"] == 0
+    assert again["assignments"] == first["assignments"]
+    assert again["modules"] == first["modules"]
+    assert again["files"] == 0
+    assert again_requests == first_requests
+
+
+def test_submitted_assignments_are_resynced():
+    """Submitting or grading updates status and submitted, though Canvas leaves updated_at alone"""
+    user_id = _new_user("submitted@example.com")
+    with _server() as server:
+        _sync(server, user_id)
+        server.submit_assignments(1, [2])
+        submitted, _ = _sync(server, user_id)
+        server.submit_assignments(1, [2], workflow_state="graded")
+        graded, _ = _sync(server, user_id)
+
+    assert submitted["assignments"] == graded["assignments"] == 1
+    db = SessionLocal()
+    try:
+        assignment = db.query(Assignment).filter(Assignment.course_id == _course_id(user_id, "1"),
+                                                 Assignment.title == "Course 1 Homework 2").one()
+        assert (assignment.status, assignment.submitted) == ("completed", True)
+        others = db.query(Assignment).filter(Assignment.user_id == user_id, Assignment.submitted.is_(True)).count()
+        assert others == 1
+    finally:
+        db.close()
+
+
+def test_clock_driven_fields_are_refreshed():
+    """Priority and overdue status catch up with the clock, though Canvas reports nothing changed"""
+    user_id = _new_user("clock@example.com")
+    with _server() as server:
+        _sync(server, user_id)
+        # As if course 1 was last synced before its assignments fell due
+        db = SessionLocal()
+        try:
+            course_1 = _course_id(user_id, "1")
+            db.query(Assignment).filter(Assignment.course_id == course_1).update(
+                {Assignment.priority: "low", Assignment.status: "pending"}, synchronize_session=False
+            )
+            db.query(CourseSyncState).filter(CourseSyncState.course_id == course_1).update(
+                {CourseSyncState.last_synced_at: datetime(2025, 9, 1)}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+        results, _ = _sync(server, user_id)
+
+    # Course 1's assignments are downloaded again; the rest still answer 304
+    assert results["not_modified"] == NUM_COURSES * 3 - 1
+    assert results["assignments"] == NUM_ASSIGNMENTS
+    db = SessionLocal()
+    try:
+        stale = db.query(Assignment).filter(Assignment.user_id == user_id,
+                                            Assignment.status == "pending").count()
+        assert stale == 0
+        assert db.query(Assignment).filter(Assignment.course_id == course_1,
+                                           Assignment.priority == "high").count() == NUM_ASSIGNMENTS
+    finally:
+        db.close()
+
+
+def test_files_index_relists_removed_files():
+    """A file removed past the first page leaves the ETag alone until the periodic full relist"""
+    user_id = _new_user("files-relist@example.com")
+    db = SessionLocal()
+    try:
+        course = Course(user_id=user_id, canvas_id="1", code="COP4600", name="Course 1", color="#3B82F6")
+        db.add(course)
+        db.commit()
+        with _server() as server:
+            listing = lambda: course_files_index.get_course_files(db, course, server.url, "test", force_refresh=True)
+            assert len(listing()) == NUM_FILES
+            server.remove_files(1, [NUM_FILES])  # on the last page
+
+            assert len(listing()) == NUM_FILES  # first page unchanged: 304
+            assert server.not_modified_count == 1
+
+            index = db.query(CourseFileIndex).filter(CourseFileIndex.course_id == course.id).one()
+            index.full_listed_at -= timedelta(hours=settings.FILES_INDEX_FULL_RELIST_HOURS)
+            db.commit()
+            assert len(listing()) == NUM_FILES - 1
+            assert server.not_modified_count == 1
+    finally:
+        db.close()
+
+
+def test_benchmark_full_vs_delta():
+    """Requests and rows written: full sync vs incremental sync after a few edits"""
+    user_id = _new_user("benchmark@example.com")
+    with _server() as server:
+        full, full_requests = _sync(server, user_id)
+        for course in range(1, NUM_COURSES + 1):
+            server.touch_assignments(course, [1])
+        server.touch_files(1, [5])
+        delta, delta_requests = _sync(server, user_id)
+
+    print(f"  {NUM_COURSES} courses, {NUM_ASSIGNMENTS} assignments and {NUM_FILES} files each")
+    print(f"  full sync:  {full_requests} requests, {full['rows_touched']} rows written")
+    print(f"  delta sync: {delta_requests} requests, {delta['rows_touched']} rows written, "
+          f"{delta['rows_skipped']} skipped, {delta['not_modified']} resources not modified")
+    assert delta["rows_touched"] == NUM_COURSES + 1
+    assert delta_requests < full_requests
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING INCREMENTAL CANVAS SYNC (fake Canvas server, temporary SQLite database)")
+    print("=" * 70)
+    for test in (test_unchanged_courses_are_skipped, test_only_edited_items_are_written,
+                 test_full_sync_on_request, test_submitted_assignments_are_resynced,
+                 test_clock_driven_fields_are_refreshed, test_files_index_relists_removed_files, test_benchmark_full_vs_delta):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
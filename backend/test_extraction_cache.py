@@ -0,0 +1,159 @@
+"""
+Test script for the extraction cache
+
+Uses a temporary SQLite database and a mocked Canvas. Checks that cached
+text is found by file version and by content hash, that a new file version
+misses, that a content-hash hit also stores the file version's key, that a
+module item URL is resolved to its file before the cache lookup (so a hit
+needs no download), and that least-recently-used entries are evicted by
+entry count and by size.
+
+    python test_extraction_cache.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_extraction_cache_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import httpx
+from app.core.config import settings
+from app.db.database import Base, SessionLocal, engine
+from app.models.extracted_document import ExtractedDocument
+from app.services import extraction_cache, flashcard_generator, ingestion
+from app.services.extraction_cache import file_cache_key
+
+Base.metadata.create_all(bind=engine)
+
+CANVAS_URL = "https://canvas.test"
+PAGE = b"<html><body><p>Photosynthesis converts light into chemical energy.</p></body></html>"
+
+
+def _reset() -> None:
+    db = SessionLocal()
+    try:
+        db.query(ExtractedDocument).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _keys() -> set:
+    db = SessionLocal()
+    try:
+        return {key for (key,) in db.query(ExtractedDocument.cache_key)}
+    finally:
+        db.close()
+
+
+def _store(cache_key: str, text: str, accessed_minutes_ago: int) -> None:
+    """Store an entry and backdate its last access"""
+    extraction_cache.store_text(cache_key, f"hash-{cache_key}", text)
+    db = SessionLocal()
+    try:
+        db.query(ExtractedDocument).filter(ExtractedDocument.cache_key == cache_key).update(
+            {ExtractedDocument.last_accessed_at: datetime.utcnow() - timedelta(minutes=accessed_minutes_ago)},
+            synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_hits_by_version_and_hash():
+    """Text is found by file id + version and by content hash; a new version misses"""
+    _reset()
+    extraction_cache.store_text(file_cache_key("11", "2024-01-01T00:00:00Z"), "abc123", "Lecture 1 text")
+
+    assert extraction_cache.get_text(file_cache_key("11", "2024-01-01T00:00:00Z")) == "Lecture 1 text"
+    assert extraction_cache.get_text_by_hash("abc123") == "Lecture 1 text"
+    assert extraction_cache.get_text(file_cache_key("11", "2024-02-01T00:00:00Z")) is None
+
+
+def test_hash_hit_stores_file_key():
+    """Identical content under a new file version is served from the cache and stored under that version"""
+    _reset()
+    first = flashcard_generator.extract_and_cache_text(PAGE, "text/html", file_cache_key("12", "v1"))
+
+    def reparse(*args):
+        raise AssertionError("identical content was parsed again")
+
+    parse = flashcard_generator.extract_text_from_content
+    flashcard_generator.extract_text_from_content = reparse
+    try:
+        again = flashcard_generator.extract_and_cache_text(PAGE, "text/html", file_cache_key("12", "v2"))
+    finally:
+        flashcard_generator.extract_text_from_content = parse
+
+    assert again == first
+    assert extraction_cache.get_text(file_cache_key("12", "v2")) == first
+
+
+def test_module_item_resolved_before_download():
+    """A module item URL is resolved to its file id (redirect or content_id), so a cached version skips the download"""
+    _reset()
+    extraction_cache.store_text(file_cache_key("77", "v1"), "def456", "Cached slides")
+    requests = []
+
+    def canvas(request: httpx.Request) -> httpx.Response:
+        requests.append(request.url.path)
+        if request.url.path == "/courses/1/modules/items/5":
+            return httpx.Response(302, headers={"Location": f"{CANVAS_URL}/courses/1/files/77?module_item_id=5"})
+        if request.url.path == "/api/v1/files/77":
+            return httpx.Response(200, json={"id": 77, "updated_at": "v1"})
+        return httpx.Response(200, content=PAGE, headers={"Content-Type": "text/html"})
+
+    async def extract(file_id=None):
+        async with httpx.AsyncClient(transport=httpx.MockTransport(canvas), follow_redirects=True) as client:
+            return await ingestion.extract_text_from_url_async(
+                client, f"{CANVAS_URL}/courses/1/modules/items/5", CANVAS_URL, file_id
+            )
+
+    assert asyncio.run(extract()) == "Cached slides"
+    assert requests == ["/courses/1/modules/items/5", "/api/v1/files/77"]
+
+    requests.clear()
+    assert asyncio.run(extract(file_id="77")) == "Cached slides"
+    assert requests == ["/api/v1/files/77"]
+
+
+def test_lru_eviction():
+    """Least-recently-used entries go first, by entry count and by total size"""
+    limits = settings.EXTRACTION_CACHE_MAX_ENTRIES, settings.EXTRACTION_CACHE_MAX_BYTES
+    try:
+        _reset()
+        settings.EXTRACTION_CACHE_MAX_ENTRIES = 3
+        _store("a", "text a", accessed_minutes_ago=30)
+        _store("b", "text b", accessed_minutes_ago=20)
+        _store("c", "text c", accessed_minutes_ago=10)
+        assert extraction_cache.get_text("a") == "text a"  # Now the most recent
+        _store("d", "text d", accessed_minutes_ago=0)
+        assert _keys() == {"a", "c", "d"}
+
+        _reset()
+        settings.EXTRACTION_CACHE_MAX_ENTRIES = limits[0]
+        settings.EXTRACTION_CACHE_MAX_BYTES = 25
+        _store("e", "x" * 10, accessed_minutes_ago=20)
+        _store("f", "y" * 10, accessed_minutes_ago=10)
+        _store("g", "z" * 10, accessed_minutes_ago=0)
+        assert _keys() == {"f", "g"}
+    finally:
+        settings.EXTRACTION_CACHE_MAX_ENTRIES, settings.EXTRACTION_CACHE_MAX_BYTES = limits
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING THE EXTRACTION CACHE (temporary SQLite database)")
+    print("=" * 70)
+    for test in (test_hits_by_version_and_hash, test_hash_hit_stores_file_key,
+                 test_module_item_resolved_before_download, test_lru_eviction):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
@@ -1,6 +1,7 @@
 """
 Test script to verify flashcard generation step by step
 """
+import asyncio
 import sys
 from pathlib import Path
 sys.path.append(str(Path(__file__).parent))
@@ -75,7 +76,7 @@ def test_step_by_step():
     
     # Step 4: Test extracting text from first item
     print("Step 4: Extracting text from first item...")
-    from app.services.flashcard_generator import extract_text_from_url
+    from app.services.ingestion import extract_texts_from_urls
     
     first_item = selected_module.items[0]
     url = first_item.get('url')
@@ -85,7 +86,7 @@ def test_step_by_step():
         return
     
     print(f"   URL: {url}")
-    text = extract_text_from_url(url, session_cookie, settings.CANVAS_INSTANCE_URL)
+    text = asyncio.run(extract_texts_from_urls([url], session_cookie, settings.CANVAS_INSTANCE_URL))[0]
     
     if not text:
         print("❌ Failed to extract text!")
@@ -111,11 +112,11 @@ def test_step_by_step():
     sample_text = text[:2000] if len(text) > 2000 else text
     
     try:
-        flashcards = generate_flashcards_with_groq(
+        flashcards = asyncio.run(generate_flashcards_with_groq(
             content=sample_text,
             module_name=selected_module.name,
             num_cards=3  # Just 3 for testing
-        )
+        ))
         
         if not flashcards:
             print("❌ No flashcards generated!")
@@ -0,0 +1,143 @@
+"""
+Test script for the generation cache
+
+Uses a temporary SQLite database; generation is a stub that counts calls.
+Checks the cache key (whitespace-insensitive, separate per module, prompt
+version and model), that a hit skips generation until the TTL passes, that a
+larger cached set is sampled down to the requested count, that shuffled
+quiz options keep correct_answer on the same text, and that least-recently-
+used entries are evicted beyond GENERATION_CACHE_MAX_ENTRIES.
+
+    python test_generation_cache.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_generation_cache_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import app.main  # Creates the tables
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models.generated_set import GeneratedSet
+from app.services import generation_cache
+from app.services.generation_cache import base_key, shuffle_quiz_options
+
+MATERIAL = "Cells divide by mitosis.\n\nMeiosis produces gametes."
+
+
+def _reset() -> None:
+    db = SessionLocal()
+    try:
+        db.query(GeneratedSet).delete()
+        db.commit()
+    finally:
+        db.close()
+
+
+def _age(seconds: float, **filters) -> None:
+    """Move matching entries' created_at and last_accessed_at into the past"""
+    db = SessionLocal()
+    try:
+        past = datetime.utcnow() - timedelta(seconds=seconds)
+        db.query(GeneratedSet).filter_by(**filters).update(
+            {GeneratedSet.created_at: past, GeneratedSet.last_accessed_at: past}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _get(count: int, material: str = MATERIAL, module: str = "Week 1") -> tuple:
+    """(items, whether generate was called) for a flashcards request"""
+    calls = []
+
+    async def generate():
+        calls.append(count)
+        return [{"question": f"Q{n}", "answer": f"A{n}"} for n in range(count)]
+
+    items = asyncio.run(generation_cache.get_or_generate(
+        "flashcards", material, module, count, prompt_version=1, model="m", generate=generate
+    ))
+    return items, bool(calls)
+
+
+def test_cache_key():
+    """Whitespace doesn't change the key; module, prompt version and model do"""
+    key = base_key("quiz", MATERIAL, "Week 1", 1, "m")
+    assert base_key("quiz", "  Cells divide by mitosis.\nMeiosis   produces gametes.  ", " week 1 ", 1, "m") == key
+    assert base_key("quiz", MATERIAL, "Week 2", 1, "m") != key
+    assert base_key("quiz", MATERIAL, "Week 1", 2, "m") != key
+    assert base_key("quiz", MATERIAL, "Week 1", 1, "other") != key
+    assert base_key("flashcards", MATERIAL, "Week 1", 1, "m") != key
+
+
+def test_hit_until_ttl():
+    """A second request is served from the cache; once the TTL has passed it generates again"""
+    _reset()
+    assert _get(5)[1]
+    items, generated = _get(5)
+    assert not generated and len(items) == 5
+
+    _age(settings.GENERATION_CACHE_TTL_SECONDS + 60)
+    assert _get(5)[1]
+
+
+def test_larger_set_sampled_down():
+    """A request for fewer items is sampled from a larger cached set; more items is a miss"""
+    _reset()
+    full, _ = _get(10)
+    items, generated = _get(4)
+    assert not generated
+    assert len(items) == 4
+    assert all(item in full for item in items)
+    assert _get(12)[1]
+
+
+def test_shuffled_options_keep_answer():
+    """Shuffling quiz options moves correct_answer with the right option"""
+    question = {"question": "Where is ATP made?", "options": ["Nucleus", "Mitochondria", "Ribosome", "Golgi"],
+                "correct_answer": "B"}
+    for _ in range(20):
+        shuffled = shuffle_quiz_options(question)
+        assert sorted(shuffled["options"]) == sorted(question["options"])
+        assert shuffled["options"]["ABCD".index(shuffled["correct_answer"])] == "Mitochondria"
+    assert shuffle_quiz_options({**question, "correct_answer": "E"}) == {**question, "correct_answer": "E"}
+
+
+def test_lru_eviction():
+    """Beyond the entry limit, the least recently used sets are evicted"""
+    limit = settings.GENERATION_CACHE_MAX_ENTRIES
+    settings.GENERATION_CACHE_MAX_ENTRIES = 2
+    try:
+        _reset()
+        _get(3, module="Week 1")
+        _get(3, module="Week 2")
+        _age(120, module_name="Week 1")
+        _age(60, module_name="Week 2")
+        assert not _get(3, module="Week 1")[1]  # Now more recent than Week 2
+        _get(3, module="Week 3")
+
+        assert not _get(3, module="Week 1")[1]
+        assert not _get(3, module="Week 3")[1]
+        assert _get(3, module="Week 2")[1]
+    finally:
+        settings.GENERATION_CACHE_MAX_ENTRIES = limit
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING THE GENERATION CACHE (temporary SQLite database)")
+    print("=" * 70)
+    for test in (test_cache_key, test_hit_until_ttl, test_larger_set_sampled_down,
+                 test_shuffled_options_keep_answer, test_lru_eviction):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
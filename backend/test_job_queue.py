@@ -0,0 +1,205 @@
+"""
+Test script for the background job queue's claims and leases
+
+Uses a temporary SQLite database. Checks that concurrent claims never run
+more jobs of a kind than JOB_KIND_CONCURRENCY allows, that only running
+jobs whose lease has expired are requeued (at startup and by the
+heartbeat), or failed once they're out of attempts, that the heartbeat
+renews this process's own leases, and that a worker that lost its lease
+can't overwrite the job's new run.
+
+    python test_job_queue.py
+"""
+import os
+import sys
+import tempfile
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_job_queue_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from app.core.config import settings
+from app.db.database import Base, SessionLocal, engine
+from app.models import User  # noqa: F401 (create_all needs the users table)
+from app.models.job import Job
+from app.models.module import Module  # noqa: F401 (create_all needs the modules table)
+from app.services import job_queue
+
+Base.metadata.create_all(bind=engine)
+
+CLAIMERS = 8
+
+
+@job_queue.handler("test_limited")
+async def _limited(payload):
+    return payload
+
+
+@job_queue.handler("test_free")
+async def _free(payload):
+    return payload
+
+
+def _reset(**jobs_by_kind) -> None:
+    """Empty the jobs table and queue the given number of jobs per kind"""
+    db = SessionLocal()
+    try:
+        db.query(Job).delete()
+        db.commit()
+        for kind, count in jobs_by_kind.items():
+            for n in range(count):
+                job_queue.enqueue(db, kind, {"n": n})
+    finally:
+        db.close()
+
+
+def _running() -> dict:
+    db = SessionLocal()
+    try:
+        counts = {}
+        for job in db.query(Job).filter(Job.status == "running").all():
+            counts[job.kind] = counts.get(job.kind, 0) + 1
+        return counts
+    finally:
+        db.close()
+
+
+def _add_running(owner: str, lease_expires_at, attempts: int = 1) -> str:
+    db = SessionLocal()
+    try:
+        job = job_queue.enqueue(db, "test_free")
+        db.query(Job).filter(Job.id == job.id).update(
+            {Job.status: "running", Job.owner: owner, Job.lease_expires_at: lease_expires_at, Job.attempts: attempts},
+            synchronize_session=False
+        )
+        db.commit()
+        return job.id
+    finally:
+        db.close()
+
+
+def _status(job_id: str) -> tuple:
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == job_id).one()
+        return job.status, job.owner
+    finally:
+        db.close()
+
+
+def test_concurrent_claims_respect_kind_limit():
+    """Claims racing from several threads never exceed a kind's limit"""
+    limits = settings.JOB_KIND_CONCURRENCY
+    settings.JOB_KIND_CONCURRENCY = {"test_limited": 2}
+    try:
+        _reset(test_limited=CLAIMERS, test_free=2)
+        barrier = threading.Barrier(CLAIMERS)
+
+        def claim():
+            barrier.wait()
+            job_queue._claim_next()
+
+        threads = [threading.Thread(target=claim) for _ in range(CLAIMERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        while job_queue._claim_next() is not None:
+            pass
+
+        assert _running() == {"test_limited": 2, "test_free": 2}
+    finally:
+        settings.JOB_KIND_CONCURRENCY = limits
+
+
+def test_only_expired_leases_are_requeued():
+    """Startup recovery leaves jobs with a live lease to their owner"""
+    _reset()
+    now = datetime.utcnow()
+    alive = _add_running("other-host:1:live", now + timedelta(seconds=30))
+    expired = _add_running("other-host:2:dead", now - timedelta(seconds=1))
+    legacy = _add_running(None, None)
+
+    job_queue._recover_and_purge()
+
+    assert _status(alive) == ("running", "other-host:1:live")
+    assert _status(expired) == ("queued", None)
+    assert _status(legacy) == ("queued", None)
+
+
+def test_expired_job_out_of_attempts_fails():
+    """An expired lease on a job already claimed JOB_MAX_ATTEMPTS times fails it instead of requeueing"""
+    _reset()
+    past = datetime.utcnow() - timedelta(seconds=1)
+    retry = _add_running("other-host:5:dead", past, attempts=settings.JOB_MAX_ATTEMPTS - 1)
+    exhausted = _add_running("other-host:6:dead", past, attempts=settings.JOB_MAX_ATTEMPTS)
+
+    job_queue._recover_and_purge()
+
+    assert _status(retry) == ("queued", None)
+    assert _status(exhausted) == ("failed", None)
+    db = SessionLocal()
+    try:
+        job = db.query(Job).filter(Job.id == exhausted).one()
+        assert f"{settings.JOB_MAX_ATTEMPTS} attempts" in job.error
+        assert job.finished_at is not None
+    finally:
+        db.close()
+
+
+def test_heartbeat_renews_own_leases():
+    """The heartbeat extends this process's leases and requeues others' expired ones"""
+    _reset(test_free=1)
+    claimed = job_queue._claim_next()
+    past = datetime.utcnow() - timedelta(seconds=1)
+    dead = _add_running("other-host:3:dead", past)
+    db = SessionLocal()
+    try:
+        db.query(Job).filter(Job.id == claimed.id).update({Job.lease_expires_at: past}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+    job_queue._renew_leases()
+
+    db = SessionLocal()
+    try:
+        renewed = db.query(Job).filter(Job.id == claimed.id).one()
+        assert (renewed.status, renewed.owner) == ("running", job_queue._owner)
+        assert renewed.lease_expires_at > datetime.utcnow()
+    finally:
+        db.close()
+    assert _status(dead) == ("queued", None)
+
+
+def test_lost_lease_result_is_dropped():
+    """A worker whose job was requeued and claimed elsewhere can't record its result"""
+    _reset(test_free=1)
+    claimed = job_queue._claim_next()
+    db = SessionLocal()
+    try:
+        db.query(Job).filter(Job.id == claimed.id).update({Job.owner: "other-host:4:new"}, synchronize_session=False)
+        db.commit()
+    finally:
+        db.close()
+
+    job_queue._finish(claimed.id, "succeeded", result={"stale": True})
+
+    assert _status(claimed.id) == ("running", "other-host:4:new")
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING JOB QUEUE CLAIMS AND LEASES (temporary SQLite database)")
+    print("=" * 70)
+    for test in (test_concurrent_claims_respect_kind_limit, test_only_expired_leases_are_requeued,
+                 test_expired_job_out_of_attempts_fails, test_heartbeat_renews_own_leases,
+                 test_lost_lease_result_is_dropped):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
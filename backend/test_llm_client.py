@@ -0,0 +1,144 @@
+"""
+Test and benchmark script for the pooled async Groq client
+
+Runs against the local fake Groq server (fake_groq_server.py). Checks that
+every generator works through app.services.llm_client, then measures
+calls/sec at a fixed concurrency for the old pattern (a new blocking
+connection per call, run in threads) against the shared pooled client.
+
+    python test_llm_client.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{tempfile.gettempdir()}/canvas_ext_llm_client_test.db")
+
+import requests
+from app.core.config import settings
+from app.services import flashcard_generator, llm_client
+from fake_groq_server import FakeGroqServer
+
+CONCURRENCY = 16
+CALLS = 200
+
+COURSE_TEXT = (
+    "A process is a program in execution. The scheduler picks which process runs next, "
+    "and a context switch saves one process's registers and restores another's. "
+) * 30
+
+
+class _FakeGroq:
+    """Fake Groq server with settings pointed at it for the duration of a test"""
+
+    def __enter__(self):
+        self.server = FakeGroqServer(first_token_delay=0.02, token_delay=0.0, num_words=50).start()
+        self.saved = (settings.GROQ_API_KEY, settings.GROQ_API_BASE_URL)
+        settings.GROQ_API_KEY = "test-key"
+        settings.GROQ_API_BASE_URL = self.server.url
+        return self.server
+
+    def __exit__(self, *exc):
+        settings.GROQ_API_KEY, settings.GROQ_API_BASE_URL = self.saved
+        self.server.stop()
+
+
+def test_generators_use_pooled_client():
+    """All five generators return parsed results and share connections"""
+    async def run_all():
+        flashcards = await flashcard_generator.generate_flashcards_with_groq(COURSE_TEXT, "Processes", num_cards=2)
+        quiz = await flashcard_generator.generate_quiz_with_groq(COURSE_TEXT, "Processes", num_questions=1)
+        answer = await flashcard_generator.generate_chat_response_with_groq("What is a process?", COURSE_TEXT, "Processes")
+        question = await flashcard_generator.generate_active_recall_question_with_groq(COURSE_TEXT, "Processes")
+        grade = await flashcard_generator.grade_active_recall_answer_with_groq(
+            question, "A program that is running.", COURSE_TEXT, "balanced"
+        )
+        await llm_client.close_client()
+        return flashcards, quiz, answer, question, grade
+
+    with _FakeGroq() as server:
+        flashcards, quiz, answer, question, grade = asyncio.run(run_all())
+        assert len(flashcards) == 2 and flashcards[0]["question"]
+        assert quiz[0]["correct_answer"] == "A"
+        assert answer.startswith("word0")
+        assert question.endswith("?")
+        assert grade["score"] == 85
+        print(f"5 generator calls used {server.connection_count} connection(s)")
+        assert server.connection_count == 1
+
+
+def test_missing_api_key():
+    """Calls fail with ValueError before any request when no key is configured"""
+    saved = settings.GROQ_API_KEY
+    settings.GROQ_API_KEY = None
+    try:
+        asyncio.run(flashcard_generator.generate_chat_response_with_groq("q", COURSE_TEXT, "m"))
+    except ValueError as e:
+        assert "GROQ_API_KEY" in str(e)
+    else:
+        raise AssertionError("expected ValueError")
+    finally:
+        settings.GROQ_API_KEY = saved
+
+
+def _unpooled_call(url: str) -> None:
+    """The previous pattern: a fresh connection for every completion"""
+    response = requests.post(
+        url,
+        headers={"Authorization": f"Bearer {settings.GROQ_API_KEY}", "Connection": "close"},
+        json={"model": flashcard_generator.MODEL, "messages": [{"role": "user", "content": "hi"}]},
+        timeout=60
+    )
+    response.raise_for_status()
+
+
+async def _pooled_calls() -> None:
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    messages = [{"role": "user", "content": "hi"}]
+
+    async def call():
+        async with semaphore:
+            await llm_client.chat_completion(messages, flashcard_generator.MODEL, 0.7, 100)
+
+    await asyncio.gather(*(call() for _ in range(CALLS)))
+    await llm_client.close_client()
+
+
+def test_benchmark_calls_per_second():
+    """Calls/sec and connections opened: per-call connections vs the pooled client"""
+    with _FakeGroq() as server:
+        url = f"{server.url}{llm_client.COMPLETIONS_PATH}"
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=CONCURRENCY) as pool:
+            list(pool.map(lambda _: _unpooled_call(url), range(CALLS)))
+        unpooled_seconds = time.perf_counter() - started
+        unpooled_connections = server.connection_count
+
+    with _FakeGroq() as server:
+        started = time.perf_counter()
+        asyncio.run(_pooled_calls())
+        pooled_seconds = time.perf_counter() - started
+        pooled_connections = server.connection_count
+
+    print(f"{CALLS} calls at concurrency {CONCURRENCY} "
+          f"(HTTP/2 {'on' if llm_client.HTTP2_AVAILABLE else 'off, h2 not installed'}):")
+    print(f"  new connection per call: {CALLS / unpooled_seconds:7.1f} calls/sec, {unpooled_connections} connections")
+    print(f"  pooled async client:     {CALLS / pooled_seconds:7.1f} calls/sec, {pooled_connections} connections")
+    assert pooled_connections <= min(CONCURRENCY, settings.LLM_MAX_CONNECTIONS)
+    assert pooled_connections < unpooled_connections
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING POOLED GROQ CLIENT (fake Groq server)")
+    print("=" * 70)
+    for test in (test_generators_use_pooled_client, test_missing_api_key, test_benchmark_calls_per_second):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
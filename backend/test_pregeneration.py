@@ -0,0 +1,143 @@
+"""
+Test script for module pre-generation
+
+Uses a temporary SQLite database, with ingestion and the Groq batches
+stubbed out. Checks that _generate_pool asks for batches of at most
+PREGENERATION_BATCH_SIZE, drops repeated questions and stops at the target
+(with one spare batch for duplicates), and that pregenerate_module skips a
+module whose context hash hasn't changed, regenerates when it has, and
+reports "running" for a module it is already generating.
+
+    python test_pregeneration.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_pregeneration_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+import app.main  # Creates the tables
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.models import User, Course
+from app.models.module import Module
+from app.models.module_pool import PregeneratedFlashcard
+from app.services import pregeneration
+from app.services.ingestion import IngestedContent
+
+LECTURE = "Mitosis is how a cell divides into two identical daughter cells. " * 20
+
+
+def _batches(questions_per_call):
+    """A stub generator returning the given questions call by call; records the requested counts"""
+    requested = []
+
+    async def generate(context, module_name, count):
+        requested.append(count)
+        questions = questions_per_call[len(requested) - 1] if len(requested) <= len(questions_per_call) else []
+        return [{"question": q, "answer": "A"} for q in questions[:count]]
+
+    return generate, requested
+
+
+def test_generate_pool_dedupes_and_batches():
+    """Batches are capped at PREGENERATION_BATCH_SIZE, repeats are dropped, and it stops at the target"""
+    batch_size = settings.PREGENERATION_BATCH_SIZE
+    settings.PREGENERATION_BATCH_SIZE = 4
+    try:
+        generate, requested = _batches([
+            ["Q1", "Q2", "q1 ", "Q3"],  # "q1 " repeats Q1
+            ["Q4", "Q5", "Q6", "Q7"],
+            ["Q8", "Q9"],
+        ])
+        pool = asyncio.run(pregeneration._generate_pool(generate, LECTURE, "Week 1", 9))
+        assert [item["question"] for item in pool] == ["Q1", "Q2", "Q3", "Q4", "Q5", "Q6", "Q7", "Q8", "Q9"]
+        assert requested == [4, 4, 2]
+
+        # All duplicates: gives up after the batches for the target plus one spare
+        generate, requested = _batches([["Q1"] * 4] * 10)
+        pool = asyncio.run(pregeneration._generate_pool(generate, LECTURE, "Week 1", 8))
+        assert [item["question"] for item in pool] == ["Q1"]
+        assert len(requested) == 3
+    finally:
+        settings.PREGENERATION_BATCH_SIZE = batch_size
+
+
+class _FakeIngestion:
+    text = LECTURE
+
+    def __init__(self, db, user):
+        self.canvas_url = self.session_cookie = None
+
+    async def ingest(self, module=None):
+        content = IngestedContent(self.text, [module.name], 1)
+        content.documents.append((module.name, self.text))
+        return content
+
+
+def test_unchanged_context_is_skipped():
+    """A module whose context hash is unchanged isn't regenerated; a changed one is"""
+    db = SessionLocal()
+    try:
+        user = User(first_name="Test", last_name="Student", email="pregeneration@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        course = Course(user_id=user.id, code="BIO101", name="Biology")
+        db.add(course)
+        db.flush()
+        module = Module(course_id=course.id, name="Week 1", items=[])
+        db.add(module)
+        db.commit()
+
+        calls = []
+
+        async def batch(context, module_name, count):
+            calls.append(count)
+            return [{"question": f"Q{len(calls)}.{n}", "answer": "A", "options": ["A", "B"], "correct_answer": "A"}
+                    for n in range(count)]
+
+        stubs = (pregeneration.ContentIngestionService, pregeneration._flashcard_batch, pregeneration._quiz_batch)
+        pregeneration.ContentIngestionService = _FakeIngestion
+        pregeneration._flashcard_batch = pregeneration._quiz_batch = batch
+        try:
+            run = lambda: asyncio.run(pregeneration.pregenerate_module(db, user, module))
+
+            assert run() == "ready"
+            assert calls
+            assert db.query(PregeneratedFlashcard).filter_by(module_id=module.id).count() == \
+                settings.PREGENERATION_FLASHCARDS_PER_MODULE
+
+            calls.clear()
+            assert run() == "unchanged"
+            assert not calls
+
+            _FakeIngestion.text = LECTURE.replace("Mitosis", "Meiosis")
+            assert run() == "ready"
+            assert calls
+
+            pregeneration._running_modules.add(module.id)
+            try:
+                assert run() == "running"
+            finally:
+                pregeneration._running_modules.discard(module.id)
+        finally:
+            pregeneration.ContentIngestionService, pregeneration._flashcard_batch, pregeneration._quiz_batch = stubs
+            _FakeIngestion.text = LECTURE
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING MODULE PRE-GENERATION (temporary SQLite database)")
+    print("=" * 70)
+    for test in (test_generate_pool_dedupes_and_batches, test_unchanged_context_is_skipped):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
@@ -0,0 +1,68 @@
+"""
+Test script for prompt packing
+
+No database or network needed. Checks that repeated slide headers, footers
+and page numbers are stripped (keeping the first header and the real
+content), and that packed prompts stay within their budget for context
+budgets from several chunks down to less than one chunk.
+
+    python test_prompt_packer.py
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from app.services.prompt_packer import count_tokens, pack_prompt, strip_boilerplate
+
+MODEL = "llama-3.1-8b-instant"
+TOPICS = ["mitosis", "meiosis", "osmosis", "diffusion", "enzymes", "ribosomes", "photosynthesis", "respiration"]
+SLIDES = "".join(
+    f"CS 101 - Intro to Biology\n"
+    f"{TOPICS[n % 8].capitalize()} depends on {TOPICS[n // 8]} in the {'cell' * (1 + n % 5)} stage.\n"
+    f"Page {n} of 40\n{n}\n"
+    for n in range(40)
+)
+# Lines longer than a header or footer, so none of it is boilerplate
+NOTES = "".join(
+    f"Lecture note {n}: {TOPICS[n % 8]} is covered here with worked examples and review questions for the exam.\n"
+    for n in range(400)
+)
+
+
+def _build(material: str) -> str:
+    return f"Write flashcards about this material.\n\nTEXT:\n{material}\n\nReturn JSON."
+
+
+def test_strip_boilerplate():
+    """Repeated headers and footers are kept once, bare page numbers dropped, content untouched"""
+    text, removed = strip_boilerplate(SLIDES)
+    lines = text.split("\n")
+
+    assert lines.count("CS 101 - Intro to Biology") == 1
+    assert sum(line.startswith("Page ") for line in lines) == 1
+    assert not any(line.isdigit() for line in lines)
+    assert sum(" depends on " in line for line in lines) == 40
+    assert removed == 39 + 39 + 40
+
+
+def test_pack_within_budget():
+    """Context and prompt stay within budget, down to a budget smaller than one chunk"""
+    for context_budget in (2000, 600, 120, 20):
+        packed = pack_prompt(_build, NOTES, "test", MODEL, max_output_tokens=1000,
+                             context_budget=context_budget, query="mitosis")
+        stats = packed.stats
+        assert stats["truncated"]
+        assert stats["context_tokens"] <= context_budget, (context_budget, stats["context_tokens"])
+        assert stats["context_tokens"] > 0
+        assert stats["prompt_tokens"] <= stats["prompt_budget"]
+        assert count_tokens(packed.prompt) <= stats["template_tokens"] + context_budget
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING PROMPT PACKING")
+    print("=" * 70)
+    for test in (test_strip_boilerplate, test_pack_within_budget):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
@@ -0,0 +1,263 @@
+"""
+Test script for the indexes behind hot endpoint queries
+
+Migrates a temporary SQLite database with Alembic (app.db.migrations),
+seeds a user, then runs the dashboard, course, module, module import,
+assignment, study session, chat history, saved deck and quiz queries while
+capturing the SQL they send. Each captured SELECT is EXPLAINed and must
+search its tables through the expected index rather than scanning them.
+
+Set QUERY_PLAN_POSTGRES_URL to a scratch PostgreSQL database to run the
+same checks there (EXPLAIN with sequential scans disabled, so small test
+tables still show whether an index is usable). Routes on the async engine
+are EXPLAINed through aiosqlite/asyncpg, the rest through the sync driver.
+
+    python test_query_plans.py
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_query_plans_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+POSTGRES_URL = os.environ.get("QUERY_PLAN_POSTGRES_URL")
+
+import pytest
+from sqlalchemy import create_engine, event, inspect
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import Session, sessionmaker
+from app.db.database import async_database_url, engine
+from app.db.migrations import upgrade_database
+from app.models import (User, Course, Assignment, Flashcard, StudySession, ChatMessage,
+                        Quiz, QuizQuestion, SavedFlashcardDeck, SavedFlashcard)
+from app.models.module import Module
+from app.api.v1 import assignments, chat, courses, modules, quizzes, saved_decks, study_sessions
+from app.services import bulk_upsert, dashboard
+
+upgrade_database(engine)
+
+# Hot path -> {table: index its queries must use}
+EXPECTED_INDEXES = {
+    "dashboard course progress": {"courses": "ix_courses_user_active",
+                                  "assignments": "ix_assignments_course_submitted"},
+    "dashboard due windows": {"assignments": "ix_assignments_user_due_date"},
+    "dashboard flashcards due": {"flashcards": "ix_flashcards_user_course_reviewed"},
+    "GET /courses": {"courses": "ix_courses_user_active"},
+    "GET /modules/course/{id}": {"modules": "ix_modules_course_position"},
+    "module import lookup": {"modules": "uq_modules_course_name"},
+    "GET /assignments": {"assignments": "ix_assignments_user_due_date"},
+    "GET /study-sessions": {"study_sessions": "ix_study_sessions_session_date"},
+    "GET /chat/history/{course_id}": {"chat_messages": "ix_chat_messages_course_created"},
+    "GET /saved-decks": {"saved_flashcard_decks": "ix_saved_decks_user_course",
+                         "saved_flashcards": "ix_saved_flashcards_deck_order"},
+    "GET /quizzes": {"quizzes": "ix_quizzes_user_course"},
+    "GET /quizzes/{id}": {"quiz_questions": "ix_quiz_questions_quiz_order"},
+}
+
+
+def _seed(session_factory) -> dict:
+    """A user with a few courses, each with modules, assignments, cards, sessions, chat, a deck and a quiz"""
+    db = session_factory()
+    try:
+        user = User(first_name="Test", last_name="Student", password_hash="x",
+                    email=f"plan-{datetime.utcnow().timestamp()}@example.com")
+        db.add(user)
+        db.flush()
+        now = datetime.utcnow()
+        for c in range(3):
+            course = Course(user_id=user.id, code=f"COP{4000 + c}", name=f"Course {c}", color="#3B82F6")
+            db.add(course)
+            db.flush()
+            db.add_all(Module(course_id=course.id, name=f"Week {m}", position=m, items=[]) for m in range(5))
+            db.add_all(
+                Assignment(user_id=user.id, course_id=course.id, course=course.code, type="Assignment",
+                           title=f"Homework {a}", submitted=a % 2 == 0, due_date=now + timedelta(days=a - 3))
+                for a in range(10)
+            )
+            db.add_all(
+                Flashcard(user_id=user.id, course_id=course.id, question=f"Q{n}", answer=f"A{n}",
+                          last_reviewed=now - timedelta(days=n))
+                for n in range(5)
+            )
+            db.add_all(StudySession(user_id=user.id, course_id=course.id, duration_minutes=30,
+                                    session_date=now - timedelta(days=d)) for d in range(5))
+            db.add_all(ChatMessage(user_id=user.id, course_id=course.id, role="user", content=f"Hi {n}",
+                                   created_at=now - timedelta(minutes=n)) for n in range(5))
+            deck = SavedFlashcardDeck(user_id=user.id, course_id=course.id, name=f"Deck {c}")
+            deck.cards = [SavedFlashcard(question=f"Q{n}", answer=f"A{n}", order=n) for n in range(3)]
+            quiz = Quiz(user_id=user.id, course_id=course.id, title=f"Quiz {c}")
+            quiz.questions = [QuizQuestion(question_text=f"Q{n}", option_a="a", option_b="b", option_c="c",
+                                           option_d="d", correct_answer="A", order=n) for n in range(3)]
+            db.add_all([deck, quiz])
+        db.commit()
+        return {"user_id": user.id, "course_id": course.id, "quiz_id": quiz.id}
+    finally:
+        db.close()
+
+
+def _sync_paths(db, user, ids):
+    """Hot paths on a Session: (label, callable)"""
+    now = datetime.utcnow()
+    return [
+        ("dashboard course progress", lambda: dashboard.course_progress(db, user.id)),
+        ("dashboard due windows", lambda: dashboard.due_windows(db, user.id, now)),
+        ("dashboard flashcards due", lambda: dashboard.flashcards_due(db, user.id, now)),
+        ("GET /courses", lambda: courses.get_courses(active_only=True, current_user=user, db=db)),
+        ("GET /modules/course/{id}", lambda: modules.get_course_modules(ids["course_id"], db=db, current_user=user)),
+        ("module import lookup", lambda: bulk_upsert.upsert_modules(
+            db, {ids["course_id"]: [{"name": f"Week {m}", "items": []} for m in range(5)]})),
+        ("GET /assignments", lambda: assignments.get_assignments(course_id=None, status=None, upcoming_only=True,
+                                                                 current_user=user, db=db)),
+        ("GET /study-sessions", lambda: study_sessions.get_study_sessions(course_id=None, days=30, db=db)),
+    ]
+
+
+def _async_paths(db, user, ids):
+    """Hot paths on an AsyncSession (routes using get_async_db): (label, coroutine function)"""
+    return [
+        ("GET /chat/history/{course_id}", lambda: chat.get_chat_history(str(ids["course_id"]), 50, db)),
+        ("GET /saved-decks", lambda: saved_decks.list_saved_decks(current_user=user, db=db)),
+        ("GET /quizzes", lambda: quizzes.list_quizzes(current_user=user, db=db, course_id=ids["course_id"])),
+        ("GET /quizzes/{id}", lambda: quizzes.get_quiz(ids["quiz_id"], current_user=user, db=db)),
+    ]
+
+
+@contextmanager
+def _capture_selects(bind):
+    """Collect (statement, parameters) for every SELECT sent through bind"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            captured.append((statement, parameters))
+
+    event.listen(bind, "before_cursor_execute", capture)
+    try:
+        yield captured
+    finally:
+        event.remove(bind, "before_cursor_execute", capture)
+
+
+def _explain(connection, statement, parameters) -> list:
+    """
+    Plan lines for a captured statement, run through the same driver
+
+    SQLite: EXPLAIN QUERY PLAN details, e.g. 'SEARCH courses USING INDEX ix_courses_user_active (user_id=?)'
+    PostgreSQL: plan nodes as 'Index Scan courses USING ix_courses_user_active' / 'Seq Scan courses'
+    """
+    if connection.dialect.name == "sqlite":
+        rows = connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters).all()
+        return [row[-1] for row in rows]
+
+    connection.exec_driver_sql("SET enable_seqscan = off")
+    plan = connection.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+    if isinstance(plan, str):  # asyncpg returns json as text
+        plan = json.loads(plan)
+    lines, nodes = [], [plan[0]["Plan"]]
+    while nodes:
+        node = nodes.pop()
+        nodes.extend(node.get("Plans", []))
+        if "Relation Name" in node or "Index Name" in node:
+            line = f"{node['Node Type']} {node.get('Relation Name', '')}"
+            if "Index Name" in node:
+                line += f" USING {node['Index Name']}"
+            lines.append(line)
+    return lines
+
+
+def _sync_plans(bind, ids) -> dict:
+    plans = {}
+    with Session(bind) as db:
+        user = db.get(User, ids["user_id"])
+        for label, run in _sync_paths(db, user, ids):
+            with _capture_selects(bind) as captured:
+                run()
+            assert captured, f"{label} sent no queries"
+            # On the session's own connection (a SQLite writer engine has only one)
+            plans[label] = [line for statement, parameters in captured
+                            for line in _explain(db.connection(), statement, parameters)]
+    return plans
+
+
+async def _async_plans(async_url: str, ids) -> dict:
+    plans = {}
+    async_bind = create_async_engine(async_url)
+    try:
+        async with AsyncSession(async_bind, expire_on_commit=False) as db:
+            user = await db.get(User, ids["user_id"])
+            for label, run in _async_paths(db, user, ids):
+                with _capture_selects(async_bind.sync_engine) as captured:
+                    await run()
+                assert captured, f"{label} sent no queries"
+                async with async_bind.connect() as connection:
+                    plans[label] = [line for statement, parameters in captured
+                                    for line in await connection.run_sync(_explain, statement, parameters)]
+    finally:
+        await async_bind.dispose()
+    return plans
+
+
+def _check_plans(bind) -> dict:
+    """{hot path: plan lines}, asserting every expected index is used and no expected table is scanned"""
+    ids = _seed(sessionmaker(bind=bind))
+    async_url = async_database_url(bind.url.render_as_string(hide_password=False))
+    plans = {**_sync_plans(bind, ids), **asyncio.run(_async_plans(async_url, ids))}
+
+    for label, expected in EXPECTED_INDEXES.items():
+        plan = plans[label]
+        for table, index in expected.items():
+            assert any(index in line for line in plan), f"{label} doesn't use {index}: {plan}"
+            scans = [line for line in plan if line in (f"SCAN {table}", f"Seq Scan {table}")]
+            assert not scans, f"{label} scans {table}: {plan}"
+    return plans
+
+
+def test_migrations_create_indexes():
+    """Alembic migrations create every expected index"""
+    indexes = {index["name"] for table in inspect(engine).get_table_names()
+               for index in inspect(engine).get_indexes(table)}
+    missing = {index for expected in EXPECTED_INDEXES.values() for index in expected.values()} - indexes
+    assert not missing
+
+
+def test_sqlite_query_plans():
+    """On SQLite each hot endpoint query searches through its index"""
+    plans = _check_plans(engine)
+    for label, plan in plans.items():
+        print(f"  {label}:")
+        for line in dict.fromkeys(plan):
+            print(f"      {line}")
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="QUERY_PLAN_POSTGRES_URL not set")
+def test_postgres_query_plans():
+    """On PostgreSQL each hot endpoint query can use its index"""
+    pg_engine = create_engine(POSTGRES_URL)
+    try:
+        upgrade_database(pg_engine)
+        _check_plans(pg_engine)
+    finally:
+        pg_engine.dispose()
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING QUERY PLANS (temporary SQLite database)")
+    print("=" * 70)
+    tests = [test_migrations_create_indexes, test_sqlite_query_plans]
+    if POSTGRES_URL:
+        tests.append(test_postgres_query_plans)
+    else:
+        print("\n(QUERY_PLAN_POSTGRES_URL not set, skipping PostgreSQL plans)")
+    for test in tests:
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
@@ -0,0 +1,57 @@
+"""
+Test script for BM25 context retrieval
+
+No database or network needed. Checks that a query ranks the chunk that
+answers it above the start of the material (so the selected context
+contains a passage plain truncation would cut), and that the selected
+context stays within its token budget.
+
+    python test_retrieval.py
+"""
+import sys
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+from app.services.retrieval import BM25Index, chunk_text, estimate_tokens, select_context, CHARS_PER_TOKEN
+
+FILLER = "".join(
+    f"Week {n} notes: the syllabus, grading policy and office hours are unchanged, see section {n}.\n"
+    for n in range(1, 200)
+)
+RELEVANT = ("Mitochondria produce ATP through oxidative phosphorylation: the electron transport chain "
+            "pumps protons and ATP synthase uses the gradient to phosphorylate ADP.\n")
+LECTURE = FILLER[:len(FILLER) // 2] + RELEVANT + FILLER[len(FILLER) // 2:]
+QUERY = "How do mitochondria make ATP with ATP synthase?"
+
+
+def test_relevant_chunk_beats_head():
+    """The chunk that answers the query outranks the head of the text and makes it into the context"""
+    chunks = chunk_text(LECTURE)
+    best = BM25Index(chunks).rank(QUERY)[0][1]
+    assert "ATP synthase" in best.text
+    assert best is not chunks[0]
+
+    budget = 300
+    context = select_context([("Lecture 4", LECTURE)], QUERY, budget)
+    assert "ATP synthase" in context
+    assert "ATP synthase" not in LECTURE[:budget * CHARS_PER_TOKEN]  # What truncation would have kept
+
+
+def test_context_within_budget():
+    """The selected context never exceeds the token budget, for one or several documents"""
+    documents = [("Lecture 4", LECTURE), ("Lab 2", FILLER), ("Reading", RELEVANT * 20)]
+    for budget in (300, 600, 1500):
+        for docs in (documents[:1], documents):
+            context = select_context(docs, QUERY, budget)
+            assert context
+            assert estimate_tokens(context) <= budget, (budget, len(docs), estimate_tokens(context))
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING BM25 CONTEXT RETRIEVAL")
+    print("=" * 70)
+    for test in (test_relevant_chunk_beats_head, test_context_within_budget):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
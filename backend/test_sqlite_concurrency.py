@@ -0,0 +1,321 @@
+"""
+Test and benchmark script for SQLite production mode
+
+Checks the pragmas on the tuned engines (create_sqlite_engines in
+app.db.database), that sync and aiosqlite writers on one file take turns on
+the write gate, and that RoutingSession reads through the read pool until
+its transaction writes (unless it's a write unit). Then runs the same mixed workload for a few seconds
+against two temporary SQLite files, one on a plain engine (rollback journal,
+synchronous=FULL, every pooled connection may write) and one on the tuned
+writer/reader pair:
+
+- READERS threads building dashboards (app.services.dashboard)
+- WRITERS threads recording flashcard reviews, one commit per review
+- an import thread writing batches of IMPORT_BATCH assignments per commit
+
+and compares reads/sec, writes/sec and "database is locked" errors.
+
+    python test_sqlite_concurrency.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_DIR = Path(tempfile.gettempdir())
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{DB_DIR / 'canvas_ext_sqlite_concurrency_test.db'}")
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from app.core.config import settings
+from app.db.database import Base, RoutingSession, async_database_url, create_sqlite_engines, use_writer
+from app.models import User, Course, Assignment, Flashcard, StudySession
+from app.models.module import Module  # noqa: F401 (create_all needs the modules table)
+from app.services import dashboard
+
+READERS = 8
+WRITERS = 4
+IMPORT_BATCH = 500
+DURATION_SECONDS = 3.0
+
+
+def _database(name: str) -> str:
+    path = DB_DIR / f"canvas_ext_sqlite_{name}_test.db"
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        Path(f"{path}{suffix}").unlink(missing_ok=True)
+    return f"sqlite:///{path}"
+
+
+def _plain_sessions(url: str):
+    """The engine the app used before production mode: pysqlite defaults on one pool"""
+    bind = create_engine(url, connect_args={"check_same_thread": False})
+    return sessionmaker(autoflush=False, bind=bind), [bind]
+
+
+def _tuned_sessions(url: str):
+    writer, reader = create_sqlite_engines(url)
+    return sessionmaker(autoflush=False, bind=writer, class_=RoutingSession, read_bind=reader), [writer, reader]
+
+
+def _seed(session_factory) -> int:
+    """A user with a few courses of assignments and flashcards"""
+    db = session_factory()
+    try:
+        user = User(first_name="Test", last_name="Student", email="sqlite-concurrency@example.com", password_hash="x")
+        db.add(user)
+        db.flush()
+        for c in range(4):
+            course = Course(user_id=user.id, code=f"COP{4200 + c}", name=f"Course {c}", color="#3B82F6")
+            db.add(course)
+            db.flush()
+            db.add_all(Assignment(user_id=user.id, course_id=course.id, course=course.code, type="Assignment",
+                                  title=f"Homework {a}", submitted=a % 2 == 0, due_date=datetime.utcnow())
+                       for a in range(20))
+            db.add_all(Flashcard(user_id=user.id, course_id=course.id, question=f"Q{n}", answer=f"A{n}")
+                       for n in range(25))
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def _review(session_factory, user_id: int, n: int) -> None:
+    """Record one flashcard review: bump the card, log a study session"""
+    db = session_factory()
+    try:
+        use_writer(db)
+        card = db.query(Flashcard).filter(Flashcard.user_id == user_id).order_by(Flashcard.id).offset(n % 100).first()
+        card.times_reviewed = (card.times_reviewed or 0) + 1
+        card.last_reviewed = datetime.utcnow()
+        db.add(StudySession(user_id=user_id, course_id=card.course_id, duration_minutes=1, activity_type="flashcards"))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _import(session_factory, user_id: int, n: int) -> None:
+    """One import transaction: a batch of new assignments for the user's first course"""
+    db = session_factory()
+    try:
+        course_id = db.query(Course.id).filter(Course.user_id == user_id).order_by(Course.id).limit(1).scalar()
+        db.add_all(Assignment(user_id=user_id, course_id=course_id, course="IMPORT", type="Assignment",
+                              title=f"Imported {n}.{a}", due_date=datetime.utcnow()) for a in range(IMPORT_BATCH))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _read(session_factory, user_id: int, n: int) -> None:
+    db = session_factory()
+    try:
+        dashboard.build_dashboard(db, user_id, 0)
+    finally:
+        db.close()
+
+
+def _mixed_load(session_factory, user_id: int) -> dict:
+    """Run READERS + WRITERS threads for DURATION_SECONDS; ops/sec and errors by kind"""
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "imports": 0, "locked": 0}
+    lock = threading.Lock()
+
+    def worker(kind, op):
+        n = 0
+        while not stop.is_set():
+            n += 1
+            try:
+                op(session_factory, user_id, n)
+                outcome = kind
+            except OperationalError as e:
+                if "locked" not in str(e):
+                    raise
+                outcome = "locked"
+            with lock:
+                counts[outcome] += 1
+
+    threads = ([threading.Thread(target=worker, args=("reads", _read)) for _ in range(READERS)]
+               + [threading.Thread(target=worker, args=("writes", _review)) for _ in range(WRITERS)]
+               + [threading.Thread(target=worker, args=("imports", _import))])
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION_SECONDS)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+
+    db = session_factory()
+    try:
+        logged = db.query(StudySession).filter(StudySession.user_id == user_id).count()
+        imported = db.query(Assignment).filter(Assignment.course == "IMPORT").count()
+    finally:
+        db.close()
+    assert logged == counts["writes"], "every committed review must be stored exactly once"
+    assert imported == counts["imports"] * IMPORT_BATCH
+    return {"reads/s": counts["reads"] / seconds, "writes/s": counts["writes"] / seconds,
+            "imports": counts["imports"], "locked": counts["locked"]}
+
+
+def _run(make_sessions, name: str) -> dict:
+    session_factory, binds = make_sessions(_database(name))
+    try:
+        Base.metadata.create_all(bind=binds[0])
+        return _mixed_load(session_factory, _seed(session_factory))
+    finally:
+        for bind in binds:
+            bind.dispose()
+
+
+def test_pragmas():
+    """Writer and reader connections get WAL and the configured pragmas; readers can't write"""
+    writer, reader = create_sqlite_engines(_database("pragmas"))
+    try:
+        for bind, query_only in ((writer, 0), (reader, 1)):
+            with bind.connect() as connection:
+                pragma = lambda name: connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+                assert pragma("journal_mode") == "wal"
+                assert pragma("synchronous") == 1  # NORMAL
+                assert pragma("busy_timeout") == settings.SQLITE_BUSY_TIMEOUT_MS
+                assert pragma("cache_size") == -settings.SQLITE_CACHE_SIZE_KB
+                assert pragma("query_only") == query_only
+        assert writer.pool.size() == 1
+    finally:
+        writer.dispose()
+        reader.dispose()
+
+
+def test_sync_and_async_writers_share_the_gate():
+    """Sync and aiosqlite writers on one file never hold a writer connection at the same time"""
+    url = _database("shared_writer")
+    writer, reader = create_sqlite_engines(url)
+    async_writer, async_reader = create_sqlite_engines(async_database_url(url), create=create_async_engine)
+    held, overlaps = [0], [0]
+    lock = threading.Lock()
+
+    def checkout(*args):
+        with lock:
+            held[0] += 1
+            overlaps[0] += held[0] > 1
+
+    def checkin(*args):
+        with lock:
+            held[0] -= 1
+
+    for bind in (writer, async_writer.sync_engine):
+        event.listen(bind, "checkout", checkout)
+        event.listen(bind, "checkin", checkin)
+    increments = 50
+    try:
+        with writer.begin() as connection:
+            connection.exec_driver_sql("CREATE TABLE counter (n INTEGER NOT NULL)")
+            connection.exec_driver_sql("INSERT INTO counter VALUES (0)")
+
+        # Read-modify-write, so interleaved writers would lose increments
+        def sync_increments():
+            for _ in range(increments):
+                with writer.begin() as connection:
+                    n = connection.execute(text("SELECT n FROM counter")).scalar()
+                    connection.execute(text("UPDATE counter SET n = :n"), {"n": n + 1})
+
+        async def async_increments():
+            for _ in range(increments):
+                async with async_writer.begin() as connection:
+                    n = (await connection.execute(text("SELECT n FROM counter"))).scalar()
+                    await connection.execute(text("UPDATE counter SET n = :n"), {"n": n + 1})
+
+        async def mixed():
+            threads = [threading.Thread(target=sync_increments) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            await asyncio.gather(async_increments(), async_increments())
+            for thread in threads:
+                thread.join()
+
+        asyncio.run(mixed())
+        with reader.connect() as connection:
+            assert connection.exec_driver_sql("SELECT n FROM counter").scalar() == 4 * increments
+        assert overlaps[0] == 0
+    finally:
+        writer.dispose()
+        reader.dispose()
+        asyncio.run(async_writer.dispose())
+        asyncio.run(async_reader.dispose())
+
+
+def test_routing_session():
+    """Reads use the read pool until the transaction writes, or from the start with for_write/use_writer"""
+    session_factory, (writer, reader) = _tuned_sessions(_database("routing"))
+    statements = []
+    for bind, name in ((writer, "writer"), (reader, "reader")):
+        event.listen(bind, "before_cursor_execute",
+                     lambda conn, cursor, statement, *args, name=name: statements.append((name, statement.split()[0])))
+    try:
+        Base.metadata.create_all(bind=writer)
+        statements.clear()
+        db = session_factory()
+        try:
+            assert db.query(User).count() == 0
+            db.add(User(first_name="Test", last_name="Student", email="routing@example.com", password_hash="x"))
+            db.flush()
+            assert db.query(User).count() == 1  # sees its own uncommitted row
+            db.commit()
+            assert db.query(User).count() == 1
+        finally:
+            db.close()
+        assert statements == [("reader", "SELECT"), ("writer", "INSERT"), ("writer", "SELECT"), ("reader", "SELECT")]
+
+        # Read-modify-write units read on the writer: for one transaction, or the whole session
+        statements.clear()
+        db = session_factory()
+        try:
+            use_writer(db)
+            db.query(User).one().study_streak_days = 1
+            db.commit()
+            db.query(User).count()
+        finally:
+            db.close()
+        db = session_factory(for_write=True)
+        try:
+            db.query(User).count()
+            db.commit()
+            db.query(User).count()
+        finally:
+            db.close()
+        assert [name for name, _ in statements] == ["writer", "writer", "reader", "writer", "writer"]
+    finally:
+        writer.dispose()
+        reader.dispose()
+
+
+def test_mixed_load_benchmark():
+    """Under concurrent dashboards, reviews and imports, production mode commits more reviews with no "database is locked" """
+    before = _run(_plain_sessions, "plain")
+    after = _run(_tuned_sessions, "tuned")
+
+    print(f"{READERS} readers, {WRITERS} writers, 1 importer, {DURATION_SECONDS:g} s:")
+    for label, result in (("plain engine", before), ("production mode", after)):
+        print(f"  {label}: {result['reads/s']:.0f} reads/s, {result['writes/s']:.0f} writes/s, "
+              f"{result['imports']} imports, {result['locked']} locked errors")
+
+    assert after["locked"] == 0
+    assert after["writes/s"] > before["writes/s"]
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING SQLITE PRODUCTION MODE (temporary SQLite databases)")
+    print("=" * 70)
+    for test in [test_pragmas, test_sync_and_async_writers_share_the_gate, test_routing_session,
+                 test_mixed_load_benchmark]:
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
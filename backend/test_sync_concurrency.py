@@ -0,0 +1,130 @@
+"""
+Test and benchmark script for concurrent course syncs
+
+Runs CanvasSyncService.sync_all against the local fake Canvas server with
+per-request latency on a temporary SQLite database, once with courses
+fetched one at a time (CANVAS_SYNC_COURSE_CONCURRENCY=1) and once
+concurrently. Checks that both write the same rows, that only the
+current user's courses are synced, and that per-course timings are
+reported.
+
+    python test_sync_concurrency.py
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+sys.path.append(str(Path(__file__).parent))
+
+# Keep test data out of the development database
+DB_PATH = Path(tempfile.gettempdir()) / "canvas_ext_sync_concurrency_test.db"
+DB_PATH.unlink(missing_ok=True)
+os.environ["DATABASE_URL"] = f"sqlite:///{DB_PATH}"
+
+from app.core.config import settings
+from app.db.database import Base, SessionLocal, engine
+from app.models import User, Course
+from app.models.assignment import Assignment
+from app.models.course_sync_state import CourseSyncState
+from app.services.canvas_client import CanvasClient
+from app.services.canvas_sync import CanvasSyncService
+from fake_canvas_server import FakeCanvasServer
+
+Base.metadata.create_all(bind=engine)
+
+NUM_COURSES = 8
+LATENCY = 0.05
+
+
+def _new_user(email: str) -> int:
+    db = SessionLocal()
+    try:
+        user = User(first_name="Test", last_name="Student", email=email, password_hash="x")
+        db.add(user)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+
+def _sync(url: str, user_id: int, concurrency: int):
+    """Run a full sync with the given course concurrency, returning (results, seconds)"""
+    async def run():
+        canvas = CanvasClient(url, "test-token")
+        db = SessionLocal()
+        try:
+            return await CanvasSyncService(db=db, canvas_client=canvas, user_id=user_id).sync_all(full=True)
+        finally:
+            db.close()
+            await canvas.close()
+
+    configured = settings.CANVAS_SYNC_COURSE_CONCURRENCY
+    settings.CANVAS_SYNC_COURSE_CONCURRENCY = concurrency
+    try:
+        started = time.perf_counter()
+        results = asyncio.run(run())
+        return results, time.perf_counter() - started
+    finally:
+        settings.CANVAS_SYNC_COURSE_CONCURRENCY = configured
+
+
+def test_only_current_users_courses_are_synced():
+    """Another user's courses are neither fetched nor written"""
+    other_id = _new_user("other@example.com")
+    db = SessionLocal()
+    db.add(Course(user_id=other_id, canvas_id="999", code="OTHER", name="Someone else's course", color="#3B82F6"))
+    db.commit()
+    db.close()
+
+    user_id = _new_user("owner@example.com")
+    with FakeCanvasServer(num_courses=3, latency=0.0) as server:
+        results, _ = _sync(server.url, user_id, concurrency=4)
+
+    assert results["errors"] == []
+    assert len(results["course_timings"]) == 3
+    db = SessionLocal()
+    try:
+        other_course = db.query(Course).filter(Course.user_id == other_id).one()
+        assert db.query(CourseSyncState).filter(CourseSyncState.course_id == other_course.id).count() == 0
+        assert db.query(Assignment).filter(Assignment.course_id == other_course.id).count() == 0
+    finally:
+        db.close()
+
+
+def test_benchmark_sequential_vs_concurrent():
+    """Wall time to sync 8 courses: one course at a time vs concurrent fetches"""
+    runs = {}
+    for label, concurrency in (("sequential", 1), ("concurrent", 4)):
+        user_id = _new_user(f"{label}@example.com")
+        with FakeCanvasServer(num_courses=NUM_COURSES, num_assignments=20, num_files=30,
+                              latency=LATENCY) as server:
+            results, seconds = _sync(server.url, user_id, concurrency)
+            runs[label] = (results, seconds, server.max_in_flight)
+        assert results["errors"] == []
+
+    sequential, concurrent = runs["sequential"][0], runs["concurrent"][0]
+    print(f"  {NUM_COURSES} courses, {LATENCY * 1000:.0f} ms per request")
+    for label, (results, seconds, in_flight) in runs.items():
+        print(f"  {label:>10}: {seconds:.2f}s, up to {in_flight} requests in flight, "
+              f"{results['rows_touched']} rows written")
+    slowest = max(concurrent["course_timings"], key=lambda timing: timing["fetch_ms"])
+    print(f"  slowest course fetch {slowest['fetch_ms']:.0f} ms, write {slowest['write_ms']:.0f} ms")
+
+    for key in ("assignments", "modules", "files", "rows_touched"):
+        assert sequential[key] == concurrent[key]
+    assert len(concurrent["course_timings"]) == NUM_COURSES
+    assert all(timing["error"] is None and timing["full"] for timing in concurrent["course_timings"])
+    assert runs["concurrent"][2] <= settings.CANVAS_MAX_CONNECTIONS_PER_HOST
+    assert runs["concurrent"][1] < runs["sequential"][1]
+
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print(" TESTING CONCURRENT COURSE SYNCS (fake Canvas server, temporary SQLite database)")
+    print("=" * 70)
+    for test in (test_only_current_users_courses_are_synced, test_benchmark_sequential_vs_concurrent):
+        print(f"\n{test.__name__}: {test.__doc__}")
+        test()
+        print(f"✅ {test.__name__} passed")
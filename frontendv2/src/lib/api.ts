@@ -432,6 +432,70 @@ export const modulesAPI = {
   },
 };
 
+// Background jobs (generation endpoints return 202 with a job to poll)
+export interface Job<T = any> {
+  id: string;
+  kind: string;
+  status: "queued" | "running" | "succeeded" | "failed";
+  result: T | null;
+  error: string | null;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+}
+
+const JOB_POLL_INTERVAL_MS = 1000;
+const JOB_POLL_TIMEOUT_MS = 30 * 60 * 1000; // The backend's JOB_TIMEOUT_SECONDS
+
+export const jobsAPI = {
+  async getJob<T = any>(jobId: string): Promise<Job<T>> {
+    const token = tokenManager.getToken();
+    if (!token) {
+      throw new Error("Not authenticated");
+    }
+
+    const response = await fetch(`${API_BASE_URL}/jobs/${jobId}`, {
+      headers: {
+        Authorization: `Bearer ${token}`,
+        "Content-Type": "application/json"
+      },
+    });
+
+    if (!response.ok) {
+      const error = await response.json().catch(() => ({ detail: "Failed to fetch job" }));
+      throw new Error(error.detail || "Failed to fetch job");
+    }
+
+    return response.json();
+  },
+
+  // Poll a job until it finishes; resolves with its result, rejects with its error
+  async waitForJob<T = any>(job: Job<T>, failureMessage: string): Promise<T> {
+    const deadline = Date.now() + JOB_POLL_TIMEOUT_MS;
+    let current = job;
+    while (current.status === "queued" || current.status === "running") {
+      if (Date.now() > deadline) {
+        throw new Error(`${failureMessage}: timed out`);
+      }
+      await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+      current = await jobsAPI.getJob<T>(current.id);
+    }
+
+    if (current.status === "failed") {
+      const errorObj = { message: current.error || failureMessage, detail: current.error };
+
+      // Check if it's a Canvas session error
+      if (isCanvasSessionError(errorObj) && onCanvasSessionExpired) {
+        onCanvasSessionExpired();
+      }
+
+      throw new Error(current.error || failureMessage);
+    }
+
+    return current.result as T;
+  },
+};
+
 // Flashcards API
 export const flashcardsAPI = {
   async generateFromModule(moduleId: number | null, numCards: number, fileUrls?: string[], includeFilesTab?: boolean): Promise<{ flashcards: any[], module_name: string, count: number }> {
@@ -472,7 +536,8 @@ export const flashcardsAPI = {
       throw new Error(error.detail || "Failed to generate flashcards");
     }
 
-    return response.json();
+    const job: Job<{ flashcards: any[], module_name: string, count: number }> = await response.json();
+    return jobsAPI.waitForJob(job, "Failed to generate flashcards");
   },
 
   async generateQuizFromModule(moduleId: number | null, numQuestions: number, fileUrls?: string[], includeFilesTab?: boolean): Promise<{ questions: any[], module_name: string, count: number }> {
@@ -513,7 +578,8 @@ export const flashcardsAPI = {
       throw new Error(error.detail || "Failed to generate quiz");
     }
 
-    return response.json();
+    const job: Job<{ questions: any[], module_name: string, count: number }> = await response.json();
+    return jobsAPI.waitForJob(job, "Failed to generate quiz");
   },
 
   async saveDeck(deckName: string, flashcards: any[], courseId: number, moduleId: number) {